@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Mesure du temps de démarrage du serveur web (import de meteo_web.py et
+# première requête), dans un processus Python neuf à chaque essai comme lors
+# d'un redémarrage de Gunicorn.
+#
+# Utilisation :
+#   python bench_startup.py              -> 5 essais, affichage du résumé
+#   python bench_startup.py -n 10 --save -> ajoute le résultat à data/bench_startup.jsonl
+#   python bench_startup.py --importtime -> modules les plus lents à importer
+#
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_FILE = os.path.join(BASE_DIR, "data", "bench_startup.jsonl")
+
+# Code exécuté dans le processus enfant : import, première page, modules chargés
+CHILD_CODE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import meteo_web
+t1 = time.perf_counter()
+client = meteo_web.app.test_client()
+status = client.get("/login").status_code
+t2 = time.perf_counter()
+heavy = [m for m in ("pandas", "numpy", "matplotlib", "PIL", "requests", "paho") if m in sys.modules]
+print(json.dumps({"import": t1 - t0, "first_request": t2 - t1, "status": status, "heavy_modules": heavy}))
+'''
+
+def run_once():
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", CHILD_CODE], cwd=BASE_DIR, capture_output=True, text=True)
+    total = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "échec du processus enfant")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    data["process_total"] = total
+    return data
+
+def show_import_time(top=15):
+    """Affiche les modules les plus coûteux à importer (python -X importtime)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import meteo_web"], cwd=BASE_DIR, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        try:
+            rows.append((int(parts[1]), parts[2]))
+        except (ValueError, IndexError):
+            continue
+    print(f"\n--- {top} imports les plus lents (cumulé, µs) ---")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative:>10}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du temps de démarrage de meteo_web.py")
+    parser.add_argument("-n", "--runs", type=int, default=5, help="Nombre d'essais (défaut : 5)")
+    parser.add_argument("--save", action="store_true", help=f"Ajoute le résultat à {RESULTS_FILE}")
+    parser.add_argument("--importtime", action="store_true", help="Affiche le détail des imports les plus lents")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        try:
+            runs.append(run_once())
+        except RuntimeError as e:
+            print(f"❌ Essai {i + 1} échoué : {e}")
+            return 1
+
+    summary = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "runs": len(runs),
+        "import_median": statistics.median(r["import"] for r in runs),
+        "first_request_median": statistics.median(r["first_request"] for r in runs),
+        "process_total_median": statistics.median(r["process_total"] for r in runs),
+        "heavy_modules": runs[-1]["heavy_modules"],
+    }
+    print(f"Import de meteo_web       : {summary['import_median'] * 1000:.0f} ms (médiane sur {len(runs)} essais)")
+    print(f"Première requête (/login) : {summary['first_request_median'] * 1000:.0f} ms")
+    print(f"Processus complet         : {summary['process_total_median'] * 1000:.0f} ms")
+    print(f"Modules lourds chargés    : {', '.join(summary['heavy_modules']) or 'aucun'}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+        with open(RESULTS_FILE, 'a') as f:
+            f.write(json.dumps(summary) + "\n")
+        print(f"✅ Résultat ajouté à {RESULTS_FILE}")
+
+    if args.importtime:
+        show_import_time()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#
+# Pilote du BME280 en mode forcé pour meteo_capteur.py.
+#
+# Le capteur dort entre deux mesures : chaque échantillon déclenche une seule
+# conversion (suréchantillonnage et filtre IIR réglables, voir config.json),
+# puis température, pression et humidité sont lues en une seule lecture I2C
+# de 8 octets et compensées avec les coefficients d'étalonnage de la puce
+# (formules en virgule flottante de la fiche technique Bosch, section 8.1).
+# Une conversion par minute au lieu d'un fonctionnement continu limite
+# l'échauffement du capteur, et le bus n'est occupé que quelques octets.
+#
+# La mesure se fait en deux temps pour ne pas garder le bus pendant la
+# conversion : start_measurement() retourne le temps de conversion à
+# attendre, read_measurement() lit le résultat.
+#
+
+import struct
+import time
+
+from adafruit_bus_device.i2c_device import I2CDevice
+
+BME280_ADDRESS = 0x76
+CHIP_ID = 0x60
+
+REGISTER_CALIB_TP = 0x88   # dig_T1..dig_P9 (24 octets)
+REGISTER_CALIB_H1 = 0xA1
+REGISTER_CHIP_ID = 0xD0
+REGISTER_RESET = 0xE0
+REGISTER_CALIB_H2 = 0xE1   # dig_H2..dig_H6 (7 octets)
+REGISTER_CTRL_HUM = 0xF2
+REGISTER_STATUS = 0xF3
+REGISTER_CTRL_MEAS = 0xF4
+REGISTER_CONFIG = 0xF5
+REGISTER_DATA = 0xF7       # press_msb .. hum_lsb (8 octets)
+
+MODE_FORCED = 0x01
+STATUS_MEASURING = 0x08
+STATUS_IM_UPDATE = 0x01
+RESET_COMMAND = 0xB6
+
+# Valeur réglée -> code du registre (0 : grandeur non mesurée)
+OVERSAMPLING = {0: 0, 1: 1, 2: 2, 4: 3, 8: 4, 16: 5}
+IIR_FILTER = {0: 0, 2: 1, 4: 2, 8: 3, 16: 4}
+
+# Réglages "surveillance météo" de la fiche technique : 1x partout, sans filtre
+DEFAULT_OVERSAMPLING = 1
+DEFAULT_IIR_FILTER = 0
+
+STATUS_POLLS = 10          # Vérifications du bit "mesure en cours" avant abandon
+STATUS_POLL_INTERVAL = 0.002
+
+def _setting(name, value, allowed, default):
+    """Valeur de réglage valide, ou la valeur par défaut (avec avertissement)."""
+    if value in allowed:
+        return value
+    print(f"⚠️ BME280 : {name}={value!r} invalide (valeurs possibles : {sorted(allowed)}), utilisation de {default}.")
+    return default
+
+class BME280:
+    """BME280 sur I2C en mode forcé, lecture groupée des trois grandeurs."""
+
+    def __init__(self, i2c, address=BME280_ADDRESS, oversampling_temp=DEFAULT_OVERSAMPLING,
+                 oversampling_hum=DEFAULT_OVERSAMPLING, oversampling_pressure=DEFAULT_OVERSAMPLING,
+                 iir_filter=DEFAULT_IIR_FILTER):
+        self._device = I2CDevice(i2c, address) # ValueError si aucun périphérique ne répond
+        self._buffer = bytearray(24)
+        chip_id = self._read(REGISTER_CHIP_ID, 1)[0]
+        if chip_id != CHIP_ID:
+            raise OSError(f"Identifiant de puce 0x{chip_id:02x} inattendu à l'adresse 0x{address:02x} (BME280 : 0x{CHIP_ID:02x})")
+        self._write(REGISTER_RESET, RESET_COMMAND)
+        time.sleep(0.004)
+        for _ in range(STATUS_POLLS):
+            if not self._read(REGISTER_STATUS, 1)[0] & STATUS_IM_UPDATE:
+                break
+            time.sleep(STATUS_POLL_INTERVAL)
+        self._read_calibration()
+        self.configure(oversampling_temp, oversampling_hum, oversampling_pressure, iir_filter)
+
+    def _read(self, register, length):
+        buffer = memoryview(self._buffer)[:length]
+        with self._device as i2c:
+            i2c.write_then_readinto(bytes([register]), buffer)
+        return bytes(buffer)
+
+    def _write(self, register, value):
+        with self._device as i2c:
+            i2c.write(bytes([register, value & 0xFF]))
+
+    def _read_calibration(self):
+        (self._t1, self._t2, self._t3,
+         self._p1, self._p2, self._p3, self._p4, self._p5,
+         self._p6, self._p7, self._p8, self._p9) = struct.unpack("<HhhHhhhhhhhh", self._read(REGISTER_CALIB_TP, 24))
+        self._h1 = self._read(REGISTER_CALIB_H1, 1)[0]
+        e1, e2, e3, e4, e5, e6, e7 = self._read(REGISTER_CALIB_H2, 7)
+        self._h2 = struct.unpack("<h", bytes([e1, e2]))[0]
+        self._h3 = e3
+        self._h4 = (struct.unpack("b", bytes([e4]))[0] << 4) | (e5 & 0x0F)
+        self._h5 = (struct.unpack("b", bytes([e6]))[0] << 4) | (e5 >> 4)
+        self._h6 = struct.unpack("b", bytes([e7]))[0]
+
+    def configure(self, oversampling_temp=DEFAULT_OVERSAMPLING, oversampling_hum=DEFAULT_OVERSAMPLING,
+                  oversampling_pressure=DEFAULT_OVERSAMPLING, iir_filter=DEFAULT_IIR_FILTER):
+        """
+        Règle le suréchantillonnage (0, 1, 2, 4, 8 ou 16 ; 0 désactive l'humidité
+        ou la pression) et le filtre IIR (0, 2, 4, 8 ou 16). Le capteur reste en
+        sommeil jusqu'à la prochaine mesure.
+        """
+        self.oversampling_temp = _setting("oversampling_temp", oversampling_temp, set(OVERSAMPLING) - {0}, DEFAULT_OVERSAMPLING)
+        self.oversampling_hum = _setting("oversampling_hum", oversampling_hum, OVERSAMPLING, DEFAULT_OVERSAMPLING)
+        self.oversampling_pressure = _setting("oversampling_pressure", oversampling_pressure, OVERSAMPLING, DEFAULT_OVERSAMPLING)
+        self.iir_filter = _setting("iir_filter", iir_filter, IIR_FILTER, DEFAULT_IIR_FILTER)
+        # ctrl_hum n'est pris en compte qu'après une écriture de ctrl_meas ; config s'écrit en sommeil
+        self._write(REGISTER_CTRL_HUM, OVERSAMPLING[self.oversampling_hum])
+        self._write(REGISTER_CONFIG, IIR_FILTER[self.iir_filter] << 2)
+        self._ctrl_meas = (OVERSAMPLING[self.oversampling_temp] << 5) | (OVERSAMPLING[self.oversampling_pressure] << 2)
+        self._write(REGISTER_CTRL_MEAS, self._ctrl_meas) # Mode sommeil
+
+    def measurement_time(self):
+        """Durée maximale d'une conversion avec les réglages actuels (fiche technique, annexe 9.1), en secondes."""
+        duration = 1.25 + 2.3 * self.oversampling_temp
+        if self.oversampling_pressure:
+            duration += 2.3 * self.oversampling_pressure + 0.575
+        if self.oversampling_hum:
+            duration += 2.3 * self.oversampling_hum + 0.575
+        return duration / 1000.0
+
+    def start_measurement(self):
+        """Déclenche une conversion en mode forcé. Retourne le temps à attendre (secondes) avant read_measurement()."""
+        self._write(REGISTER_CTRL_MEAS, self._ctrl_meas | MODE_FORCED)
+        return self.measurement_time()
+
+    def read_measurement(self):
+        """
+        Lit la dernière conversion en une lecture de 8 octets.
+        Retourne (température °C, humidité %, pression hPa) ; humidité ou pression
+        valent None si elles ne sont pas mesurées. Lève OSError si la conversion
+        n'est pas terminée.
+        """
+        for _ in range(STATUS_POLLS):
+            if not self._read(REGISTER_STATUS, 1)[0] & STATUS_MEASURING:
+                break
+            time.sleep(STATUS_POLL_INTERVAL)
+        else:
+            raise OSError("BME280 : conversion non terminée")
+        data = self._read(REGISTER_DATA, 8)
+        adc_p = (data[0] << 12) | (data[1] << 4) | (data[2] >> 4)
+        adc_t = (data[3] << 12) | (data[4] << 4) | (data[5] >> 4)
+        adc_h = (data[6] << 8) | data[7]
+
+        t_fine = self._compensate_t_fine(adc_t)
+        temperature = t_fine / 5120.0
+        pressure = self._compensate_pressure(adc_p, t_fine) if self.oversampling_pressure else None
+        humidity = self._compensate_humidity(adc_h, t_fine) if self.oversampling_hum else None
+        return temperature, humidity, pressure
+
+    def read(self):
+        """Mesure complète (déclenchement, attente, lecture) : (température, humidité, pression)."""
+        time.sleep(self.start_measurement())
+        return self.read_measurement()
+
+    def _compensate_t_fine(self, adc_t):
+        var1 = (adc_t / 16384.0 - self._t1 / 1024.0) * self._t2
+        var2 = (adc_t / 131072.0 - self._t1 / 8192.0) ** 2 * self._t3
+        return var1 + var2
+
+    def _compensate_pressure(self, adc_p, t_fine):
+        var1 = t_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * self._p6 / 32768.0
+        var2 = var2 + var1 * self._p5 * 2.0
+        var2 = var2 / 4.0 + self._p4 * 65536.0
+        var1 = (self._p3 * var1 * var1 / 524288.0 + self._p2 * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * self._p1
+        if var1 == 0:
+            return None # Évite une division par zéro (coefficients invalides)
+        pressure = 1048576.0 - adc_p
+        pressure = (pressure - var2 / 4096.0) * 6250.0 / var1
+        var1 = self._p9 * pressure * pressure / 2147483648.0
+        var2 = pressure * self._p8 / 32768.0
+        pressure = pressure + (var1 + var2 + self._p7) / 16.0
+        return pressure / 100.0 # Pa -> hPa
+
+    def _compensate_humidity(self, adc_h, t_fine):
+        var_h = t_fine - 76800.0
+        var_h = (adc_h - (self._h4 * 64.0 + self._h5 / 16384.0 * var_h)) * (
+            self._h2 / 65536.0 * (1.0 + self._h6 / 67108864.0 * var_h * (1.0 + self._h3 / 67108864.0 * var_h)))
+        var_h = var_h * (1.0 - self._h1 * var_h / 524288.0)
+        return min(max(var_h, 0.0), 100.0)
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+#
+# Vérification et réparation du fichier de mesures (meteo_log.csv).
+#
+# - verify_tail() : détection incrémentale des caractères NUL laissés par une
+#   coupure de courant. Un point de contrôle ("vérifié jusqu'à l'octet N") est
+#   conservé à côté du CSV : seuls les octets ajoutés depuis sont parcourus
+#   (via mmap), et seule la fin du fichier à partir de la première ligne
+#   corrompue est réécrite, sur place.
+# - repair_file() : passe complète en flux (NUL, passage des anciennes lignes
+#   de 7 colonnes au format actuel, virgules décimales), avec affichage de la
+#   progression. Utilisée par reparer_csv.py et convertisseur_csv.py.
+# - rewrite_rows() : modification ou suppression de mesures précises
+#   (page d'historique du serveur web), les autres lignes étant recopiées
+#   octet pour octet.
+#
+# Le CSV est verrouillé (flock) pendant les réparations ; meteo_capteur.py
+# écrit ses lignes via locked_append() pour ne pas en perdre pendant ce temps.
+#
+
+import csv
+import fcntl
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import zlib
+from contextlib import contextmanager
+from itertools import chain
+
+from meteo_stats import CSV_HEADERS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+
+CHECKPOINT_SUFFIX = ".verified"   # Point de contrôle : <csv>.verified (JSON)
+FINGERPRINT_BYTES = 4096          # Octets précédant le point de contrôle servant d'empreinte
+MIN_FIELDS = 7                    # Plus petite ligne valide (ancien format sans rafale)
+DECIMAL_COLUMNS = range(1, 7)     # temp, hum, pressure, rain, wind_speed, wind_gust
+
+# Timestamp valide (ex: 2025-11-08 10:30:00) à partir duquel une ligne est récupérée
+TIMESTAMP_REGEX = re.compile(rb'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+NUL_RUN_REGEX = re.compile(rb'\x00+')
+
+# --- Verrouillage ---
+
+@contextmanager
+def locked_append(filepath):
+    """
+    Ouvre le CSV en ajout sous verrou exclusif. Si le fichier a été remplacé
+    pendant l'attente du verrou (réparation complète), on rouvre le nouveau.
+    """
+    while True:
+        f = open(filepath, "a", newline="")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            same_file = os.fstat(f.fileno()).st_ino == os.stat(filepath).st_ino
+        except FileNotFoundError:
+            same_file = False
+        if same_file:
+            break
+        f.close()
+    try:
+        yield f
+    finally:
+        f.close() # Libère le verrou
+
+# --- Point de contrôle ---
+
+def _checkpoint_path(filepath):
+    return filepath + CHECKPOINT_SUFFIX
+
+def _fingerprint(fd, offset):
+    start = max(0, offset - FINGERPRINT_BYTES)
+    return zlib.crc32(os.pread(fd, offset - start, start))
+
+def load_checkpoint(filepath, fd):
+    """Retourne l'offset déjà vérifié, ou 0 si le fichier a été remplacé ou réécrit entre-temps."""
+    try:
+        with open(_checkpoint_path(filepath), 'r') as f:
+            state = json.load(f)
+        offset = int(state["offset"])
+        st = os.fstat(fd)
+        if st.st_ino != state["inode"] or st.st_size < offset:
+            return 0
+        if _fingerprint(fd, offset) != state["fingerprint"]:
+            return 0
+        return offset
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+
+def save_checkpoint(filepath, fd, offset):
+    state = {"offset": offset, "inode": os.fstat(fd).st_ino, "fingerprint": _fingerprint(fd, offset)}
+    tmp_path = _checkpoint_path(filepath) + ".tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, _checkpoint_path(filepath))
+    except OSError as e:
+        print(f"⚠️ Impossible d'enregistrer le point de contrôle du CSV : {e}")
+
+# --- Récupération des lignes corrompues ---
+
+def recover_line(line):
+    """
+    Récupère les enregistrements d'une ligne contenant des caractères NUL.
+    Une suite de NUL remplace souvent la fin d'une ligne : chaque fragment est
+    repris à partir de son timestamp et conservé s'il a assez de colonnes.
+    Retourne (lignes récupérées, fragments ignorés).
+    """
+    recovered = []
+    dropped = 0
+    for fragment in NUL_RUN_REGEX.split(line.rstrip(b'\r\n')):
+        if not fragment.strip():
+            continue
+        match = TIMESTAMP_REGEX.search(fragment)
+        if match and fragment.count(b',') + 1 >= MIN_FIELDS:
+            recovered.append(fragment[match.start():] + b'\n')
+        else:
+            dropped += 1
+            print(f"Ligne corrompue irrécupérable ignorée : {fragment.decode('utf-8', errors='replace').strip()}")
+    return recovered, dropped
+
+# --- Vérification incrémentale ---
+
+def verify_tail(filepath=CSV_FILE):
+    """
+    Vérifie les octets ajoutés au CSV depuis le dernier point de contrôle et
+    répare sur place la fin du fichier si des caractères NUL y sont trouvés.
+    Retourne un dictionnaire {"scanned", "repaired", "dropped"}.
+    """
+    result = {"scanned": 0, "repaired": 0, "dropped": 0}
+    if not os.path.exists(filepath):
+        return result
+
+    with open(filepath, 'r+b') as f:
+        fcntl.flock(f, fcntl.LOCK_EX) # Aucune ligne ne peut être ajoutée pendant la vérification
+        fd = f.fileno()
+        start = load_checkpoint(filepath, fd)
+        size = os.fstat(fd).st_size
+        if size <= start:
+            return result
+        result["scanned"] = size - start
+
+        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as mm:
+            first_nul = mm.find(b'\x00', start)
+            if first_nul == -1:
+                # Seules les lignes complètes sont considérées comme vérifiées
+                verified = mm.rfind(b'\n', start) + 1
+                if verified > start:
+                    save_checkpoint(filepath, fd, verified)
+                return result
+
+            print(f"Corruption détectée dans '{filepath}' (octet {first_nul}). Réparation de la fin du fichier...")
+            # Compactage sur place à partir de la ligne corrompue : ce qui est
+            # écrit n'est jamais plus long que ce qui a été lu.
+            read_pos = mm.rfind(b'\n', 0, first_nul) + 1
+            write_pos = read_pos
+            while read_pos < size:
+                end = mm.find(b'\n', read_pos)
+                end = size if end == -1 else end + 1
+                line = mm[read_pos:end]
+                read_pos = end
+                if b'\x00' in line:
+                    lines, dropped = recover_line(line)
+                    result["repaired"] += 1
+                    result["dropped"] += dropped
+                else:
+                    lines = [line]
+                for out in lines:
+                    os.pwrite(fd, out, write_pos)
+                    write_pos += len(out)
+
+        os.ftruncate(fd, write_pos)
+        os.fsync(fd)
+        save_checkpoint(filepath, fd, write_pos)
+        print(f"✅ '{filepath}' réparé : {result['repaired']} ligne(s) corrompue(s), {result['dropped']} fragment(s) ignoré(s).")
+    return result
+
+# --- Modification de lignes ---
+
+def rewrite_rows(timestamp, transform, filepath=CSV_FILE):
+    """
+    Applique transform(ligne) aux lignes dont l'horodatage vaut `timestamp` :
+    elle retourne la nouvelle ligne (liste de champs), ou None pour la
+    supprimer. Les autres lignes sont recopiées telles quelles. Le fichier est
+    remplacé de manière atomique sous verrou (locked_append rouvre le nouveau
+    fichier). Retourne le nombre de lignes trouvées.
+    """
+    if not os.path.exists(filepath):
+        return 0
+    prefix = timestamp.encode('utf-8') + b','
+    temp_path = filepath + ".edit.tmp"
+    found = 0
+    with open(filepath, 'rb') as f_in:
+        fcntl.flock(f_in, fcntl.LOCK_EX) # Aucune mesure n'est ajoutée pendant la réécriture
+        try:
+            with open(temp_path, 'wb') as f_out:
+                for raw in f_in:
+                    if not raw.startswith(prefix):
+                        f_out.write(raw)
+                        continue
+                    found += 1
+                    row = next(csv.reader([raw.decode('utf-8', errors='replace')]), [])
+                    new_row = transform(row)
+                    if new_row is not None:
+                        f_out.write(_format_row(new_row).encode('utf-8'))
+            if found:
+                # Nouveau fichier : verify_tail() le revérifiera entièrement (point de contrôle invalidé)
+                os.replace(temp_path, filepath)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return found
+
+def _format_row(row):
+    out = io.StringIO()
+    csv.writer(out).writerow(["" if value is None else value for value in row])
+    return out.getvalue() # Fin de ligne du module csv, comme les lignes écrites par meteo_capteur.py
+
+# --- Passe complète ---
+
+def _print_progress(done, total):
+    print(f"\r  {done * 100 // max(total, 1):3d} % ({done // 1024} / {total // 1024} Ko)", end="", flush=True)
+
+def _upgrade_row(row, stats):
+    """Ancien format à 7 colonnes : insertion d'une rafale vide avant la direction."""
+    if len(row) == MIN_FIELDS:
+        stats["upgraded"] += 1
+        return row[:6] + [""] + [row[6]]
+    return row[:len(CSV_HEADERS)]
+
+def _fix_decimals(row, stats):
+    """Remplace les virgules décimales ("12,5") par des points dans les colonnes numériques."""
+    fixed = False
+    for i in DECIMAL_COLUMNS:
+        if i < len(row) and ',' in row[i]:
+            row[i] = row[i].replace(',', '.', 1)
+            fixed = True
+    if fixed:
+        stats["decimals"] += 1
+    return row
+
+def repair_file(source=CSV_FILE, destination=None, upgrade=True, decimals=True, backup=True, progress=_print_progress):
+    """
+    Réécrit le CSV en une seule passe en flux : récupération des lignes
+    contenant des NUL, puis (au choix) mise au format 10 colonnes et
+    correction des virgules décimales. Sans destination, le fichier source est
+    remplacé (après sauvegarde en .bak). progress(octets_lus, taille) est
+    appelé régulièrement. Retourne les compteurs, ou None en cas d'erreur.
+    """
+    stats = {"rows": 0, "nul_repaired": 0, "nul_dropped": 0, "upgraded": 0, "decimals": 0, "skipped": 0}
+    if not os.path.exists(source):
+        print(f"Erreur : Le fichier {source} n'existe pas.")
+        return None
+
+    in_place = destination is None
+    output = source + ".repair.tmp" if in_place else destination
+    total = os.path.getsize(source)
+    read_bytes = 0
+    next_report = 0
+
+    def decoded_lines(f_in):
+        nonlocal read_bytes
+        for raw in f_in:
+            read_bytes += len(raw)
+            if b'\x00' in raw:
+                lines, dropped = recover_line(raw)
+                stats["nul_repaired"] += 1
+                stats["nul_dropped"] += dropped
+            else:
+                lines = [raw]
+            for line in lines:
+                yield line.decode('utf-8', errors='replace')
+
+    try:
+        with open(source, 'rb') as f_in:
+            fcntl.flock(f_in, fcntl.LOCK_EX) # meteo_capteur.py attend la fin de la réparation
+            if backup and in_place:
+                shutil.copy(source, source + ".bak")
+                print(f"✅ Sauvegarde de sécurité créée : {source}.bak")
+
+            with open(output, 'w', newline='', encoding='utf-8') as f_out:
+                reader = csv.reader(decoded_lines(f_in))
+                writer = csv.writer(f_out)
+                first = next(reader, None)
+                if first is None:
+                    print("Fichier vide.")
+                    return None
+                # En-tête réécrit au format courant (ou ajouté s'il manquait)
+                is_header = bool(first) and first[0] == "time"
+                writer.writerow(first if is_header and not upgrade else CSV_HEADERS)
+                rows = reader if is_header else chain([first], reader)
+
+                for row in rows:
+                    if not row:
+                        continue
+                    if len(row) < MIN_FIELDS:
+                        stats["skipped"] += 1
+                        continue
+                    if upgrade:
+                        row = _upgrade_row(row, stats)
+                    if decimals:
+                        row = _fix_decimals(row, stats)
+                    writer.writerow(row)
+                    stats["rows"] += 1
+                    if progress and read_bytes >= next_report:
+                        progress(read_bytes, total)
+                        next_report = read_bytes + max(total // 20, 1)
+
+            if progress:
+                progress(total, total)
+                print()
+            if in_place:
+                os.replace(output, source)
+        if in_place:
+            # Tout le fichier vient d'être vérifié
+            with open(source, 'rb') as f:
+                save_checkpoint(source, f.fileno(), os.fstat(f.fileno()).st_size)
+    except Exception as e:
+        print(f"❌ Une erreur est survenue : {e}")
+        if in_place and os.path.exists(output):
+            os.remove(output)
+        return None
+    return stats
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+#
+# Lecture de la fin des fichiers CSV et de logs sans les lire en entier.
+#
+# - read_last_lines() : lecture par blocs en partant de la fin du fichier,
+#   pour récupérer les N dernières lignes.
+# - TailReader : garde en mémoire les N dernières lignes et la position déjà
+#   lue. Sur un fichier en ajout seul, un nouvel appel ne lit que les octets
+#   écrits depuis (API temps réel du serveur web, suivi du bot Telegram).
+#
+# Une dernière ligne sans retour à la ligne est une écriture en cours : elle
+# est ignorée jusqu'à ce qu'elle soit complète.
+#
+
+import os
+import threading
+from collections import deque
+
+BLOCK_SIZE = 4096
+ANCHOR_BYTES = 64   # Octets précédant la position lue, comparés pour détecter une réécriture
+
+def _decode(raw):
+    return raw.decode('utf-8', errors='ignore').rstrip('\r')
+
+def _read_last_raw(fd, size, num_lines, block_size=BLOCK_SIZE, complete_only=True):
+    """
+    Lit le fichier par blocs depuis la fin jusqu'à trouver `num_lines` lignes.
+    Retourne (lignes brutes sans '\\n', offset juste après la dernière ligne complète).
+    """
+    chunks = []
+    newlines = 0
+    pos = size
+    while pos > 0 and newlines <= num_lines:
+        length = min(block_size, pos)
+        pos -= length
+        chunk = os.pread(fd, length, pos)
+        chunks.append(chunk)
+        newlines += chunk.count(b'\n')
+    data = b"".join(reversed(chunks))
+
+    complete_end = data.rfind(b'\n') + 1
+    lines = data[:complete_end].split(b'\n')[:-1]
+    if pos > 0 and lines:
+        lines.pop(0) # Première ligne coupée par la lecture par blocs
+    if not complete_only and data[complete_end:].strip():
+        lines.append(data[complete_end:])
+    lines = [line for line in lines if line.strip()]
+    return lines[-num_lines:], pos + complete_end
+
+def read_last_lines(filepath, num_lines=1, complete_only=True):
+    """Retourne les `num_lines` dernières lignes non vides du fichier (liste de chaînes)."""
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        lines, _ = _read_last_raw(f.fileno(), size, num_lines, complete_only=complete_only)
+    return [_decode(line) for line in lines]
+
+def read_last_fields(filepath):
+    """Dernière ligne complète d'un CSV découpée en champs, ou None."""
+    try:
+        lines = read_last_lines(filepath, 1)
+    except OSError:
+        return None
+    return lines[-1].strip().split(',') if lines else None
+
+class TailReader:
+    """
+    Dernières lignes d'un fichier en ajout seul, mises à jour en ne lisant que
+    les nouveaux octets. Si le fichier a été remplacé, tronqué ou réécrit
+    (édition depuis l'interface, réparation, restauration), la fin est relue.
+    """
+
+    def __init__(self, filepath, num_lines=1, block_size=BLOCK_SIZE):
+        self.filepath = filepath
+        self.block_size = block_size
+        self.offset = 0             # Position juste après la dernière ligne complète lue
+        self.inode = None
+        self._anchor = b""          # Derniers octets lus, pour vérifier que le fichier n'a pas été réécrit
+        self._lines = deque(maxlen=num_lines)
+        self._lock = threading.Lock() # Partagé entre les threads d'un worker Gunicorn
+
+    def _still_valid(self, fd):
+        return os.pread(fd, len(self._anchor), self.offset - len(self._anchor)) == self._anchor
+
+    def _sync(self):
+        """Met à jour le cache. Retourne (nouvelles lignes, True si la fin a été relue)."""
+        try:
+            f = open(self.filepath, 'rb')
+        except OSError:
+            self.inode = None
+            self.offset = 0
+            self._anchor = b""
+            self._lines.clear()
+            return [], True
+
+        with f:
+            fd = f.fileno()
+            st = os.fstat(fd)
+            if self.inode != st.st_ino or st.st_size < self.offset or not self._still_valid(fd):
+                raw_lines, self.offset = _read_last_raw(fd, st.st_size, self._lines.maxlen, self.block_size)
+                self.inode = st.st_ino
+                self._anchor = os.pread(fd, min(ANCHOR_BYTES, self.offset), self.offset - min(ANCHOR_BYTES, self.offset))
+                self._lines.clear()
+                self._lines.extend(_decode(line) for line in raw_lines)
+                return list(self._lines), True
+
+            if st.st_size == self.offset:
+                return [], False
+            data = os.pread(fd, st.st_size - self.offset, self.offset)
+
+        complete_end = data.rfind(b'\n') + 1
+        if complete_end == 0:
+            return [], False # Ligne en cours d'écriture
+        raw_lines = [line for line in data[:complete_end].split(b'\n')[:-1] if line.strip()]
+        self.offset += complete_end
+        self._anchor = (self._anchor + data[:complete_end])[-ANCHOR_BYTES:]
+        new_lines = [_decode(line) for line in raw_lines]
+        self._lines.extend(new_lines)
+        return new_lines, False
+
+    def lines(self):
+        """Les dernières lignes complètes du fichier (au plus num_lines)."""
+        with self._lock:
+            self._sync()
+            return list(self._lines)
+
+    def last_fields(self):
+        """Dernière ligne complète découpée en champs CSV, ou None."""
+        lines = self.lines()
+        return lines[-1].strip().split(',') if lines else None
+
+    def poll(self):
+        """
+        Lignes complètes apparues depuis l'appel précédent (suivi façon `tail -f`).
+        Le premier appel retourne les num_lines dernières lignes ; après un
+        remplacement du fichier, on repart de sa fin sans rien retourner.
+        """
+        with self._lock:
+            first = self.inode is None and not self._lines
+            new_lines, reloaded = self._sync()
+            return new_lines if first or not reloaded else []
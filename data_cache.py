@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+# Cache partagé du jeu de données meteo_log.csv pour le serveur web.
+# Le CSV n'est analysé qu'une fois : les colonnes sont enregistrées en
+# fichiers binaires bruts dans data/cache/ puis ouvertes en mmap. Le capteur
+# ajoutant une ligne par minute, seules les lignes ajoutées depuis la
+# dernière mise à jour sont analysées et écrites à la fin des colonnes
+# (quelques dizaines d'octets sur la carte SD). Le cache n'est reconstruit
+# que si le fichier a été remplacé, raccourci ou modifié avant sa fin.
+# Tous les workers Gunicorn et les processus de rendu graphique partagent
+# ainsi les mêmes pages mémoire (cache du noyau) au lieu d'avoir chacun
+# leur propre copie du DataFrame.
+#
+
+import fcntl
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import meteo_metrics
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+META_FILE = os.path.join(CACHE_DIR, "meta.json")
+LOCK_FILE = os.path.join(CACHE_DIR, ".lock")
+
+NUMERIC_COLUMNS = ["temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_deg", "wind_dir_std"]
+
+CSV_COLUMNS = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str", "wind_dir_deg", "wind_dir_std"]
+
+# Colonnes stockées (les libellés de direction sont des codes : les chaînes ne se projettent pas en mémoire)
+COLUMN_DTYPES = {"time": "datetime64[ns]", **{column: "float64" for column in NUMERIC_COLUMNS}, "wind_dir_code": "int16"}
+TAIL_CHECK_BYTES = 4096 # Fin de la partie déjà analysée comparée avant un ajout
+
+def read_and_process_csv(filepath):
+    """
+    Lit le fichier CSV, en gérant les anciens (7 colonnes), 8 colonnes et nouveaux
+    (10 colonnes : angle moyen et écart-type de la direction) formats,
+    et retourne un DataFrame nettoyé.
+    """
+    with meteo_metrics.timer("meteo_csv_load_seconds"):
+        return _read_and_process_csv(filepath)
+
+def _read_and_process_csv(filepath):
+    try:
+        # Lire avec un nombre de colonnes flexible et sans en-tête, en traitant tous les champs comme du texte au départ
+        df_raw = pd.read_csv(filepath, header=None, on_bad_lines='warn', engine='python', dtype=str, names=range(10))
+        
+        if df_raw.empty:
+            return pd.DataFrame(columns=CSV_COLUMNS)
+
+        # Vérifier et supprimer la ligne d'en-tête si elle existe
+        if df_raw.iloc[0, 0] == 'time':
+            df_raw = df_raw.iloc[1:]
+
+        # Réinitialiser l'index après une suppression potentielle de l'en-tête
+        df_raw.reset_index(drop=True, inplace=True)
+
+        # Créer le DataFrame final en convertissant les types immédiatement pour éviter les Warnings
+        df = pd.DataFrame({
+            "time": df_raw[0],
+            "temp": pd.to_numeric(df_raw[1], errors='coerce'),
+            "hum": pd.to_numeric(df_raw[2], errors='coerce'),
+            "pressure": pd.to_numeric(df_raw[3], errors='coerce'),
+            "rain": pd.to_numeric(df_raw[4], errors='coerce'),
+            "wind_speed": pd.to_numeric(df_raw[5], errors='coerce'),
+            "wind_gust": np.nan,
+            "wind_dir_str": "N/A",
+            "wind_dir_deg": pd.to_numeric(df_raw[8], errors='coerce'),
+            "wind_dir_std": pd.to_numeric(df_raw[9], errors='coerce'),
+        })
+
+        # Gestion des formats (Ancien: 7 col, Nouveau: 8 col)
+        is_new_format = df_raw[7].notna()
+        if is_new_format.any():
+            # On assigne les rafales converties en numérique
+            df.loc[is_new_format, 'wind_gust'] = pd.to_numeric(df_raw.loc[is_new_format, 6], errors='coerce')
+            df.loc[is_new_format, 'wind_dir_str'] = df_raw.loc[is_new_format, 7]
+            
+        is_old_format = ~is_new_format
+        if is_old_format.any():
+            df.loc[is_old_format, 'wind_dir_str'] = df_raw.loc[is_old_format, 6]
+        
+        # --- CORRECTION AUTO : Rafales mal placées dans la direction ---
+        # On détecte si la colonne 'wind_dir_str' contient des nombres (ex: "12.5") au lieu de texte ("N", "NE")
+        # et si la colonne 'wind_gust' est vide pour ces lignes.
+        dir_as_num = pd.to_numeric(df['wind_dir_str'], errors='coerce')
+        
+        # Masque : La direction est un nombre ET la rafale est vide
+        misplaced_mask = dir_as_num.notna() & df['wind_gust'].isna()
+        
+        if misplaced_mask.any():
+            # On déplace la valeur numérique dans la bonne colonne (Rafale)
+            df.loc[misplaced_mask, 'wind_gust'] = dir_as_num[misplaced_mask]
+            # On marque la direction comme inconnue car elle était absente
+            df.loc[misplaced_mask, 'wind_dir_str'] = "N/A"
+
+        return df
+
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        return pd.DataFrame(columns=CSV_COLUMNS)
+    except Exception as e:
+        print(f"Erreur lors du traitement du fichier CSV : {e}")
+        return pd.DataFrame(columns=CSV_COLUMNS)
+
+def _read_meta():
+    try:
+        with open(META_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def _write_meta(meta):
+    temp_path = META_FILE + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, META_FILE)
+
+def _read_complete_lines(filepath, offset):
+    """Texte de `offset` à la dernière fin de ligne (une ligne en cours d'écriture attend). Retourne (texte, fin)."""
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    return data[:end].decode('utf-8', errors='replace'), offset + end
+
+def _tail_hash(filepath, end):
+    """Empreinte des derniers octets déjà analysés (détecte une réécriture du début du fichier)."""
+    start = max(0, end - TAIL_CHECK_BYTES)
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(end - start)).hexdigest()
+
+def _parse_columns(text, labels):
+    """
+    Analyse des lignes CSV et conversion en colonnes à stocker. Les nouveaux
+    libellés de direction sont ajoutés à la fin de `labels` : les codes déjà
+    enregistrés restent valables.
+    """
+    df = _read_and_process_csv(io.StringIO(text)) if text else pd.DataFrame(columns=CSV_COLUMNS)
+    columns = {"time": pd.to_datetime(df['time'], errors='coerce').to_numpy(dtype='datetime64[ns]')}
+    for column in NUMERIC_COLUMNS:
+        columns[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)
+    local_codes, uniques = pd.factorize(df['wind_dir_str'])
+    index = {label: code for code, label in enumerate(labels)}
+    mapping = np.empty(len(uniques) + 1, dtype=np.int16)
+    mapping[-1] = -1 # Code -1 (valeur manquante) conservé
+    for position, label in enumerate(uniques):
+        label = str(label)
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+        mapping[position] = index[label]
+    columns["wind_dir_code"] = mapping[local_codes]
+    return columns
+
+def _column_path(version, column):
+    return os.path.join(CACHE_DIR, version, f"{column}.bin")
+
+def _build_cache(filepath, st):
+    """Analyse tout le CSV et écrit les colonnes dans un nouveau répertoire de version."""
+    with meteo_metrics.timer("meteo_csv_load_seconds"):
+        text, size = _read_complete_lines(filepath, 0)
+        labels = []
+        columns = _parse_columns(text, labels)
+    version = f"v{st.st_ino}_{st.st_mtime_ns}"
+    os.makedirs(os.path.join(CACHE_DIR, version), exist_ok=True)
+    for column, values in columns.items():
+        with open(_column_path(version, column), 'wb') as f:
+            f.write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[column]).tobytes())
+
+    meta = {"version": version, "inode": st.st_ino, "size": size, "mtime_ns": st.st_mtime_ns,
+            "tail_hash": _tail_hash(filepath, size), "rows": len(columns["time"]), "wind_dir_labels": labels}
+    _write_meta(meta)
+
+    # Les anciennes versions peuvent être supprimées : les processus qui les
+    # ont encore ouvertes en mmap gardent l'accès jusqu'à leur fermeture.
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith("v") and name != version:
+            shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+    return meta
+
+def _append_cache(filepath, meta, st):
+    """Analyse seulement les lignes ajoutées depuis la dernière mise à jour et les ajoute aux colonnes."""
+    text, size = _read_complete_lines(filepath, meta["size"])
+    if size == meta["size"]:
+        return meta # Seule une ligne incomplète a été ajoutée
+    labels = list(meta["wind_dir_labels"])
+    columns = _parse_columns(text, labels)
+    for column, values in columns.items():
+        path = _column_path(meta["version"], column)
+        with open(path, 'r+b') as f:
+            # Une mise à jour interrompue a pu laisser des octets après les lignes validées par meta.json
+            f.truncate(meta["rows"] * np.dtype(COLUMN_DTYPES[column]).itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(values, dtype=COLUMN_DTYPES[column]).tobytes())
+    meta = dict(meta, size=size, mtime_ns=st.st_mtime_ns, tail_hash=_tail_hash(filepath, size),
+                rows=meta["rows"] + len(columns["time"]), wind_dir_labels=labels)
+    _write_meta(meta) # Les lecteurs ne voient les nouvelles lignes qu'à partir d'ici
+    return meta
+
+def _cache_state(filepath, meta, st):
+    """"fresh" (cache à jour), "append" (lignes ajoutées en fin de fichier) ou "rebuild"."""
+    if meta is None or meta.get("inode") != st.st_ino or st.st_size < meta.get("size", 0):
+        return "rebuild"
+    if st.st_size == meta["size"]:
+        return "fresh" if st.st_mtime_ns == meta["mtime_ns"] else "rebuild"
+    try:
+        intact = _tail_hash(filepath, meta["size"]) == meta["tail_hash"]
+    except OSError:
+        intact = False
+    return "append" if intact else "rebuild"
+
+def _update_cache(filepath, st):
+    """Met le cache à jour (sous verrou : un seul processus à la fois) et retourne sa description."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(LOCK_FILE, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        st = os.stat(filepath)
+        meta = _read_meta()
+        state = _cache_state(filepath, meta, st)
+        if state == "append":
+            return _append_cache(filepath, meta, st)
+        if state == "rebuild":
+            return _build_cache(filepath, st)
+        return meta
+
+_local = {"key": None, "arrays": None, "labels": None}
+_local_lock = threading.Lock()
+
+def _load_arrays(meta):
+    """Ouvre (une seule fois par processus et par mise à jour) les `rows` premières valeurs de chaque colonne en mmap."""
+    key = (meta["version"], meta["rows"])
+    with _local_lock:
+        if _local["key"] != key:
+            arrays = {}
+            for column, dtype in COLUMN_DTYPES.items():
+                if meta["rows"]:
+                    arrays[column] = np.memmap(_column_path(meta["version"], column), dtype=dtype, mode='r', shape=(meta["rows"],))
+                else:
+                    arrays[column] = np.empty(0, dtype=dtype) # mmap impossible sur un fichier vide
+            _local.update(key=key, arrays=arrays, labels=np.array(meta["wind_dir_labels"] + [np.nan], dtype=object))
+        return _local["arrays"], _local["labels"]
+
+def load_dataframe(filepath=CSV_FILE):
+    """
+    Retourne le DataFrame du CSV (mêmes colonnes que read_and_process_csv, 'time'
+    déjà converti en datetime). Les colonnes numériques sont des vues en lecture
+    seule sur les fichiers mmap : les appelants doivent remplacer une colonne
+    plutôt que la modifier sur place.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return pd.DataFrame(columns=CSV_COLUMNS)
+
+    try:
+        meta = _read_meta()
+        if _cache_state(filepath, meta, st) != "fresh":
+            meta = _update_cache(filepath, st)
+        arrays, labels = _load_arrays(meta)
+    except Exception as e:
+        print(f"⚠️ Cache de données indisponible ({e}), lecture directe du CSV.")
+        df = read_and_process_csv(filepath)
+        df['time'] = pd.to_datetime(df['time'], errors='coerce')
+        return df
+
+    # Code -1 (valeur manquante) -> dernière entrée de `labels` (NaN)
+    wind_dir_str = labels[np.asarray(arrays["wind_dir_code"])]
+    columns = {column: wind_dir_str if column == "wind_dir_str" else arrays[column] for column in CSV_COLUMNS}
+    return pd.DataFrame(columns, copy=False)
+
+def load_store_dataframe(start=None, end=None):
+    """
+    Mesures de la plage [start, end[ lues dans la base SQLite (meteo_store.py),
+    au même format que load_dataframe. start/end : datetime ou None.
+    """
+    from meteo_store import get_store
+    fmt = "%Y-%m-%d %H:%M:%S"
+    rows = get_store().query_range(start.strftime(fmt) if start else None, end.strftime(fmt) if end else None)
+    df = pd.DataFrame.from_records(rows, columns=CSV_COLUMNS)
+    df['time'] = pd.to_datetime(df['time'], format=fmt, errors='coerce')
+    for column in NUMERIC_COLUMNS:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+def hourly_summary(df, start, end):
+    """
+    Agrégats horaires de la plage [start, end[ d'un DataFrame de load_dataframe,
+    dans l'ordre de meteo_store.HOURLY_COLUMNS (station locale en stockage CSV).
+    """
+    df = df[(df['time'] >= start) & (df['time'] < end)]
+    if df.empty:
+        return []
+    grouped = df.groupby(df['time'].dt.strftime('%Y-%m-%d %H'))
+    summary = pd.DataFrame({
+        "temp": grouped['temp'].mean(), "temp_min": grouped['temp'].min(), "temp_max": grouped['temp'].max(),
+        "hum": grouped['hum'].mean(), "pressure": grouped['pressure'].mean(), "rain": grouped['rain'].sum(),
+        "wind_speed": grouped['wind_speed'].mean(), "wind_gust": grouped['wind_gust'].max(), "count": grouped['time'].count(),
+    })
+    summary = summary.astype(object).where(summary.notna(), None) # NaN -> None (JSON)
+    return [(hour,) + tuple(values) for hour, values in zip(summary.index, summary.itertuples(index=False))]
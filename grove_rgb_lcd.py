@@ -3,14 +3,28 @@
 # Pilote pour le Grove - LCD RGB Backlight
 # Ce code est une adaptation pour smbus2 et est conçu pour être simple d'utilisation.
 #
+# Le contenu affiché (2 x 16 caractères) est conservé en mémoire : show()
+# n'envoie que la partie modifiée de chaque ligne, en une écriture I2C par
+# bloc, et set_rgb() ne touche le rétroéclairage que si la couleur change.
+# Le bus I2C est partagé avec le BME280 et la girouette : moins de
+# transactions pour l'écran, c'est moins d'attente pour les capteurs.
+# Avec un arbitre (voir i2c_bus.py), chaque opération attend son tour sur le
+# bus, après les lectures de capteurs en attente.
+#
 
 import time
+from contextlib import nullcontext
 import smbus2
+from i2c_bus import PRIORITY_DISPLAY
 
 # Adresses I2C par défaut du module
 LCD_ADDRESS = 0x3e
 RGB_ADDRESS = 0x62
 
+LCD_COLS = 16
+LCD_ROWS = 2
+ROW_ADDRESSES = (0x00, 0x40) # Adresse DDRAM du début de chaque ligne
+
 # Commandes pour le contrôleur LCD
 LCD_CLEARDISPLAY = 0x01
 LCD_RETURNHOME = 0x02
@@ -42,59 +56,135 @@ LCD_5x8DOTS = 0x00
 
 class RgbLcd:
     """Classe pour contrôler l'écran LCD RGB Grove."""
-    def __init__(self, bus=1):
+    def __init__(self, bus=1, arbiter=None):
         self.bus = smbus2.SMBus(bus)
+        self.arbiter = arbiter # i2c_bus.BusArbiter partagé avec les capteurs, ou None
+        self._shown = None # Contenu affiché (liste de lignes), None : inconnu
+        self._rgb = None   # Dernière couleur envoyée au rétroéclairage
+        self._col, self._row = 0, 0
         
-        # Initialisation de l'écran LCD
-        self._command(LCD_FUNCTIONSET | LCD_2LINE | LCD_5x8DOTS)
-        self._command(LCD_DISPLAYCONTROL | LCD_DISPLAYON)
-        self._command(LCD_CLEARDISPLAY)
-        time.sleep(0.002)
-        self._command(LCD_ENTRYMODESET | LCD_ENTRYLEFT)
+        with self.access():
+            # Initialisation de l'écran LCD
+            self._command(LCD_FUNCTIONSET | LCD_2LINE | LCD_5x8DOTS)
+            self._command(LCD_DISPLAYCONTROL | LCD_DISPLAYON)
+            self.clear()
+            self._command(LCD_ENTRYMODESET | LCD_ENTRYLEFT)
 
-        # Initialisation du rétroéclairage RGB
-        self.set_rgb(0, 0, 0)
+            # Initialisation du rétroéclairage RGB (registres de mode une seule fois)
+            try:
+                self.bus.write_byte_data(RGB_ADDRESS, 0, 0)
+                self.bus.write_byte_data(RGB_ADDRESS, 1, 0)
+                self.bus.write_byte_data(RGB_ADDRESS, 0x08, 0xaa)
+            except IOError:
+                print("Avertissement : Le contrôleur de rétroéclairage RGB n'a pas été trouvé.")
+            self.set_rgb(0, 0, 0)
+
+    def access(self):
+        """
+        Accès exclusif au bus pour une suite d'opérations (par exemple couleur
+        puis texte) ; les méthodes publiques le prennent d'elles-mêmes.
+        """
+        if self.arbiter is None:
+            return nullcontext()
+        return self.arbiter.device("lcd", PRIORITY_DISPLAY)
 
     def _command(self, cmd):
         """Envoie une commande à l'écran."""
         self.bus.write_byte_data(LCD_ADDRESS, 0x80, cmd)
 
-    def _write(self, data):
-        """Écrit un caractère sur l'écran."""
-        self.bus.write_byte_data(LCD_ADDRESS, 0x40, data)
+    def _write_block(self, codes):
+        """Écrit une suite de caractères à la position courante, en une seule transaction I2C."""
+        self.bus.write_i2c_block_data(LCD_ADDRESS, 0x40, codes)
+
+    @staticmethod
+    def _encode(char):
+        code = ord(char)
+        return code if 32 <= code < 127 else ord('?') # Jeu de caractères ROM : ASCII seulement
 
     def set_cursor(self, col, row):
         """Positionne le curseur."""
+        self._col, self._row = col, row
         if row == 0:
             col |= 0x80
         else:
             col |= 0xc0
-        self._command(col)
+        with self.access():
+            self._command(col)
 
     def write(self, text):
-        """Écrit une chaîne de caractères sur l'écran."""
+        """Écrit une chaîne de caractères à la position du curseur ("\n" passe à la ligne suivante)."""
         # S'assure que le texte est bien une chaîne
         if not isinstance(text, str):
             text = str(text)
-            
-        for char in text:
-            self._write(ord(char))
+
+        with self.access():
+            for index, segment in enumerate(text.split("\n")):
+                if index:
+                    self.set_cursor(0, min(self._row + 1, LCD_ROWS - 1))
+                segment = segment[:max(LCD_COLS - self._col, 0)]
+                if not segment:
+                    continue
+                try:
+                    self._write_block([self._encode(char) for char in segment])
+                except OSError:
+                    self._shown = None
+                    raise
+                if self._shown is not None:
+                    line = self._shown[self._row]
+                    self._shown[self._row] = line[:self._col] + segment + line[self._col + len(segment):]
+                self._col += len(segment)
+
+    def show(self, *lines):
+        """
+        Affiche les lignes données (complétées par des espaces) en n'envoyant
+        que les caractères qui diffèrent de l'affichage actuel : pour chaque
+        ligne modifiée, une commande de position et une écriture par bloc.
+        """
+        lines = [(lines[row] if row < len(lines) else "").ljust(LCD_COLS)[:LCD_COLS] for row in range(LCD_ROWS)]
+        if self._shown == lines:
+            return # Rien à envoyer : le bus n'est pas demandé
+        try:
+            with self.access():
+                for row, line in enumerate(lines):
+                    shown = self._shown[row] if self._shown is not None else None
+                    if shown == line:
+                        continue
+                    if shown is None:
+                        first, last = 0, LCD_COLS - 1
+                    else:
+                        changed = [col for col in range(LCD_COLS) if shown[col] != line[col]]
+                        first, last = changed[0], changed[-1]
+                    self._command(LCD_SETDDRAMADDR | (ROW_ADDRESSES[row] + first))
+                    self._write_block([self._encode(char) for char in line[first:last + 1]])
+                    self._col, self._row = last + 1, row
+                    if self._shown is not None:
+                        self._shown[row] = line
+        except OSError:
+            self._shown = None # Contenu incertain : tout sera renvoyé au prochain affichage
+            raise
+        if self._shown is None:
+            self._shown = lines
 
     def clear(self):
         """Efface l'écran."""
-        self._command(LCD_CLEARDISPLAY)
-        time.sleep(0.002)
+        with self.access():
+            self._command(LCD_CLEARDISPLAY)
+            time.sleep(0.002)
+        self._shown = [" " * LCD_COLS for _ in range(LCD_ROWS)]
+        self._col, self._row = 0, 0
 
     def set_rgb(self, r, g, b):
-        """Définit la couleur du rétroéclairage."""
+        """Définit la couleur du rétroéclairage (seuls les canaux modifiés sont envoyés)."""
+        if self._rgb == (r, g, b):
+            return # Couleur inchangée : le bus n'est pas demandé
+        previous = self._rgb or (None, None, None)
         try:
-            self.bus.write_byte_data(RGB_ADDRESS, 0, 0)
-            self.bus.write_byte_data(RGB_ADDRESS, 1, 0)
-            self.bus.write_byte_data(RGB_ADDRESS, 0x08, 0xaa)
-            self.bus.write_byte_data(RGB_ADDRESS, 4, r)
-            self.bus.write_byte_data(RGB_ADDRESS, 3, g)
-            self.bus.write_byte_data(RGB_ADDRESS, 2, b)
+            with self.access():
+                for register, value, old in ((4, r, previous[0]), (3, g, previous[1]), (2, b, previous[2])):
+                    if value != old:
+                        self.bus.write_byte_data(RGB_ADDRESS, register, value)
+            self._rgb = (r, g, b)
         except IOError:
             # Si le rétroéclairage n'est pas trouvé, on continue sans.
+            self._rgb = None
             print("Avertissement : Le contrôleur de rétroéclairage RGB n'a pas été trouvé.")
-            pass
\ No newline at end of file
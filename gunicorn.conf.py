@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#
+# Configuration Gunicorn du serveur web (meteo_web:app).
+# Lancement : gunicorn -c gunicorn.conf.py meteo_web:app
+#
+# - Workers "gthread" : chaque processus sert plusieurs requêtes en parallèle
+#   avec des threads. Les appels légers (vent temps réel toutes les 2s, API JSON)
+#   ne restent plus bloqués derrière un graphique ou un téléchargement de tuiles.
+# - Les rendus Matplotlib sont envoyés au pool de processus de render_pool.py.
+# - Les données du CSV sont partagées entre workers via data_cache.py (mmap).
+#
+
+import os
+
+bind = os.environ.get("METEO_BIND", "unix:/run/station-meteo/station-meteo.sock")
+umask = 0o007 # Supprime les permissions pour "les autres" mais garde celles du groupe (Nginx)
+
+worker_class = "gthread"
+workers = int(os.environ.get("METEO_WEB_WORKERS", "2"))
+threads = int(os.environ.get("METEO_WEB_THREADS", "4"))
+
+# Un rendu peut être long sur un Raspberry Pi Zero : on laisse de la marge
+# avant que l'arbitre Gunicorn ne considère un worker comme bloqué.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+def worker_exit(server, worker):
+    """Arrête proprement les processus de rendu du worker qui se termine."""
+    try:
+        import render_pool
+        render_pool.shutdown()
+    except Exception as e:
+        server.log.warning(f"Arrêt du pool de rendu impossible : {e}")
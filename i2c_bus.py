@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+# Arbitre du bus I2C partagé de meteo_capteur.py.
+#
+# Le BME280 et la girouette AS5600 (board.I2C) et l'écran Grove (son propre
+# smbus2.SMBus(1)) sont sur le même bus physique, utilisé par plusieurs
+# threads (mesure minute, boucle temps réel 3s, bouton de l'écran). Chaque
+# accès passe par BusArbiter :
+# - un seul périphérique à la fois, les lectures de capteurs passant avant
+#   le rafraîchissement de l'écran quand plusieurs threads attendent ;
+# - accès regroupés : un bloc `with arbiter.device(...)` couvre toutes les
+#   transactions d'une opération (déclenchement d'une conversion du BME280,
+#   lecture de son résultat) ou d'un rafraîchissement de l'écran (couleur et texte), sans qu'un autre
+#   thread ne s'intercale ; l'accès est réentrant pour le thread qui le tient ;
+# - temps d'occupation du bus et temps d'attente par périphérique (métriques
+#   Prometheus, voir meteo_metrics.py).
+#
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+import meteo_metrics
+
+PRIORITY_SENSOR = 0    # Mesures : servies en premier
+PRIORITY_DISPLAY = 10  # Écran LCD : peut attendre quelques millisecondes
+ACQUIRE_TIMEOUT = 2.0  # Attente maximale du bus (secondes)
+
+class BusTimeout(OSError):
+    """Bus non obtenu dans le délai (un autre périphérique le garde trop longtemps)."""
+
+class BusArbiter:
+    """Accès exclusif et ordonné par priorité au bus I2C (réentrant pour le thread qui le détient)."""
+
+    def __init__(self, acquire_timeout=ACQUIRE_TIMEOUT):
+        self.acquire_timeout = acquire_timeout
+        self._condition = threading.Condition()
+        self._waiting = []          # Tas de (priorité, ordre d'arrivée)
+        self._order = itertools.count()
+        self._owner = None          # (thread, périphérique, jeton)
+        self._depth = 0
+        self._held_since = 0.0
+        self._tokens = itertools.count(1)
+
+    def acquire(self, device, priority=PRIORITY_SENSOR, timeout=None):
+        """Attend le bus et retourne le jeton de l'accès. Lève BusTimeout après `timeout` secondes."""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        me = threading.current_thread()
+        start = time.perf_counter()
+        with self._condition:
+            if self._owner is not None and self._owner[0] is me:
+                self._depth += 1
+                return self._owner[2]
+            ticket = (priority, next(self._order))
+            heapq.heappush(self._waiting, ticket)
+            deadline = time.monotonic() + timeout
+            while self._owner is not None or self._waiting[0] != ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                    owner = self._owner[1] if self._owner is not None else "?"
+                    raise BusTimeout(f"Bus I2C occupé par {owner} depuis plus de {timeout:.1f}s ({device} en attente)")
+                self._condition.wait(remaining)
+            heapq.heappop(self._waiting)
+            token = next(self._tokens)
+            self._owner = (me, device, token)
+            self._depth = 1
+            self._held_since = time.perf_counter()
+            waited = self._held_since - start
+        meteo_metrics.observe("meteo_i2c_wait_seconds", waited, device=device)
+        return token
+
+    def release(self, token):
+        """Libère le bus. Sans effet si l'accès a été repris de force entre-temps (force_release)."""
+        with self._condition:
+            if self._owner is None or self._owner[2] != token:
+                return
+            self._depth -= 1
+            if self._depth:
+                return
+            device = self._owner[1]
+            held = time.perf_counter() - self._held_since
+            self._owner = None
+            self._condition.notify_all()
+        meteo_metrics.inc("meteo_i2c_busy_seconds_total", held, device=device)
+
+    def force_release(self, device):
+        """
+        Reprend le bus à un thread bloqué dans une transaction de `device`
+        (appelé par le chien de garde avant de recréer le pilote).
+        Retourne vrai si le bus était tenu par ce périphérique.
+        """
+        with self._condition:
+            if self._owner is None or self._owner[1] != device:
+                return False
+            self._owner = None
+            self._depth = 0
+            self._condition.notify_all()
+        print(f"🐕 Bus I2C repris à {device}.")
+        return True
+
+    @contextmanager
+    def device(self, device, priority=PRIORITY_SENSOR, timeout=None):
+        """Bloc exécuté avec l'accès exclusif au bus."""
+        token = self.acquire(device, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+_arbiter = None
+_arbiter_lock = threading.Lock()
+
+def get_arbiter():
+    """Arbitre unique du processus (un seul bus I2C sur le Raspberry Pi)."""
+    global _arbiter
+    with _arbiter_lock:
+        if _arbiter is None:
+            _arbiter = BusArbiter()
+        return _arbiter
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# Import différé des bibliothèques lourdes (pandas, numpy, PIL, requests...).
+# Le module n'est réellement importé qu'au premier accès à l'un de ses
+# attributs : le serveur web démarre sans attendre pandas/numpy, et seules
+# les pages qui en ont besoin paient ce coût (une seule fois par processus).
+#
+
+import importlib
+import threading
+
+class LazyModule:
+    """Remplaçant d'un module, importé au premier accès à un attribut (thread-safe)."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    @property
+    def loaded(self):
+        return self.__dict__['_module'] is not None
+
+    def __repr__(self):
+        state = "chargé" if self.loaded else "non chargé"
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
@@ -1,20 +1,29 @@
 # -*- coding: utf-8 -*-
 import csv
 import time
-import json
 import os
 from datetime import datetime
 import logging # Ajout pour le logging des événements du pluviomètre
 import smbus2
 import threading
+from collections import deque
 import board
+import busio
 import adafruit_dht
-from adafruit_bme280 import basic as adafruit_bme280
+from bme280_driver import BME280
 from adafruit_as5600 import AS5600
-import paho.mqtt.client as mqtt
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import Point, WritePrecision
 from gpiozero import Button
+from meteo_config import ConfigWatcher
+from meteo_publisher import NetworkPublisher, CONFIG_KEYS as PUBLISHER_CONFIG_KEYS
+from meteo_stats import StreamingStats, parse_csv_row
+from csv_repair import locked_append, verify_tail
+from meteo_wind import WindVaneBuffer, WindRoseStore
+from meteo_store import MeteoStore
+from meteo_climate import ClimateStore
+import meteo_metrics
+from meteo_watchdog import Stage, Watchdog
+from i2c_bus import get_arbiter
 try:
     from grove_rgb_lcd import RgbLcd 
 except ImportError:
@@ -28,7 +37,6 @@ if not os.path.exists(DATA_DIR):
 CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
 WIND_CSV_FILE = os.path.join(DATA_DIR, "wind_detail_log.csv")
 PLUVIOMETER_EVENT_LOG = os.path.join(DATA_DIR, "pluviometer_events.log")
-CONFIG_FILE = "config.json"
 
 # Configuration du logging pour les événements du pluviomètre
 logging.basicConfig(
@@ -39,10 +47,15 @@ logging.basicConfig(
     ]
 )
 
+ROTATION_INTERVAL = 600 # Vérification de la taille du log détaillé du vent (secondes)
+ROTATION_SLACK = 0.1    # Lignes tolérées au-delà de max_lines avant réécriture (10 %)
+
 def rotate_file_if_large(filepath, max_lines=28800):
     """
     Limite le nombre de lignes d'un fichier log/CSV pour éviter de saturer le stockage.
     Ne procède que si la taille du fichier dépasse un seuil (~1 Mo).
+    Le fichier n'est réécrit qu'au-delà de max_lines + 10 % : une réécriture
+    toutes les ~2 h 30 pour le vent détaillé, au lieu d'une à chaque vérification.
     """
     try:
         if not os.path.exists(filepath):
@@ -51,36 +64,30 @@ def rotate_file_if_large(filepath, max_lines=28800):
         # dépasse ~1 Mo (environ 30 000 lignes de vent détaillé)
         if os.path.getsize(filepath) < 1000000:
             return
-            
+
+        # Lecture en flux : seules les max_lines dernières lignes restent en mémoire
         with open(filepath, 'r', newline='', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        if len(lines) > max_lines:
-            header = lines[0]
+            header = f.readline()
+            tail = deque(maxlen=max_lines)
+            count = 1
+            for line in f:
+                tail.append(line)
+                count += 1
+
+        if count > max_lines * (1 + ROTATION_SLACK):
             # On conserve l'en-tête et les dernières lignes
-            new_lines = [header] + lines[-max_lines:]
-            
             temp_path = filepath + ".tmp"
             with open(temp_path, 'w', newline='', encoding='utf-8') as f:
-                f.writelines(new_lines)
+                f.write(header)
+                f.writelines(tail)
             os.replace(temp_path, filepath)
-            print(f"🔄 Fichier {os.path.basename(filepath)} tourné : {len(lines)} -> {len(new_lines)} lignes.")
+            print(f"🔄 Fichier {os.path.basename(filepath)} tourné : {count} -> {len(tail) + 1} lignes.")
     except Exception as e:
         print(f"⚠️ Erreur lors de la rotation de {filepath} : {e}")
 
-def load_config():
-    """Charge la configuration depuis config.json."""
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
 # ---- Configuration du pluviomètre ----
 RAIN_PIN = 5  # GPIO 5
-# Nouvelle calibration (100ml d'eau = 10mm de pluie) pour 47 basculements
-# 10mm / 47 tips = 0.2127659574 mm/tip
-MM_PER_TIP = 0.213  # Chaque basculement correspond à 0.213mm de pluie
+# Hauteur de pluie par basculement : "rain_mm_per_tip" dans config.json (MM_PER_TIP ci-dessous)
 
 # Variable globale pour compter les basculements
 tip_count = 0
@@ -88,9 +95,7 @@ tip_count_lock = threading.Lock()
 
 # ---- Configuration de l'anémomètre ----
 WIND_PIN = 6 # GPIO 6
-# Facteur de calibration après test en voiture (70 km/h réels -> 30 km/h mesurés)
-# Nouveau facteur = 2.4 * (70 / 30) = 5.6
-WIND_SPEED_FACTOR = 5.6 # 1 Hz (1 impulsion/sec) = 5.6 km/h
+# km/h pour 1 Hz : "wind_speed_factor" dans config.json (WIND_SPEED_FACTOR ci-dessous)
 BUTTON_PIN = 26 # GPIO 26 pour le bouton de changement d'affichage
 
 # Variable globale pour compter les impulsions du vent
@@ -101,6 +106,10 @@ wind_pulse_count_display = 0
 wind_gust_pulse_max = 0 # Pour traquer la rafale (pic sur 2s)
 gust_lock = threading.Lock()
 wind_display_lock = threading.Lock()
+# Historique des vitesses 3s sur 10 minutes pour la rafale glissante (flux haute fréquence)
+wind_rt_history = deque(maxlen=200)
+# Lectures de la girouette toutes les 3s, moyennées vectoriellement à chaque mesure minute
+wind_vane_buffer = WindVaneBuffer()
 
 # ---- Variables globales pour l'affichage et les données ----
 display_mode = 0 # 0: Vent, 1: Temp/Pres, 2: Hum/Pluie
@@ -116,60 +125,112 @@ last_wind_speed = 0.0
 last_sample_time = time.time()
 last_realtime_time = time.time()
 
-# ---- Initialisation MQTT ----
-mqtt_client = None
+# ---- Publication réseau (MQTT / InfluxDB) ----
+# Un seul publisher longue durée : une session MQTT, un client InfluxDB et une
+# file d'attente sur disque pour ne rien perdre pendant les coupures Wifi.
+# La configuration est surveillée en arrière-plan : le publisher n'est notifié
+# (et ne se reconnecte) que si l'une de ses propres clés change.
+config_watcher = ConfigWatcher()
+
+# ---- Étalonnage (config.json, appliqué sans redémarrage) ----
+CALIBRATION_KEYS = ["temp_offset", "humidity_offset", "pressure_offset", "rain_mm_per_tip", "wind_speed_factor"]
+
+def apply_calibration(config, changed=None):
+    """Met à jour les décalages des mesures et les facteurs du pluviomètre et de l'anémomètre."""
+    global TEMP_OFFSET, HUMIDITY_OFFSET, PRESSURE_OFFSET, MM_PER_TIP, WIND_SPEED_FACTOR
+    TEMP_OFFSET = config.get("temp_offset", -2.0)
+    HUMIDITY_OFFSET = config.get("humidity_offset", 0.0)
+    PRESSURE_OFFSET = config.get("pressure_offset", 0.0)
+    MM_PER_TIP = config.get("rain_mm_per_tip", 0.213)
+    WIND_SPEED_FACTOR = config.get("wind_speed_factor", 5.6)
+
+apply_calibration(config_watcher.config)
+config_watcher.subscribe(CALIBRATION_KEYS, apply_calibration)
+
+publisher = NetworkPublisher(config_watcher.config, DATA_DIR)
+config_watcher.subscribe(PUBLISHER_CONFIG_KEYS, lambda new_config, changed: publisher.configure(new_config))
+config_watcher.start()
+
+# ---- Métriques internes (voir meteo_metrics.py) ----
+# Recopiées dans METRICS_DIR pour la route /metrics du serveur web, et servies
+# directement sur "metrics_port" si ce port est configuré.
+meteo_metrics.start("capteur")
+meteo_metrics.serve(config_watcher.config.get("metrics_port", 0))
+config_watcher.subscribe(["metrics_port"], lambda new_config, changed: meteo_metrics.serve(new_config.get("metrics_port", 0)))
+
+# ---- Statistiques glissantes (10 min, 1h, 3h, 24h) ----
+# Mises à jour en O(1) à chaque mesure et publiées dans data/live_stats.json
+# (serveur web, bot Telegram) ainsi que dans les messages MQTT/InfluxDB.
+live_stats = StreamingStats()
+# Après une coupure de courant, la fin du CSV peut contenir des caractères NUL :
+# seule la partie non encore vérifiée est parcourue.
+try:
+    verify_tail(CSV_FILE)
+except Exception as e:
+    print(f"⚠️ Vérification du CSV impossible : {e}")
+print(f"📊 Statistiques glissantes amorcées avec {live_stats.warm_up_from_csv(CSV_FILE)} mesures.")
 
-# ---- Initialisation InfluxDB ----
-influx_client = None
+# ---- Rose des vents : histogrammes journaliers incrémentaux ----
+# Les mesures du CSV non encore comptées (premier démarrage, arrêt du service)
+# sont rattrapées en arrière-plan ; les nouvelles sont ajoutées à chaque minute.
+wind_rose_store = WindRoseStore()
 
-def setup_influxdb(current_config):
-    if current_config.get("influx_enabled"):
-        try:
-            client = InfluxDBClient(
-                url=current_config.get("influx_url"),
-                token=current_config.get("influx_token"),
-                org=current_config.get("influx_org"),
-                timeout=5000 # Timeout de 5s pour éviter de bloquer la boucle
-            )
-            print(f"✅ InfluxDB connecté à {current_config['influx_url']}")
-            return client
-        except Exception as e:
-            print(f"❌ Erreur de connexion InfluxDB : {e}")
-    return None
-
-def on_mqtt_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("✅ MQTT connecté avec succès au broker.")
-    else:
-        print(f"❌ Échec de la connexion MQTT (code: {rc})")
+def catch_up_wind_rose(until):
+    try:
+        count = wind_rose_store.catch_up_from_csv(CSV_FILE, until=until)
+        if count:
+            print(f"🧭 Rose des vents : {count} mesures rattrapées depuis le CSV.")
+    except Exception as e:
+        print(f"⚠️ Erreur lors du rattrapage de la rose des vents : {e}")
 
-def setup_mqtt(current_config):
-    global mqtt_client
-    if current_config.get("mqtt_enabled"):
-        try:
-            # Compatibilité paho-mqtt 2.0+ (CallbackAPIVersion requis)
-            try:
-                client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
-            except AttributeError:
-                # Ancienne version de paho-mqtt
-                client = mqtt.Client()
-            
-            client.on_connect = on_mqtt_connect
-            
-            if current_config.get("mqtt_user"):
-                client.username_pw_set(current_config["mqtt_user"], current_config["mqtt_password"])
-            
-            client.loop_start()
-            client.connect_async(current_config.get("mqtt_broker", "localhost"), int(current_config.get("mqtt_port", 1883)), 60)
-            print(f"🔄 MQTT connexion en arrière-plan vers {current_config['mqtt_broker']} initiée...")
-            return client
-        except Exception as e:
-            print(f"❌ Erreur d'initialisation MQTT : {e}")
-    return None
-
-config = load_config()
-mqtt_client = setup_mqtt(config)
-influx_client = setup_influxdb(config)
+threading.Thread(target=catch_up_wind_rose, args=(time.time(),), name="wind-rose-catch-up", daemon=True).start()
+
+# ---- Résumés climatologiques journaliers et records ----
+# Le résumé du jour est mis à jour à chaque mesure et finalisé au passage de
+# minuit. Les journées manquantes (arrêt du service) sont rattrapées depuis le CSV.
+climate_store = ClimateStore()
+
+def catch_up_climate():
+    try:
+        count = climate_store.catch_up_from_csv(CSV_FILE)
+        if count:
+            print(f"📅 Climatologie : {count} journées finalisées depuis le CSV.")
+    except Exception as e:
+        print(f"⚠️ Erreur lors du rattrapage des résumés climatologiques : {e}")
+
+threading.Thread(target=catch_up_climate, name="climate-catch-up", daemon=True).start()
+
+# ---- Base SQLite (option storage_backend = "sqlite", voir meteo_store.py) ----
+# Les mesures minute et le vent détaillé (3s) sont mis en attente puis écrits
+# par lots à chaque minute. À l'ouverture de la base, les lignes du CSV qui
+# n'y sont pas encore sont importées en arrière-plan.
+sqlite_store = None
+sqlite_store_lock = threading.Lock()
+
+def catch_up_sqlite_store(store):
+    try:
+        if os.path.exists(CSV_FILE):
+            count = store.import_csv(CSV_FILE, newer_than=store.last_time())
+            if count:
+                print(f"🗄️ Base SQLite : {count} mesures importées depuis le CSV.")
+    except Exception as e:
+        print(f"⚠️ Erreur lors de l'import du CSV dans la base SQLite : {e}")
+
+def get_sqlite_store():
+    """Base SQLite si l'option est active (ouverte au premier usage), sinon None."""
+    global sqlite_store
+    if config_watcher.config.get("storage_backend") != "sqlite":
+        return None
+    with sqlite_store_lock:
+        if sqlite_store is None:
+            sqlite_store = MeteoStore()
+            threading.Thread(target=catch_up_sqlite_store, args=(sqlite_store,), name="sqlite-catch-up", daemon=True).start()
+        return sqlite_store
+
+try:
+    get_sqlite_store()
+except Exception as e:
+    print(f"⚠️ Base SQLite indisponible : {e}")
 
 def count_tip():
     """Fonction appelée à chaque basculement de l'auget."""
@@ -187,6 +248,31 @@ def count_wind_pulse():
         wind_pulse_count_display += 1
 
 # ---- Configuration des capteurs (BME280 en priorité) ----
+# Toutes les transactions I2C (capteurs et écran) passent par l'arbitre du bus :
+# un périphérique à la fois, les capteurs avant l'écran (voir i2c_bus.py).
+i2c_bus = get_arbiter()
+BME280_ADDRESS = 0x76 # Adresse détectée par i2cdetect
+BME280_CONFIG_KEYS = ["bme280_oversampling_temp", "bme280_oversampling_hum", "bme280_oversampling_pressure", "bme280_iir_filter"]
+
+def bme280_settings(config):
+    """Réglages du mode forcé (suréchantillonnage, filtre IIR) lus dans la configuration."""
+    return {
+        "oversampling_temp": config.get("bme280_oversampling_temp", 1),
+        "oversampling_hum": config.get("bme280_oversampling_hum", 1),
+        "oversampling_pressure": config.get("bme280_oversampling_pressure", 1),
+        "iir_filter": config.get("bme280_iir_filter", 0),
+    }
+
+# Nouveaux réglages, appliqués par le thread de mesure avant la conversion suivante
+# (une écriture des registres pendant une conversion la perturberait)
+bme280_pending_settings = None
+
+def on_bme280_config(config, changed):
+    global bme280_pending_settings
+    bme280_pending_settings = bme280_settings(config)
+
+config_watcher.subscribe(BME280_CONFIG_KEYS, on_bme280_config)
+
 bme280 = None
 as5600 = None
 i2c = None
@@ -198,8 +284,8 @@ except (ValueError, FileNotFoundError):
 if i2c:
     # On essaie d'initialiser le BME280
     try:
-        # On spécifie l'adresse 0x76, car c'est celle détectée par i2cdetect.
-        bme280 = adafruit_bme280.Adafruit_BME280_I2C(i2c, address=0x76)
+        with i2c_bus.device("bme280"):
+            bme280 = BME280(i2c, address=BME280_ADDRESS, **bme280_settings(config_watcher.config))
         print("✅ Capteur BME280 détecté. Il sera utilisé pour les mesures.")
     except (ValueError, OSError) as e:
         # Si le BME280 n'est pas trouvé, on l'indique et on se préparera
@@ -208,7 +294,8 @@ if i2c:
 
     # ---- Initialisation de la girouette (AS5600) ----
     try:
-        as5600 = AS5600(i2c)
+        with i2c_bus.device("as5600"):
+            as5600 = AS5600(i2c)
         print("✅ Girouette (AS5600) détectée.")
     except (ValueError, OSError):
         print("ℹ️ Girouette (AS5600) non trouvée sur le bus I2C.")
@@ -225,12 +312,48 @@ if not bme280:
     except RuntimeError as e:
         print(f"❌ Échec de l'initialisation du DHT11: {e}. Aucune mesure de température/humidité ne sera possible.")
 
+# ---- Supervision des étapes bloquantes (voir meteo_watchdog.py) ----
+# Budgets : le BME280 répond en quelques ms, le DHT11 en 0,25 à 2s ; l'écriture
+# attend au plus la fin d'une réparation du CSV (verrou de csv_repair.py).
+SENSOR_BUDGET = 5.0
+WIND_VANE_BUDGET = 0.5
+STORAGE_BUDGET = 10.0
+
+def restart_temp_sensor():
+    """Recrée le pilote du capteur de température (nouvelle ouverture du bus I2C) après un blocage."""
+    global bme280, dht_device
+    if bme280 is not None:
+        i2c_bus.force_release("bme280") # Le thread bloqué tient encore le bus
+        with i2c_bus.device("bme280"):
+            bme280 = BME280(busio.I2C(board.SCL, board.SDA), address=BME280_ADDRESS, **bme280_settings(config_watcher.config))
+    elif dht_device is not None:
+        try:
+            dht_device.exit()
+        except Exception:
+            pass
+        dht_device = adafruit_dht.DHT11(board.D4, use_pulseio=False)
+    print("🐕 Pilote du capteur de température recréé.")
+
+def restart_wind_vane():
+    """Recrée le pilote de la girouette (nouvelle ouverture du bus I2C) après un blocage."""
+    global as5600
+    if as5600 is not None:
+        i2c_bus.force_release("as5600")
+        with i2c_bus.device("as5600"):
+            as5600 = AS5600(busio.I2C(board.SCL, board.SDA))
+        print("🐕 Pilote de la girouette recréé.")
+
+sensor_stage = Stage("sensors", SENSOR_BUDGET, restart=restart_temp_sensor)
+wind_vane_stage = Stage("wind_vane", WIND_VANE_BUDGET, restart=restart_wind_vane)
+storage_stage = Stage("storage", STORAGE_BUDGET, skip_when_busy=False) # Une ligne n'est jamais abandonnée
+Watchdog([sensor_stage, wind_vane_stage, storage_stage]).start()
+
 
 # ---- Initialisation de l'écran LCD ----
 lcd = None
 if RgbLcd:
     try:
-        lcd = RgbLcd()
+        lcd = RgbLcd(arbiter=i2c_bus)
         lcd.set_rgb(50, 50, 150) # Couleur de fond bleu/violet au démarrage
         lcd.write("Vitesse vent\nAttente...")
         print("✅ Écran LCD Grove détecté.")
@@ -257,7 +380,8 @@ def update_lcd_display():
 
     with lcd_lock:
         try:
-            # Couleur de fond basée sur la température (reste active dans tous les modes)
+            # Couleur de fond basée sur la température (reste active dans tous les modes ;
+            # le pilote n'écrit sur le bus que si la couleur change)
             if last_temp is not None:
                 if last_temp < 10:
                     lcd.set_rgb(0, 0, 255) # Bleu
@@ -266,8 +390,6 @@ def update_lcd_display():
                 else:
                     lcd.set_rgb(0, 150, 50) # Vert
 
-            lcd.clear()
-            
             if display_mode == 0: # Mode Vent
                 line1 = "Vitesse vent"
                 line2 = f"{last_wind_speed:.1f} km/h"
@@ -285,10 +407,8 @@ def update_lcd_display():
                 line1 = "Humidite: " + h_str
                 line2 = "Pluie Jour: " + r_str
 
-            lcd.set_cursor(0, 0)
-            lcd.write(line1)
-            lcd.set_cursor(0, 1)
-            lcd.write(line2)
+            # Seuls les caractères modifiés sont envoyés (pas d'effacement toutes les 3s)
+            lcd.show(line1, line2)
         except OSError:
             pass
 
@@ -305,7 +425,7 @@ mode_button.when_pressed = change_display_mode
 try:
     with open(CSV_FILE, "x", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str"])
+        writer.writerow(["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str", "wind_dir_deg", "wind_dir_std"])
 except FileExistsError:
     pass
 
@@ -313,34 +433,72 @@ except FileExistsError:
 try:
     with open(WIND_CSV_FILE, "x", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["time", "wind_speed", "wind_dir"])
+        writer.writerow(["time", "wind_speed", "wind_dir", "wind_angle"])
 except FileExistsError:
     pass
 
-def read_sensors():
+# Rotation automatique du log détaillé du vent, hors des boucles de mesure.
+# Le verrou évite de perdre un ajout fait pendant la réécriture du fichier.
+wind_log_lock = threading.Lock()
+
+def rotate_wind_log_loop():
+    while True:
+        time.sleep(ROTATION_INTERVAL)
+        with wind_log_lock:
+            rotate_file_if_large(WIND_CSV_FILE)
+
+threading.Thread(target=rotate_wind_log_loop, name="wind-log-rotation", daemon=True).start()
+
+def _read_temp_sensor():
     """
-    Lit les données depuis le BME280 si disponible, sinon depuis le DHT11.
-    Retourne (temp, hum, pressure). Pressure est None si non disponible.
+    Lecture brute du BME280 si disponible, sinon du DHT11 (thread de l'étape "sensors").
+    Retourne (temp, hum, pressure), pressure vaut None sans BME280.
+    Lève RuntimeError (DHT11) ou OSError (I2C) en cas d'échec.
     """
+    global bme280_pending_settings
+    sensor = "bme280" if bme280 else "dht11"
     try:
         temp, hum, pressure = None, None, None
         if bme280:
-            temp, hum, pressure = bme280.temperature, bme280.humidity, bme280.pressure
+            with meteo_metrics.timer("meteo_sensor_read_seconds", sensor=sensor):
+                # Une conversion en mode forcé, puis une seule lecture groupée T/H/P ;
+                # le bus reste libre pour les autres périphériques pendant la conversion.
+                with i2c_bus.device("bme280"):
+                    if bme280_pending_settings is not None:
+                        bme280.configure(**bme280_pending_settings)
+                        bme280_pending_settings = None
+                    conversion_time = bme280.start_measurement()
+                time.sleep(conversion_time)
+                with i2c_bus.device("bme280"):
+                    temp, hum, pressure = bme280.read_measurement()
         elif dht_device:
             # Utilise le DHT11, pas de pression disponible
-            temp, hum = dht_device.temperature, dht_device.humidity
-        
-        # --- Calibration de la température ---
-        # Ajustez la valeur de l'offset selon vos observations.
-        TEMP_OFFSET = -2.0
-        if temp is not None:
-            temp += TEMP_OFFSET
-        
-        return temp, hum, pressure
-    except RuntimeError as error:
-        # Erreur de lecture, on retourne None pour toutes les valeurs
-        print(f"Erreur de lecture du capteur: {error.args[0]}")
-        return None, None, None
+            with meteo_metrics.timer("meteo_sensor_read_seconds", sensor=sensor):
+                temp, hum = dht_device.temperature, dht_device.humidity
+    except (RuntimeError, OSError):
+        meteo_metrics.inc("meteo_sensor_read_errors_total", sensor=sensor)
+        raise
+
+    # --- Étalonnage (décalages de config.json, à ajuster selon vos observations) ---
+    if temp is not None:
+        temp += TEMP_OFFSET
+    if hum is not None:
+        hum = min(max(hum + HUMIDITY_OFFSET, 0.0), 100.0)
+    if pressure is not None:
+        pressure += PRESSURE_OFFSET
+
+    return temp, hum, pressure
+
+def read_sensors():
+    """
+    Lit le capteur de température dans le délai de l'étape "sensors".
+    Retourne (temp, hum, pressure, stale) : en cas d'échec ou de dépassement,
+    les dernières valeurs valides avec stale vrai (None si trop anciennes).
+    """
+    values, fresh = sensor_stage.call(_read_temp_sensor)
+    if values is None:
+        return None, None, None, not fresh
+    return values + (not fresh,)
 
 def get_wind_direction(angle):
     """Convertit un angle en direction cardinale."""
@@ -351,54 +509,57 @@ def get_wind_direction(angle):
     index = int((angle + 22.5) / 45) % 8
     return directions[index]
 
+def _read_as5600():
+    """Lecture brute de la girouette (thread de l'étape "wind_vane")."""
+    if not as5600:
+        return None
+    try:
+        with meteo_metrics.timer("meteo_sensor_read_seconds", sensor="as5600"), i2c_bus.device("as5600"):
+            return as5600.angle # La librairie retourne l'angle en degrés
+    except (OSError, RuntimeError):
+        meteo_metrics.inc("meteo_sensor_read_errors_total", sensor="as5600")
+        raise
+
 def read_wind_vane():
-    """Lit l'angle de la girouette si disponible."""
-    if as5600:
-        # La librairie retourne l'angle en degrés
-        return as5600.angle
-    return None
+    """
+    Lit l'angle de la girouette si disponible, dans le délai de l'étape "wind_vane".
+    Retourne (angle, stale).
+    """
+    angle, fresh = wind_vane_stage.call(_read_as5600)
+    return angle, not fresh
+
+def write_measurement(row):
+    """Ajout de la mesure au CSV et à la base SQLite (thread de l'étape "storage")."""
+    with meteo_metrics.timer("meteo_csv_append_seconds", file="meteo_log"):
+        with locked_append(CSV_FILE) as f: # Verrou partagé avec les réparations de csv_repair.py
+            writer = csv.writer(f)
+            writer.writerow(row)
+            f.flush()
+
+    # --- Base SQLite : mesure et vent détaillé de la minute en une transaction ---
+    try:
+        store = get_sqlite_store()
+        if store is not None:
+            store.add_measurement(row)
+            store.flush()
+    except Exception as e:
+        print(f"⚠️ Erreur d'écriture dans la base SQLite : {e}")
 
 def sample_and_log():
     """
     Fonction exécutée toutes les SAMPLE_TIME secondes pour lire les capteurs,
     calculer les valeurs et les enregistrer.
+    Les étapes qui peuvent bloquer (capteurs, écriture) sont supervisées (voir
+    meteo_watchdog.py) : l'horodatage et les compteurs sont relevés d'abord,
+    et une étape lente ne retarde pas la suite de la mesure.
     """
-    global wind_pulse_count, tip_count, last_temp, last_hum, last_pressure, daily_rain, current_day, wind_gust_pulse_max, last_sample_time, config, mqtt_client, influx_client
+    global wind_pulse_count, tip_count, last_temp, last_hum, last_pressure, daily_rain, current_day, wind_gust_pulse_max, last_sample_time
     
     # On configure le timer pour qu'il se relance à la fin de l'exécution
     threading.Timer(SAMPLE_TIME, sample_and_log).start()
+    loop_start = time.perf_counter()
 
-    # Rechargement de la config pour détecter les changements (ex: activation MQTT via Web)
-    new_config = load_config()
-    if new_config.get("mqtt_enabled") != config.get("mqtt_enabled") or \
-       new_config.get("mqtt_broker") != config.get("mqtt_broker"):
-        print("🔄 Changement de configuration MQTT détecté, reconnexion...")
-        if mqtt_client: 
-            mqtt_client.loop_stop()
-            mqtt_client.disconnect()
-        mqtt_client = setup_mqtt(new_config)
-    config = new_config
-    
-    # Reconnexion InfluxDB si nécessaire
-    if new_config.get("influx_enabled") and not influx_client:
-        influx_client = setup_influxdb(new_config)
-    elif not new_config.get("influx_enabled") and influx_client:
-        influx_client.close()
-        influx_client = None
-
-    temp, hum, pressure = read_sensors()
-    
-    # Mise à jour des variables globales pour l'affichage LCD
-    last_temp = temp
-    last_hum = hum
-    last_pressure = pressure
-
-    # Modification : On ne bloque plus l'enregistrement si la température manque.
-    # Cela permet de sauver les données de pluie/vent même si le BME280 déconne.
-    if temp is None or hum is None:
-        print("⚠️ Attention : Lecture Temp/Hum échouée, mais enregistrement Pluie/Vent maintenu.")
-
-    # --- Calculs et réinitialisations ---
+    # --- Horodatage et compteurs, avant toute lecture de capteur ---
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     # Calcul du temps réel écoulé depuis la dernière mesure pour une précision parfaite
@@ -406,6 +567,7 @@ def sample_and_log():
     elapsed = current_time - last_sample_time
     last_sample_time = current_time
     if elapsed <= 0: elapsed = SAMPLE_TIME # Sécurité
+    late = elapsed - SAMPLE_TIME
 
     # Vitesse du vent
     with wind_count_lock:
@@ -420,10 +582,6 @@ def sample_and_log():
     wind_gust_kmh = gust_hz * WIND_SPEED_FACTOR
     wind_speed_kmh = wind_hz * WIND_SPEED_FACTOR
 
-    # Direction du vent
-    wind_angle = read_wind_vane()
-    wind_dir_str = get_wind_direction(wind_angle)
-
     # Pluie
     # Gestion du cumul journalier
     now_day = datetime.now().day
@@ -436,61 +594,140 @@ def sample_and_log():
         daily_rain += rain_since_last
         tip_count = 0 # Reset
 
+    # --- Capteurs (étape supervisée) ---
+    temp, hum, pressure, sensors_stale = read_sensors()
+    
+    # Mise à jour des variables globales pour l'affichage LCD (dernières valeurs valides)
+    last_temp = temp
+    last_hum = hum
+    last_pressure = pressure
+
+    # Valeurs périmées : affichées et publiées (signalées), mais pas enregistrées
+    # comme des mesures de cette minute.
+    stale_keys = []
+    if sensors_stale:
+        stale_keys = [key for key, value in (("temperature", temp), ("humidity", hum), ("pressure", pressure)) if value is not None]
+        measured_temp, measured_hum, measured_pressure = None, None, None
+    else:
+        measured_temp, measured_hum, measured_pressure = temp, hum, pressure
+
+    # Modification : On ne bloque plus l'enregistrement si la température manque.
+    # Cela permet de sauver les données de pluie/vent même si le BME280 déconne.
+    if measured_temp is None or measured_hum is None:
+        print("⚠️ Attention : Lecture Temp/Hum échouée, mais enregistrement Pluie/Vent maintenu.")
+
+    # Direction du vent : moyenne vectorielle des lectures 3s de la minute écoulée
+    # (une lecture instantanée isolée ne sert que si le tampon est vide)
+    wind_angle, wind_dir_std, _ = wind_vane_buffer.compute_and_reset()
+    if wind_angle is None:
+        wind_angle, angle_stale = read_wind_vane()
+        if angle_stale:
+            wind_angle = None
+    wind_dir_str = get_wind_direction(wind_angle)
+
     # --- Enregistrement et affichage ---
-    pressure_val = f"{pressure:.2f}" if pressure is not None else ""
-    temp_val = f"{temp:.2f}" if temp is not None else ""
-    hum_val = f"{hum:.2f}" if hum is not None else ""
+    pressure_val = f"{measured_pressure:.2f}" if measured_pressure is not None else ""
+    temp_val = f"{measured_temp:.2f}" if measured_temp is not None else ""
+    hum_val = f"{measured_hum:.2f}" if measured_hum is not None else ""
+    angle_val = f"{wind_angle:.1f}" if wind_angle is not None else ""
+    std_val = f"{wind_dir_std:.1f}" if wind_dir_std is not None else ""
     
-    with open(CSV_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([now, temp_val, hum_val, pressure_val, f"{rain_since_last:.4f}", f"{wind_speed_kmh:.2f}", f"{wind_gust_kmh:.2f}", wind_dir_str])
-        f.flush()
-
-    # --- Publication réseau asynchrone (non bloquante) ---
-    def publish_network():
-        # --- Envoi MQTT ---
-        if mqtt_client:
-            try:
-                mqtt_data = {
-                    "temperature": round(temp, 2) if temp is not None else None,
-                    "humidity": round(hum, 1) if hum is not None else None,
-                    "pressure": round(pressure, 1) if pressure is not None else None,
-                    "rain_since_last": round(rain_since_last, 4),
-                    "daily_rain": round(daily_rain, 2),
-                    "wind_speed": round(wind_speed_kmh, 1),
-                    "wind_gust": round(wind_gust_kmh, 1),
-                    "wind_direction": wind_dir_str,
-                    "timestamp": now
-                }
-                mqtt_client.publish(config.get("mqtt_topic", "meteopi/sensors"), json.dumps(mqtt_data))
-            except Exception as e:
-                print(f"⚠️ Erreur publication MQTT : {e}")
-
-        # --- Envoi InfluxDB ---
-        if influx_client:
-            try:
-                write_api = influx_client.write_api(write_options=SYNCHRONOUS)
-                point = Point("meteo")                     .tag("station", "meteopi_1")                     .field("temperature", float(temp) if temp is not None else 0.0)                     .field("humidity", float(hum) if hum is not None else 0.0)                     .field("pressure", float(pressure) if pressure is not None else 0.0)                     .field("rain", float(rain_since_last))                     .field("wind_speed", float(wind_speed_kmh))                     .field("wind_gust", float(wind_gust_kmh))                     .field("wind_direction", wind_dir_str)                     .time(datetime.utcnow(), WritePrecision.NS)
-                
-                write_api.write(
-                    bucket=config.get("influx_bucket"),
-                    org=config.get("influx_org"),
-                    record=point
-                )
-            except Exception as e:
-                print(f"⚠️ Erreur publication InfluxDB : {e}")
+    row = [now, temp_val, hum_val, pressure_val, f"{rain_since_last:.4f}", f"{wind_speed_kmh:.2f}", f"{wind_gust_kmh:.2f}", wind_dir_str, angle_val, std_val]
+    # Écriture supervisée : si le verrou du CSV est tenu (réparation en cours),
+    # la ligne reste en file et sera écrite dès sa libération.
+    storage_stage.call(write_measurement, row)
+
+    # --- Résumé climatologique du jour (finalisé à minuit) ---
+    try:
+        with meteo_metrics.timer("meteo_stage_seconds", stage="climate"):
+            reading = parse_csv_row(row)
+            if reading is not None:
+                climate_store.update(reading)
+    except Exception as e:
+        print(f"⚠️ Erreur de mise à jour du résumé climatologique : {e}")
+
+    # --- Rose des vents du jour ---
+    try:
+        with meteo_metrics.timer("meteo_stage_seconds", stage="wind_rose"):
+            wind_rose_store.add(current_time, wind_angle, wind_speed_kmh)
+    except Exception as e:
+        print(f"⚠️ Erreur de mise à jour de la rose des vents : {e}")
 
-    threading.Thread(target=publish_network, daemon=True).start()
+    # --- Statistiques glissantes ---
+    derived = {}
+    try:
+        with meteo_metrics.timer("meteo_stage_seconds", stage="stats"):
+            live_stats.update({
+                "timestamp": current_time, "temp": measured_temp, "hum": measured_hum, "pressure": measured_pressure,
+                "rain": rain_since_last, "wind_speed": wind_speed_kmh, "wind_gust": wind_gust_kmh,
+            })
+            derived = live_stats.write_snapshot()["derived"]
+    except Exception as e:
+        print(f"⚠️ Erreur de mise à jour des statistiques glissantes : {e}")
+
+    # --- Publication réseau (dépôt dans la file d'attente, non bloquant) ---
+    station_id = config_watcher.config.get("station_id", "meteopi_1")
+    mqtt_data = {
+        "station": station_id,
+        "temperature": round(temp, 2) if temp is not None else None,
+        "humidity": round(hum, 1) if hum is not None else None,
+        "pressure": round(pressure, 1) if pressure is not None else None,
+        "stale": stale_keys, # Dernières valeurs valides, capteur sans réponse cette minute
+        "rain_since_last": round(rain_since_last, 4),
+        "daily_rain": round(daily_rain, 2),
+        "wind_speed": round(wind_speed_kmh, 1),
+        "wind_gust": round(wind_gust_kmh, 1),
+        "wind_direction": wind_dir_str,
+        "wind_direction_deg": round(wind_angle, 1) if wind_angle is not None else None,
+        "wind_direction_std": round(wind_dir_std, 1) if wind_dir_std is not None else None,
+        "rain_24h": derived.get("rain_24h"),
+        "pressure_change_3h": derived.get("pressure_change_3h"),
+        "wind_mean_10min": derived.get("wind_mean_10min"),
+        "timestamp": now
+    }
+    point = Point("meteo") \
+        .tag("station", station_id) \
+        .field("temperature", float(measured_temp) if measured_temp is not None else 0.0) \
+        .field("humidity", float(measured_hum) if measured_hum is not None else 0.0) \
+        .field("pressure", float(measured_pressure) if measured_pressure is not None else 0.0) \
+        .field("rain", float(rain_since_last)) \
+        .field("wind_speed", float(wind_speed_kmh)) \
+        .field("wind_gust", float(wind_gust_kmh)) \
+        .field("wind_direction", wind_dir_str) \
+        .time(datetime.utcnow(), WritePrecision.NS)
+    if wind_angle is not None:
+        point.field("wind_direction_deg", float(wind_angle))
+    if wind_dir_std is not None:
+        point.field("wind_direction_std", float(wind_dir_std))
+    for key in ("rain_24h", "pressure_change_3h", "wind_mean_10min"):
+        if derived.get(key) is not None:
+            point.field(key, float(derived[key]))
+    try:
+        with meteo_metrics.timer("meteo_publish_enqueue_seconds"):
+            publisher.publish_sample(mqtt_data, point.to_line_protocol(), row)
+    except Exception as e:
+        print(f"⚠️ Erreur de mise en file des données réseau : {e}")
 
     pressure_str = f"📈 {pressure:.1f}hPa" if pressure is not None else ""
     temp_disp = f"{temp:.1f}°C" if temp is not None else "--.-°C"
     hum_disp = f"{hum:.0f}%" if hum is not None else "--%"
-    print(f"[{now}] 🌡 {temp_disp}  💧 {hum_disp}  {pressure_str} 🌧️ {rain_since_last:.2f}mm 💨 {wind_speed_kmh:.1f} km/h ({wind_dir_str})")
+    stale_disp = " (valeurs précédentes)" if stale_keys else ""
+    print(f"[{now}] 🌡 {temp_disp}  💧 {hum_disp}  {pressure_str}{stale_disp} 🌧️ {rain_since_last:.2f}mm 💨 {wind_speed_kmh:.1f} km/h ({wind_dir_str})")
 
     # La mise à jour de l'écran LCD est maintenant gérée par update_lcd_realtime()
+    # La rotation du log détaillé du vent est faite par rotate_wind_log_loop()
+    record_loop_metrics("sample", SAMPLE_TIME, late, time.perf_counter() - loop_start)
 
-    # Rotation automatique du fichier de log détaillé du vent
-    rotate_file_if_large(WIND_CSV_FILE)
+def record_loop_metrics(loop, period, late, duration):
+    """
+    Retard au démarrage et durée d'une itération. Le Timer suivant étant armé
+    dès le début de l'itération, une itération plus longue que sa période en
+    chevauche une autre (un thread de plus) : c'est un dépassement.
+    """
+    meteo_metrics.observe("meteo_loop_lateness_seconds", max(late, 0.0), loop=loop)
+    meteo_metrics.observe("meteo_loop_duration_seconds", duration, loop=loop)
+    if duration > period or late > period / 2:
+        meteo_metrics.inc("meteo_loop_overruns_total", loop=loop)
 
 def update_lcd_realtime():
     """Met à jour l'écran LCD toutes les 3s pour une réactivité temps réel."""
@@ -498,12 +735,14 @@ def update_lcd_realtime():
     
     # Relance le timer pour 3 secondes (Norme OMM pour les rafales)
     threading.Timer(3.0, update_lcd_realtime).start()
+    loop_start = time.perf_counter()
     
     # Calcul du temps réel écoulé (ex: 3.01s au lieu de 3.0s)
     current_time = time.time()
     elapsed = current_time - last_realtime_time
     last_realtime_time = current_time
     if elapsed <= 0: elapsed = 3.0
+    late = elapsed - 3.0
 
     # --- 1. Calculs (Exécutés même sans écran LCD) ---
     with wind_display_lock:
@@ -520,18 +759,30 @@ def update_lcd_realtime():
     last_wind_speed = wind_hz * WIND_SPEED_FACTOR
 
     # --- 2. Enregistrement haute fréquence (toutes les 3s) ---
+    wind_angle_rt, wind_dir_rt = None, "N/A"
     try:
         now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Lecture de la direction (si dispo)
-        wind_angle_rt = read_wind_vane()
+        # Lecture de la direction (si dispo ; ignorée si la girouette n'a pas répondu à temps)
+        wind_angle_rt, angle_stale = read_wind_vane()
+        if angle_stale:
+            wind_angle_rt = None
         wind_dir_rt = get_wind_direction(wind_angle_rt)
+        wind_vane_buffer.add(wind_angle_rt, last_wind_speed)
         
-        with open(WIND_CSV_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([now_str, f"{last_wind_speed:.2f}", wind_dir_rt])
+        with meteo_metrics.timer("meteo_csv_append_seconds", file="wind_detail_log"), wind_log_lock:
+            with open(WIND_CSV_FILE, "a", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow([now_str, f"{last_wind_speed:.2f}", wind_dir_rt, f"{wind_angle_rt:.1f}" if wind_angle_rt is not None else ""])
     except Exception as e:
         print(f"Erreur log vent détaillé: {e}")
 
+    # --- 2b. Flux haute fréquence MQTT/InfluxDB (optionnel, envoyé par lots) ---
+    wind_rt_history.append(last_wind_speed)
+    try:
+        publisher.publish_wind_sample(current_time, last_wind_speed, max(wind_rt_history), wind_angle_rt, wind_dir_rt)
+    except Exception as e:
+        print(f"Erreur flux vent haute fréquence: {e}")
+
     # --- 3. Mise à jour de l'écran LCD (si présent) ---
     if lcd:
         try:
@@ -539,6 +790,8 @@ def update_lcd_realtime():
         except (IOError, OSError) as e:
             print(f"Erreur lors de la mise à jour de l'écran LCD: {e}")
 
+    record_loop_metrics("realtime", 3.0, late, time.perf_counter() - loop_start)
+
 SAMPLE_TIME = 60.0 # Durée de l'échantillonnage en secondes
 lcd_display_toggle = False # Variable pour gérer l'alternance de l'affichage LCD
 
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+# Résumés climatologiques journaliers et records de la station.
+#
+# Le processus capteurs tient à jour le résumé du jour en cours (températures
+# extrêmes et heures, cumul de pluie, rafale maximale avec heure et direction,
+# plage de pression) à chaque mesure. Au passage de minuit, la journée est
+# finalisée : elle est ajoutée au fichier de l'année (data/climate/AAAA.json)
+# et les tables de records (absolus, par mois, par année) de records.json sont
+# mises à jour. La page /climate et l'API lisent ces fichiers sans jamais
+# parcourir l'historique.
+#
+# Reconstruction complète depuis le CSV : python meteo_climate.py rebuild
+#
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+from meteo_stats import parse_csv_row
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CLIMATE_DIR = os.path.join(DATA_DIR, "climate")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+
+# Records suivis : nom -> (champ du résumé journalier, "max" ou "min", libellé, champ de l'heure)
+RECORDS = {
+    "temp_high": ("temp_max", "max", "Température la plus haute", "temp_max_time"),
+    "temp_low": ("temp_min", "min", "Température la plus basse", "temp_min_time"),
+    "warmest_night": ("temp_min", "max", "Minimale la plus douce", "temp_min_time"),
+    "coldest_day": ("temp_max", "min", "Maximale la plus froide", "temp_max_time"),
+    "wettest_day": ("rain_total", "max", "Journée la plus pluvieuse", None),
+    "gust_max": ("gust_max", "max", "Rafale la plus forte", "gust_max_time"),
+    "pressure_high": ("pressure_max", "max", "Pression la plus haute", "pressure_max_time"),
+    "pressure_low": ("pressure_min", "min", "Pression la plus basse", "pressure_min_time"),
+}
+MIN_READINGS = 60 # Une journée avec moins d'une heure de mesures n'établit pas de record
+
+class DaySummary:
+    """Résumé d'une journée, mis à jour en O(1) à chaque mesure."""
+
+    def __init__(self, date_str):
+        self.data = {
+            "date": date_str, "count": 0,
+            "temp_min": None, "temp_min_time": None, "temp_max": None, "temp_max_time": None,
+            "temp_sum": 0.0, "temp_count": 0,
+            "rain_total": 0.0,
+            "gust_max": None, "gust_max_time": None, "gust_max_dir": None,
+            "pressure_min": None, "pressure_min_time": None, "pressure_max": None, "pressure_max_time": None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data["date"])
+        summary.data.update(data)
+        return summary
+
+    @property
+    def date(self):
+        return self.data["date"]
+
+    def _extreme(self, prefix, value, time_str, keep_max):
+        key = f"{prefix}_max" if keep_max else f"{prefix}_min"
+        current = self.data[key]
+        if current is None or (value > current if keep_max else value < current):
+            self.data[key] = value
+            self.data[f"{key}_time"] = time_str
+            return True
+        return False
+
+    def update(self, reading):
+        """Ajoute une mesure (dict de meteo_stats.parse_csv_row)."""
+        d = self.data
+        time_str = reading["time"][11:16] # HH:MM
+        d["count"] += 1
+        temp = reading.get("temp")
+        if temp is not None:
+            self._extreme("temp", temp, time_str, True)
+            self._extreme("temp", temp, time_str, False)
+            d["temp_sum"] += temp
+            d["temp_count"] += 1
+        if reading.get("rain"):
+            d["rain_total"] = round(d["rain_total"] + reading["rain"], 4)
+        gust = reading.get("wind_gust")
+        if gust is None:
+            gust = reading.get("wind_speed") # Anciennes lignes sans rafale
+        if gust is not None and (d["gust_max"] is None or gust > d["gust_max"]):
+            d["gust_max"] = gust
+            d["gust_max_time"] = time_str
+            d["gust_max_dir"] = reading.get("wind_dir_str")
+        pressure = reading.get("pressure")
+        if pressure is not None:
+            self._extreme("pressure", pressure, time_str, True)
+            self._extreme("pressure", pressure, time_str, False)
+
+    def to_dict(self):
+        d = dict(self.data)
+        d["temp_mean"] = round(d["temp_sum"] / d["temp_count"], 2) if d["temp_count"] else None
+        return d
+
+def _record_candidate(summary, name):
+    field, mode, _, time_field = RECORDS[name]
+    value = summary.get(field)
+    if value is None or (name == "wettest_day" and value <= 0):
+        return None
+    return {"value": value, "date": summary["date"], "time": summary.get(time_field) if time_field else None}
+
+def _beats(candidate, current, mode):
+    if current is None:
+        return True
+    return candidate["value"] > current["value"] if mode == "max" else candidate["value"] < current["value"]
+
+class ClimateStore:
+    """
+    Résumés journaliers (un fichier JSON par année) et tables de records.
+    Le processus capteurs est le seul écrivain ; le serveur web relit les
+    fichiers (quelques Ko) à chaque requête.
+    """
+
+    def __init__(self, directory=CLIMATE_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.today = None # DaySummary de la journée en cours (processus capteurs)
+
+    # --- Fichiers ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _read(self, name, default):
+        try:
+            with open(self._path(name), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return default
+
+    def _write(self, name, data):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self._path(name) + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self._path(name))
+        except OSError as e:
+            print(f"⚠️ Écriture des résumés climatologiques impossible ({name}) : {e}")
+
+    def read_year(self, year):
+        """Résumés finalisés d'une année : {"AAAA-MM-JJ": résumé}."""
+        return self._read(str(year), {})
+
+    def read_records(self):
+        return self._read("records", {"all_time": {}, "years": {}, "months": {}, "last_date": None})
+
+    def read_today(self):
+        return self._read("today", None)
+
+    def years(self):
+        try:
+            return sorted(name[:4] for name in os.listdir(self.directory) if name[:4].isdigit() and name.endswith(".json"))
+        except OSError:
+            return []
+
+    # --- Records ---
+
+    @staticmethod
+    def _apply_records(records, summary):
+        """Met à jour les tables de records avec une journée finalisée."""
+        if summary["count"] < MIN_READINGS:
+            return
+        tables = (records["all_time"],
+                  records["years"].setdefault(summary["date"][:4], {}),
+                  records["months"].setdefault(summary["date"][:7], {}))
+        for name, (_, mode, _, _) in RECORDS.items():
+            candidate = _record_candidate(summary, name)
+            if candidate is None:
+                continue
+            for table in tables:
+                if _beats(candidate, table.get(name), mode):
+                    table[name] = candidate
+
+    # --- Écriture (processus capteurs) ---
+
+    def _finalize(self, summary, years, records):
+        data = summary.to_dict()
+        year = summary.date[:4]
+        if year not in years:
+            years[year] = self.read_year(year)
+        years[year][summary.date] = data
+        self._apply_records(records, data)
+        if records["last_date"] is None or summary.date > records["last_date"]:
+            records["last_date"] = summary.date
+
+    def update(self, reading):
+        """
+        Ajoute une mesure au résumé du jour. Le premier relevé d'une nouvelle
+        journée finalise la précédente (passage de minuit).
+        """
+        date_str = reading["time"][:10]
+        with self.lock:
+            if self.today is not None and self.today.date != date_str:
+                records = self.read_records()
+                years = {}
+                self._finalize(self.today, years, records)
+                for year, days in years.items():
+                    self._write(year, days)
+                self._write("records", records)
+                print(f"📅 Journée du {self.today.date} finalisée (résumé climatologique et records).")
+                self.today = None
+            if self.today is None:
+                self.today = DaySummary(date_str)
+            self.today.update(reading)
+            self._write("today", self.today.to_dict())
+
+    def catch_up_from_csv(self, csv_path=CSV_FILE, rebuild=False):
+        """
+        Finalise les journées du CSV postérieures à la dernière finalisée
+        (premier démarrage, arrêt du processus capteurs) et reprend le résumé
+        du jour en cours. Les lignes plus anciennes sont écartées par simple
+        comparaison de chaînes. Avec rebuild=True, tout est recalculé.
+        Retourne le nombre de journées finalisées.
+        """
+        today_str = datetime.now().strftime("%Y-%m-%d")
+        records = {"all_time": {}, "years": {}, "months": {}, "last_date": None} if rebuild else self.read_records()
+        last_date = records["last_date"] or ""
+        years = {}
+        current = None
+        finalized = 0
+        try:
+            with open(csv_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    date_str = line[:10]
+                    if date_str <= last_date or not date_str[:1].isdigit():
+                        continue
+                    reading = parse_csv_row(line.strip().split(','))
+                    if reading is None:
+                        continue
+                    if current is not None and current.date != date_str:
+                        if current.date < today_str:
+                            self._finalize(current, years, records)
+                            finalized += 1
+                        current = None
+                    if current is None:
+                        if rebuild and date_str[:4] not in years:
+                            years[date_str[:4]] = {}
+                        current = DaySummary(date_str)
+                    current.update(reading)
+        except OSError:
+            return 0
+
+        with self.lock:
+            if current is not None and current.date < today_str:
+                self._finalize(current, years, records)
+                finalized += 1
+                current = None
+            for year, days in years.items():
+                self._write(year, days)
+            if finalized or rebuild:
+                self._write("records", records)
+            # Journée en cours : reprise du résumé si le capteur n'en a pas déjà commencé un
+            if current is not None and (self.today is None or self.today.date != current.date or self.today.data["count"] < current.data["count"]):
+                self.today = current
+                self._write("today", current.to_dict())
+        return finalized
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Utilisation : python meteo_climate.py rebuild [fichier.csv]")
+        sys.exit(1)
+    source = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+    print(f"--- Recalcul des résumés climatologiques depuis {source} ---")
+    days = ClimateStore().catch_up_from_csv(source, rebuild=True)
+    print(f"✅ {days} journées finalisées.")
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# Service de configuration partagé par tous les processus de la station
+# (capteurs, serveur web et ses workers Gunicorn, bot Telegram, satellite).
+# config.json est validé selon un schéma unique, et un thread de surveillance
+# (basé sur la date de modification du fichier) notifie chaque abonné
+# uniquement lorsque les clés qui le concernent changent.
+#
+
+import copy
+import json
+import os
+import threading
+import time
+
+CONFIG_FILE = "config.json"
+WATCH_INTERVAL = 2.0 # Vérification de la date de modification toutes les 2s
+
+# Règles d'alerte par défaut du bot Telegram (voir AlertEngine dans telegram_bot.py).
+# metric : mesure instantanée (temp, hum, pressure, wind_speed, wind_gust) ou
+# calculée sur `window` minutes (rain_rate en mm/h, rain_total, pressure_change, gust_max).
+DEFAULT_ALERT_RULES = [
+    {"name": "Rafales", "metric": "wind_gust", "op": ">", "threshold": 60, "hysteresis": 10, "cooldown": 60, "message": "Rafales de vent fortes"},
+    {"name": "Pluie intense", "metric": "rain_rate", "window": 15, "op": ">", "threshold": 10, "hysteresis": 5, "cooldown": 60, "message": "Pluie intense"},
+    {"name": "Chute de pression", "metric": "pressure_change", "window": 180, "op": "<", "threshold": -3, "hysteresis": 1, "cooldown": 180, "message": "Chute rapide de la pression (3h)"},
+    {"name": "Gel", "metric": "temp", "op": "<", "threshold": 0.5, "hysteresis": 1, "cooldown": 720, "message": "Risque de gel"},
+]
+
+# Mesures et comparaisons acceptées dans une règle d'alerte
+ALERT_METRICS = ("temp", "hum", "pressure", "rain", "wind_speed", "wind_gust",   # Instantanées
+                 "rain_rate", "rain_total", "pressure_change", "gust_max")       # Sur fenêtre
+ALERT_OPS = (">", "<")
+
+# Schéma : clé -> (type attendu, valeur par défaut)
+SCHEMA = {
+    "owm_api_key": (str, "METTRE_VOTRE_CLE_ICI"),
+    "latitude": (float, 48.85),
+    "longitude": (float, 2.35),
+    "admin_password_hash": (str, ""),
+    "telegram_bot_token": (str, "METTRE_VOTRE_TOKEN_ICI"),
+    "telegram_chat_id": (str, ""),
+    "samba_share": (str, ""),
+    "samba_user": (str, ""),
+    "samba_password": (str, ""),
+    "mqtt_enabled": (bool, False),
+    "mqtt_broker": (str, "localhost"),
+    "mqtt_port": (int, 1883),
+    "mqtt_user": (str, ""),
+    "mqtt_password": (str, ""),
+    "mqtt_topic": (str, "meteopi/sensors"),
+    "influx_enabled": (bool, False),
+    "influx_url": (str, "http://localhost:8086"),
+    "influx_token": (str, ""),
+    "influx_org": (str, ""),
+    "influx_bucket": (str, "meteopi"),
+    "wind_stream_enabled": (bool, False),
+    "wind_stream_topic": (str, "meteopi/wind"),
+    "wind_stream_interval": (float, 30.0),
+    "satellite_loop_hours": (float, 3.0),
+    "satellite_max_frames": (int, 12),
+    "satellite_colors": (int, 64),
+    "alerts_enabled": (bool, True),
+    "alert_rules": (list, DEFAULT_ALERT_RULES),
+    "alert_max_per_hour": (int, 6),
+    "storage_backend": (str, "csv"), # "csv" ou "sqlite" (voir meteo_store.py)
+    "station_id": (str, "meteopi_1"), # Identifiant de la station (tag InfluxDB, MQTT, envoi HTTP)
+    "ingest_token": (str, ""),        # Jeton attendu des stations distantes (/api/v1/ingest), vide = désactivé
+    "push_enabled": (bool, False),    # Envoi des mesures vers une station centrale (voir meteo_stations.py)
+    "push_url": (str, ""),
+    "push_token": (str, ""),
+    "mqtt_ingest_client_id": (str, "meteopi-ingest"), # Session persistante de mqtt_ingest.py
+    "ha_discovery_enabled": (bool, False), # Découverte Home Assistant (voir meteo_homeassistant.py)
+    "ha_discovery_prefix": (str, "homeassistant"),
+    "ha_state_topic": (str, "meteopi"),
+    "metrics_port": (int, 0),      # Écoute Prometheus du processus des capteurs, 0 = désactivée (voir meteo_metrics.py)
+    "metrics_token": (str, ""),    # Jeton exigé par /metrics du serveur web, vide = accès libre
+    "profiling_enabled": (bool, False),    # Profilage des requêtes web (voir meteo_profiler.py)
+    "profiling_sample_rate": (float, 0.05), # Fraction des requêtes profilées au hasard
+    # Étalonnage des capteurs (appliqué sans redémarrage par meteo_capteur.py)
+    "temp_offset": (float, -2.0),      # °C ajoutés à la température (compense l'échauffement du boîtier)
+    "humidity_offset": (float, 0.0),   # % ajoutés à l'humidité
+    "pressure_offset": (float, 0.0),   # hPa ajoutés à la pression
+    "rain_mm_per_tip": (float, 0.213), # Pluviomètre : 100ml d'eau (10mm) pour 47 basculements
+    "wind_speed_factor": (float, 5.6), # Anémomètre : km/h pour 1 Hz (test en voiture : 2.4 * 70/30)
+    # BME280 en mode forcé (voir bme280_driver.py)
+    "bme280_oversampling_temp": (int, 1),     # 1, 2, 4, 8 ou 16
+    "bme280_oversampling_hum": (int, 1),      # 0 (désactivée), 1, 2, 4, 8 ou 16
+    "bme280_oversampling_pressure": (int, 1), # 0 (désactivée), 1, 2, 4, 8 ou 16
+    "bme280_iir_filter": (int, 0),            # 0 (sans filtre), 2, 4, 8 ou 16
+}
+
+def _coerce(key, value, expected_type, default):
+    """Convertit une valeur vers le type attendu, ou retourne la valeur par défaut."""
+    if value is None:
+        return copy.deepcopy(default)
+    try:
+        if expected_type is list:
+            if not isinstance(value, list):
+                raise ValueError(value)
+            return value
+        if expected_type is bool:
+            if isinstance(value, str):
+                return value.strip().lower() in ("1", "true", "on", "yes", "oui")
+            return bool(value)
+        if expected_type is str:
+            return str(value)
+        if expected_type is int and isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return expected_type(value)
+    except (TypeError, ValueError):
+        print(f"⚠️ Configuration : valeur invalide pour '{key}' ({value!r}), utilisation de {default!r}.")
+        return copy.deepcopy(default)
+
+def _number(value):
+    """Vrai pour un nombre, ou une chaîne convertible par float() (comme dans AlertEngine)."""
+    if isinstance(value, bool) or value is None:
+        return False
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+def _validate_alert_rules(rules):
+    """
+    Conserve les règles d'alerte utilisables par le bot Telegram : une règle
+    incomplète ferait planter le bot au démarrage, une mesure inconnue ne se
+    déclencherait jamais. Les règles écartées sont signalées.
+    """
+    valid = []
+    names = set()
+    for index, rule in enumerate(rules):
+        problem = None
+        if not isinstance(rule, dict):
+            problem = "n'est pas un objet"
+        elif not isinstance(rule.get("name"), str) or not rule["name"].strip():
+            problem = "nom manquant"
+        elif rule["name"] in names:
+            problem = "nom déjà utilisé"
+        elif rule.get("metric") not in ALERT_METRICS:
+            problem = f"mesure inconnue {rule.get('metric')!r} (possibles : {', '.join(ALERT_METRICS)})"
+        elif rule.get("op", ">") not in ALERT_OPS:
+            problem = f"comparaison inconnue {rule.get('op')!r} (possibles : {' '.join(ALERT_OPS)})"
+        elif not _number(rule.get("threshold")):
+            problem = "seuil (threshold) manquant ou non numérique"
+        else:
+            for key in ("window", "hysteresis", "cooldown"):
+                if key in rule and (not _number(rule[key]) or float(rule[key]) < 0):
+                    problem = f"'{key}' doit être un nombre positif"
+                    break
+        if problem:
+            label = rule.get("name") if isinstance(rule, dict) else None
+            print(f"⚠️ Configuration : règle d'alerte n°{index + 1} ({label or '?'}) ignorée : {problem}.")
+            continue
+        names.add(rule["name"])
+        valid.append(rule)
+    return valid
+
+def validate_config(raw_config):
+    """
+    Valide une configuration brute selon SCHEMA.
+    Les clés absentes reçoivent leur valeur par défaut, les clés inconnues sont conservées.
+    """
+    validated = dict(raw_config) if isinstance(raw_config, dict) else {}
+    for key, (expected_type, default) in SCHEMA.items():
+        validated[key] = _coerce(key, validated.get(key), expected_type, default)
+    validated["alert_rules"] = _validate_alert_rules(validated["alert_rules"])
+    return validated
+
+def read_config(path=CONFIG_FILE):
+    """
+    Lit et valide config.json. Lève OSError ou ValueError (dont
+    json.JSONDecodeError) si le fichier est absent, illisible ou invalide.
+    """
+    with open(path, 'r') as f:
+        raw_config = json.load(f)
+    if not isinstance(raw_config, dict):
+        raise ValueError("la configuration doit être un objet JSON")
+    return validate_config(raw_config)
+
+def load_config(path=CONFIG_FILE):
+    """Charge et valide la configuration depuis config.json (valeurs par défaut si elle est illisible)."""
+    try:
+        return read_config(path)
+    except FileNotFoundError:
+        return validate_config({})
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Configuration {path} illisible ({e}), utilisation des valeurs par défaut.")
+        return validate_config({})
+
+def save_config(config_data, path=CONFIG_FILE):
+    """Sauvegarde la configuration de manière atomique (pas de fichier à moitié écrit)."""
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(config_data, f, indent=4)
+    os.replace(temp_path, path)
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        return None
+
+class ConfigWatcher:
+    """
+    Surveille config.json et diffuse les changements aux abonnés du processus.
+    Chaque processus (et chaque worker Gunicorn) possède son propre ConfigWatcher :
+    une modification faite par l'un est donc vue par tous les autres.
+    """
+
+    def __init__(self, path=CONFIG_FILE, interval=WATCH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.config = load_config(path)
+        self._signature = _file_signature(path)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self, key, default=None):
+        return self.config.get(key, default)
+
+    def subscribe(self, keys, callback):
+        """
+        Enregistre `callback(config, changed_keys)`, appelé quand l'une des `keys`
+        change (toutes les clés si `keys` vaut None).
+        """
+        self._subscribers.append((frozenset(keys) if keys is not None else None, callback))
+
+    def check(self):
+        """Relit le fichier s'il a changé et notifie les abonnés. Retourne les clés modifiées."""
+        with self._lock:
+            signature = _file_signature(self.path)
+            if signature == self._signature:
+                return set()
+            self._signature = signature
+            old_config = self.config
+            try:
+                new_config = read_config(self.path)
+            except (OSError, ValueError) as e:
+                # Faute de frappe ou fichier en cours d'écriture : la dernière configuration valide reste en place
+                print(f"⚠️ Configuration {self.path} illisible ({e}), la configuration actuelle est conservée.")
+                return set()
+            changed = {k for k in set(old_config) | set(new_config) if old_config.get(k) != new_config.get(k)}
+            self.config = new_config
+
+        if not changed:
+            return changed
+        print(f"🔄 Configuration modifiée : {', '.join(sorted(changed))}")
+        for keys, callback in self._subscribers:
+            if keys is None or keys & changed:
+                try:
+                    callback(new_config, changed)
+                except Exception as e:
+                    print(f"⚠️ Erreur lors de l'application de la configuration : {e}")
+        return changed
+
+    def start(self):
+        """Démarre la surveillance en arrière-plan (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Erreur de surveillance de la configuration : {e}")
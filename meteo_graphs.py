@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+#
+# Génération des graphiques Matplotlib du serveur web.
+# Ces fonctions sont exécutées dans les processus de rendu de render_pool.py :
+# un rendu lent n'occupe donc pas les threads Gunicorn qui servent les API
+# temps réel. Les tâches relisent les données via data_cache (fichiers mmap
+# partagés) plutôt que de recevoir un DataFrame sérialisé.
+#
+
+import base64
+import io
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use('Agg') # Pas d'affichage sur le serveur
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates # Formatage des dates sur l'axe X
+import numpy as np
+import pandas as pd
+
+from data_cache import load_dataframe, load_store_dataframe
+import meteo_metrics
+from meteo_wind import LABEL_ANGLES, SECTORS_16, SPEED_BINS, SPEED_LABELS
+
+def generate_hourly_graph_base64(input_df, filter_recent=True, title="Données météo agrégées par heure (48 dernières heures)"):
+    """Génère un graphique horaire à partir du DataFrame et le retourne en base64."""
+    if input_df.empty:
+        return None
+
+    df = input_df.copy()
+    if filter_recent:
+        # Filtrer les données des dernières 48 heures
+        forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
+        df = df[df['time'] > forty_eight_hours_ago]
+
+    if df.empty:
+        return None
+
+    df.set_index('time', inplace=True)
+
+    # Agréger les données par heure
+    # Moyenne pour la température et l'humidité, somme pour la pluie
+    df_hourly = df.resample('h').agg({'temp': 'mean', 'hum': 'mean', 'rain': 'sum'})
+    df_hourly.dropna(subset=['temp', 'hum'], how='all', inplace=True) # Supprimer les heures sans données
+
+    if df_hourly.empty:
+        return None
+
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+
+    ax1.set_xlabel("Heure")
+    ax1.set_ylabel("Temp (°C) / Humidité (%)")
+    # Utilisation de l'index datetime directement pour l'axe X
+    ax1.plot(df_hourly.index, df_hourly["temp"], marker="o", color="tab:red", label="Température (°C)")
+    ax1.plot(df_hourly.index, df_hourly["hum"], marker="o", color="tab:blue", label="Humidité (%)")
+    ax1.grid(True, linestyle='--', alpha=0.6)
+
+    # Formatage de l'axe X pour afficher uniquement l'heure et gérer l'espacement
+    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Hh'))
+    # Définir les localisateurs pour les ticks majeurs (toutes les 3 heures) et mineurs (toutes les heures)
+    # Cela aide à éviter la superposition des labels et à avoir une bonne granularité
+    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=3))
+    ax1.xaxis.set_minor_locator(mdates.HourLocator(interval=1))
+
+    # Axe Y de droite pour la Pluie
+    ax2 = ax1.twinx()
+    ax2.set_ylabel("Pluie (mm)", color="tab:green")
+    # Utilisation de l'index datetime directement pour l'axe X
+    # On spécifie la largeur des barres à 1/24 d'une journée (soit 1 heure) pour un affichage précis.
+    # L'alignement 'edge' place la barre à droite de son point de données, ce qui est plus intuitif pour une somme horaire.
+    ax2.bar(df_hourly.index, df_hourly["rain"], width=1/24, color="tab:green", alpha=0.6, label="Pluie (mm)", align='edge')
+    ax2.tick_params(axis='y', labelcolor="tab:green")
+
+    fig.legend(loc="upper left", bbox_to_anchor=(0.1, 0.9))
+    plt.xticks(rotation=70, ha="right")
+    plt.title(title)
+    plt.tight_layout()
+
+    return _save_graph_to_base64(fig)
+
+# Couleurs des classes de vitesse de la rose des vents (voir SPEED_BINS dans meteo_wind.py)
+WIND_ROSE_COLORS = ['#d0e8f2', '#79c2e0', '#2b8cbe', '#31a354', '#fd8d3c', '#de2d26']
+
+def compute_wind_rose_histogram(df):
+    """
+    Répartit les mesures en 16 secteurs x classes de vitesse (calcul vectorisé numpy).
+    L'angle numérique est utilisé quand il existe ; les anciennes lignes
+    (libellé 8 directions seulement) sont placées au centre de leur secteur.
+    Retourne une matrice (16, nombre de classes) de comptes, ou None.
+    """
+    angles = pd.to_numeric(df['wind_dir_deg'], errors='coerce') if 'wind_dir_deg' in df.columns else pd.Series(np.nan, index=df.index)
+    angles = angles.fillna(df['wind_dir_str'].map(LABEL_ANGLES)).to_numpy(dtype=float)
+    speeds = pd.to_numeric(df['wind_speed'], errors='coerce').to_numpy(dtype=float)
+
+    valid = ~np.isnan(angles) & ~np.isnan(speeds)
+    if not valid.any():
+        return None
+    angles, speeds = angles[valid], speeds[valid]
+
+    n_classes = len(SPEED_LABELS)
+    sectors = (np.floor((angles % 360.0 + 11.25) / 22.5).astype(int)) % 16
+    classes = np.clip(np.digitize(speeds, SPEED_BINS) - 1, 0, n_classes - 1)
+    counts = np.bincount(sectors * n_classes + classes, minlength=16 * n_classes).reshape(16, n_classes)
+    return counts
+
+def generate_wind_rose_base64(counts, title='Fréquence des Directions du Vent'):
+    """
+    Génère une rose des vents (16 secteurs, empilée par classe de vitesse) à partir
+    d'une matrice de comptes et la retourne en base64.
+    """
+    counts = np.asarray(counts, dtype=float)
+    if counts.sum() == 0:
+        return None
+    histogram = counts * 100.0 / counts.sum()
+
+    theta = np.radians(np.arange(16) * 22.5)
+    width = np.radians(22.5) * 0.95
+
+    fig = plt.figure(figsize=(8, 8))
+    ax = fig.add_subplot(111, polar=True)
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(-1)
+
+    # Barres empilées : chaque classe de vitesse repose sur la précédente
+    bottom = np.zeros(16)
+    for i, label in enumerate(SPEED_LABELS):
+        ax.bar(theta, histogram[:, i], width=width, bottom=bottom, color=WIND_ROSE_COLORS[i], edgecolor='k', linewidth=0.3, label=label)
+        bottom += histogram[:, i]
+
+    # Configuration des labels pour les directions cardinales
+    ax.set_xticks(theta)
+    ax.set_xticklabels(SECTORS_16)
+    
+    # Positionne les labels de rayon (fréquence)
+    ax.set_rlabel_position(22.5)
+    ax.tick_params(axis='y', labelsize=10)
+    ax.yaxis.set_major_formatter(matplotlib.ticker.FuncFormatter(lambda v, _: f"{v:.0f}%"))
+    ax.set_title(title, pad=20, fontsize=16)
+    ax.legend(loc='lower left', bbox_to_anchor=(-0.1, -0.1), fontsize=9, title="Vitesse")
+    ax.grid(True, linestyle='--', alpha=0.6)
+
+    return _save_graph_to_base64(fig)
+
+def generate_wind_speed_graph_48h_base64(df):
+    """Génère un graphique de vitesse du vent sur 48h."""
+    df_wind = df.dropna(subset=['wind_speed', 'time']).copy()
+    
+    # Filtrer les données des dernières 48 heures
+    forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
+    df_wind = df_wind[df_wind['time'] > forty_eight_hours_ago]
+
+    if len(df_wind) < 2:
+        return None
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    
+    # Tracé de la vitesse moyenne (remplissage)
+    ax.plot(df_wind['time'], df_wind['wind_speed'], color='deepskyblue', label='Vent moyen', alpha=0.7)
+    ax.fill_between(df_wind['time'], df_wind['wind_speed'], color='deepskyblue', alpha=0.2)
+
+    # Tracé des rafales (points et ligne fine)
+    if 'wind_gust' in df_wind.columns:
+        ax.plot(df_wind['time'], df_wind['wind_gust'], color='orange', linestyle='None', marker='o', markersize=3, label='Rafales (pics 2s)')
+
+    # Ajout de la rafale max
+    max_speed = df_wind['wind_gust'].max() if 'wind_gust' in df_wind.columns else df_wind['wind_speed'].max()
+    if pd.notna(max_speed):
+        ax.axhline(y=max_speed, color='red', linestyle='--', alpha=0.5, label=f'Record période: {max_speed:.1f} km/h')
+
+    ax.set_xlabel("Heure")
+    ax.set_ylabel("Vitesse (km/h)")
+    ax.set_title("Vitesse du Vent (48 dernières heures)")
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    
+    # Formatage de l'axe X
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %Hh'))
+    ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
+    plt.xticks(rotation=45, ha="right")
+    fig.tight_layout()
+
+    return _save_graph_to_base64(fig)
+
+def generate_pressure_graph_base64(df):
+    """Génère un graphique de pression sur 48h avec tendance."""
+    df_pressure = df.dropna(subset=['pressure', 'time']).copy()
+    
+    # Filtrer les données des dernières 48 heures
+    forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
+    df_pressure = df_pressure[df_pressure['time'] > forty_eight_hours_ago]
+
+    if len(df_pressure) < 2:
+        return None
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(df_pressure['time'], df_pressure['pressure'], marker='.', linestyle='-', label='Pression mesurée', color='purple')
+
+    # Calcul et affichage de la ligne de tendance
+    x_numeric = mdates.date2num(df_pressure['time'])
+    z = np.polyfit(x_numeric, df_pressure['pressure'], 1)
+    p = np.poly1d(z)
+    ax.plot(df_pressure['time'], p(x_numeric), "r--", label='Tendance', alpha=0.8)
+
+    ax.set_xlabel("Heure")
+    ax.set_ylabel("Pression (hPa)")
+    ax.set_title("Pression Atmosphérique (48 dernières heures)")
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    
+    # Formatage de l'axe X
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %Hh'))
+    ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
+    plt.xticks(rotation=45, ha="right")
+    fig.tight_layout()
+
+    return _save_graph_to_base64(fig)
+
+def generate_rain_accumulation_graph_base64(df):
+    """Génère un histogramme du cumul de pluie journalier sur les 7 derniers jours."""
+    df_rain = df.dropna(subset=['rain', 'time']).copy()
+    df_rain.set_index('time', inplace=True)
+
+    # Agréger la pluie par jour
+    daily_rain = df_rain['rain'].resample('D').sum()
+    
+    # Garder uniquement les 7 derniers jours
+    daily_rain = daily_rain.tail(7)
+
+    if daily_rain.empty:
+        return None
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    bars = ax.bar(daily_rain.index, daily_rain.values, color='mediumseagreen')
+
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Cumul de Pluie (mm)")
+    ax.set_title("Cumul de Pluie Journalier (7 derniers jours)")
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Formatage de l'axe X pour afficher "Jour/Mois"
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    plt.xticks(rotation=0, ha="center")
+    fig.tight_layout()
+
+    return _save_graph_to_base64(fig)
+
+def generate_stats_graph_base64(stats):
+    """Génère un graphique en barres pour les températures Min/Max (jour, semaine, mois)."""
+    labels = ['Aujourd\'hui', 'Semaine', 'Mois']
+    
+    # On essaie de convertir les stats en float, en ignorant les 'N/A'
+    try:
+        mins = [float(stats['day'][0]), float(stats['week'][0]), float(stats['month'][0])]
+        maxs = [float(stats['day'][1]), float(stats['week'][1]), float(stats['month'][1])]
+    except (ValueError, TypeError):
+        # Si une valeur est 'N/A', on ne génère pas le graphique
+        return None
+
+    x = range(len(labels))  # positions des labels
+    width = 0.35  # largeur des barres
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    rects1 = ax.bar([i - width/2 for i in x], mins, width, label='Min', color='royalblue')
+    rects2 = ax.bar([i + width/2 for i in x], maxs, width, label='Max', color='crimson')
+
+    # Ajout des labels, titre et legendes
+    ax.set_ylabel('Température (°C)')
+    ax.set_title('Écarts de Température (Min/Max)')
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Ajout des valeurs au-dessus des barres
+    for rect in rects1 + rects2:
+        height = rect.get_height()
+        ax.annotate(f'{height:.1f}',
+                    xy=(rect.get_x() + rect.get_width() / 2, height),
+                    xytext=(0, 3),  # 3 points de décalage vertical
+                    textcoords="offset points",
+                    ha='center', va='bottom')
+
+    fig.tight_layout()
+    return _save_graph_to_base64(fig)
+
+def generate_wind_graph_base64(df):
+    """Génère un graphique de la vitesse du vent sur les 6 dernières heures."""
+    df_wind = df.dropna(subset=['wind_speed', 'time']).copy()
+    
+    # Filtrer les données des dernières 6 heures
+    six_hours_ago = datetime.now() - timedelta(hours=6)
+    df_wind = df_wind[df_wind['time'] > six_hours_ago]
+
+    if df_wind.empty:
+        return None
+
+    fig, ax = plt.subplots(figsize=(8, 4))
+    
+    # Tracé de la vitesse
+    ax.plot(df_wind['time'], df_wind['wind_speed'], color='tab:blue', linewidth=2, label='Moyenne (1 min)')
+    ax.fill_between(df_wind['time'], df_wind['wind_speed'], color='tab:blue', alpha=0.2)
+
+    # Tracé des rafales si disponibles
+    if 'wind_gust' in df_wind.columns:
+        ax.plot(df_wind['time'], df_wind['wind_gust'], color='orange', linestyle='None', marker='.', markersize=4, label='Rafales (3 sec)')
+        # Ajout d'une ligne pour le record sur la période
+        max_gust = df_wind['wind_gust'].max()
+        if pd.notna(max_gust):
+            ax.axhline(y=max_gust, color='red', linestyle='--', alpha=0.3, label=f'Max: {max_gust:.1f} km/h')
+
+    ax.set_ylabel("Vitesse (km/h)")
+    ax.set_title("Vent (6 dernières heures)")
+    ax.legend()
+    ax.grid(True, linestyle='--', alpha=0.6)
+    
+    # Formatage de l'axe X
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    plt.xticks(rotation=0, ha="center")
+    
+    fig.tight_layout()
+
+    return _save_graph_to_base64(fig)
+
+def _save_graph_to_base64(fig):
+    img = io.BytesIO()
+    fig.savefig(img, format="png")
+    plt.close(fig)
+    img.seek(0)
+    graph_url = base64.b64encode(img.getvalue()).decode('utf8')
+    return f"data:image/png;base64,{graph_url}"
+
+# ---- Tâches de rendu (appelées par render_pool.render) ----
+
+def _task_hourly():
+    return generate_hourly_graph_base64(load_dataframe())
+
+def _task_daily(date_str, from_store=False):
+    target_date = datetime.strptime(date_str, '%Y-%m-%d')
+    start_day = target_date.replace(hour=0, minute=0, second=0)
+    end_day = target_date.replace(hour=23, minute=59, second=59)
+    if from_store:
+        # Lecture de la seule journée dans l'index de la base SQLite
+        df_day = load_store_dataframe(start_day, start_day + timedelta(days=1))
+    else:
+        df = load_dataframe()
+        df_day = df[(df['time'] >= start_day) & (df['time'] <= end_day)]
+    if df_day.empty:
+        return None
+    return generate_hourly_graph_base64(df_day, filter_recent=False, title=f"Données horaires du {date_str}")
+
+def _task_wind_6h():
+    return generate_wind_graph_base64(load_dataframe())
+
+def _task_wind_speed_48h():
+    return generate_wind_speed_graph_48h_base64(load_dataframe())
+
+def _task_pressure():
+    return generate_pressure_graph_base64(load_dataframe())
+
+def _task_rain_accumulation():
+    return generate_rain_accumulation_graph_base64(load_dataframe())
+
+def _task_wind_rose(counts, title):
+    return generate_wind_rose_base64(counts, title=title)
+
+def _task_compare(date_str, series):
+    """
+    Comparaison de stations sur une journée. `series` : {station: [(heure
+    'AAAA-MM-JJ HH', température, pression, pluie), ...]}, agrégats déjà
+    calculés par le serveur web (quelques dizaines de points par station).
+    """
+    if not any(series.values()):
+        return None
+    fig, (ax_temp, ax_pressure, ax_rain) = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
+    for station, points in sorted(series.items()):
+        if not points:
+            continue
+        hours = [datetime.strptime(point[0], '%Y-%m-%d %H') for point in points]
+        values = np.array([point[1:] for point in points], dtype=float) # None -> NaN (heure sans mesure)
+        ax_temp.plot(hours, values[:, 0], marker='.', label=station)
+        ax_pressure.plot(hours, values[:, 1], marker='.', label=station)
+        ax_rain.plot(hours, np.nancumsum(values[:, 2]), label=station)
+    ax_temp.set_ylabel("Température (°C)")
+    ax_pressure.set_ylabel("Pression (hPa)")
+    ax_rain.set_ylabel("Pluie cumulée (mm)")
+    ax_temp.set_title(f"Comparaison des stations ({date_str})")
+    for ax in (ax_temp, ax_pressure, ax_rain):
+        ax.legend()
+        ax.grid(True, linestyle='--', alpha=0.7)
+    ax_rain.xaxis.set_major_formatter(mdates.DateFormatter('%Hh'))
+    ax_rain.set_xlabel("Heure")
+    fig.tight_layout()
+    return _save_graph_to_base64(fig)
+
+TASKS = {
+    "hourly": _task_hourly,
+    "daily": _task_daily,
+    "wind_6h": _task_wind_6h,
+    "wind_speed_48h": _task_wind_speed_48h,
+    "pressure": _task_pressure,
+    "rain_accumulation": _task_rain_accumulation,
+    "wind_rose": _task_wind_rose,
+    "compare": _task_compare,
+}
+
+def run_task(name, *args):
+    """Exécute une tâche de rendu et retourne l'image en base64 (ou None)."""
+    try:
+        with meteo_metrics.timer("meteo_graph_generate_seconds", task=name):
+            return TASKS[name](*args)
+    finally:
+        plt.close('all') # Une figure oubliée ne doit pas s'accumuler dans un processus longue durée
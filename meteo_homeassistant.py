@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Intégration Home Assistant par MQTT (option "ha_discovery_enabled").
+#
+# - Découverte automatique : un message de configuration conservé (retain)
+#   par capteur sous <ha_discovery_prefix>/sensor/<station_id>/<clé>/config.
+# - Un topic d'état conservé par capteur (<ha_state_topic>/<station_id>/<clé>),
+#   publié seulement quand la valeur varie de plus que sa zone morte
+#   (HA_SENSORS), ou toutes les HA_REFRESH_INTERVAL secondes au plus tard.
+# - Disponibilité : <ha_state_topic>/<station_id>/status vaut "online", ou
+#   "offline" (dernière volonté MQTT) quand le capteur se déconnecte.
+#
+# Le message JSON complet publié chaque minute sur mqtt_topic reste envoyé
+# (battement de cœur et compatibilité avec les abonnés existants).
+#
+
+import json
+import threading
+import time
+
+HA_REFRESH_INTERVAL = 900 # Republication d'un état inchangé (secondes)
+
+# Clé du message MQTT -> (nom, unité, device_class, state_class, zone morte).
+# Zone morte None : publication à chaque changement (valeurs textuelles).
+HA_SENSORS = {
+    "temperature": ("Température", "°C", "temperature", "measurement", 0.1),
+    "humidity": ("Humidité", "%", "humidity", "measurement", 1.0),
+    "pressure": ("Pression", "hPa", "atmospheric_pressure", "measurement", 0.2),
+    "daily_rain": ("Pluie du jour", "mm", "precipitation", "total_increasing", 0.1),
+    "rain_24h": ("Pluie sur 24h", "mm", "precipitation", "measurement", 0.1),
+    "wind_speed": ("Vent", "km/h", "wind_speed", "measurement", 1.0),
+    "wind_gust": ("Rafale", "km/h", "wind_speed", "measurement", 1.0),
+    "wind_mean_10min": ("Vent moyen 10 min", "km/h", "wind_speed", "measurement", 1.0),
+    "wind_direction_deg": ("Direction du vent", "°", None, "measurement", 10.0),
+    "wind_direction": ("Secteur du vent", None, None, None, None),
+    "pressure_change_3h": ("Tendance de la pression (3h)", "hPa", None, "measurement", 0.1),
+}
+
+def state_base(config):
+    return f"{config.get('ha_state_topic', 'meteopi')}/{config.get('station_id', 'meteopi_1')}"
+
+def availability_topic(config):
+    return f"{state_base(config)}/status"
+
+def discovery_messages(config):
+    """Messages de découverte (topic, charge JSON) de tous les capteurs."""
+    station_id = config.get("station_id", "meteopi_1")
+    device = {"identifiers": [station_id], "name": f"Station météo {station_id}", "manufacturer": "MeteoPi", "model": "Raspberry Pi"}
+    messages = []
+    for key, (name, unit, device_class, state_class, _) in HA_SENSORS.items():
+        payload = {
+            "name": name,
+            "unique_id": f"{station_id}_{key}",
+            "state_topic": f"{state_base(config)}/{key}",
+            "availability_topic": availability_topic(config),
+            "device": device,
+        }
+        if unit:
+            payload["unit_of_measurement"] = unit
+        if device_class:
+            payload["device_class"] = device_class
+        if state_class:
+            payload["state_class"] = state_class
+        messages.append((f"{config.get('ha_discovery_prefix', 'homeassistant')}/sensor/{station_id}/{key}/config", json.dumps(payload)))
+    return messages
+
+class StateFilter:
+    """Dernières valeurs publiées par capteur, pour n'envoyer que les variations significatives."""
+
+    def __init__(self):
+        self.published = {} # Clé -> (valeur, horodatage de publication)
+        self.lock = threading.Lock()
+
+    def changes(self, values, now=None):
+        """Valeurs de `values` à publier : [(clé, valeur), ...]. Rien n'est mémorisé avant commit()."""
+        now = time.time() if now is None else now
+        changes = []
+        with self.lock:
+            for key, (_, _, _, _, deadband) in HA_SENSORS.items():
+                value = values.get(key)
+                if value is None:
+                    continue
+                previous = self.published.get(key)
+                if previous is None or now - previous[1] >= HA_REFRESH_INTERVAL:
+                    changes.append((key, value))
+                elif deadband is None:
+                    if value != previous[0]:
+                        changes.append((key, value))
+                elif round(abs(value - previous[0]), 6) >= deadband: # Arrondi : 10.2 - 10.1 = 0.0999...
+                    changes.append((key, value))
+        return changes
+
+    def commit(self, key, value, now=None):
+        with self.lock:
+            self.published[key] = (value, time.time() if now is None else now)
+
+    def reset(self):
+        """Tout republier (reconnexion, broker redémarré sans persistance)."""
+        with self.lock:
+            self.published.clear()
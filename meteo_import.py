@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+#
+# Import en masse d'historiques CSV : sauvegardes du NAS (backup_samba.sh),
+# export d'une autre station, fichiers qui se chevauchent...
+#
+# 1. Chaque fichier est découpé en blocs (~4 Mo, alignés sur les fins de
+#    ligne) analysés en parallèle par un pool de processus. Chaque bloc donne
+#    un "run" trié par horodatage, écrit dans un fichier temporaire.
+# 2. Les runs sont fusionnés en flux (heapq.merge) : la mémoire utilisée ne
+#    dépend pas de la taille des fichiers.
+# 3. Les mesures de même horodatage sont dédoublonnées selon la politique
+#    choisie (CONFLICT_POLICIES).
+# 4. Le résultat est écrit en masse dans le stockage actif : meteo_log.csv
+#    (remplacé de façon atomique) ou la base SQLite (meteo_store.py). Avec
+#    SQLite, meteo_log.csv est aussi fusionné : l'accueil et les graphiques
+#    le lisent.
+#
+# Les lignes du journal existant sont recopiées telles quelles (texte
+# d'origine) et celles qui ne s'analysent pas sont conservées à leur place :
+# une fusion ne réécrit ni ne supprime l'historique.
+#
+# Utilisation :
+#   python meteo_import.py [--policy first|last|most_complete] [--replace] fichier1.csv [fichier2.csv ...]
+#
+
+import argparse
+import csv
+import fcntl
+import heapq
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from meteo_config import load_config
+from meteo_stats import CSV_HEADERS
+from meteo_store import IMPORT_BATCH, MeteoStore, format_csv_value, normalize_row
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+IMPORT_STATUS_FILE = os.path.join(DATA_DIR, "import_status.json") # Affiché sur la page d'administration
+LOCK_FILE = os.path.join(DATA_DIR, ".import.lock")
+
+CHUNK_SIZE = 4 * 1024 * 1024  # Taille des blocs analysés par chaque processus
+RUN_BATCH = 10000             # Lignes par enregistrement pickle dans un run
+MAX_SAMPLES = 10              # Lignes rejetées conservées pour le rapport
+
+# Politique en cas de doublon (même horodatage)
+CONFLICT_POLICIES = {
+    "first": "Conserver la mesure existante (ou celle du premier fichier)",
+    "last": "Conserver la mesure du dernier fichier importé",
+    "most_complete": "Conserver la mesure la plus complète (le moins de valeurs manquantes)",
+}
+
+class ImportInProgress(RuntimeError):
+    """Un autre import (interface web ou ligne de commande) est en cours."""
+
+# --- Étape 1 : analyse parallèle ---
+
+def split_file(path, chunk_size=CHUNK_SIZE):
+    """Découpe un fichier en plages d'octets (début, fin) alignées sur les fins de ligne."""
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline() # Avance jusqu'à la fin de la ligne en cours
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _parse_chunk(path, start, end, source, run_dir, existing=False):
+    """
+    Analyse un bloc (exécuté dans un processus du pool) et écrit ses mesures
+    triées dans un run temporaire. Retourne les compteurs du bloc.
+
+    Chaque entrée du run est (horodatage, ligne normalisée, texte d'origine).
+    Pour le journal existant (`existing`), le texte d'origine est conservé et
+    une ligne illisible est gardée (ligne normalisée None) sous l'horodatage
+    de la mesure valide qui la précède, ou à défaut de celle qui la suit.
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.replace(b'\x00', b'').decode('utf-8', errors='replace').splitlines()
+
+    entries = []
+    rejected = 0
+    kept = 0
+    samples = []
+    for line in lines:
+        fields = next(csv.reader([line]), [])
+        if not fields or not any(field.strip() for field in fields) or fields[0] == "time":
+            continue # Ligne vide ou en-tête
+        row = normalize_row(fields)
+        if row is None and not existing:
+            rejected += 1
+            if len(samples) < MAX_SAMPLES:
+                samples.append(f"{os.path.basename(path)} : {line[:120]}")
+            continue
+        kept += row is None
+        entries.append([row[0] if row is not None else None, row, line if existing else None])
+
+    if kept:
+        previous = None
+        for entry in entries:
+            if entry[1] is not None:
+                previous = entry[0]
+            elif previous is not None:
+                entry[0] = previous
+        following = ""
+        for entry in reversed(entries):
+            if entry[1] is not None:
+                following = entry[0]
+            elif entry[0] is None:
+                entry[0] = following
+    entries.sort(key=lambda entry: entry[0]) # Tri stable : l'ordre du fichier départage les doublons
+
+    run_path = os.path.join(run_dir, f"run_{source:03d}_{start:012d}.pkl")
+    with open(run_path, 'wb') as f:
+        for i in range(0, len(entries), RUN_BATCH):
+            pickle.dump([tuple(entry) for entry in entries[i:i + RUN_BATCH]], f, protocol=pickle.HIGHEST_PROTOCOL)
+    return {"run": run_path, "source": source, "start": start, "rows": len(entries) - kept, "rejected": rejected,
+            "kept_unparsed": kept, "samples": samples, "bytes": end - start}
+
+# --- Étape 2 et 3 : fusion et dédoublonnage ---
+
+def _iter_run(run):
+    """Mesures d'un run : (horodatage, source, bloc, rang, ligne, texte), ordre total sans comparer les lignes."""
+    index = 0
+    with open(run["run"], 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            for key, row, raw in batch:
+                yield (key, run["source"], run["start"], index, row, raw)
+                index += 1
+
+def _completeness(row):
+    return sum(value is not None and value != "" for value in row)
+
+def merge_runs(runs, policy, stats):
+    """
+    Fusionne les runs triés et résout les doublons. Génère les couples
+    (ligne normalisée, texte d'origine ou None) dans l'ordre chronologique ;
+    les lignes illisibles conservées (ligne None) suivent leur horodatage.
+    """
+    group = []
+    for item in heapq.merge(*(_iter_run(run) for run in runs)):
+        if group and item[0] != group[0][0]:
+            yield from _flush(group, policy, stats)
+            group = []
+        group.append(item)
+    if group:
+        yield from _flush(group, policy, stats)
+
+def _flush(group, policy, stats):
+    """Mesure retenue d'un horodatage, entourée des lignes illisibles conservées dans leur ordre du fichier."""
+    measures = [item for item in group if item[4] is not None]
+    for item in group:
+        if item[4] is None:
+            yield None, item[5]
+        elif item is measures[0]:
+            yield _resolve(measures, policy, stats)
+
+def _resolve(group, policy, stats):
+    if len(group) == 1:
+        winner = group[0]
+    else:
+        stats["duplicates"] += len(group) - 1
+        if policy == "last":
+            winner = group[-1]
+        elif policy == "most_complete":
+            winner = max(group, key=lambda item: _completeness(item[4])) # À égalité, max() garde la première
+        else:
+            winner = group[0]
+    return winner[4], winner[5]
+
+# --- Étape 4 : écriture ---
+
+def _write_csv(rows, destination, snapshot_size, stats, report):
+    """
+    Écrit les lignes fusionnées dans un fichier temporaire puis remplace le
+    CSV. Les lignes ajoutées par le capteur pendant l'import (au-delà de
+    `snapshot_size`) sont recopiées à la fin avant le remplacement.
+    """
+    temp_path = destination + ".import.tmp"
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        for row, raw in rows:
+            if raw is not None:
+                f.write(raw + writer.dialect.lineterminator) # Ligne existante recopiée telle quelle
+            else:
+                writer.writerow([format_csv_value(value) for value in row])
+            stats["written"] += 1
+            if stats["written"] % 100000 == 0:
+                report("write")
+
+    try:
+        original = open(destination, 'rb')
+    except FileNotFoundError:
+        os.replace(temp_path, destination)
+        return
+    with original:
+        fcntl.flock(original, fcntl.LOCK_EX) # Le capteur attend (voir csv_repair.locked_append)
+        original.seek(snapshot_size)
+        appended = original.read()
+        if appended:
+            with open(temp_path, 'ab') as f:
+                f.write(appended if appended.endswith(b'\n') else appended + b'\n')
+        shutil.copymode(destination, temp_path)
+        os.replace(temp_path, destination)
+
+def _write_store(rows, store, policy, replace, stats, report):
+    """Écriture par lots dans la base SQLite, les conflits avec l'existant étant résolus en SQL."""
+    if replace:
+        store.clear()
+    batch = []
+    for row, _ in rows:
+        if row is None:
+            continue # Ligne illisible du CSV : rien à écrire en base
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH:
+            stats["written"] += store.bulk_write(batch, policy)
+            batch = []
+            report("write")
+    if batch:
+        stats["written"] += store.bulk_write(batch, policy)
+
+# --- Pilotage ---
+
+def write_status(status):
+    try:
+        temp_path = IMPORT_STATUS_FILE + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(status, f)
+        os.replace(temp_path, IMPORT_STATUS_FILE)
+    except OSError as e:
+        print(f"⚠️ Écriture de l'état de l'import impossible : {e}")
+
+def import_running():
+    """Vrai si un import tient le verrou (vérification avant d'en lancer un en arrière-plan)."""
+    try:
+        with open(LOCK_FILE, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    return False
+
+def read_status():
+    try:
+        with open(IMPORT_STATUS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def run_import(paths, policy="first", replace=False, backend=None, workers=None, verbose=True):
+    """
+    Importe les fichiers `paths` dans le stockage actif (`backend` : "csv" ou
+    "sqlite", lu dans config.json par défaut). Sans `replace`, les mesures
+    existantes sont conservées et fusionnées avec les fichiers importés.
+    Avec "sqlite", meteo_log.csv est fusionné (ou remplacé) de la même façon.
+    Retourne le rapport (dict), également écrit dans data/import_status.json.
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Politique de doublons inconnue : {policy}")
+    backend = backend or load_config().get("storage_backend", "csv")
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    lock = open(LOCK_FILE, 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        raise ImportInProgress("Un import est déjà en cours.")
+
+    started = time.time()
+    stats = {"state": "running", "phase": "parse", "files": [os.path.basename(p) for p in paths], "policy": policy,
+             "backend": backend, "replace": replace, "started": started, "rows_read": 0, "rejected": 0,
+             "samples": [], "kept_unparsed": 0, "duplicates": 0, "written": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+
+    def report(phase):
+        stats["phase"] = phase
+        stats["seconds"] = round(time.time() - started, 1)
+        stats["rows_per_sec"] = round(max(stats["rows_read"], stats["written"]) / max(stats["seconds"], 0.001))
+        write_status(stats)
+        if verbose:
+            print(f"\r  [{phase}] {stats['rows_read']} lues, {stats['rejected']} rejetées, {stats['written']} écrites ({stats['rows_per_sec']} lignes/s)", end="", flush=True)
+
+    run_dir = tempfile.mkdtemp(prefix="meteo_import_", dir=DATA_DIR)
+    try:
+        # L'existant est la source prioritaire ("first") lors d'une fusion dans le CSV
+        sources = list(paths)
+        # Taille du journal au départ : ce qui est ajouté ensuite par le capteur est recopié (même avec `replace`)
+        snapshot_size = os.path.getsize(CSV_FILE) if os.path.exists(CSV_FILE) else 0
+        merge_existing = not replace and os.path.exists(CSV_FILE)
+        if merge_existing:
+            sources.insert(0, CSV_FILE)
+
+        tasks = [(path, start, end, source) for source, path in enumerate(sources) for start, end in split_file(path)]
+        runs = []
+        report("parse")
+        # "spawn" : le serveur web est multi-thread, on ne duplique pas le processus par fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_parse_chunk, path, start, end, source, run_dir, existing=merge_existing and source == 0)
+                       for path, start, end, source in tasks]
+            for future in futures:
+                run = future.result()
+                runs.append(run)
+                stats["rows_read"] += run["rows"] + run["rejected"] + run["kept_unparsed"]
+                stats["rejected"] += run["rejected"]
+                stats["kept_unparsed"] += run["kept_unparsed"]
+                stats["samples"] = (stats["samples"] + run["samples"])[:MAX_SAMPLES]
+                report("parse")
+
+        report("merge")
+        if backend == "sqlite":
+            # La base résout en SQL les conflits avec son contenu : seuls les fichiers importés y sont fusionnés
+            imported = [run for run in runs if not (merge_existing and run["source"] == 0)]
+            _write_store(merge_runs(imported, policy, stats), MeteoStore(), policy, replace, stats, report)
+            # Puis le CSV, lu par l'accueil et les graphiques (compteurs de cette passe non cumulés)
+            report("write_csv")
+            _write_csv(merge_runs(runs, policy, {"duplicates": 0}), CSV_FILE, snapshot_size, {"written": 0}, report)
+        else:
+            _write_csv(merge_runs(runs, policy, stats), CSV_FILE, snapshot_size, stats, report)
+        stats["state"] = "done"
+        report("done")
+    except Exception as e:
+        stats["state"] = "error"
+        stats["error"] = str(e)
+        report("error")
+        raise
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        lock.close()
+        if verbose:
+            print()
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import en masse de fichiers CSV de mesures")
+    parser.add_argument("files", nargs="+", help="Fichiers CSV à importer (7, 8 ou 10 colonnes)")
+    parser.add_argument("--policy", choices=sorted(CONFLICT_POLICIES), default="first", help="Résolution des doublons (défaut : first)")
+    parser.add_argument("--replace", action="store_true", help="Remplace les données existantes au lieu de fusionner")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], help="Stockage cible (défaut : storage_backend de config.json)")
+    parser.add_argument("--workers", type=int, help="Nombre de processus d'analyse (défaut : nombre de cœurs)")
+    args = parser.parse_args()
+
+    print(f"--- Import de {len(args.files)} fichier(s) ---")
+    try:
+        result = run_import(args.files, args.policy, args.replace, args.backend, args.workers)
+    except (ImportInProgress, ValueError) as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    print(f"✅ Import terminé en {result['seconds']} s ({result['rows_per_sec']} lignes/s)")
+    print(f"- Lignes lues : {result['rows_read']}")
+    print(f"- Lignes rejetées : {result['rejected']}")
+    if result["kept_unparsed"]:
+        print(f"- Lignes illisibles du journal existant conservées : {result['kept_unparsed']}")
+    for sample in result["samples"]:
+        print(f"    {sample}")
+    print(f"- Doublons résolus ({result['policy']}) : {result['duplicates']}")
+    print(f"- Mesures écrites : {result['written']}")
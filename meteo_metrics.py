@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+#
+# Métriques internes au format texte Prometheus / OpenMetrics.
+#
+# Chaque processus (capteurs, workers Gunicorn, processus de rendu) garde ses
+# compteurs et histogrammes en mémoire et les recopie toutes les DUMP_INTERVAL
+# secondes dans METRICS_DIR (un fichier JSON par processus, en mémoire vive
+# sur le Raspberry Pi : /dev/shm). La route /metrics du serveur web assemble
+# ces fichiers : une seule cible Prometheus suffit pour toute la station.
+# Chaque série porte les étiquettes process et pid du processus qui l'a produite.
+#
+# Le processus des capteurs peut aussi répondre directement sur le port
+# "metrics_port" (0 = désactivé), par exemple quand le serveur web tourne
+# sur une autre machine.
+#
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+METRICS_DIR = os.environ.get("METEO_METRICS_DIR") or (
+    "/dev/shm/meteopi-metrics" if os.path.isdir("/dev/shm") else os.path.join(DATA_DIR, "metrics"))
+DUMP_INTERVAL = 15.0   # Recopie des métriques du processus (secondes)
+STALE_AFTER = 120.0    # Fichier d'un processus ignoré s'il n'a pas été mis à jour depuis (secondes)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bornes communes des histogrammes de durée (secondes) : de la lecture I2C
+# (quelques ms) au rendu d'un graphique sur un Raspberry Pi Zero (dizaines de s).
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Catalogue : nom -> (type, description). Un nom absent du catalogue est une erreur.
+METRICS = {
+    # Processus (mis à jour à chaque recopie)
+    "meteo_threads": ("gauge", "Number of live threads in the process"),
+    "meteo_process_resident_bytes": ("gauge", "Resident memory of the process"),
+    "meteo_process_cpu_seconds_total": ("counter", "User and system CPU time of the process"),
+    # Boucles de mesure de meteo_capteur.py
+    "meteo_loop_duration_seconds": ("histogram", "Duration of one iteration of a sampling loop"),
+    "meteo_loop_lateness_seconds": ("histogram", "Delay between the scheduled and the actual start of a sampling loop"),
+    "meteo_loop_overruns_total": ("counter", "Sampling loop iterations longer than their period or started more than half a period late"),
+    "meteo_sensor_read_seconds": ("histogram", "Duration of a sensor read (I2C or DHT)"),
+    "meteo_sensor_read_errors_total": ("counter", "Failed sensor reads"),
+    "meteo_csv_append_seconds": ("histogram", "Duration of a CSV append, lock included"),
+    "meteo_publish_enqueue_seconds": ("histogram", "Duration of queueing a sample for network publication"),
+    "meteo_stage_seconds": ("histogram", "Time the sampling loop spent on a stage (bounded by the stage budget when supervised)"),
+    "meteo_stage_timeouts_total": ("counter", "Supervised stage calls abandoned after their budget or skipped while the stage was hung"),
+    "meteo_stage_failures_total": ("counter", "Supervised stage calls that raised an error"),
+    "meteo_driver_restarts_total": ("counter", "Sensor drivers recreated by the watchdog after a hang"),
+    "meteo_i2c_busy_seconds_total": ("counter", "Time the shared I2C bus was held, by device"),
+    "meteo_i2c_wait_seconds": ("histogram", "Time a device waited for the shared I2C bus"),
+    # Publication réseau (meteo_publisher.py)
+    "meteo_publish_drain_seconds": ("histogram", "Duration of one drain of a publication queue"),
+    "meteo_publish_messages_total": ("counter", "Messages handled by the publisher, by target and result"),
+    "meteo_publish_queue": ("gauge", "Messages waiting in a publication queue"),
+    # Serveur web et rendus
+    "meteo_http_request_seconds": ("histogram", "Duration of a web request, by Flask endpoint"),
+    "meteo_http_errors_total": ("counter", "Web responses with a 5xx status, by Flask endpoint"),
+    "meteo_render_seconds": ("histogram", "Wall time of a graph render seen by the web worker, queue included"),
+    "meteo_render_failures_total": ("counter", "Graph renders abandoned, by reason"),
+    "meteo_graph_generate_seconds": ("histogram", "Duration of a graph task inside the render process"),
+    "meteo_csv_load_seconds": ("histogram", "Duration of a full CSV parse (read_and_process_csv)"),
+}
+
+def _key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class Registry:
+    """Valeurs des métriques d'un processus (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {} # (nom, étiquettes) -> nombre, ou [comptes par borne..., +Inf, somme] pour un histogramme
+
+    def _check(self, name, kinds):
+        kind = METRICS[name][0]
+        if kind not in kinds:
+            raise ValueError(f"Métrique {name} de type {kind}")
+
+    def inc(self, name, amount=1.0, **labels):
+        self._check(name, ("counter",))
+        key = (name, _key(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, name, value, **labels):
+        """Fixe une jauge, ou un compteur tenu ailleurs (compteurs du publisher, temps CPU)."""
+        self._check(name, ("gauge", "counter"))
+        with self._lock:
+            self._values[(name, _key(labels))] = float(value)
+
+    def observe(self, name, value, **labels):
+        self._check(name, ("histogram",))
+        key = (name, _key(labels))
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            index = 0
+            while index < len(BUCKETS) and value > BUCKETS[index]:
+                index += 1
+            values[index] += 1
+            values[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mesure la durée du bloc, y compris quand il lève une exception."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Copie sérialisable en JSON : [[nom, {étiquettes}, valeur], ...]."""
+        with self._lock:
+            return [[name, dict(labels), list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self._values.items()]
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+set_value = REGISTRY.set
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+
+def update_process_metrics(registry=REGISTRY):
+    registry.set("meteo_threads", threading.active_count())
+    times = os.times()
+    registry.set("meteo_process_cpu_seconds_total", times.user + times.system)
+    try:
+        with open("/proc/self/statm") as f:
+            registry.set("meteo_process_resident_bytes", int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        pass
+
+# ---- Format texte ----
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for name, value in sorted(labels.items()))
+    return "{" + ",".join(escaped) + "}"
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def render(sources):
+    """
+    Texte d'exposition Prometheus. `sources` : [(snapshot, étiquettes du
+    processus), ...]. Les métriques inconnues (fichier d'une version plus
+    ancienne ou plus récente) sont ignorées.
+    """
+    series = {}
+    for snapshot, process_labels in sources:
+        for name, labels, value in snapshot:
+            if name in METRICS:
+                series.setdefault(name, []).append(({**labels, **process_labels}, value))
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        if name not in series:
+            continue
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series[name]:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': str(bound)})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+# ---- Recopie et collecte entre processus ----
+
+_role = None
+_started_pid = None
+_start_lock = threading.Lock()
+
+def _process_labels():
+    return {"process": _role or "unknown", "pid": str(os.getpid())}
+
+def _dump_path(pid=None):
+    return os.path.join(METRICS_DIR, f"{_role}-{pid or os.getpid()}.json")
+
+def dump():
+    """Écrit les métriques du processus dans METRICS_DIR (écriture atomique)."""
+    update_process_metrics()
+    path = _dump_path()
+    temp_path = path + ".tmp"
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        with open(temp_path, 'w') as f:
+            json.dump({"process": _role, "pid": os.getpid(), "updated": time.time(), "metrics": REGISTRY.snapshot()}, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"⚠️ Écriture des métriques impossible : {e}")
+
+def _remove_dump():
+    try:
+        os.remove(_dump_path())
+    except OSError:
+        pass
+
+def _dump_loop():
+    while True:
+        time.sleep(DUMP_INTERVAL)
+        dump()
+
+def start(role):
+    """
+    Active la recopie périodique des métriques du processus (idempotent).
+    Vérifie le pid : un worker Gunicorn issu d'un fork relance sa propre recopie.
+    """
+    global _role, _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _role = role
+        _started_pid = os.getpid()
+    dump()
+    atexit.register(_remove_dump)
+    threading.Thread(target=_dump_loop, name="metrics-dump", daemon=True).start()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect():
+    """Texte d'exposition de tous les processus de la station (route /metrics)."""
+    update_process_metrics()
+    sources = [(REGISTRY.snapshot(), _process_labels())]
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    now = time.time()
+    for name in sorted(names):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(METRICS_DIR, name)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            pid = int(data["pid"])
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        if pid == os.getpid():
+            continue
+        if not _pid_alive(pid):
+            # Processus arrêté sans nettoyage (kill -9, coupure) : ses séries disparaissent
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        if now - data.get("updated", 0) > STALE_AFTER:
+            continue
+        sources.append((data.get("metrics", []), {"process": str(data.get("process")), "pid": str(pid)}))
+    return render(sources)
+
+# ---- Écoute HTTP (processus des capteurs) ----
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        update_process_metrics()
+        body = render([(REGISTRY.snapshot(), _process_labels())]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Une ligne de journal par collecte Prometheus serait du bruit
+
+_server = None
+_server_lock = threading.Lock()
+
+def serve(port):
+    """(Re)démarre l'écoute HTTP sur `port` (toutes interfaces), ou l'arrête si port vaut 0."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            if _server.server_address[1] == port:
+                return
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+        if not port:
+            return
+        try:
+            _server = ThreadingHTTPServer(("", port), _MetricsHandler)
+        except OSError as e:
+            print(f"⚠️ Écoute des métriques sur le port {port} impossible : {e}")
+            return
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"📈 Métriques disponibles sur http://<station>:{port}/metrics")
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# Profilage des requêtes du serveur web (mode activé depuis /admin).
+#
+# Une requête profilée est mesurée de deux façons dans son propre thread :
+# - cProfile : temps propre et cumulé de chaque fonction (points chauds) ;
+# - un échantillonneur qui relève la pile du thread toutes les
+#   SAMPLE_INTERVAL secondes : piles "repliées" (une ligne "a;b;c N" par pile),
+#   lisibles par flamegraph.pl ou speedscope.
+# Un graphique étant rendu dans un processus de render_pool.py, le rendu
+# demandé par une requête profilée est profilé dans ce processus et ajouté
+# au profil de la requête (partie "render:<tâche>").
+#
+# Les profils sont enregistrés dans data/profiles/ (anneau de PROFILE_RING
+# fichiers, les plus anciens sont supprimés).
+#
+
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROFILE_RING = 50         # Profils conservés sur disque
+TOP_N = 30                # Points chauds retenus par classement
+SAMPLE_INTERVAL = 0.005   # Période de l'échantillonneur de pile (secondes)
+MAX_STACK_DEPTH = 80      # Cadres relevés par échantillon (les plus proches de la racine sont tronqués)
+MAX_STACKS = 500          # Piles distinctes conservées par partie (les plus fréquentes)
+PROFILE_ID_REGEX = re.compile(r'^\d+-\d+-\d+$')
+
+_capture_lock = threading.Lock() # Une seule capture à la fois par processus
+_local = threading.local()
+_sequence = itertools.count()
+
+def _short_path(filename):
+    """Chemin relatif au projet, ou à partir du paquet pour les bibliothèques."""
+    if filename.startswith(PROJECT_DIR + os.sep):
+        return os.path.relpath(filename, PROJECT_DIR)
+    marker = os.sep + "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return os.path.basename(filename)
+
+def _function_label(key):
+    filename, line, name = key
+    if filename == "~": # Fonction intégrée (C)
+        return name
+    return f"{_short_path(filename)}:{line}({name})"
+
+class StackSampler:
+    """Relève périodiquement la pile d'un thread et compte les piles identiques."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{_short_path(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+def _summarize(name, profile, stacks, duration):
+    """Partie sérialisable d'un profil : points chauds et piles repliées."""
+    rows = [
+        {"function": _function_label(key), "calls": calls, "primitive_calls": primitive_calls,
+         "self": round(self_time, 6), "cumulative": round(cumulative, 6)}
+        for key, (primitive_calls, calls, self_time, cumulative, _) in pstats.Stats(profile).stats.items()
+    ]
+    return {
+        "name": name,
+        "duration": round(duration, 6),
+        "samples": sum(stacks.values()),
+        "hotspots_self": sorted(rows, key=lambda row: row["self"], reverse=True)[:TOP_N],
+        "hotspots_cumulative": sorted(rows, key=lambda row: row["cumulative"], reverse=True)[:TOP_N],
+        "stacks": dict(stacks.most_common(MAX_STACKS)),
+    }
+
+class Capture:
+    """Profilage du thread courant entre start() et stop()."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.parts = [] # Parties ajoutées pendant la capture (rendus)
+        self.started = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.profile.enable()
+        self.sampler.start()
+
+    def stop(self, name):
+        self.sampler.stop()
+        self.profile.disable()
+        return [_summarize(name, self.profile, self.sampler.counts, time.perf_counter() - self.started)] + self.parts
+
+def begin():
+    """Démarre une capture dans le thread courant, ou retourne None si une autre est en cours."""
+    if not _capture_lock.acquire(blocking=False):
+        return None
+    try:
+        capture = Capture()
+        capture.start()
+    except Exception as e:
+        # cProfile refuse de démarrer si un autre profileur est actif (débogueur...)
+        _capture_lock.release()
+        print(f"⚠️ Profilage impossible : {e}")
+        return None
+    _local.capture = capture
+    return capture
+
+def end(capture, name):
+    """Arrête la capture et retourne ses parties (la première est celle du thread courant)."""
+    try:
+        return capture.stop(name)
+    finally:
+        _local.capture = None
+        _capture_lock.release()
+
+def is_active():
+    """Vrai si le thread courant est en cours de profilage."""
+    return getattr(_local, "capture", None) is not None
+
+def add_part(part):
+    """Ajoute une partie mesurée ailleurs (processus de rendu) à la capture du thread courant."""
+    capture = getattr(_local, "capture", None)
+    if capture is not None:
+        capture.parts.append(part)
+
+def profile_call(name, func, *args):
+    """Exécute func(*args) sous profilage. Retourne (résultat, partie) ; partie vaut None si la capture était impossible."""
+    capture = begin()
+    if capture is None:
+        return func(*args), None
+    try:
+        result = func(*args)
+    finally:
+        parts = end(capture, name)
+    return result, parts[0]
+
+# ---- Anneau de profils sur disque ----
+
+def save(record):
+    """Enregistre un profil (écriture atomique) et supprime les plus anciens. Retourne son identifiant."""
+    profile_id = f"{int(record['time'] * 1000)}-{os.getpid()}-{next(_sequence)}"
+    record = dict(record, id=profile_id)
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    path = os.path.join(PROFILES_DIR, profile_id + ".json")
+    with open(path + ".tmp", 'w') as f:
+        json.dump(record, f)
+    os.replace(path + ".tmp", path)
+    for old_id in list_ids()[PROFILE_RING:]:
+        try:
+            os.remove(os.path.join(PROFILES_DIR, old_id + ".json"))
+        except OSError:
+            pass # Déjà supprimé par un autre worker
+    return profile_id
+
+def list_ids():
+    """Identifiants des profils, du plus récent au plus ancien."""
+    try:
+        names = os.listdir(PROFILES_DIR)
+    except OSError:
+        return []
+    ids = [name[:-5] for name in names if name.endswith(".json") and PROFILE_ID_REGEX.match(name[:-5])]
+    return sorted(ids, key=lambda profile_id: tuple(int(part) for part in profile_id.split("-")), reverse=True)
+
+def load(profile_id):
+    """Profil complet, ou None s'il n'existe pas (ou plus)."""
+    if not PROFILE_ID_REGEX.match(profile_id or ""):
+        return None
+    try:
+        with open(os.path.join(PROFILES_DIR, profile_id + ".json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def list_profiles():
+    """Résumés des profils (sans points chauds ni piles) pour la page d'administration."""
+    summaries = []
+    for profile_id in list_ids():
+        record = load(profile_id)
+        if record is None:
+            continue
+        summary = {key: record.get(key) for key in ("id", "time", "method", "path", "endpoint", "status", "duration", "reason")}
+        summary["parts"] = [part["name"] for part in record.get("parts", [])]
+        summaries.append(summary)
+    return summaries
+
+def clear():
+    for profile_id in list_ids():
+        try:
+            os.remove(os.path.join(PROFILES_DIR, profile_id + ".json"))
+        except OSError:
+            pass
+
+def collapsed_stacks(record):
+    """Piles repliées de toutes les parties (format flamegraph.pl / speedscope), une racine par partie."""
+    lines = []
+    for part in record.get("parts", []):
+        for stack, count in part.get("stacks", {}).items():
+            lines.append(f"{part['name']};{stack} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,667 @@
+# -*- coding: utf-8 -*-
+#
+# Publication réseau (MQTT / InfluxDB / station centrale HTTP) pour meteo_capteur.py.
+# Home Assistant : découverte MQTT et états par capteur (meteo_homeassistant.py).
+# Une seule session MQTT et un seul client InfluxDB sont conservés pendant toute
+# la vie du processus. Chaque mesure passe par une file d'attente persistante
+# (outbox) : en cas de coupure Wifi, les points sont conservés sur disque puis
+# renvoyés par lots dès que la connexion revient.
+#
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+    print("ℹ️ Bibliothèque paho-mqtt non trouvée, publication MQTT désactivée.")
+
+try:
+    from influxdb_client import InfluxDBClient
+    from influxdb_client.client.write_api import SYNCHRONOUS
+except ImportError:
+    InfluxDBClient = None
+    print("ℹ️ Bibliothèque influxdb-client non trouvée, publication InfluxDB désactivée.")
+
+try:
+    import requests
+except ImportError:
+    requests = None
+    print("ℹ️ Bibliothèque requests non trouvée, envoi vers la station centrale désactivé.")
+
+from meteo_homeassistant import StateFilter, availability_topic, discovery_messages, state_base
+import meteo_metrics
+
+# Clés de configuration surveillées par chaque client (une reconnexion n'a lieu
+# que si l'une d'elles change)
+MQTT_KEYS = ("mqtt_enabled", "mqtt_broker", "mqtt_port", "mqtt_user", "mqtt_password",
+             "ha_discovery_enabled", "ha_discovery_prefix", "ha_state_topic", "station_id") # Dernière volonté et découverte HA
+INFLUX_KEYS = ("influx_enabled", "influx_url", "influx_token", "influx_org")
+# Ensemble des clés lues par le publisher (abonnement au ConfigWatcher)
+CONFIG_KEYS = MQTT_KEYS + INFLUX_KEYS + ("mqtt_topic", "influx_bucket", "wind_stream_enabled", "wind_stream_topic", "wind_stream_interval",
+                                        "push_enabled", "push_url", "push_token")
+
+OUTBOX_MAX_ITEMS = 20000  # ~2 semaines de mesures à 1/min
+BATCH_SIZE = 500          # Nombre de points envoyés par lot lors de la vidange
+DRAIN_INTERVAL = 10.0     # Vérification de la file toutes les 10s
+MAX_BACKOFF = 300.0       # Attente max entre deux tentatives InfluxDB ou HTTP (5 min)
+PUSH_TIMEOUT = 10         # Délai d'une requête vers la station centrale (secondes)
+PUBACK_TIMEOUT = 10.0     # Attente max des accusés de réception (PUBACK) d'un lot MQTT
+GOODBYE_TIMEOUT = 1.0     # Attente max de l'envoi des messages de retrait Home Assistant
+OUTBOX_COMPACT_ITEMS = 1000 # Éléments acquittés tolérés en tête d'une file avant réécriture du fichier
+
+# Flux vent haute fréquence (échantillons 3s) : regroupés en mémoire puis envoyés
+# en un seul message MQTT (QoS 0) et une seule écriture InfluxDB par intervalle.
+WIND_STREAM_INTERVAL = 30.0  # Regroupement par défaut : 10 échantillons par envoi
+WIND_STREAM_MAX_ITEMS = 1200 # 1h d'échantillons 3s conservés au maximum en mémoire
+
+
+class Outbox:
+    """
+    File d'attente bornée, sauvegardée sur disque (une ligne JSON par élément).
+    Le fichier n'est écrit qu'en ajout : les éléments envoyés (ou abandonnés)
+    ne sont pas effacés mais comptés dans <fichier>.ack, une courte ligne
+    "inode nombre" par lot. Le fichier n'est réécrit (compactage) que lorsque
+    la tête morte dépasse OUTBOX_COMPACT_ITEMS et le nombre d'éléments vivants.
+    """
+
+    def __init__(self, path, max_items=OUTBOX_MAX_ITEMS):
+        self.path = path
+        self.ack_path = path + ".ack"
+        self.max_items = max_items
+        self.items = deque()
+        self.dropped = 0
+        self.dead = 0 # Éléments acquittés encore présents en tête du fichier
+        self._stale = False # Fichier en retard sur la mémoire (écriture échouée) : à réécrire
+        self.lock = threading.Lock()
+        self._load()
+
+    def _acked_count(self, inode):
+        """Nombre d'éléments acquittés en tête du fichier d'inode `inode` (lignes d'une autre génération ignorées)."""
+        total = 0
+        try:
+            with open(self.ack_path, 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) == 2 and parts[0] == str(inode) and parts[1].isdigit():
+                        total += int(parts[1])
+        except OSError:
+            pass
+        return total
+
+    def _load(self):
+        """Recharge les éléments restés en attente lors du précédent arrêt."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            entries = []
+            damaged = False
+            with open(self.path, 'r', encoding='utf-8') as f:
+                acked = self._acked_count(os.fstat(f.fileno()).st_ino)
+                for line in f:
+                    if not line.strip():
+                        damaged = True
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        entries.append(None) # Ligne tronquée (coupure pendant l'écriture)
+            self.dead = min(acked, len(entries))
+            for item in islice(entries, self.dead, None):
+                if item is None:
+                    self.dropped += 1
+                    damaged = True
+                else:
+                    self.items.append(item)
+            while len(self.items) > self.max_items:
+                self.items.popleft()
+                self.dropped += 1
+                damaged = True
+            if damaged:
+                self._compact() # Une ligne du fichier par élément : condition du comptage des acquittements
+            if self.items:
+                print(f"📦 {len(self.items)} point(s) en attente rechargé(s) depuis {os.path.basename(self.path)}.")
+        except OSError as e:
+            print(f"⚠️ Lecture de la file {self.path} impossible : {e}")
+
+    def _compact(self):
+        """Réécrit le fichier de manière atomique avec le contenu actuel et remet les acquittements à zéro."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for item in self.items:
+                f.write(json.dumps(item) + "\n")
+        os.replace(temp_path, self.path)
+        self._stale = False
+        # Nouvel inode : les acquittements restants ne s'appliquent plus, même si ce qui suit échoue
+        self.dead = 0
+        open(self.ack_path, 'w').close()
+
+    def _acknowledge(self, count):
+        """Retire `count` éléments de tête du fichier : une ligne d'acquittement, ou un compactage."""
+        self.dead += count
+        if self._stale or (self.dead >= OUTBOX_COMPACT_ITEMS and self.dead >= len(self.items)):
+            self._compact()
+            return
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self._compact() # Fichier disparu : on le recrée avec les éléments vivants
+            return
+        with open(self.ack_path, 'a') as f:
+            f.write(f"{inode} {count}\n")
+
+    def put(self, item):
+        """Ajoute un élément. Si la file est pleine, les plus anciens sont abandonnés."""
+        with self.lock:
+            overflow = 0
+            if len(self.items) >= self.max_items:
+                # On libère 10% d'un coup : un seul acquittement pour le lot abandonné
+                overflow = min(len(self.items), max(1, self.max_items // 10))
+                for _ in range(overflow):
+                    self.items.popleft()
+                self.dropped += overflow
+            self.items.append(item)
+            try:
+                if self._stale:
+                    self._compact()
+                else:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(item) + "\n")
+                    if overflow:
+                        self._acknowledge(overflow)
+            except OSError as e:
+                self._stale = True
+                print(f"⚠️ Écriture de la file {self.path} impossible : {e}")
+
+    def peek(self, count):
+        """Retourne (sans les retirer) les `count` plus anciens éléments."""
+        with self.lock:
+            return list(islice(self.items, count))
+
+    def commit(self, count):
+        """Retire les `count` plus anciens éléments (envoyés avec succès)."""
+        if count <= 0:
+            return
+        with self.lock:
+            count = min(count, len(self.items))
+            for _ in range(count):
+                self.items.popleft()
+            try:
+                self._acknowledge(count)
+            except OSError as e:
+                self._stale = True
+                print(f"⚠️ Écriture de la file {self.path} impossible : {e}")
+
+    def __len__(self):
+        return len(self.items)
+
+
+def on_mqtt_connect(client, userdata, flags, rc):
+    if rc == 0:
+        print("✅ MQTT connecté avec succès au broker.")
+        # La file sera vidée (et la découverte HA republiée) au prochain passage du thread de publication
+        if userdata is not None:
+            userdata.on_mqtt_connected()
+    else:
+        print(f"❌ Échec de la connexion MQTT (code: {rc})")
+
+
+def setup_mqtt(current_config, userdata=None):
+    if mqtt is None or not current_config.get("mqtt_enabled"):
+        return None
+    try:
+        # Compatibilité paho-mqtt 2.0+ (CallbackAPIVersion requis)
+        try:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, userdata=userdata)
+        except AttributeError:
+            # Ancienne version de paho-mqtt
+            client = mqtt.Client(userdata=userdata)
+
+        client.on_connect = on_mqtt_connect
+        # paho se reconnecte seul ; on limite juste l'intervalle de tentative
+        client.reconnect_delay_set(min_delay=1, max_delay=120)
+
+        if current_config.get("mqtt_user"):
+            client.username_pw_set(current_config["mqtt_user"], current_config.get("mqtt_password"))
+        if current_config.get("ha_discovery_enabled"):
+            # Publié par le broker si la connexion est perdue sans déconnexion propre
+            client.will_set(availability_topic(current_config), "offline", qos=1, retain=True)
+
+        client.loop_start()
+        client.connect_async(current_config.get("mqtt_broker", "localhost"), int(current_config.get("mqtt_port", 1883)), 60)
+        print(f"🔄 MQTT connexion en arrière-plan vers {current_config.get('mqtt_broker', 'localhost')} initiée...")
+        return client
+    except Exception as e:
+        print(f"❌ Erreur d'initialisation MQTT : {e}")
+    return None
+
+
+def acked_prefix(infos, timeout=PUBACK_TIMEOUT):
+    """
+    Attend les accusés du broker (PUBACK) des messages QoS 1 publiés, dans
+    l'ordre. Retourne le nombre de messages en tête de liste confirmés avant
+    `timeout` : seuls ceux-là peuvent être retirés de la file.
+    """
+    deadline = time.monotonic() + timeout
+    acked = 0
+    for info in infos:
+        while not info.is_published():
+            if time.monotonic() >= deadline:
+                return acked
+            time.sleep(0.05)
+        acked += 1
+    return acked
+
+
+def setup_influxdb(current_config):
+    if InfluxDBClient is None or not current_config.get("influx_enabled"):
+        return None
+    try:
+        client = InfluxDBClient(
+            url=current_config.get("influx_url"),
+            token=current_config.get("influx_token"),
+            org=current_config.get("influx_org"),
+            timeout=5000 # Timeout de 5s pour éviter de bloquer la boucle
+        )
+        print(f"✅ InfluxDB connecté à {current_config.get('influx_url')}")
+        return client
+    except Exception as e:
+        print(f"❌ Erreur de connexion InfluxDB : {e}")
+    return None
+
+
+# Échappements du line protocol (mêmes règles que Point d'influxdb-client) : une
+# station_id avec espace, virgule ou "=" ferait échouer tout le lot sinon.
+_ESCAPE_TAG = str.maketrans({"\\": "\\\\", ",": "\\,", " ": "\\ ", "=": "\\=", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+_ESCAPE_STRING = str.maketrans({"\\": "\\\\", '"': '\\"'})
+
+def _escape_tag(value):
+    return str(value).translate(_ESCAPE_TAG)
+
+def _escape_string(value):
+    return str(value).translate(_ESCAPE_STRING)
+
+def _wind_line_protocol(station_id, timestamp, speed, gust, angle, direction):
+    """Formate un échantillon de vent au format line protocol InfluxDB (précision ns)."""
+    fields = f"speed={float(speed)},gust={float(gust)}"
+    if angle is not None:
+        fields += f",angle={float(angle)}"
+    fields += f',direction="{_escape_string(direction)}"'
+    return f"meteo_wind,station={_escape_tag(station_id)} {fields} {int(timestamp * 1e9)}"
+
+
+class NetworkPublisher:
+    """
+    Sous-système de publication longue durée.
+    Les mesures sont déposées dans une file persistante par `publish_sample()`,
+    puis un thread unique les envoie par lots vers MQTT et InfluxDB.
+    """
+
+    def __init__(self, config, data_dir, batch_size=BATCH_SIZE, drain_interval=DRAIN_INTERVAL):
+        self.config = {}
+        self.batch_size = batch_size
+        self.drain_interval = drain_interval
+        self.status_file = os.path.join(data_dir, "publisher_status.json")
+        self.mqtt_outbox = Outbox(os.path.join(data_dir, "outbox_mqtt.jsonl"))
+        self.influx_outbox = Outbox(os.path.join(data_dir, "outbox_influx.jsonl"))
+        self.push_outbox = Outbox(os.path.join(data_dir, "outbox_push.jsonl"))
+        self.push_session = requests.Session() if requests else None # Connexion HTTP réutilisée entre les lots
+
+        self.mqtt_client = None
+        self.influx_client = None
+        self.write_api = None
+        self.client_lock = threading.Lock()
+
+        # Tampon mémoire du flux vent haute fréquence (non persisté : l'agrégat
+        # 60s reste la donnée de référence conservée dans l'outbox)
+        self.wind_buffer = deque(maxlen=WIND_STREAM_MAX_ITEMS)
+        self._wind_last_flush = time.time()
+
+        self.counters = {
+            "mqtt_sent": 0,
+            "mqtt_errors": 0,
+            "influx_sent": 0,
+            "influx_errors": 0,
+            "wind_sent": 0,
+            "wind_dropped": 0,
+            "push_sent": 0,
+            "push_errors": 0,
+            "ha_sent": 0,
+        }
+        self.last_success = {"mqtt": None, "influx": None, "push": None}
+        self._influx_retry_at = 0.0
+        self._influx_backoff = self.drain_interval
+        self._push_retry_at = 0.0
+        self._push_backoff = self.drain_interval
+
+        # Home Assistant : états déjà publiés (zone morte) et découverte à (re)publier
+        self.ha_states = StateFilter()
+        self._ha_discovery_pending = True
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+
+        self.configure(config)
+
+        self._thread = threading.Thread(target=self._run, name="network-publisher", daemon=True)
+        self._thread.start()
+
+    # ---- Gestion des connexions ----
+
+    def configure(self, new_config):
+        """Applique une nouvelle configuration ; ne reconnecte que les clients concernés."""
+        old_config = self.config
+        self.config = dict(new_config)
+        mqtt_changed = any(old_config.get(k) != new_config.get(k) for k in MQTT_KEYS)
+        influx_changed = any(old_config.get(k) != new_config.get(k) for k in INFLUX_KEYS)
+        if not (mqtt_changed or influx_changed):
+            return
+
+        with self.client_lock:
+            if mqtt_changed:
+                if self.mqtt_client:
+                    print("🔄 Changement de configuration MQTT détecté, reconnexion...")
+                    self._ha_goodbye(self.mqtt_client, old_config, new_config)
+                    self.mqtt_client.loop_stop()
+                    self.mqtt_client.disconnect()
+                self.mqtt_client = setup_mqtt(new_config, userdata=self)
+
+            if influx_changed:
+                if self.influx_client:
+                    print("🔄 Changement de configuration InfluxDB détecté, reconnexion...")
+                    self.influx_client.close()
+                self.influx_client = setup_influxdb(new_config)
+                # Une seule API d'écriture réutilisée pour tous les lots
+                self.write_api = self.influx_client.write_api(write_options=SYNCHRONOUS) if self.influx_client else None
+                self._influx_retry_at = 0.0
+                self._influx_backoff = self.drain_interval
+
+    def on_mqtt_connected(self):
+        """Appelé par paho à chaque (re)connexion."""
+        self._ha_discovery_pending = True
+        self.wake()
+
+    def wake(self):
+        """Demande une vidange immédiate de la file."""
+        self._wake_event.set()
+
+    def close(self):
+        """Arrête le thread et ferme les connexions (les files restent sur disque)."""
+        self._stop_event.set()
+        self._wake_event.set()
+        self._thread.join(timeout=5)
+        with self.client_lock:
+            if self.mqtt_client:
+                self._ha_goodbye(self.mqtt_client, self.config, self.config) # Capteurs conservés dans HA
+                self.mqtt_client.loop_stop()
+                self.mqtt_client.disconnect()
+                self.mqtt_client = None
+            if self.influx_client:
+                self.influx_client.close()
+                self.influx_client = None
+                self.write_api = None
+
+    # ---- Dépôt des mesures ----
+
+    def publish_sample(self, mqtt_payload, influx_line, csv_row=None):
+        """
+        Dépose une mesure dans les files d'attente (non bloquant).
+        `mqtt_payload` est un dict sérialisé en JSON, `influx_line` une ligne
+        au format line protocol (horodatage inclus, donc valable en différé),
+        `csv_row` la ligne de meteo_log.csv envoyée à la station centrale.
+        """
+        if self.config.get("mqtt_enabled"):
+            self.mqtt_outbox.put({
+                "topic": self.config.get("mqtt_topic", "meteopi/sensors"),
+                "payload": json.dumps(mqtt_payload),
+            })
+        if self.config.get("influx_enabled"):
+            self.influx_outbox.put(influx_line)
+        if self.config.get("push_enabled") and csv_row is not None:
+            self.push_outbox.put(["" if value is None else str(value) for value in csv_row])
+        self._publish_ha_states(mqtt_payload)
+        self.wake()
+
+    def publish_wind_sample(self, timestamp, speed, gust, angle, direction):
+        """
+        Dépose un échantillon de vent 3s dans le tampon haute fréquence.
+        `timestamp` est un horodatage UNIX (secondes), `angle` en degrés (ou None).
+        """
+        if not self.config.get("wind_stream_enabled"):
+            return
+        if len(self.wind_buffer) == self.wind_buffer.maxlen:
+            self.counters["wind_dropped"] += 1
+        self.wind_buffer.append((timestamp, speed, gust, angle, direction))
+
+    # ---- Home Assistant ----
+
+    def _publish_ha_discovery(self, client):
+        """Configurations de découverte et disponibilité (messages conservés), après chaque connexion."""
+        if not self._ha_discovery_pending or not self.config.get("ha_discovery_enabled"):
+            return
+        for topic, payload in discovery_messages(self.config):
+            client.publish(topic, payload, qos=1, retain=True)
+        client.publish(availability_topic(self.config), "online", qos=1, retain=True)
+        self.ha_states.reset() # Le broker a pu perdre les états conservés : tout est republié
+        self._ha_discovery_pending = False
+        print("🏠 Découverte Home Assistant publiée.")
+
+    def _publish_ha_states(self, values):
+        """Publie les états ayant varié de plus que leur zone morte (non bloquant, sans file d'attente)."""
+        client = self.mqtt_client
+        if not self.config.get("ha_discovery_enabled") or client is None or not client.is_connected():
+            return
+        now = time.time()
+        base = state_base(self.config)
+        for key, value in self.ha_states.changes(values, now):
+            info = client.publish(f"{base}/{key}", str(value), qos=1, retain=True)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                self.ha_states.commit(key, value, now)
+                self.counters["ha_sent"] += 1
+            else:
+                self.counters["mqtt_errors"] += 1
+
+    def _ha_goodbye(self, client, old_config, new_config):
+        """
+        Avant une déconnexion volontaire (pas de dernière volonté) : station
+        "offline", et retrait des capteurs si la découverte change ou s'arrête.
+        """
+        if not old_config.get("ha_discovery_enabled") or not client.is_connected():
+            return
+        try:
+            infos = [client.publish(availability_topic(old_config), "offline", qos=1, retain=True)]
+            old_messages = discovery_messages(old_config)
+            if not new_config.get("ha_discovery_enabled") or discovery_messages(new_config) != old_messages:
+                for topic, _ in old_messages:
+                    infos.append(client.publish(topic, "", qos=1, retain=True)) # Message vide : capteur supprimé dans HA
+            # Attend le PUBACK (au plus GOODBYE_TIMEOUT au total) plutôt qu'un délai fixe sous client_lock
+            deadline = time.monotonic() + GOODBYE_TIMEOUT
+            for info in infos:
+                info.wait_for_publish(max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            print(f"⚠️ Erreur lors du retrait Home Assistant : {e}")
+
+    # ---- Vidange des files ----
+
+    def _drain_mqtt(self):
+        client = self.mqtt_client
+        if client is None or not client.is_connected():
+            return
+        self._publish_ha_discovery(client)
+        while len(self.mqtt_outbox):
+            batch = self.mqtt_outbox.peek(self.batch_size)
+            infos = []
+            for item in batch:
+                info = client.publish(item["topic"], item["payload"], qos=1)
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    self.counters["mqtt_errors"] += 1
+                    break
+                infos.append(info)
+            # publish() ne fait que confier le message à paho : un élément ne quitte
+            # la file sur disque qu'après l'accusé du broker (PUBACK). Un message non
+            # confirmé sera renvoyé au passage suivant (doublon possible, jamais de perte).
+            sent = acked_prefix(infos)
+            if sent < len(infos):
+                self.counters["mqtt_errors"] += 1
+                print(f"⚠️ MQTT : {len(infos) - sent} message(s) sans accusé du broker en {PUBACK_TIMEOUT:.0f}s, conservé(s) dans la file.")
+            self.mqtt_outbox.commit(sent)
+            self.counters["mqtt_sent"] += sent
+            if sent:
+                self.last_success["mqtt"] = time.time()
+            if sent < len(batch):
+                break
+
+    def _drain_influx(self):
+        write_api = self.write_api
+        if write_api is None or time.time() < self._influx_retry_at:
+            return
+        while len(self.influx_outbox):
+            batch = self.influx_outbox.peek(self.batch_size)
+            try:
+                write_api.write(
+                    bucket=self.config.get("influx_bucket"),
+                    org=self.config.get("influx_org"),
+                    record=batch
+                )
+            except Exception as e:
+                self.counters["influx_errors"] += 1
+                # Attente exponentielle pour ne pas marteler un serveur injoignable
+                self._influx_retry_at = time.time() + self._influx_backoff
+                print(f"⚠️ Erreur publication InfluxDB ({len(self.influx_outbox)} en attente, nouvel essai dans {self._influx_backoff:.0f}s) : {e}")
+                self._influx_backoff = min(self._influx_backoff * 2, MAX_BACKOFF)
+                return
+            self.influx_outbox.commit(len(batch))
+            self.counters["influx_sent"] += len(batch)
+            self.last_success["influx"] = time.time()
+            self._influx_backoff = self.drain_interval
+
+    def _drain_push(self):
+        """Envoie les mesures en attente à la station centrale, par lots (POST /api/v1/ingest)."""
+        url = self.config.get("push_url")
+        if self.push_session is None or not self.config.get("push_enabled") or not url or time.time() < self._push_retry_at:
+            return
+        while len(self.push_outbox):
+            batch = self.push_outbox.peek(self.batch_size)
+            try:
+                response = self.push_session.post(
+                    url,
+                    json={"station": self.config.get("station_id"), "rows": batch},
+                    headers={"Authorization": f"Bearer {self.config.get('push_token', '')}"},
+                    timeout=PUSH_TIMEOUT
+                )
+                response.raise_for_status()
+            except Exception as e:
+                self.counters["push_errors"] += 1
+                self._push_retry_at = time.time() + self._push_backoff
+                print(f"⚠️ Erreur d'envoi vers la station centrale ({len(self.push_outbox)} en attente, nouvel essai dans {self._push_backoff:.0f}s) : {e}")
+                self._push_backoff = min(self._push_backoff * 2, MAX_BACKOFF)
+                return
+            self.push_outbox.commit(len(batch))
+            self.counters["push_sent"] += len(batch)
+            self.last_success["push"] = time.time()
+            self._push_backoff = self.drain_interval
+
+    def _flush_wind_stream(self):
+        """Envoie les échantillons de vent accumulés en un seul lot par destination."""
+        interval = float(self.config.get("wind_stream_interval", WIND_STREAM_INTERVAL))
+        now = time.time()
+        if not self.wind_buffer or now - self._wind_last_flush < interval:
+            return
+        self._wind_last_flush = now
+        samples = []
+        while self.wind_buffer:
+            samples.append(self.wind_buffer.popleft())
+        delivered = False
+
+        # MQTT : un seul message QoS 0 regroupant tous les échantillons
+        client = self.mqtt_client
+        if client is not None and client.is_connected():
+            payload = json.dumps({
+                "samples": [
+                    {"t": round(ts, 1), "speed": round(speed, 1), "gust": round(gust, 1),
+                     "angle": round(angle, 1) if angle is not None else None, "dir": direction}
+                    for ts, speed, gust, angle, direction in samples
+                ]
+            })
+            info = client.publish(self.config.get("wind_stream_topic", "meteopi/wind"), payload, qos=0)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                delivered = True
+            else:
+                self.counters["mqtt_errors"] += 1
+
+        # InfluxDB : une écriture en line protocol pour tout le lot
+        if self.write_api is not None and time.time() >= self._influx_retry_at:
+            lines = [_wind_line_protocol(self.config.get("station_id", "meteopi_1"), *sample) for sample in samples]
+            try:
+                self.write_api.write(
+                    bucket=self.config.get("influx_bucket"),
+                    org=self.config.get("influx_org"),
+                    record=lines
+                )
+                delivered = True
+            except Exception as e:
+                self.counters["influx_errors"] += 1
+                print(f"⚠️ Erreur publication du flux vent InfluxDB : {e}")
+
+        if delivered:
+            self.counters["wind_sent"] += len(samples)
+        else:
+            self.counters["wind_dropped"] += len(samples)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.wait(min(self.drain_interval, float(self.config.get("wind_stream_interval", WIND_STREAM_INTERVAL))))
+            self._wake_event.clear()
+            try:
+                with self.client_lock:
+                    for target, drain in (("mqtt", self._drain_mqtt), ("influx", self._drain_influx),
+                                          ("push", self._drain_push), ("wind_stream", self._flush_wind_stream)):
+                        with meteo_metrics.timer("meteo_publish_drain_seconds", target=target):
+                            drain()
+            except Exception as e:
+                print(f"⚠️ Erreur dans le thread de publication : {e}")
+            self._write_status()
+            self._update_metrics()
+
+    # ---- Supervision ----
+
+    def stats(self):
+        """Retourne la profondeur des files et les compteurs d'envoi/perte."""
+        return {
+            "mqtt_connected": bool(self.mqtt_client and self.mqtt_client.is_connected()),
+            "mqtt_queue": len(self.mqtt_outbox),
+            "mqtt_dropped": self.mqtt_outbox.dropped,
+            "influx_enabled": self.write_api is not None,
+            "influx_queue": len(self.influx_outbox),
+            "influx_dropped": self.influx_outbox.dropped,
+            "push_enabled": bool(self.config.get("push_enabled")),
+            "push_queue": len(self.push_outbox),
+            "push_dropped": self.push_outbox.dropped,
+            "wind_queue": len(self.wind_buffer),
+            "last_success": dict(self.last_success),
+            "updated": time.time(),
+            **self.counters,
+        }
+
+    def _update_metrics(self):
+        """Recopie les compteurs (mqtt_sent, influx_errors...) et la profondeur des files dans meteo_metrics."""
+        for key, value in list(self.counters.items()):
+            target, result = key.rsplit("_", 1)
+            meteo_metrics.set_value("meteo_publish_messages_total", value, target=target, result=result)
+        for target, queue in (("mqtt", self.mqtt_outbox), ("influx", self.influx_outbox), ("push", self.push_outbox), ("wind_stream", self.wind_buffer)):
+            meteo_metrics.set_value("meteo_publish_queue", len(queue), target=target)
+
+    def _write_status(self):
+        """Publie les statistiques dans un fichier lu par la page d'administration."""
+        try:
+            temp_path = self.status_file + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.stats(), f)
+            os.replace(temp_path, self.status_file)
+        except OSError:
+            pass
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Stations distantes agrégées par un serveur web central.
+#
+# Chaque Raspberry Pi garde son propre meteo_capteur.py et envoie ses mesures
+# minute par lots (publisher : "push_url", API /api/v1/ingest). Le serveur
+# central range les mesures de chaque station dans sa propre base SQLite
+# (data/stations/<station_id>/meteo.db, voir meteo_store.py) : une station
+# bavarde ou volumineuse ne ralentit pas les autres, et les comparaisons ne
+# lisent que des agrégats horaires calculés par SQLite sur la plage demandée.
+#
+
+import os
+import re
+import threading
+
+from meteo_store import HOURLY_COLUMNS, MeteoStore, format_csv_value, normalize_row
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STATIONS_DIR = os.path.join(DATA_DIR, "stations")
+
+STATION_ID_REGEX = re.compile(r'^[A-Za-z0-9_-]{1,32}$') # Sert aussi de nom de dossier
+MAX_INGEST_ROWS = 5000 # Lignes acceptées par requête (la file d'un capteur est vidée par lots de 500)
+
+def valid_station_id(station_id):
+    return isinstance(station_id, str) and bool(STATION_ID_REGEX.match(station_id))
+
+class StationRegistry:
+    """Bases SQLite des stations distantes, ouvertes à la demande et conservées par le processus."""
+
+    def __init__(self, directory=STATIONS_DIR):
+        self.directory = directory
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def _path(self, station_id):
+        return os.path.join(self.directory, station_id, "meteo.db")
+
+    def list(self):
+        """Identifiants des stations distantes ayant déjà envoyé des mesures."""
+        try:
+            return sorted(name for name in os.listdir(self.directory)
+                          if valid_station_id(name) and os.path.exists(self._path(name)))
+        except OSError:
+            return []
+
+    def get(self, station_id, create=False):
+        """Base de la station, ou None si elle est inconnue (et `create` faux)."""
+        if not valid_station_id(station_id):
+            return None
+        with self._lock:
+            store = self._stores.get(station_id)
+            if store is None:
+                if not create and not os.path.exists(self._path(station_id)):
+                    return None
+                store = MeteoStore(self._path(station_id))
+                self._stores[station_id] = store
+            return store
+
+    def ingest(self, station_id, rows):
+        """
+        Enregistre un lot de lignes au format CSV (listes de champs ou chaînes).
+        Les horodatages déjà reçus sont ignorés : un lot renvoyé après une
+        coupure ne crée pas de doublon. Retourne (acceptées, rejetées).
+        """
+        normalized = []
+        rejected = 0
+        for row in rows:
+            if isinstance(row, str):
+                fields = row.strip().split(',')
+            elif isinstance(row, list):
+                fields = [format_csv_value(value) for value in row]
+            else:
+                fields = []
+            measurement = normalize_row(fields)
+            if measurement is None:
+                rejected += 1
+            else:
+                normalized.append(measurement)
+        if normalized:
+            self.get(station_id, create=True).bulk_write(normalized, "first")
+        return len(normalized), rejected
+
+def _round(value, digits=1):
+    return round(value, digits) if value is not None else None
+
+def summarize(hours):
+    """Résumé d'une période à partir de ses agrégats horaires (tuples HOURLY_COLUMNS)."""
+    rows = [dict(zip(HOURLY_COLUMNS, hour)) for hour in hours]
+
+    def values(key):
+        return [row[key] for row in rows if row[key] is not None]
+
+    temps, pressures = values("temp"), values("pressure")
+    return {
+        "count": sum(row["count"] for row in rows),
+        "temp_min": _round(min(values("temp_min"), default=None)),
+        "temp_max": _round(max(values("temp_max"), default=None)),
+        "temp_mean": _round(sum(temps) / len(temps)) if temps else None,
+        "rain_total": _round(sum(values("rain")), 2),
+        "gust_max": _round(max(values("wind_gust"), default=None)),
+        "pressure_mean": _round(sum(pressures) / len(pressures)) if pressures else None,
+    }
+
+_default_registry = None
+_default_lock = threading.Lock()
+
+def get_registry():
+    """Registre partagé du processus (serveur web)."""
+    global _default_registry
+    with _default_lock:
+        if _default_registry is None:
+            _default_registry = StationRegistry()
+        return _default_registry
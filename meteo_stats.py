@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# Statistiques glissantes calculées au fil de l'eau par le processus capteurs.
+# Chaque mesure (toutes les 60s) met à jour des fenêtres de 10 min, 1h, 3h et 24h
+# en O(1) amorti : sommes courantes, min/max par files monotones et
+# première/dernière valeur. Un instantané est écrit dans data/live_stats.json
+# pour le serveur web, le bot Telegram et la publication MQTT/InfluxDB :
+# plus besoin de recalculer la tendance de pression ou la pluie sur 24h à
+# partir du CSV complet à chaque affichage de page.
+#
+
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LIVE_STATS_FILE = os.path.join(DATA_DIR, "live_stats.json")
+
+# Fenêtres suivies : nom -> durée en secondes
+STATS_WINDOWS = {"10min": 600, "1h": 3600, "3h": 10800, "24h": 86400}
+STATS_METRICS = ("temp", "hum", "pressure", "rain", "wind_speed", "wind_gust")
+
+CSV_HEADERS = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str", "wind_dir_deg", "wind_dir_std"]
+CSV_HEADERS_OLD = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_dir_str"]
+
+def parse_csv_row(fields):
+    """Convertit une ligne CSV (ancien format 7 colonnes, 8 colonnes, ou 10 avec l'angle du vent) en dict."""
+    if not fields or len(fields) < 7 or fields[0] == "time":
+        return None
+    headers = CSV_HEADERS if len(fields) >= 8 else CSV_HEADERS_OLD
+    reading = dict(zip(headers, fields))
+    try:
+        reading['timestamp'] = datetime.strptime(reading['time'], "%Y-%m-%d %H:%M:%S").timestamp()
+    except ValueError:
+        return None
+    for key in STATS_METRICS + ("wind_dir_deg", "wind_dir_std"):
+        try:
+            reading[key] = float(reading[key]) if reading.get(key) not in (None, "") else None
+        except ValueError:
+            reading[key] = None
+    return reading
+
+class RollingWindow:
+    """Fenêtre glissante temporelle : somme, première/dernière valeur, min et max en O(1) amorti."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.values = deque()   # (timestamp, valeur)
+        self.maxima = deque()   # File monotone décroissante pour le max
+        self.minima = deque()   # File monotone croissante pour le min
+        self.total = 0.0
+
+    def add(self, timestamp, value):
+        if value is None:
+            return
+        self.values.append((timestamp, value))
+        self.total += value
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((timestamp, value))
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((timestamp, value))
+
+    def expire(self, now):
+        limit = now - self.seconds
+        while self.values and self.values[0][0] <= limit:
+            _, old = self.values.popleft()
+            self.total -= old
+        while self.maxima and self.maxima[0][0] <= limit:
+            self.maxima.popleft()
+        while self.minima and self.minima[0][0] <= limit:
+            self.minima.popleft()
+        if not self.values:
+            self.total = 0.0 # Évite l'accumulation d'erreurs d'arrondi
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def first(self):
+        return self.values[0][1] if self.values else None
+
+    @property
+    def last(self):
+        return self.values[-1][1] if self.values else None
+
+    @property
+    def maximum(self):
+        return self.maxima[0][1] if self.maxima else None
+
+    @property
+    def minimum(self):
+        return self.minima[0][1] if self.minima else None
+
+    @property
+    def mean(self):
+        return self.total / len(self.values) if self.values else None
+
+    @property
+    def change(self):
+        """Écart entre la dernière et la première valeur de la fenêtre (tendance)."""
+        if len(self.values) < 2:
+            return None
+        return self.values[-1][1] - self.values[0][1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "min": _round(self.minimum),
+            "max": _round(self.maximum),
+            "mean": _round(self.mean),
+            "sum": _round(self.total) if self.values else None,
+            "first": _round(self.first),
+            "last": _round(self.last),
+            "change": _round(self.change),
+        }
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+class StreamingStats:
+    """Ensemble des fenêtres glissantes (une par mesure et par durée)."""
+
+    def __init__(self, windows=STATS_WINDOWS, metrics=STATS_METRICS):
+        self.windows = {
+            name: {metric: RollingWindow(seconds) for metric in metrics}
+            for name, seconds in windows.items()
+        }
+        self.metrics = metrics
+        self.updated = None
+
+    def update(self, reading):
+        """Intègre une mesure (dict avec 'timestamp' et les valeurs numériques)."""
+        ts = reading['timestamp']
+        for metrics in self.windows.values():
+            for metric, window in metrics.items():
+                window.add(ts, reading.get(metric))
+                window.expire(ts)
+        self.updated = ts
+
+    def window(self, name, metric):
+        return self.windows[name][metric]
+
+    def snapshot(self):
+        """Retourne l'état courant sous forme sérialisable (lecture O(1) par les consommateurs)."""
+        derived = {
+            "rain_1h": _round(self.window("1h", "rain").total, 2),
+            "rain_24h": _round(self.window("24h", "rain").total, 2),
+            "pressure_change_3h": _round(self.window("3h", "pressure").change, 2),
+            "temp_change_3h": _round(self.window("3h", "temp").change, 2),
+            "hum_change_3h": _round(self.window("3h", "hum").change, 1),
+            "wind_mean_10min": _round(self.window("10min", "wind_speed").mean, 1),
+            "gust_max_10min": _round(self.window("10min", "wind_gust").maximum, 1),
+            "temp_min_24h": _round(self.window("24h", "temp").minimum, 1),
+            "temp_max_24h": _round(self.window("24h", "temp").maximum, 1),
+            "pressure_last": _round(self.window("3h", "pressure").last, 1),
+        }
+        return {
+            "updated": self.updated,
+            "updated_str": datetime.fromtimestamp(self.updated).strftime("%d/%m/%Y %H:%M:%S") if self.updated else None,
+            "derived": derived,
+            "windows": {
+                name: {metric: window.summary() for metric, window in metrics.items()}
+                for name, metrics in self.windows.items()
+            },
+        }
+
+    def warm_up_from_csv(self, csv_path, max_bytes=256 * 1024):
+        """
+        Amorce les fenêtres avec la fin du CSV (~24h de mesures) au démarrage,
+        pour que les tendances soient disponibles sans attendre 3h.
+        """
+        try:
+            with open(csv_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - max_bytes))
+                data = f.read()
+        except OSError:
+            return 0
+        lines = data.split(b"\n")
+        if size > max_bytes:
+            lines = lines[1:] # Première ligne coupée par le positionnement
+        horizon = time.time() - max(STATS_WINDOWS.values())
+        count = 0
+        for line in lines:
+            reading = parse_csv_row(line.decode('utf-8', errors='ignore').strip().split(','))
+            if reading is None or reading['timestamp'] < horizon:
+                continue
+            self.update(reading)
+            count += 1
+        return count
+
+    def write_snapshot(self, path=LIVE_STATS_FILE):
+        """Écrit l'instantané de manière atomique (fichier sur le disque RAM)."""
+        snapshot = self.snapshot()
+        try:
+            temp_path = path + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"⚠️ Écriture des statistiques glissantes impossible : {e}")
+        return snapshot
+
+def read_snapshot(path=LIVE_STATS_FILE, max_age=300):
+    """
+    Lit le dernier instantané publié par le processus capteurs.
+    Retourne None s'il est absent ou trop ancien (processus capteurs arrêté).
+    """
+    try:
+        with open(path, 'r') as f:
+            snapshot = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if not snapshot.get("updated") or time.time() - snapshot["updated"] > max_age:
+        return None
+    return snapshot
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+# Stockage SQLite des mesures (option `storage_backend: "sqlite"`).
+#
+# - Mode WAL : le processus capteurs écrit pendant que les workers Gunicorn
+#   lisent, sans blocage mutuel.
+# - Tables "WITHOUT ROWID" dont la clé primaire est l'horodatage : les lignes
+#   sont rangées dans l'ordre chronologique et une plage de dates se lit
+#   directement dans l'index (historique, graphique d'une journée, pluies).
+# - Insertions groupées : les lignes sont mises en attente puis écrites en
+#   une seule transaction (requête préparée réutilisée par executemany).
+#
+# meteo_log.csv reste écrit par le capteur comme journal brut (sauvegardes,
+# API temps réel, bot Telegram). Utilisation en ligne de commande :
+#   python meteo_store.py import [fichier.csv]   -> import (sans doublons)
+#   python meteo_store.py export [fichier.csv]   -> export au format CSV
+#
+
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+from meteo_stats import CSV_HEADERS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STORE_FILE = os.path.join(DATA_DIR, "meteo.db")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+
+BUSY_TIMEOUT = 5000     # ms d'attente si un autre processus écrit
+IMPORT_BATCH = 5000     # Lignes par transaction lors d'un import
+MAX_PENDING = 10000     # Lignes conservées en mémoire si la base est indisponible
+
+# Agrégats horaires (hourly_summary) : heure 'AAAA-MM-JJ HH' puis valeurs
+HOURLY_COLUMNS = ("hour", "temp", "temp_min", "temp_max", "hum", "pressure", "rain", "wind_speed", "wind_gust", "count")
+
+TIME_REGEX = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    time TEXT PRIMARY KEY,
+    temp REAL, hum REAL, pressure REAL, rain REAL,
+    wind_speed REAL, wind_gust REAL, wind_dir_str TEXT,
+    wind_dir_deg REAL, wind_dir_std REAL
+) WITHOUT ROWID;
+-- Vent 3 s : seul wind_detail_log.csv (réduit par meteo_capteur.py) est conservé
+DROP TABLE IF EXISTS wind_detail;
+"""
+
+INSERT_MEASUREMENT = f"INSERT OR IGNORE INTO measurements ({', '.join(CSV_HEADERS)}) VALUES ({', '.join('?' * len(CSV_HEADERS))})"
+
+# Import en masse (meteo_import.py) : résolution des doublons avec les mesures déjà en base
+_COLUMNS = ', '.join(CSV_HEADERS)
+_VALUES = ', '.join('?' * len(CSV_HEADERS))
+_UPDATE_ALL = ', '.join(f"{c} = excluded.{c}" for c in CSV_HEADERS[1:])
+
+def _filled(prefix):
+    """Expression SQL comptant les valeurs renseignées d'une mesure."""
+    return ' + '.join(f"({prefix}{c} IS NOT NULL)" for c in CSV_HEADERS[1:])
+
+BULK_WRITE = {
+    "first": INSERT_MEASUREMENT,
+    "last": f"INSERT INTO measurements ({_COLUMNS}) VALUES ({_VALUES}) ON CONFLICT(time) DO UPDATE SET {_UPDATE_ALL}",
+    "most_complete": (f"INSERT INTO measurements ({_COLUMNS}) VALUES ({_VALUES}) ON CONFLICT(time) DO UPDATE SET {_UPDATE_ALL}"
+                      f" WHERE {_filled('excluded.')} > {_filled('measurements.')}"),
+}
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def normalize_row(fields):
+    """
+    Convertit une ligne CSV (7, 8 ou 10 colonnes) en tuple de 10 valeurs
+    typées dans l'ordre de CSV_HEADERS, ou None si la ligne est invalide.
+    """
+    if len(fields) < 7 or not TIME_REGEX.match(fields[0]):
+        return None
+    if len(fields) == 7:
+        gust, direction, extra = None, fields[6], []
+    else:
+        gust, direction, extra = _float(fields[6]), fields[7], fields[8:10]
+    # Rafale décalée dans la colonne direction (mêmes règles que data_cache)
+    if gust is None and _float(direction) is not None:
+        gust, direction = _float(direction), "N/A"
+    extra = [_float(value) for value in extra] + [None] * (2 - len(extra))
+    return (fields[0], _float(fields[1]), _float(fields[2]), _float(fields[3]), _float(fields[4]),
+            _float(fields[5]), gust, direction or None, extra[0], extra[1])
+
+def format_csv_value(value):
+    return "" if value is None else str(value)
+
+class MeteoStore:
+    """
+    Accès à la base SQLite. Une connexion par thread (les workers Gunicorn
+    servent plusieurs requêtes en parallèle) ; les écritures en attente sont
+    propres à l'instance.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._pending_measurements = []
+        self._pending_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL") # Suffisant en WAL : seule la dernière transaction peut être perdue
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT}")
+            self._local.conn = conn
+        return conn
+
+    # --- Écriture ---
+
+    def add_measurement(self, fields):
+        """Met en attente une ligne au format CSV (écrite au prochain flush())."""
+        row = normalize_row([format_csv_value(value) if not isinstance(value, str) else value for value in fields])
+        if row is not None:
+            with self._pending_lock:
+                self._pending_measurements.append(row)
+
+    def flush(self):
+        """Écrit les lignes en attente en une seule transaction. Retourne le nombre de lignes."""
+        with self._pending_lock:
+            measurements, self._pending_measurements = self._pending_measurements, []
+        if not measurements:
+            return 0
+        try:
+            with self._connect() as conn:
+                conn.executemany(INSERT_MEASUREMENT, measurements)
+        except sqlite3.Error as e:
+            # Base occupée ou indisponible : les lignes seront retentées au prochain flush
+            with self._pending_lock:
+                self._pending_measurements[:0] = measurements
+                # Base durablement indisponible : on ne garde que les lignes les plus récentes
+                del self._pending_measurements[:-MAX_PENDING]
+            print(f"⚠️ Écriture SQLite différée : {e}")
+            return 0
+        return len(measurements)
+
+    def bulk_write(self, rows, policy="first"):
+        """
+        Écrit un lot de mesures normalisées en une transaction. En cas de
+        doublon : "first" garde la mesure en base, "last" la remplace,
+        "most_complete" garde celle qui a le plus de valeurs renseignées.
+        Retourne le nombre de lignes ajoutées ou remplacées.
+        """
+        conn = self._connect()
+        changes_before = conn.total_changes
+        with conn:
+            conn.executemany(BULK_WRITE[policy], rows)
+        return conn.total_changes - changes_before
+
+    def update_measurement(self, time_str, fields):
+        """Remplace la mesure `time_str` (fields : valeurs au format CSV). Retourne True si trouvée."""
+        row = normalize_row([time_str] + list(fields))
+        if row is None:
+            return False
+        with self._connect() as conn:
+            cursor = conn.execute(f"UPDATE measurements SET {', '.join(f'{c} = ?' for c in CSV_HEADERS[1:])} WHERE time = ?", row[1:] + (time_str,))
+        return cursor.rowcount > 0
+
+    def delete_measurement(self, time_str):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM measurements WHERE time = ?", (time_str,)).rowcount > 0
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM measurements")
+
+    # --- Lecture ---
+
+    @staticmethod
+    def _range_clause(start, end):
+        """Bornes [start, end[ (chaînes 'AAAA-MM-JJ HH:MM:SS' ou None)."""
+        clauses, params = [], []
+        if start:
+            clauses.append("time >= ?")
+            params.append(start)
+        if end:
+            clauses.append("time < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_range(self, start=None, end=None, limit=None, offset=0, newest_first=False):
+        """Mesures de la plage [start, end[ (tuples dans l'ordre de CSV_HEADERS)."""
+        where, params = self._range_clause(start, end)
+        sql = f"SELECT {', '.join(CSV_HEADERS)} FROM measurements{where} ORDER BY time{' DESC' if newest_first else ''}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return self._connect().execute(sql, params).fetchall()
+
+    def get_measurement(self, time_str):
+        return self._connect().execute(f"SELECT {', '.join(CSV_HEADERS)} FROM measurements WHERE time = ?", (time_str,)).fetchone()
+
+    def count(self, start=None, end=None):
+        where, params = self._range_clause(start, end)
+        return self._connect().execute(f"SELECT COUNT(*) FROM measurements{where}", params).fetchone()[0]
+
+    def last_time(self):
+        row = self._connect().execute("SELECT MAX(time) FROM measurements").fetchone()
+        return row[0] if row else None
+
+    def hourly_summary(self, start=None, end=None):
+        """
+        Agrégats horaires de la plage [start, end[ calculés par SQLite (comparaison
+        de stations) : tuples dans l'ordre de HOURLY_COLUMNS.
+        """
+        where, params = self._range_clause(start, end)
+        return self._connect().execute(
+            "SELECT substr(time, 1, 13) AS hour, AVG(temp), MIN(temp), MAX(temp), AVG(hum), AVG(pressure),"
+            " SUM(rain), AVG(wind_speed), MAX(wind_gust), COUNT(*)"
+            f" FROM measurements{where} GROUP BY hour ORDER BY hour", params).fetchall()
+
+    # --- Import / export CSV ---
+
+    def import_csv(self, filepath=CSV_FILE, newer_than=None, progress=None):
+        """
+        Importe un CSV de mesures (7, 8 ou 10 colonnes) par lots. Les horodatages
+        déjà présents sont ignorés : un import peut être relancé sans doublons.
+        Retourne le nombre de mesures ajoutées.
+        """
+        total = os.path.getsize(filepath)
+        batch = []
+        conn = self._connect()
+        changes_before = conn.total_changes
+        with open(filepath, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            for fields in csv.reader(line.replace('\x00', '') for line in f):
+                if not fields or (newer_than and fields[0] <= newer_than):
+                    continue
+                row = normalize_row(fields)
+                if row is None:
+                    continue
+                batch.append(row)
+                if len(batch) >= IMPORT_BATCH:
+                    with conn:
+                        conn.executemany(INSERT_MEASUREMENT, batch)
+                    batch = []
+                    if progress:
+                        progress(f.buffer.tell(), total)
+        if batch:
+            with conn:
+                conn.executemany(INSERT_MEASUREMENT, batch)
+        return conn.total_changes - changes_before
+
+    def iter_csv(self, start=None, end=None):
+        """Génère le contenu CSV (en-tête compris) ligne par ligne, pour /download."""
+        yield ",".join(CSV_HEADERS) + "\n"
+        where, params = self._range_clause(start, end)
+        cursor = self._connect().execute(f"SELECT {', '.join(CSV_HEADERS)} FROM measurements{where} ORDER BY time", params)
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                # Le champ direction ne contient jamais de virgule : pas besoin du module csv
+                yield ",".join(format_csv_value(value) for value in row) + "\n"
+
+    def export_csv(self, filepath):
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            for line in self.iter_csv():
+                f.write(line)
+
+_default_store = None
+_default_lock = threading.Lock()
+
+def get_store():
+    """Instance partagée du processus (ouverte au premier usage)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = MeteoStore()
+        return _default_store
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("import", "export"):
+        print("Utilisation : python meteo_store.py import|export [fichier.csv]")
+        sys.exit(1)
+    store = MeteoStore()
+    if sys.argv[1] == "import":
+        source = sys.argv[2] if len(sys.argv) > 2 else CSV_FILE
+        print(f"--- Import de {source} dans {store.path} ---")
+        imported = store.import_csv(source, progress=lambda done, total: print(f"\r  {done * 100 // max(total, 1):3d} %", end="", flush=True))
+        print(f"\n✅ {imported} mesures ajoutées, {store.count()} mesures dans la base.")
+    else:
+        destination = sys.argv[2] if len(sys.argv) > 2 else "meteo_log_export.csv"
+        store.export_csv(destination)
+        print(f"✅ {store.count()} mesures exportées dans {destination}.")
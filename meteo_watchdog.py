@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Supervision du cycle de mesure de meteo_capteur.py.
+#
+# Chaque étape qui peut bloquer (lecture I2C du BME280 ou de l'AS5600, DHT11,
+# écriture du CSV derrière le verrou de csv_repair.py) s'exécute dans son
+# propre thread. Le cycle n'attend son résultat que pendant le budget de
+# l'étape : au-delà, ou en cas d'erreur, il continue avec la dernière valeur
+# valide, signalée comme périmée. L'horodatage de la mesure ne dépend donc
+# plus d'un capteur lent.
+#
+# Le chien de garde (Watchdog) surveille les étapes : une étape bloquée depuis
+# plus de HANG_AFTER secondes reçoit un nouveau thread et son pilote est recréé
+# (fonction `restart`), sans redémarrer le processus. Le thread bloqué est
+# abandonné (il se terminera si l'appel finit par rendre la main).
+#
+
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from queue import Queue
+
+import meteo_metrics
+
+HANG_AFTER = 30.0        # Étape considérée comme bloquée (secondes)
+RESTART_BACKOFF = 60.0   # Délai minimal entre deux redémarrages du même pilote
+STALE_MAX_AGE = 600.0    # Âge maximal d'une dernière valeur valide réutilisée (secondes)
+WATCHDOG_INTERVAL = 5.0  # Période de vérification du chien de garde
+
+class Stage:
+    """
+    Étape supervisée : les appels s'exécutent dans l'ordre dans le thread de
+    l'étape, l'appelant n'attend jamais plus de `budget` secondes.
+
+    skip_when_busy : vrai pour une lecture de capteur (inutile d'empiler une
+    lecture derrière une lecture bloquée) ; faux pour une écriture, qui reste
+    en file et sera faite dès que possible.
+    restart : recrée le pilote après un blocage (None : jamais redémarrée).
+    """
+
+    def __init__(self, name, budget, restart=None, skip_when_busy=True, hang_after=HANG_AFTER, max_age=STALE_MAX_AGE):
+        self.name = name
+        self.budget = budget
+        self.restart = restart
+        self.skip_when_busy = skip_when_busy
+        self.hang_after = hang_after
+        self.max_age = max_age
+        self.last_good = None
+        self.last_good_time = None
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._jobs = None
+        self._busy_since = None
+        self._last_restart = 0.0
+        self._hang_reported = False
+        self._start_worker()
+
+    def _start_worker(self):
+        """Nouveau thread et nouvelle file (appelé sous self._lock après le premier démarrage)."""
+        self._generation += 1
+        self._jobs = Queue()
+        self._busy_since = None
+        threading.Thread(target=self._work, args=(self._jobs, self._generation), name=f"stage-{self.name}", daemon=True).start()
+
+    def _work(self, jobs, generation):
+        while True:
+            func, args, future = jobs.get()
+            with self._lock:
+                if generation != self._generation:
+                    return # Thread abandonné par le chien de garde
+                self._busy_since = time.monotonic()
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                meteo_metrics.inc("meteo_stage_failures_total", stage=self.name)
+                print(f"⚠️ Étape '{self.name}' : {e}")
+                future.set_exception(e)
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._busy_since = None
+
+    def busy_for(self):
+        """Durée de l'appel en cours dans le thread de l'étape (0 si inactif)."""
+        with self._lock:
+            return time.monotonic() - self._busy_since if self._busy_since is not None else 0.0
+
+    def stale_value(self):
+        """Dernière valeur valide si elle n'est pas trop ancienne, sinon None."""
+        if self.last_good_time is None or time.monotonic() - self.last_good_time > self.max_age:
+            return None
+        return self.last_good
+
+    def call(self, func, *args):
+        """
+        Exécute func(*args) dans le thread de l'étape. Retourne (valeur, fraîche) :
+        le résultat, ou (dernière valeur valide, False) si l'appel échoue, dépasse
+        son budget ou si l'étape est encore bloquée sur un appel précédent.
+        """
+        start = time.perf_counter()
+        try:
+            if self.skip_when_busy and self.busy_for() > self.budget:
+                meteo_metrics.inc("meteo_stage_timeouts_total", stage=self.name)
+                return self.stale_value(), False
+            future = Future()
+            with self._lock:
+                self._jobs.put((func, args, future))
+            try:
+                value = future.result(timeout=self.budget)
+            except FutureTimeoutError:
+                meteo_metrics.inc("meteo_stage_timeouts_total", stage=self.name)
+                print(f"⏱️ Étape '{self.name}' : pas de réponse en {self.budget:.1f}s, mesure poursuivie sans attendre.")
+                return self.stale_value(), False
+            except Exception:
+                return self.stale_value(), False # Déjà signalée par le thread de l'étape
+            self.last_good, self.last_good_time = value, time.monotonic()
+            return value, True
+        finally:
+            meteo_metrics.observe("meteo_stage_seconds", time.perf_counter() - start, stage=self.name)
+
+    def check(self):
+        """Vérification du chien de garde : redémarre le pilote d'une étape bloquée. Retourne vrai si redémarrée."""
+        busy = self.busy_for()
+        if busy < self.hang_after:
+            self._hang_reported = False
+            return False
+        if self.restart is None:
+            if not self._hang_reported:
+                print(f"🐕 Étape '{self.name}' bloquée depuis {busy:.0f}s (les appels suivants restent en file).")
+                self._hang_reported = True
+            return False
+        now = time.monotonic()
+        if now - self._last_restart < RESTART_BACKOFF:
+            return False
+        print(f"🐕 Étape '{self.name}' bloquée depuis {busy:.0f}s : redémarrage du pilote.")
+        with self._lock:
+            self._start_worker()
+            # Recréation du pilote dans le nouveau thread : si elle bloque à son tour,
+            # le chien de garde le verra au prochain passage.
+            self._jobs.put((self.restart, (), Future()))
+        self._last_restart = now
+        self.restarts += 1
+        meteo_metrics.inc("meteo_driver_restarts_total", stage=self.name)
+        return True
+
+class Watchdog:
+    """Thread de surveillance des étapes supervisées."""
+
+    def __init__(self, stages, interval=WATCHDOG_INTERVAL):
+        self.stages = list(stages)
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            for stage in self.stages:
+                try:
+                    stage.check()
+                except Exception as e:
+                    print(f"⚠️ Erreur du chien de garde ({stage.name}) : {e}")
@@ -1,70 +1,48 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import csv
 import time
 import base64
+import hmac
+import random
 from datetime import datetime, timedelta
-from flask import Flask, render_template, send_file, make_response, redirect, url_for, jsonify, request, flash
+from flask import Flask, Response, render_template, send_file, make_response, redirect, url_for, jsonify, request, flash, stream_with_context, g
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-import pandas as pd
 import os
-import matplotlib.pyplot as plt
 import shutil
-import matplotlib.font_manager as fm
-import matplotlib
-import matplotlib.dates as mdates # Ajout pour le formatage des dates sur l'axe X
-import io
-import re # Ajout du module pour les expressions régulières
-import numpy as np # Ajout de numpy pour les calculs
+import threading
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests # Ajout pour les requêtes API externes
 import json # Ajout pour gérer le fichier de configuration
-import paho.mqtt.client as mqtt # Ajout pour MQTT
-from PIL import Image # Pour la génération du fond de carte
-
-# On désactive l'affichage de Matplotlib sur le serveur
-plt.switch_backend('Agg')
+from meteo_config import CONFIG_FILE, ConfigWatcher, load_config, save_config
+from meteo_stats import read_snapshot as read_live_stats
+from meteo_wind import SECTORS_16, SPEED_LABELS, WindRoseStore
+from meteo_climate import RECORDS, ClimateStore
+import meteo_metrics # Métriques Prometheus (/metrics)
+import meteo_profiler # Profilage des requêtes (mode activé depuis /admin)
+import render_pool # Les graphiques Matplotlib sont rendus hors des threads Gunicorn (voir meteo_graphs.py)
+from lazy_import import LazyModule
+import csv_repair
+from csv_tail import TailReader, read_last_lines
+
+# Bibliothèques lourdes chargées au premier usage (démarrage rapide après un redémarrage du Pi).
+# Voir bench_startup.py pour mesurer le temps de démarrage.
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+requests = LazyModule("requests")
+data_cache = LazyModule("data_cache")   # pandas + numpy
+tile_client = LazyModule("tile_client") # PIL + requests
+meteo_store = LazyModule("meteo_store") # Base SQLite (storage_backend = "sqlite")
+meteo_import = LazyModule("meteo_import") # Import en masse d'historiques CSV
+meteo_stations = LazyModule("meteo_stations") # Stations distantes (serveur central)
 
 def cleanup_csv_on_startup(filepath):
     """
-    Vérifie et nettoie le fichier CSV au démarrage.
-    Tente de réparer les lignes corrompues (contenant des caractères NUL)
-    de manière plus performante et robuste.
+    Vérifie le fichier CSV au démarrage et répare les lignes corrompues
+    (caractères NUL). Seuls les octets ajoutés depuis la dernière vérification
+    sont parcourus (point de contrôle de csv_repair.py).
     """
-    if not os.path.exists(filepath):
-        return
-    
-    # Expression régulière pour trouver un timestamp valide (ex: 2025-11-08 10:30:00)
-    # C'est beaucoup plus robuste que de chercher seulement l'année.
-    timestamp_regex = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
-    
     try:
-        # On lit le fichier en mode binaire pour détecter les NUL bytes
-        with open(filepath, 'rb') as f:
-            content = f.read()
-
-        # On ne procède à la réécriture que si des caractères corrompus sont trouvés
-        if b'\x00' not in content:
-            return
-
-        print(f"Corruption détectée dans '{filepath}'. Début du nettoyage...")
-        cleaned_lines = []
-        # On décode en ignorant les erreurs pour pouvoir itérer sur les lignes
-        for line in content.decode('utf-8', errors='ignore').splitlines():
-            # On cherche une date valide dans la ligne pour la récupérer
-            match = timestamp_regex.search(line)
-            if match:
-                # On récupère la partie valide de la ligne à partir de la date
-                recovered_line = line[match.start():]
-                cleaned_lines.append(recovered_line)
-            else:
-                print(f"Ligne corrompue irrécupérable ignorée : {line.strip()}")
-
-        # On réécrit le fichier original avec les lignes nettoyées
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            f.write('\n'.join(cleaned_lines) + '\n')
-        print(f"Le fichier '{filepath}' a été nettoyé avec succès.")
+        csv_repair.verify_tail(filepath)
     except Exception as e:
         print(f"Erreur critique lors du nettoyage du fichier CSV : {e}")
 
@@ -75,113 +53,26 @@ if not os.path.exists(DATA_DIR):
 CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
 WIND_CSV_FILE = os.path.join(DATA_DIR, "wind_detail_log.csv")
 PLUVIOMETER_EVENT_LOG = os.path.join(DATA_DIR, "pluviometer_events.log")
-CONFIG_FILE = "config.json"
-
-def load_config():
-    """Charge la configuration depuis config.json."""
-    default_config = {
-        "owm_api_key": "METTRE_VOTRE_CLE_ICI",
-        "latitude": 48.85,
-        "longitude": 2.35,
-        "telegram_bot_token": "METTRE_VOTRE_TOKEN_ICI",
-        "telegram_chat_id": "",
-        "mqtt_enabled": False,
-        "mqtt_broker": "localhost",
-        "mqtt_port": 1883,
-        "mqtt_user": "",
-        "mqtt_password": "",
-        "mqtt_topic": "meteopi/sensors",
-        "samba_share": "",
-        "samba_user": "",
-        "samba_password": ""
-    }
-    try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                saved_config = json.load(f)
-                # Fusionne les valeurs par défaut avec les valeurs sauvegardées
-                return {**default_config, **saved_config}
-        return default_config
-    except (FileNotFoundError, json.JSONDecodeError):
-        return default_config
-
-def save_config(config_data):
-    """Sauvegarde la configuration dans config.json."""
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config_data, f, indent=4)
-
-def read_and_process_csv(filepath):
-    """
-    Lit le fichier CSV, en gérant les anciens (7 colonnes) et nouveaux (8 colonnes) formats,
-    et retourne un DataFrame nettoyé.
-    """
-    try:
-        # Lire avec un nombre de colonnes flexible et sans en-tête, en traitant tous les champs comme du texte au départ
-        df_raw = pd.read_csv(filepath, header=None, on_bad_lines='warn', engine='python', dtype=str, names=range(8))
-        
-        if df_raw.empty:
-            return pd.DataFrame(columns=["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str"])
-
-        # Vérifier et supprimer la ligne d'en-tête si elle existe
-        if df_raw.iloc[0, 0] == 'time':
-            df_raw = df_raw.iloc[1:]
-
-        # Réinitialiser l'index après une suppression potentielle de l'en-tête
-        df_raw.reset_index(drop=True, inplace=True)
-
-        # Créer le DataFrame final en convertissant les types immédiatement pour éviter les Warnings
-        df = pd.DataFrame({
-            "time": df_raw[0],
-            "temp": pd.to_numeric(df_raw[1], errors='coerce'),
-            "hum": pd.to_numeric(df_raw[2], errors='coerce'),
-            "pressure": pd.to_numeric(df_raw[3], errors='coerce'),
-            "rain": pd.to_numeric(df_raw[4], errors='coerce'),
-            "wind_speed": pd.to_numeric(df_raw[5], errors='coerce'),
-            "wind_gust": np.nan,
-            "wind_dir_str": "N/A"
-        })
-
-        # Gestion des formats (Ancien: 7 col, Nouveau: 8 col)
-        is_new_format = df_raw[7].notna()
-        if is_new_format.any():
-            # On assigne les rafales converties en numérique
-            df.loc[is_new_format, 'wind_gust'] = pd.to_numeric(df_raw.loc[is_new_format, 6], errors='coerce')
-            df.loc[is_new_format, 'wind_dir_str'] = df_raw.loc[is_new_format, 7]
-            
-        is_old_format = ~is_new_format
-        if is_old_format.any():
-            df.loc[is_old_format, 'wind_dir_str'] = df_raw.loc[is_old_format, 6]
-        
-        # --- CORRECTION AUTO : Rafales mal placées dans la direction ---
-        # On détecte si la colonne 'wind_dir_str' contient des nombres (ex: "12.5") au lieu de texte ("N", "NE")
-        # et si la colonne 'wind_gust' est vide pour ces lignes.
-        dir_as_num = pd.to_numeric(df['wind_dir_str'], errors='coerce')
-        
-        # Masque : La direction est un nombre ET la rafale est vide
-        misplaced_mask = dir_as_num.notna() & df['wind_gust'].isna()
-        
-        if misplaced_mask.any():
-            # On déplace la valeur numérique dans la bonne colonne (Rafale)
-            df.loc[misplaced_mask, 'wind_gust'] = dir_as_num[misplaced_mask]
-            # On marque la direction comme inconnue car elle était absente
-            df.loc[misplaced_mask, 'wind_dir_str'] = "N/A"
-
-        return df
-
-    except (FileNotFoundError, pd.errors.EmptyDataError):
-        return pd.DataFrame(columns=["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str"])
-    except Exception as e:
-        print(f"Erreur lors du traitement du fichier CSV : {e}")
-        return pd.DataFrame(columns=["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str"])
-
+PUBLISHER_STATUS_FILE = os.path.join(DATA_DIR, "publisher_status.json") # Écrit par meteo_publisher.py
+MQTT_INGEST_STATUS_FILE = os.path.join(DATA_DIR, "mqtt_ingest_status.json") # Écrit par mqtt_ingest.py
+# Dernières mesures lues sans relire les fichiers (API capteurs, vent temps réel toutes les 2s)
+csv_tail_reader = TailReader(CSV_FILE)
+wind_tail_reader = TailReader(WIND_CSV_FILE)
+# Histogrammes journaliers de la rose des vents, tenus à jour par meteo_capteur.py
+wind_rose_store = WindRoseStore(cache=False)
+# Résumés journaliers et records, finalisés chaque nuit par meteo_capteur.py
+climate_store = ClimateStore()
 # --- Chargement de la configuration au démarrage ---
-config = load_config()
+# Chaque worker Gunicorn surveille config.json : une modification faite via un
+# worker (ou un autre processus) est appliquée partout en quelques secondes.
+config_watcher = ConfigWatcher()
+config = config_watcher.config
 
 app = Flask(__name__)
 # Clé secrète pour la gestion des sessions Flask (nécessaire pour le login)
 
-# On exécute le nettoyage du CSV au démarrage de l'application
-cleanup_csv_on_startup(CSV_FILE)
+# Le nettoyage du CSV se fait en arrière-plan : le serveur répond immédiatement
+threading.Thread(target=cleanup_csv_on_startup, args=(CSV_FILE,), name="csv-cleanup", daemon=True).start()
 
 # Changez cette clé pour une chaîne de caractères aléatoire !
 app.secret_key = 'une-cle-secrete-tres-difficile-a-deviner'
@@ -193,6 +84,65 @@ login_manager.login_view = 'login' # Redirige les utilisateurs non connectés ve
 login_manager.login_message = "Veuillez vous connecter pour accéder à cette page."
 login_manager.login_message_category = "info"
 
+# --- Métriques internes (voir meteo_metrics.py) ---
+@app.before_request
+def start_request_timer():
+    meteo_metrics.start("web") # Premier appel dans chaque worker Gunicorn
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get("request_start")
+    if start is not None:
+        endpoint = request.endpoint or "unknown" # 404 : pas d'endpoint, une seule série
+        meteo_metrics.observe("meteo_http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        if response.status_code >= 500:
+            meteo_metrics.inc("meteo_http_errors_total", endpoint=endpoint)
+    return response
+
+# --- Profilage des requêtes (voir meteo_profiler.py) ---
+# Mode activé depuis /admin : une fraction des requêtes est profilée au hasard,
+# et l'administrateur connecté peut profiler une page précise avec ?profile=1.
+PROFILE_EXCLUDED_ENDPOINTS = {"static", "metrics", "admin_profile", "admin_profile_collapsed"}
+
+@app.before_request
+def start_profiling():
+    if not config.get("profiling_enabled") or request.endpoint in PROFILE_EXCLUDED_ENDPOINTS:
+        return
+    if request.args.get("profile") == "1" and current_user.is_authenticated:
+        reason = "flag"
+    elif random.random() < config.get("profiling_sample_rate", 0.0):
+        reason = "sample"
+    else:
+        return
+    capture = meteo_profiler.begin() # None si une autre requête du worker est déjà profilée
+    if capture is not None:
+        g.profile_capture = capture
+        g.profile_reason = reason
+        g.profile_time = time.time()
+
+@app.after_request
+def save_profile(response):
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        parts = meteo_profiler.end(capture, f"request:{request.endpoint or 'unknown'}")
+        try:
+            meteo_profiler.save({
+                "time": g.profile_time, "method": request.method, "path": request.full_path.rstrip("?"),
+                "endpoint": request.endpoint, "status": response.status_code, "duration": parts[0]["duration"],
+                "reason": g.profile_reason, "parts": parts,
+            })
+        except Exception as e:
+            print(f"⚠️ Enregistrement du profil impossible : {e}")
+    return response
+
+@app.teardown_request
+def discard_profile(exc):
+    """Arrête une capture restée ouverte (exception avant after_request)."""
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        meteo_profiler.end(capture, "request")
+
 # --- Modèle Utilisateur simple ---
 class User(UserMixin):
     def __init__(self, id, username, password=None, password_hash=None):
@@ -208,10 +158,6 @@ class User(UserMixin):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
-# Calibration du pluviomètre (identique à meteo_capteur.py) - 2024-05-26 (expérimentale)
-# Basé sur le test : 100ml d'eau (10mm) pour 53 basculements.
-MM_PER_TIP = 0.213 # Correction pour correspondre au capteur
-
 WINDY_THRESHOLD_KMH = 25.0 # Seuil en km/h pour considérer un épisode comme "venteux"
 
 # --- Base de données utilisateur ---
@@ -229,61 +175,22 @@ OWM_API_KEY = config.get("owm_api_key")
 LATITUDE = config.get("latitude")
 LONGITUDE = config.get("longitude")
 
-def generate_hourly_graph_base64(input_df, filter_recent=True, title="Données météo agrégées par heure (48 dernières heures)"):
-    """Génère un graphique horaire à partir du DataFrame et le retourne en base64."""
-    if input_df.empty:
-        return None
-
-    df = input_df.copy()
-    if filter_recent:
-        # Filtrer les données des dernières 48 heures
-        forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
-        df = df[df['time'] > forty_eight_hours_ago]
-
-    if df.empty:
-        return None
-
-    df.set_index('time', inplace=True)
+def apply_config(new_config, changed_keys):
+    """Met à jour les variables globales du worker lorsque config.json change."""
+    global config, LATITUDE, LONGITUDE, OWM_API_KEY
+    config = new_config
+    LATITUDE = new_config.get("latitude")
+    LONGITUDE = new_config.get("longitude")
+    OWM_API_KEY = new_config.get("owm_api_key")
+    if "admin_password_hash" in changed_keys and new_config.get("admin_password_hash"):
+        users["1"].password_hash = new_config["admin_password_hash"]
 
-    # Agréger les données par heure
-    # Moyenne pour la température et l'humidité, somme pour la pluie
-    df_hourly = df.resample('h').agg({'temp': 'mean', 'hum': 'mean', 'rain': 'sum'})
-    df_hourly.dropna(subset=['temp', 'hum'], how='all', inplace=True) # Supprimer les heures sans données
-
-    if df_hourly.empty:
-        return None
+config_watcher.subscribe(None, apply_config)
+config_watcher.start()
 
-    fig, ax1 = plt.subplots(figsize=(12, 6))
-
-    ax1.set_xlabel("Heure")
-    ax1.set_ylabel("Temp (°C) / Humidité (%)")
-    # Utilisation de l'index datetime directement pour l'axe X
-    ax1.plot(df_hourly.index, df_hourly["temp"], marker="o", color="tab:red", label="Température (°C)")
-    ax1.plot(df_hourly.index, df_hourly["hum"], marker="o", color="tab:blue", label="Humidité (%)")
-    ax1.grid(True, linestyle='--', alpha=0.6)
-
-    # Formatage de l'axe X pour afficher uniquement l'heure et gérer l'espacement
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Hh'))
-    # Définir les localisateurs pour les ticks majeurs (toutes les 3 heures) et mineurs (toutes les heures)
-    # Cela aide à éviter la superposition des labels et à avoir une bonne granularité
-    ax1.xaxis.set_major_locator(mdates.HourLocator(interval=3))
-    ax1.xaxis.set_minor_locator(mdates.HourLocator(interval=1))
-
-    # Axe Y de droite pour la Pluie
-    ax2 = ax1.twinx()
-    ax2.set_ylabel("Pluie (mm)", color="tab:green")
-    # Utilisation de l'index datetime directement pour l'axe X
-    # On spécifie la largeur des barres à 1/24 d'une journée (soit 1 heure) pour un affichage précis.
-    # L'alignement 'edge' place la barre à droite de son point de données, ce qui est plus intuitif pour une somme horaire.
-    ax2.bar(df_hourly.index, df_hourly["rain"], width=1/24, color="tab:green", alpha=0.6, label="Pluie (mm)", align='edge')
-    ax2.tick_params(axis='y', labelcolor="tab:green")
-
-    fig.legend(loc="upper left", bbox_to_anchor=(0.1, 0.9))
-    plt.xticks(rotation=70, ha="right")
-    plt.title(title)
-    plt.tight_layout()
-
-    return _save_graph_to_base64(fig)
+def use_sqlite():
+    """Vrai si l'historique est servi par la base SQLite (option storage_backend, voir meteo_store.py)."""
+    return config.get("storage_backend") == "sqlite"
 
 def get_weather_prediction(df):
     """Analyse la tendance de la pression pour fournir une prédiction simple."""
@@ -306,8 +213,10 @@ def get_weather_prediction(df):
 
     # Calcul de la tendance de pression (hPa par 3 heures)
     pressure_change = recent_data['pressure'].iloc[-1] - recent_data['pressure'].iloc[0]
+    return describe_pressure_trend(pressure_change, recent_data['pressure'].iloc[-1])
 
-    # Logique de prédiction
+def describe_pressure_trend(pressure_change, current_pressure):
+    """Traduit la variation de pression sur 3h en prédiction textuelle."""
     if pressure_change < -1.6:
         return "Détérioration rapide, pluie ou vent probable."
     elif pressure_change < -0.5:
@@ -317,7 +226,8 @@ def get_weather_prediction(df):
     elif pressure_change > 0.5:
         return "Lente amélioration, temps stable."
     else:
-        current_pressure = recent_data['pressure'].iloc[-1]
+        if current_pressure is None:
+            return "Pas de changement significatif prévu."
         if current_pressure > 1022:
             return "Temps stable et calme (haute pression)."
         elif current_pressure < 1000:
@@ -325,223 +235,6 @@ def get_weather_prediction(df):
         else:
             return "Pas de changement significatif prévu."
 
-def generate_wind_rose_base64(df):
-    """Génère une rose des vents et la retourne en base64."""
-    df_wind = df.dropna(subset=['wind_dir_str'])
-    if df_wind.empty:
-        return None
-
-    # Ordre cardinal et conversion en radians
-    directions_map = {
-        'N': 0, 'NE': np.pi/4, 'E': np.pi/2, 'SE': 3*np.pi/4,
-        'S': np.pi, 'SO': 5*np.pi/4, 'O': 3*np.pi/2, 'NO': 7*np.pi/4
-    }
-    dir_order = ['N', 'NE', 'E', 'SE', 'S', 'SO', 'O', 'NO']
-    
-    # Calcul de la fréquence de chaque direction
-    counts = df_wind['wind_dir_str'].value_counts()
-    # S'assure que toutes les directions sont présentes, même avec une fréquence de 0
-    freq = [counts.get(d, 0) for d in dir_order]
-    angles = [directions_map[d] for d in dir_order]
-
-    fig = plt.figure(figsize=(8, 8))
-    ax = fig.add_subplot(111, polar=True)
-    
-    # Utilise un bar plot sur un axe polaire
-    ax.bar(angles, freq, width=np.pi/4, alpha=0.7, color='dodgerblue', edgecolor='k')
-    
-    # Configuration des labels pour les directions cardinales
-    ax.set_xticks(angles)
-    ax.set_xticklabels(dir_order)
-    
-    # Positionne les labels de rayon (fréquence)
-    ax.set_rlabel_position(22.5)
-    ax.tick_params(axis='y', labelsize=10)
-    ax.set_title('Fréquence des Directions du Vent', pad=20, fontsize=16)
-    ax.grid(True, linestyle='--', alpha=0.6)
-
-    return _save_graph_to_base64(fig)
-
-def generate_wind_speed_graph_48h_base64(df):
-    """Génère un graphique de vitesse du vent sur 48h."""
-    df_wind = df.dropna(subset=['wind_speed', 'time']).copy()
-    
-    # Filtrer les données des dernières 48 heures
-    forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
-    df_wind = df_wind[df_wind['time'] > forty_eight_hours_ago]
-
-    if len(df_wind) < 2:
-        return None
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    
-    # Tracé de la vitesse moyenne (remplissage)
-    ax.plot(df_wind['time'], df_wind['wind_speed'], color='deepskyblue', label='Vent moyen', alpha=0.7)
-    ax.fill_between(df_wind['time'], df_wind['wind_speed'], color='deepskyblue', alpha=0.2)
-
-    # Tracé des rafales (points et ligne fine)
-    if 'wind_gust' in df_wind.columns:
-        ax.plot(df_wind['time'], df_wind['wind_gust'], color='orange', linestyle='None', marker='o', markersize=3, label='Rafales (pics 2s)')
-
-    # Ajout de la rafale max
-    max_speed = df_wind['wind_gust'].max() if 'wind_gust' in df_wind.columns else df_wind['wind_speed'].max()
-    if pd.notna(max_speed):
-        ax.axhline(y=max_speed, color='red', linestyle='--', alpha=0.5, label=f'Record période: {max_speed:.1f} km/h')
-
-    ax.set_xlabel("Heure")
-    ax.set_ylabel("Vitesse (km/h)")
-    ax.set_title("Vitesse du Vent (48 dernières heures)")
-    ax.legend()
-    ax.grid(True, linestyle='--', alpha=0.7)
-    
-    # Formatage de l'axe X
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %Hh'))
-    ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
-    plt.xticks(rotation=45, ha="right")
-    fig.tight_layout()
-
-    return _save_graph_to_base64(fig)
-
-def generate_pressure_graph_base64(df):
-    """Génère un graphique de pression sur 48h avec tendance."""
-    df_pressure = df.dropna(subset=['pressure', 'time']).copy()
-    
-    # Filtrer les données des dernières 48 heures
-    forty_eight_hours_ago = datetime.now() - timedelta(hours=48)
-    df_pressure = df_pressure[df_pressure['time'] > forty_eight_hours_ago]
-
-    if len(df_pressure) < 2:
-        return None
-
-    fig, ax = plt.subplots(figsize=(12, 6))
-    ax.plot(df_pressure['time'], df_pressure['pressure'], marker='.', linestyle='-', label='Pression mesurée', color='purple')
-
-    # Calcul et affichage de la ligne de tendance
-    x_numeric = mdates.date2num(df_pressure['time'])
-    z = np.polyfit(x_numeric, df_pressure['pressure'], 1)
-    p = np.poly1d(z)
-    ax.plot(df_pressure['time'], p(x_numeric), "r--", label='Tendance', alpha=0.8)
-
-    ax.set_xlabel("Heure")
-    ax.set_ylabel("Pression (hPa)")
-    ax.set_title("Pression Atmosphérique (48 dernières heures)")
-    ax.legend()
-    ax.grid(True, linestyle='--', alpha=0.7)
-    
-    # Formatage de l'axe X
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %Hh'))
-    ax.xaxis.set_major_locator(mdates.HourLocator(interval=6))
-    plt.xticks(rotation=45, ha="right")
-    fig.tight_layout()
-
-    return _save_graph_to_base64(fig)
-
-def generate_rain_accumulation_graph_base64(df):
-    """Génère un histogramme du cumul de pluie journalier sur les 7 derniers jours."""
-    df_rain = df.dropna(subset=['rain', 'time']).copy()
-    df_rain.set_index('time', inplace=True)
-
-    # Agréger la pluie par jour
-    daily_rain = df_rain['rain'].resample('D').sum()
-    
-    # Garder uniquement les 7 derniers jours
-    daily_rain = daily_rain.tail(7)
-
-    if daily_rain.empty:
-        return None
-
-    fig, ax = plt.subplots(figsize=(10, 6))
-    bars = ax.bar(daily_rain.index, daily_rain.values, color='mediumseagreen')
-
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Cumul de Pluie (mm)")
-    ax.set_title("Cumul de Pluie Journalier (7 derniers jours)")
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-
-    # Formatage de l'axe X pour afficher "Jour/Mois"
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-    plt.xticks(rotation=0, ha="center")
-    fig.tight_layout()
-
-    return _save_graph_to_base64(fig)
-
-def generate_stats_graph_base64(stats):
-    """Génère un graphique en barres pour les températures Min/Max (jour, semaine, mois)."""
-    labels = ['Aujourd\'hui', 'Semaine', 'Mois']
-    
-    # On essaie de convertir les stats en float, en ignorant les 'N/A'
-    try:
-        mins = [float(stats['day'][0]), float(stats['week'][0]), float(stats['month'][0])]
-        maxs = [float(stats['day'][1]), float(stats['week'][1]), float(stats['month'][1])]
-    except (ValueError, TypeError):
-        # Si une valeur est 'N/A', on ne génère pas le graphique
-        return None
-
-    x = range(len(labels))  # positions des labels
-    width = 0.35  # largeur des barres
-
-    fig, ax = plt.subplots(figsize=(8, 5))
-    rects1 = ax.bar([i - width/2 for i in x], mins, width, label='Min', color='royalblue')
-    rects2 = ax.bar([i + width/2 for i in x], maxs, width, label='Max', color='crimson')
-
-    # Ajout des labels, titre et legendes
-    ax.set_ylabel('Température (°C)')
-    ax.set_title('Écarts de Température (Min/Max)')
-    ax.set_xticks(x)
-    ax.set_xticklabels(labels)
-    ax.legend()
-    ax.grid(axis='y', linestyle='--', alpha=0.7)
-
-    # Ajout des valeurs au-dessus des barres
-    for rect in rects1 + rects2:
-        height = rect.get_height()
-        ax.annotate(f'{height:.1f}',
-                    xy=(rect.get_x() + rect.get_width() / 2, height),
-                    xytext=(0, 3),  # 3 points de décalage vertical
-                    textcoords="offset points",
-                    ha='center', va='bottom')
-
-    fig.tight_layout()
-    return _save_graph_to_base64(fig)
-
-def generate_wind_graph_base64(df):
-    """Génère un graphique de la vitesse du vent sur les 6 dernières heures."""
-    df_wind = df.dropna(subset=['wind_speed', 'time']).copy()
-    
-    # Filtrer les données des dernières 6 heures
-    six_hours_ago = datetime.now() - timedelta(hours=6)
-    df_wind = df_wind[df_wind['time'] > six_hours_ago]
-
-    if df_wind.empty:
-        return None
-
-    fig, ax = plt.subplots(figsize=(8, 4))
-    
-    # Tracé de la vitesse
-    ax.plot(df_wind['time'], df_wind['wind_speed'], color='tab:blue', linewidth=2, label='Moyenne (1 min)')
-    ax.fill_between(df_wind['time'], df_wind['wind_speed'], color='tab:blue', alpha=0.2)
-
-    # Tracé des rafales si disponibles
-    if 'wind_gust' in df_wind.columns:
-        ax.plot(df_wind['time'], df_wind['wind_gust'], color='orange', linestyle='None', marker='.', markersize=4, label='Rafales (3 sec)')
-        # Ajout d'une ligne pour le record sur la période
-        max_gust = df_wind['wind_gust'].max()
-        if pd.notna(max_gust):
-            ax.axhline(y=max_gust, color='red', linestyle='--', alpha=0.3, label=f'Max: {max_gust:.1f} km/h')
-
-    ax.set_ylabel("Vitesse (km/h)")
-    ax.set_title("Vent (6 dernières heures)")
-    ax.legend()
-    ax.grid(True, linestyle='--', alpha=0.6)
-    
-    # Formatage de l'axe X
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-    plt.xticks(rotation=0, ha="center")
-    
-    fig.tight_layout()
-
-    return _save_graph_to_base64(fig)
-
 def get_rain_summary(df, start_time=None, end_time=None):
     """Analyse les données de pluie et génère un résumé textuel."""
     if df.empty:
@@ -621,8 +314,10 @@ def get_temp_hum_summary(df):
 
     # Calcul des changements
     temp_change = recent_data['temp'].iloc[-1] - recent_data['temp'].iloc[0]
-    hum_change = recent_data['hum'].iloc[-1] - recent_data['hum'].iloc[0]
+    return describe_temp_trend(temp_change)
 
+def describe_temp_trend(temp_change):
+    """Traduit la variation de température sur 3h en phrase de tendance."""
     # --- Analyse de la température ---
     if temp_change > 0.8:
         temp_trend = f"en hausse ({temp_change:+.1f}°C)"
@@ -716,15 +411,6 @@ def send_telegram_message(token, chat_id, message):
     except requests.RequestException as e:
         return False, f"Erreur de connexion à l'API Telegram: {e}"
 
-def latlon_to_tile_coords(lat, lon, zoom):
-    """Convertit des coordonnées GPS en coordonnées de tuile OpenStreetMap."""
-    import math
-    lat_rad = math.radians(lat)
-    n = 2.0 ** zoom
-    xtile = int((lon + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return (xtile, ytile)
-
 @login_manager.user_loader
 def load_user(user_id):
     """Charge un utilisateur à partir de son ID pour Flask-Login."""
@@ -811,14 +497,11 @@ def get_temp_gradient(min_t, max_t):
     return f"linear-gradient(90deg, {', '.join(gradient_parts)})"
 
 def read_log_tail(filename, num_lines=30):
-    """Lit les dernières lignes d'un fichier de log."""
+    """Lit les dernières lignes d'un fichier de log (lecture par blocs depuis la fin)."""
     if not os.path.exists(filename):
         return f"Fichier non trouvé : {filename} (Vérifiez le dossier logs/)"
     try:
-        with open(filename, 'r', encoding='utf-8', errors='ignore') as f:
-            # On lit tout le fichier (supposé de taille raisonnable pour des logs rotatifs)
-            lines = f.readlines()
-            return "".join(lines[-num_lines:])
+        return "\n".join(read_last_lines(filename, num_lines, complete_only=False))
     except Exception as e:
         return f"Erreur de lecture : {e}"
 
@@ -832,8 +515,12 @@ def home():
     rain_scale_max, wind_scale_max = 0, 0 # Valeurs max pour les échelles
     press_scale_min, press_scale_max = 2000, 0 # Valeurs initiales pour l'échelle de pression
 
+    # Statistiques glissantes publiées par meteo_capteur.py (None si le processus est arrêté)
+    live_stats = read_live_stats()
+    live_derived = live_stats["derived"] if live_stats else {}
+
     try:
-        df = read_and_process_csv(CSV_FILE)
+        df = data_cache.load_dataframe(CSV_FILE)
         if not df.empty:
             # Conversion des types, en gérant les erreurs
             df['time'] = pd.to_datetime(df['time'], errors='coerce')
@@ -853,9 +540,13 @@ def home():
             pressure = f"{last_reading['pressure']:.1f}" if pd.notna(last_reading['pressure']) else "N/A"
             hum = f"{last_reading['hum']:.0f}"
             
-            # Calcul du cumul de pluie sur les dernières 24h
-            last_24h = df[df['time'] > (datetime.now() - timedelta(hours=24))]
-            rain_24h = last_24h['rain'].sum()
+            # Cumul de pluie sur les dernières 24h : fourni directement par les
+            # statistiques glissantes du processus capteurs, sinon recalculé depuis le CSV
+            if live_derived.get("rain_24h") is not None:
+                rain_24h = live_derived["rain_24h"]
+            else:
+                last_24h = df[df['time'] > (datetime.now() - timedelta(hours=24))]
+                rain_24h = last_24h['rain'].sum()
             rain = f"{rain_24h:.2f}"
 
             # --- Calcul des statistiques Min/Max ---
@@ -1005,10 +696,13 @@ def home():
             press_scale_max += 2
             
             # Génération de la prédiction (uniquement si des données de pression existent)
-            prediction = get_weather_prediction(df)
+            if live_derived.get("pressure_change_3h") is not None:
+                prediction = describe_pressure_trend(live_derived["pressure_change_3h"], live_derived.get("pressure_last"))
+            else:
+                prediction = get_weather_prediction(df)
             
             # Génération du graphique de vent (6h)
-            wind_graph = generate_wind_graph_base64(df)
+            wind_graph = render_pool.render("wind_6h")
 
             last_update = last_reading['time'].strftime("%d/%m/%Y à %H:%M:%S")
 
@@ -1018,7 +712,10 @@ def home():
     
     # On déplace les appels aux fonctions d'analyse ici pour plus de clarté
     rain_summary = get_rain_summary(df) if 'df' in locals() and not df.empty else "Données non disponibles."
-    temp_hum_summary = get_temp_hum_summary(df) if 'df' in locals() and not df.empty else None
+    if live_derived.get("temp_change_3h") is not None:
+        temp_hum_summary = describe_temp_trend(live_derived["temp_change_3h"])
+    else:
+        temp_hum_summary = get_temp_hum_summary(df) if 'df' in locals() and not df.empty else None
     wind_summary = get_wind_summary(df) if 'df' in locals() and not df.empty else "Données non disponibles."
     
     return render_template("home.html", temp=temp, hum=hum, pressure=pressure, rain=rain, wind=wind, wind_gust=wind_gust, wind_dir=wind_dir, last_update=last_update, prediction=prediction, stats=stats, scale_min=scale_min, scale_max=scale_max, press_scale_min=press_scale_min, press_scale_max=press_scale_max, rain_scale_max=rain_scale_max, wind_scale_max=wind_scale_max, rain_summary=rain_summary, temp_hum_summary=temp_hum_summary, wind_summary=wind_summary, wind_graph=wind_graph)
@@ -1030,19 +727,21 @@ def pluviometer_logs_page():
     logs_content = "Aucun basculement enregistré pour le moment."
     total_tips = 0
     total_rain = 0.0
+    mm_per_tip = config.get("rain_mm_per_tip", 0.213) # Même étalonnage que meteo_capteur.py
     try:
         with open(PLUVIOMETER_EVENT_LOG, "r") as f:
             lines = f.readlines()
             if lines:
                 logs_content = "".join(lines)
                 total_tips = len(lines)
-                total_rain = total_tips * MM_PER_TIP
+                total_rain = total_tips * mm_per_tip
     except FileNotFoundError:
         pass # Le fichier n'existe pas encore
     return render_template("pluviometer_logs.html", 
                            logs_content=logs_content, 
                            total_tips=total_tips, 
-                           total_rain=f"{total_rain:.2f}")
+                           total_rain=f"{total_rain:.2f}",
+                           mm_per_tip=mm_per_tip)
 
 @app.route("/admin/clear_data", methods=['POST'])
 @login_required
@@ -1060,6 +759,9 @@ def admin_clear_data():
         # Supprime le fichier de logs détaillés du vent
         if os.path.exists(WIND_CSV_FILE):
             os.remove(WIND_CSV_FILE)
+
+        if use_sqlite():
+            meteo_store.get_store().clear()
             
     except Exception as e:
         print(f"Erreur lors de l'effacement des fichiers de données : {e}")
@@ -1090,36 +792,26 @@ def delete_history_line():
         flash("Identifiant de ligne manquant.", "danger")
         return redirect(url_for('history'))
     
+    # En stockage SQLite, la base sert l'historique mais le CSV reste lu par les
+    # autres pages, les graphiques, les résumés climatiques, le bot et les
+    # sauvegardes : la mesure est supprimée des deux.
+    found, errors = False, []
+    if use_sqlite():
+        try:
+            found = meteo_store.get_store().delete_measurement(timestamp)
+        except Exception as e:
+            errors.append(f"base : {e}")
     try:
-        lines = []
-        found = False
-        # Lecture du fichier CSV et filtrage de la ligne à supprimer
-        if os.path.exists(CSV_FILE):
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                header = next(reader, None)
-                if header:
-                    lines.append(header)
-                
-                for row in reader:
-                    if len(row) > 0 and row[0] == timestamp:
-                        found = True
-                        continue # On saute (supprime) cette ligne
-                    lines.append(row)
-            
-            if found:
-                with open(CSV_FILE, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerows(lines)
-                flash(f"Mesure du {timestamp} supprimée avec succès.", "success")
-            else:
-                flash("Ligne introuvable dans le fichier.", "warning")
-        else:
-            flash("Fichier de données introuvable.", "danger")
-            
+        found = csv_repair.rewrite_rows(timestamp, lambda row: None, CSV_FILE) > 0 or found
     except Exception as e:
-        flash(f"Erreur lors de la suppression : {e}", "danger")
-        
+        errors.append(f"CSV : {e}")
+
+    if errors:
+        flash(f"Erreur lors de la suppression ({'; '.join(errors)}).", "danger")
+    elif found:
+        flash(f"Mesure du {timestamp} supprimée avec succès.", "success")
+    else:
+        flash("Ligne introuvable.", "warning")
     return redirect(url_for('history'))
 
 @app.route('/history/update', methods=['POST'])
@@ -1141,74 +833,84 @@ def update_history_line():
     new_gust = request.form.get('wind_gust')
     new_wind_dir = request.form.get('wind_dir')
 
+    # Comme pour la suppression : la base (stockage SQLite) et le CSV sont modifiés
+    found, errors = False, []
+    if use_sqlite():
+        try:
+            store = meteo_store.get_store()
+            current = store.get_measurement(original_time)
+            # L'angle mesuré n'est conservé que si la direction n'a pas été modifiée
+            angle_cols = [meteo_store.format_csv_value(v) for v in current[8:10]] if current and current[7] == new_wind_dir else []
+            found = bool(current) and store.update_measurement(original_time, [new_temp, new_hum, new_pressure, new_rain, new_wind, new_gust, new_wind_dir] + angle_cols)
+        except Exception as e:
+            errors.append(f"base : {e}")
+
+    def updated_row(row):
+        # Mise à jour de la ligne (on conserve l'ordre du CSV)
+        angle_cols = row[8:10] if len(row) > 7 and row[7] == new_wind_dir else []
+        return [original_time, new_temp, new_hum, new_pressure, new_rain, new_wind, new_gust, new_wind_dir] + angle_cols
+
     try:
-        lines = []
-        updated = False
-        if os.path.exists(CSV_FILE):
-            with open(CSV_FILE, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                header = next(reader, None)
-                if header:
-                    lines.append(header)
-                
-                for row in reader:
-                    if len(row) > 0 and row[0] == original_time:
-                        # Mise à jour de la ligne (on conserve l'ordre du CSV)
-                        lines.append([original_time, new_temp, new_hum, new_pressure, new_rain, new_wind, new_gust, new_wind_dir])
-                        updated = True
-                    else:
-                        lines.append(row)
-            
-            if updated:
-                # Écriture atomique via un fichier temporaire pour la sécurité
-                temp_file = CSV_FILE + '.tmp'
-                with open(temp_file, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerows(lines)
-                shutil.move(temp_file, CSV_FILE)
-                flash(f"Mesure du {original_time} mise à jour avec succès.", "success")
-            else:
-                flash("Ligne introuvable pour mise à jour.", "warning")
+        found = csv_repair.rewrite_rows(original_time, updated_row, CSV_FILE) > 0 or found
     except Exception as e:
-        flash(f"Erreur lors de la mise à jour : {e}", "danger")
+        errors.append(f"CSV : {e}")
 
+    if errors:
+        flash(f"Erreur lors de la mise à jour ({'; '.join(errors)}).", "danger")
+    elif found:
+        flash(f"Mesure du {original_time} mise à jour avec succès.", "success")
+    else:
+        flash("Ligne introuvable pour mise à jour.", "warning")
     return redirect(url_for('history'))
 
+def format_history_entry(time_value, temp, hum, pressure, rain, wind_speed, wind_gust, wind_dir):
+    """Ligne de l'historique prête pour le template (valeur manquante -> chaîne vide)."""
+    def fmt(value, spec):
+        return "" if value is None or value != value else format(value, spec) # value != value : NaN
+    return {
+        'original_time': time_value.strftime('%Y-%m-%d %H:%M:%S'), # Identifiant unique pour suppression
+        'display_time': time_value.strftime('%d/%m/%Y %H:%M'),
+        'temp': fmt(temp, ".1f"),
+        'hum': fmt(hum, ".0f"),
+        'pressure': fmt(pressure, ".1f"),
+        'rain': fmt(rain, ".3f"),
+        'wind_speed': fmt(wind_speed, ".1f"),
+        'wind_gust': fmt(wind_gust, ".1f"),
+        'wind_dir': wind_dir if isinstance(wind_dir, str) else ""
+    }
+
 @app.route('/history')
 @login_required
 def history():
     """Affiche l'historique complet des données avec pagination et filtrage par date."""
     try:
-        df = read_and_process_csv(CSV_FILE)
-        df.dropna(subset=['time'], inplace=True) # On s'assure que la colonne 'time' n'est pas vide
-        df['time'] = pd.to_datetime(df['time'], errors='coerce')
-        df.dropna(subset=['time'], inplace=True) # On supprime les lignes où la conversion de date a échoué
-
-        # Conversion des colonnes en numérique pour éviter les erreurs de formatage
-        numeric_cols = ['temp', 'hum', 'pressure', 'rain', 'wind_speed', 'wind_gust']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-
         # --- Logique de filtrage par date ---
         start_date_str = request.args.get('start_date', '')
         end_date_str = request.args.get('end_date', '')
-        
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            df = df[df['time'] >= start_date]
-        
-        if end_date_str:
-            # On ajoute un jour et on compare à "inférieur à" pour inclure toute la journée de la date de fin.
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1)
-            df = df[df['time'] < end_date]
-
-        # On inverse le DataFrame pour avoir les données les plus récentes en premier
-        df = df.iloc[::-1]
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d') if start_date_str else None
+        # On ajoute un jour et on compare à "inférieur à" pour inclure toute la journée de la date de fin.
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d') + timedelta(days=1) if end_date_str else None
+
+        sqlite_mode = use_sqlite()
+        if sqlite_mode:
+            # Comptage et page lus directement dans l'index de la base
+            store = meteo_store.get_store()
+            bounds = [d.strftime('%Y-%m-%d %H:%M:%S') if d else None for d in (start_date, end_date)]
+            total_rows = store.count(*bounds)
+        else:
+            df = data_cache.load_dataframe(CSV_FILE)
+            df.dropna(subset=['time'], inplace=True) # On supprime les lignes où la conversion de date a échoué
+            if start_date:
+                df = df[df['time'] >= start_date]
+            if end_date:
+                df = df[df['time'] < end_date]
+            # On inverse le DataFrame pour avoir les données les plus récentes en premier
+            df = df.iloc[::-1]
+            total_rows = len(df)
 
         # Logique de pagination
         page = request.args.get('page', 1, type=int)
         per_page = 50  # 50 entrées par page
-        total_rows = len(df) 
         total_pages = (total_rows + per_page - 1) // per_page
         
         if page < 1: page = 1
@@ -1216,7 +918,6 @@ def history():
 
         start = (page - 1) * per_page
         end = start + per_page
-        df_page = df.iloc[start:end].copy() # .copy() pour éviter un avertissement
 
         # --- Calcul de la pagination intelligente ---
         # Génère une liste comme [1, None, 49, 50, 51, None, 100] où None deviendra "..."
@@ -1245,19 +946,13 @@ def history():
                     prev = p
 
         # Préparation des données pour le template (liste de dictionnaires)
-        history_data = []
-        for _, row in df_page.iterrows():
-            history_data.append({
-                'original_time': row['time'].strftime('%Y-%m-%d %H:%M:%S'), # Identifiant unique pour suppression
-                'display_time': row['time'].strftime('%d/%m/%Y %H:%M'),
-                'temp': f"{row['temp']:.1f}" if pd.notna(row['temp']) else "",
-                'hum': f"{row['hum']:.0f}" if pd.notna(row['hum']) else "",
-                'pressure': f"{row['pressure']:.1f}" if pd.notna(row['pressure']) else "",
-                'rain': f"{row['rain']:.3f}" if pd.notna(row['rain']) else "",
-                'wind_speed': f"{row['wind_speed']:.1f}" if pd.notna(row['wind_speed']) else "",
-                'wind_gust': f"{row['wind_gust']:.1f}" if pd.notna(row['wind_gust']) else "",
-                'wind_dir': row['wind_dir_str'] if pd.notna(row['wind_dir_str']) else ""
-            })
+        columns = ['temp', 'hum', 'pressure', 'rain', 'wind_speed', 'wind_gust', 'wind_dir_str']
+        if sqlite_mode:
+            page_rows = store.query_range(*bounds, limit=per_page, offset=start, newest_first=True)
+            history_data = [format_history_entry(datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S'), *row[1:8]) for row in page_rows]
+        else:
+            df_page = df.iloc[start:end]
+            history_data = [format_history_entry(*row) for row in df_page[['time'] + columns].itertuples(index=False)]
 
     except (FileNotFoundError, pd.errors.EmptyDataError):
         history_data = []
@@ -1302,7 +997,37 @@ def admin_page():
                 system_status['active'] = True
         except Exception: pass
 
-    return render_template('admin.html', config=config, logs=logs_data, system_status=system_status)
+    # --- État des files d'attente réseau (MQTT / InfluxDB) ---
+    publisher_status = None
+    try:
+        with open(PUBLISHER_STATUS_FILE, 'r') as f:
+            publisher_status = json.load(f)
+        publisher_status['updated_str'] = datetime.fromtimestamp(publisher_status.get('updated', 0)).strftime("%d/%m/%Y %H:%M:%S")
+    except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError):
+        pass
+
+    # --- Service d'ingestion MQTT (tableau de bord séparé du capteur) ---
+    ingest_status = None
+    try:
+        with open(MQTT_INGEST_STATUS_FILE, 'r') as f:
+            ingest_status = json.load(f)
+        ingest_status['updated_str'] = datetime.fromtimestamp(ingest_status.get('updated', 0)).strftime("%d/%m/%Y %H:%M:%S")
+    except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError):
+        pass
+
+    # --- Dernier import en masse (fusion d'historiques) ---
+    import_status = meteo_import.read_status()
+    if import_status:
+        import_status['started_str'] = datetime.fromtimestamp(import_status.get('started', 0)).strftime("%d/%m/%Y %H:%M:%S")
+
+    # --- Derniers profils de requêtes ---
+    profiles = meteo_profiler.list_profiles()
+    for profile in profiles:
+        profile['time_str'] = datetime.fromtimestamp(profile.get('time') or 0).strftime("%d/%m %H:%M:%S")
+
+    return render_template('admin.html', config=config, logs=logs_data, system_status=system_status, publisher_status=publisher_status,
+                           import_status=import_status, conflict_policies=meteo_import.CONFLICT_POLICIES, ingest_status=ingest_status,
+                           profiles=profiles)
 
 @app.route('/admin/update_config', methods=['POST'])
 @login_required
@@ -1334,13 +1059,8 @@ def admin_update_config():
 
         save_config(current_config)
         
-        # On recharge la configuration pour la session en cours
-        global config, LATITUDE, LONGITUDE, OWM_API_KEY
-        config = current_config
-        # Utilisation de valeurs de secours sécurisées pour éviter float(None)
-        LATITUDE = float(config.get('latitude') if config.get('latitude') is not None else 48.85)
-        LONGITUDE = float(config.get('longitude') if config.get('longitude') is not None else 2.35)
-        OWM_API_KEY = config.get('owm_api_key', '')
+        # Application immédiate dans ce worker (les autres suivront via leur surveillance)
+        config_watcher.check()
 
         flash("Configuration mise à jour avec succès !", "success")
     except ValueError:
@@ -1349,6 +1069,52 @@ def admin_update_config():
         flash(f"Une erreur est survenue : {e}", "danger")
     return redirect(url_for('admin_page'))
 
+@app.route('/admin/profiling', methods=['POST'])
+@login_required
+def admin_profiling():
+    """Active ou désactive le profilage des requêtes et règle la fraction échantillonnée."""
+    try:
+        rate = float(request.form.get('profiling_sample_rate') or 0) / 100
+        if not 0 <= rate <= 1:
+            raise ValueError(rate)
+        current_config = load_config()
+        current_config["profiling_enabled"] = request.form.get('profiling_enabled') == 'on'
+        current_config["profiling_sample_rate"] = rate
+        save_config(current_config)
+        config_watcher.check()
+        flash("Réglages du profilage enregistrés.", "success")
+    except ValueError:
+        flash("Erreur : le pourcentage de requêtes profilées doit être compris entre 0 et 100.", "danger")
+    return redirect(url_for('admin_page'))
+
+@app.route('/admin/profiles/<profile_id>')
+@login_required
+def admin_profile(profile_id):
+    """Points chauds d'un profil enregistré."""
+    record = meteo_profiler.load(profile_id)
+    if record is None:
+        flash("Profil introuvable (il a pu être remplacé par un plus récent).", "warning")
+        return redirect(url_for('admin_page'))
+    record['time_str'] = datetime.fromtimestamp(record.get('time') or 0).strftime("%d/%m/%Y %H:%M:%S")
+    return render_template('profile.html', profile=record)
+
+@app.route('/admin/profiles/<profile_id>/collapsed')
+@login_required
+def admin_profile_collapsed(profile_id):
+    """Piles repliées du profil, pour flamegraph.pl ou speedscope."""
+    record = meteo_profiler.load(profile_id)
+    if record is None:
+        return Response("Not found\n", status=404, mimetype="text/plain")
+    return Response(meteo_profiler.collapsed_stacks(record), mimetype="text/plain",
+                    headers={"Content-Disposition": f"attachment; filename=profile-{profile_id}.folded"})
+
+@app.route('/admin/profiles/clear', methods=['POST'])
+@login_required
+def admin_clear_profiles():
+    meteo_profiler.clear()
+    flash("Profils supprimés.", "success")
+    return redirect(url_for('admin_page'))
+
 @app.route('/admin/test_telegram', methods=['POST'])
 @login_required
 def admin_test_telegram():
@@ -1387,10 +1153,12 @@ def admin_change_password():
     # Mise à jour du hash
     new_hash = generate_password_hash(new_password)
     
-    # Mise à jour en mémoire et dans la config
+    # Mise à jour en mémoire et dans la config (propagée aux autres workers)
     users[current_user.id].password_hash = new_hash
-    config['admin_password_hash'] = new_hash
-    save_config(config)
+    current_config = load_config()
+    current_config['admin_password_hash'] = new_hash
+    save_config(current_config)
+    config_watcher.check()
 
     flash("Mot de passe modifié avec succès.", "success")
     return redirect(url_for('admin_page'))
@@ -1398,6 +1166,11 @@ def admin_change_password():
 @app.route("/download")
 @login_required
 def download():
+    if use_sqlite():
+        # Export généré à la volée depuis la base, au même format que meteo_log.csv
+        response = Response(stream_with_context(meteo_store.get_store().iter_csv()), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=meteo_log.csv'
+        return response
     return send_file(CSV_FILE, as_attachment=True)
 
 @app.route("/download_wind_detail")
@@ -1414,6 +1187,26 @@ def download_wind_detail():
 def download_config():
     return send_file(CONFIG_FILE, as_attachment=True)
 
+def run_background_import(upload_path, policy, replace=False):
+    """
+    Fusionne (ou avec `replace`, restaure) un fichier envoyé depuis
+    l'administration ; l'état est suivi dans import_status.json.
+    """
+    try:
+        meteo_import.run_import([upload_path], policy=policy, replace=replace, verbose=False)
+    except (meteo_import.ImportInProgress, ValueError) as e:
+        # Refusé avant le début de l'import : l'échec s'affiche quand même dans le diagnostic
+        print(f"❌ Import de {upload_path} impossible : {e}")
+        meteo_import.write_status({"state": "error", "error": str(e), "files": [os.path.basename(upload_path)],
+                                   "policy": policy, "started": time.time()})
+    except Exception as e:
+        print(f"❌ Import de {upload_path} impossible : {e}")
+    finally:
+        try:
+            os.remove(upload_path)
+        except OSError:
+            pass
+
 @app.route('/admin/upload_csv', methods=['POST'])
 @login_required
 def admin_upload_csv():
@@ -1428,7 +1221,31 @@ def admin_upload_csv():
         flash('Aucun fichier sélectionné.', 'danger')
         return redirect(url_for('admin_page'))
     
-    if file and file.filename.endswith('.csv'):
+    merge = request.form.get('mode') == 'merge'
+    if file and file.filename.endswith('.csv') and (merge or use_sqlite()):
+        # Fusion avec l'historique existant, ou restauration avec la base SQLite à reconstruire :
+        # analyse parallèle et écriture en arrière-plan (une grosse sauvegarde dépasse le délai de Gunicorn)
+        policy = request.form.get('policy', 'first') if merge else 'first'
+        if policy not in meteo_import.CONFLICT_POLICIES:
+            flash(f"Politique de doublons inconnue : {policy}", "danger")
+            return redirect(url_for('admin_page'))
+        if meteo_import.import_running():
+            flash("Un import est déjà en cours : attendez sa fin avant d'en lancer un autre.", "warning")
+            return redirect(url_for('admin_page'))
+        upload_path = os.path.join(DATA_DIR, f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.path.basename(file.filename)}")
+        try:
+            file.save(upload_path)
+            if not merge and os.path.exists(CSV_FILE):
+                shutil.copy(CSV_FILE, CSV_FILE + ".bak")
+            threading.Thread(target=run_background_import, args=(upload_path, policy, not merge), daemon=True).start()
+            if merge:
+                flash("Import lancé en arrière-plan : suivez son avancement dans le diagnostic ci-dessus.", 'success')
+            else:
+                flash("Restauration lancée en arrière-plan : suivez son avancement dans le diagnostic ci-dessus. "
+                      "Une sauvegarde de l'ancien fichier a été créée (.bak).", 'success')
+        except Exception as e:
+            flash(f"Erreur lors de l'import : {e}", "danger")
+    elif file and file.filename.endswith('.csv'):
         try:
             # Sauvegarde de sécurité du fichier actuel avant écrasement
             if os.path.exists(CSV_FILE):
@@ -1460,23 +1277,19 @@ def admin_upload_config():
     if file and file.filename.endswith('.json'):
         try:
             # On lit le contenu pour vérifier que c'est un JSON valide
-            file_content = file.read()
-            json.loads(file_content) # Lève une exception si invalide
+            new_config = json.loads(file.read()) # Lève une exception si invalide
+            if not isinstance(new_config, dict):
+                raise json.JSONDecodeError("la configuration doit être un objet JSON", "", 0)
 
             # Sauvegarde de sécurité du fichier actuel
             if os.path.exists(CONFIG_FILE):
                 shutil.copy(CONFIG_FILE, CONFIG_FILE + ".bak")
             
-            # On écrit le nouveau contenu
-            with open(CONFIG_FILE, 'wb') as f:
-                f.write(file_content)
+            # Écriture atomique : les autres processus ne lisent jamais un fichier tronqué
+            save_config(new_config)
             
-            # Mise à jour de la configuration en mémoire
-            global config, LATITUDE, LONGITUDE, OWM_API_KEY
-            config = load_config()
-            LATITUDE = config.get("latitude")
-            LONGITUDE = config.get("longitude")
-            OWM_API_KEY = config.get("owm_api_key")
+            # Mise à jour de la configuration en mémoire (tous les workers)
+            config_watcher.check()
             
             flash('Configuration restaurée avec succès. Une sauvegarde (.bak) a été créée.', 'success')
         except json.JSONDecodeError:
@@ -1520,34 +1333,21 @@ def admin_generate_overlay():
         grid_size = 3
         
         # Calcul des coordonnées de la tuile centrale
-        center_x, center_y = latlon_to_tile_coords(LATITUDE, LONGITUDE, zoom)
-        
-        # Création d'une image vide (RGBA pour la transparence potentielle)
-        full_image = Image.new('RGBA', (256 * grid_size, 256 * grid_size), (0, 0, 0, 0))
-        
-        # User-Agent requis par la politique d'utilisation des tuiles OSM
-        headers = {
-            'User-Agent': 'MeteoPi/1.0 (Raspberry Pi Weather Station)'
-        }
+        center_x, center_y = tile_client.latlon_to_tile_coords(LATITUDE, LONGITUDE, zoom)
         
         # Vérification de l'option noir et blanc
         to_grayscale = request.form.get('grayscale') == 'true'
 
-        for i in range(grid_size):
-            for j in range(grid_size):
-                # On décalle pour centrer la grille (comme dans satellite_fetcher.py)
-                tile_x = center_x + i - 1
-                tile_y = center_y + j - 1
-                
-                url = f"https://tile.openstreetmap.org/{zoom}/{tile_x}/{tile_y}.png"
-                
-                try:
-                    response = requests.get(url, headers=headers, stream=True, timeout=5)
-                    if response.status_code == 200:
-                        tile_img = Image.open(response.raw).convert("RGBA")
-                        full_image.paste(tile_img, (i * 256, j * 256))
-                except Exception as e:
-                    print(f"Erreur téléchargement tuile OSM {tile_x},{tile_y}: {e}")
+        # Téléchargement parallèle des 9 tuiles (RGBA pour la transparence potentielle).
+        # Les tuiles OSM ne changent pas à ce zoom : elles sont gardées en cache disque
+        # et simplement revalidées (ETag / Last-Modified) après 30 jours.
+        full_image, tiles_ok = tile_client.get_client().fetch_grid(
+            "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+            center_x, center_y, zoom, grid_size=grid_size, mode='RGBA', cache_name='osm'
+        )
+        if tiles_ok == 0:
+            flash("Impossible de télécharger les tuiles OpenStreetMap.", "danger")
+            return redirect(url_for('admin_page'))
 
         # Conversion en niveaux de gris si demandé
         if to_grayscale:
@@ -1573,39 +1373,39 @@ def rain_detail():
     summary = "Période non spécifiée."
     
     try:
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
-            df['rain'] = pd.to_numeric(df['rain'], errors='coerce')
-            df.dropna(subset=['time'], inplace=True)
-            
-            now = datetime.now()
-            start_time = None
-            end_time = None
-            
-            if period == 'day':
-                start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                title = "Pluies - Aujourd'hui"
-            elif period == 'week':
-                start_time = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-                title = "Pluies - Cette Semaine"
-            elif period == 'month':
-                start_time = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                title = "Pluies - Ce Mois"
-            elif period and period.startswith('day_'):
-                try:
-                    days_ago = int(period.split('_')[1])
-                    target_date = now - timedelta(days=days_ago)
-                    start_time = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-                    end_time = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                    title = f"Pluies - {target_date.strftime('%d/%m')}"
-                except (ValueError, IndexError):
-                    pass
-
-            if start_time:
-                summary = get_rain_summary(df, start_time=start_time, end_time=end_time)
+        now = datetime.now()
+        start_time = None
+        end_time = None
+        
+        if period == 'day':
+            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            title = "Pluies - Aujourd'hui"
+        elif period == 'week':
+            start_time = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+            title = "Pluies - Cette Semaine"
+        elif period == 'month':
+            start_time = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            title = "Pluies - Ce Mois"
+        elif period and period.startswith('day_'):
+            try:
+                days_ago = int(period.split('_')[1])
+                target_date = now - timedelta(days=days_ago)
+                start_time = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+                end_time = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+                title = f"Pluies - {target_date.strftime('%d/%m')}"
+            except (ValueError, IndexError):
+                pass
+
+        if not start_time:
+            summary = "Période invalide."
+        else:
+            if use_sqlite():
+                # Seule la période demandée est lue (requête sur l'index de la base)
+                df = data_cache.load_store_dataframe(start_time, start_time + timedelta(days=1) if end_time else None)
             else:
-                summary = "Période invalide."
+                df = data_cache.load_dataframe(CSV_FILE)
+                df.dropna(subset=['time'], inplace=True)
+            summary = get_rain_summary(df, start_time=start_time, end_time=end_time)
                 
     except (FileNotFoundError, pd.errors.EmptyDataError):
         summary = "Aucune donnée disponible."
@@ -1620,11 +1420,7 @@ def rain_detail():
 def hourly_graph():
     graph_html = None
     try:
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'])
-            df['temp'] = pd.to_numeric(df['temp'], errors='coerce')
-            graph_html = generate_hourly_graph_base64(df)
+        graph_html = render_pool.render("hourly")
     except (FileNotFoundError, pd.errors.EmptyDataError):
         pass
     return render_template("hourly_graph.html", graph_html=graph_html)
@@ -1641,47 +1437,287 @@ def daily_graph():
     title = f"Météo du {date_str}"
     
     try:
-        target_date = datetime.strptime(date_str, '%Y-%m-%d')
-        start_day = target_date.replace(hour=0, minute=0, second=0)
-        end_day = target_date.replace(hour=23, minute=59, second=59)
-        
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
-            df['temp'] = pd.to_numeric(df['temp'], errors='coerce')
-            df['hum'] = pd.to_numeric(df['hum'], errors='coerce')
-            df['rain'] = pd.to_numeric(df['rain'], errors='coerce')
-            
-            df_day = df[(df['time'] >= start_day) & (df['time'] <= end_day)]
-            if not df_day.empty:
-                graph_html = generate_hourly_graph_base64(df_day, filter_recent=False, title=f"Données horaires du {date_str}")
+        datetime.strptime(date_str, '%Y-%m-%d') # Validation du format avant le rendu
+        graph_html = render_pool.render("daily", date_str, use_sqlite())
     except (ValueError, FileNotFoundError, pd.errors.EmptyDataError):
         pass
         
     return render_template("graph_page.html", title=title, graph_html=graph_html)
 
+WIND_ROSE_PERIODS = [('day', "Jour"), ('week', "Semaine"), ('month', "Mois"), ('season', "Saison"), ('year', "Année"), ('all', "Tout"), ('custom', "Personnalisée")]
+SEASONS_FR = {12: "Hiver", 1: "Hiver", 2: "Hiver", 3: "Printemps", 4: "Printemps", 5: "Printemps",
+              6: "Été", 7: "Été", 8: "Été", 9: "Automne", 10: "Automne", 11: "Automne"}
+
+def resolve_wind_rose_period(args):
+    """
+    Traduit les paramètres de requête (period, date, start, end) en bornes de dates incluses.
+    Les saisons sont météorologiques (hiver = décembre à février).
+    Retourne (période, date de début, date de fin, libellé).
+    """
+    period = args.get('period', 'month')
+    try:
+        ref = datetime.strptime(args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        ref = datetime.now().date()
+
+    if period == 'day':
+        return period, ref, ref, ref.strftime('%d/%m/%Y')
+    if period == 'week':
+        start = ref - timedelta(days=ref.weekday())
+        return period, start, start + timedelta(days=6), f"semaine du {start.strftime('%d/%m/%Y')}"
+    if period == 'season':
+        # Décembre appartient à l'hiver de l'année suivante
+        start_month = (ref.month // 3) * 3 or 12
+        start_year = ref.year - 1 if ref.month in (1, 2) else ref.year
+        start = ref.replace(year=start_year, month=start_month, day=1)
+        end_year, end_month = (start_year + 1, (start_month + 3) % 12) if start_month >= 10 else (start_year, start_month + 3)
+        end = start.replace(year=end_year, month=end_month) - timedelta(days=1)
+        return period, start, end, f"{SEASONS_FR[ref.month]} {end.year if start_month == 12 else start.year}"
+    if period == 'year':
+        return period, ref.replace(month=1, day=1), ref.replace(month=12, day=31), str(ref.year)
+    if period == 'all':
+        first, last = wind_rose_store.date_range()
+        if first is None:
+            return period, None, None, "tout l'historique"
+        return period, first, last, "tout l'historique"
+    if period == 'custom':
+        try:
+            start = datetime.strptime(args.get('start', ''), '%Y-%m-%d').date()
+            end = datetime.strptime(args.get('end', ''), '%Y-%m-%d').date()
+            if start <= end:
+                return period, start, end, f"du {start.strftime('%d/%m/%Y')} au {end.strftime('%d/%m/%Y')}"
+        except ValueError:
+            pass
+    # Par défaut : le mois de la date de référence
+    start = ref.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return 'month', start, end, start.strftime('%m/%Y')
+
+def get_wind_rose_counts(start, end):
+    """
+    Matrice 16 secteurs x classes de vitesse sur la période, depuis les histogrammes
+    journaliers. Si le processus capteurs ne les a pas encore construits, le calcul
+    est fait (une seule fois par requête) sur le CSV complet.
+    Retourne (comptes, nombre de jours couverts).
+    """
+    if start is not None and wind_rose_store.months():
+        return wind_rose_store.histogram(start, end)
+
+    from meteo_graphs import compute_wind_rose_histogram # Chargé seulement dans ce cas de secours
+    df = data_cache.load_dataframe(CSV_FILE)
+    if df.empty:
+        return None, 0
+    if start is not None:
+        df = df[(df['time'] >= pd.Timestamp(start)) & (df['time'] < pd.Timestamp(end + timedelta(days=1)))]
+    counts = compute_wind_rose_histogram(df)
+    if counts is None:
+        return None, 0
+    return counts.tolist(), df['time'].dt.date.nunique()
+
 @app.route("/wind_rose")
 @login_required
 def wind_rose():
-    """Affiche la rose des vents, ou un graphique de vitesse si pas de direction."""
+    """Affiche la rose des vents sur une période, ou un graphique de vitesse si pas de direction."""
     graph_html = None
-    title = "Analyse du Vent"
+    period, start, end, label = resolve_wind_rose_period(request.args)
+    days = 0
     try:
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
-            
-            # Vérifie si des données de direction valides existent (différentes de 'N/A')
-            valid_directions = df['wind_dir_str'].dropna().unique()
-            if len(valid_directions) == 0 or (len(valid_directions) == 1 and valid_directions[0] == 'N/A'):
-                title = "Graphique de Vitesse du Vent"
-                graph_html = generate_wind_speed_graph_48h_base64(df)
-            else:
-                title = "Rose des Vents"
-                graph_html = generate_wind_rose_base64(df)
+        counts, days = get_wind_rose_counts(start, end)
+        if counts is not None:
+            graph_html = render_pool.render("wind_rose", counts, f"Rose des vents - {label}")
+        if graph_html is None and not wind_rose_store.months():
+            # Pas de girouette : on affiche la vitesse du vent à la place
+            df = data_cache.load_dataframe(CSV_FILE)
+            if not df.empty:
+                df['time'] = pd.to_datetime(df['time'], errors='coerce')
+                valid_directions = df['wind_dir_str'].dropna().unique()
+                if len(valid_directions) == 0 or (len(valid_directions) == 1 and valid_directions[0] == 'N/A'):
+                    return render_template("graph_page.html", title="Graphique de Vitesse du Vent", graph_html=render_pool.render("wind_speed_48h"))
     except (FileNotFoundError, pd.errors.EmptyDataError):
         pass
-    return render_template("graph_page.html", title=title, graph_html=graph_html)
+    return render_template("wind_rose.html", graph_html=graph_html, periods=WIND_ROSE_PERIODS, period=period, label=label, days=days,
+                           date=request.args.get('date', datetime.now().strftime('%Y-%m-%d')),
+                           start=start.strftime('%Y-%m-%d') if start else '', end=end.strftime('%Y-%m-%d') if end else '')
+
+@app.route("/api/v1/wind_rose")
+def api_wind_rose():
+    """Rose des vents au format JSON (mêmes paramètres que /wind_rose : period, date, start, end)."""
+    period, start, end, label = resolve_wind_rose_period(request.args)
+    counts, days = get_wind_rose_counts(start, end)
+    if counts is None:
+        return jsonify({"error": "No wind direction data available"}), 404
+    total = sum(sum(row) for row in counts)
+    return jsonify({
+        "period": period,
+        "label": label,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "days": days,
+        "sectors": SECTORS_16,
+        "speed_classes": SPEED_LABELS,
+        "counts": counts,
+        "frequencies": [[round(c * 100.0 / total, 2) if total else 0.0 for c in row] for row in counts],
+        "total": total,
+    })
+
+@app.route("/api/v1/wind_rose.png")
+def api_wind_rose_png():
+    """Rose des vents en image PNG (mêmes paramètres que /wind_rose)."""
+    _, start, end, label = resolve_wind_rose_period(request.args)
+    counts, _ = get_wind_rose_counts(start, end)
+    graph = render_pool.render("wind_rose", counts, f"Rose des vents - {label}") if counts is not None else None
+    if graph is None:
+        return jsonify({"error": "No wind direction data available"}), 404
+    response = make_response(base64.b64decode(graph.split(",", 1)[1]))
+    response.headers['Content-Type'] = 'image/png'
+    return response
+
+RECORD_UNITS = {"temp": "°C", "rain": "mm", "gust": "km/h", "pressure": "hPa"}
+
+def get_climate_overview(month_str):
+    """
+    Records (absolus, de l'année et du mois), journée en cours et résumés
+    journaliers du mois `month_str` (AAAA-MM). Lecture de quelques petits
+    fichiers JSON : le coût ne dépend pas de la taille de l'historique.
+    """
+    records = climate_store.read_records()
+    year = month_str[:4]
+    days = climate_store.read_year(year)
+    return {
+        "month": month_str,
+        "today": climate_store.read_today(),
+        "last_finalized": records.get("last_date"),
+        "records": {
+            "all_time": records.get("all_time", {}),
+            "year": records.get("years", {}).get(year, {}),
+            "month": records.get("months", {}).get(month_str, {}),
+        },
+        "days": [days[date] for date in sorted(days) if date.startswith(month_str)],
+    }
+
+def resolve_climate_month(args):
+    month_str = args.get('month') or datetime.now().strftime('%Y-%m')
+    datetime.strptime(month_str, '%Y-%m') # ValueError si le format est invalide
+    return month_str
+
+@app.route("/climate")
+@login_required
+def climate():
+    """Records et résumés climatologiques journaliers d'un mois."""
+    try:
+        month_str = resolve_climate_month(request.args)
+    except ValueError:
+        flash("Mois invalide.", "warning")
+        month_str = datetime.now().strftime('%Y-%m')
+    overview = get_climate_overview(month_str)
+    record_defs = [(name, label, RECORD_UNITS[field.split('_')[0]]) for name, (field, _, label, _) in RECORDS.items()]
+    return render_template("climate.html", overview=overview, record_defs=record_defs)
+
+@app.route("/api/v1/climate")
+def api_climate():
+    """Records et résumés journaliers au format JSON (paramètre month=AAAA-MM, mois courant par défaut)."""
+    try:
+        month_str = resolve_climate_month(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid month, expected YYYY-MM"}), 400
+    return jsonify(get_climate_overview(month_str))
+
+# --- Stations multiples (mesures reçues des autres Raspberry Pi) ---
+
+def get_station_hours(station_id, start, end):
+    """Agrégats horaires d'une station sur [start, end[ (tuples meteo_store.HOURLY_COLUMNS)."""
+    fmt = "%Y-%m-%d %H:%M:%S"
+    if station_id == config.get("station_id"):
+        # Station locale : lue dans son propre stockage
+        if use_sqlite():
+            return meteo_store.get_store().hourly_summary(start.strftime(fmt), end.strftime(fmt))
+        return data_cache.hourly_summary(data_cache.load_dataframe(), start, end)
+    store = meteo_stations.get_registry().get(station_id)
+    return store.hourly_summary(start.strftime(fmt), end.strftime(fmt)) if store else []
+
+def get_stations_overview(date_str):
+    """
+    Résumé de la journée `date_str` pour la station locale et chaque station
+    distante. Seuls les agrégats horaires de la journée sont lus : le coût ne
+    dépend ni de la taille des historiques ni de leur nombre de stations.
+    """
+    start = datetime.strptime(date_str, '%Y-%m-%d')
+    end = start + timedelta(days=1)
+    local_id = config.get("station_id")
+    registry = meteo_stations.get_registry()
+    stations = []
+    for station_id in [local_id] + [s for s in registry.list() if s != local_id]:
+        hours = get_station_hours(station_id, start, end)
+        if station_id == local_id:
+            fields = csv_tail_reader.last_fields()
+            last_time = fields[0] if fields else None
+        else:
+            last_time = registry.get(station_id).last_time()
+        stations.append({
+            "id": station_id,
+            "local": station_id == local_id,
+            "last_time": last_time,
+            "summary": meteo_stations.summarize(hours),
+            "hours": [dict(zip(meteo_stations.HOURLY_COLUMNS, hour)) for hour in hours],
+        })
+    return {"date": date_str, "stations": stations}
+
+def resolve_stations_date(args):
+    date_str = args.get('date') or datetime.now().strftime('%Y-%m-%d')
+    datetime.strptime(date_str, '%Y-%m-%d') # ValueError si le format est invalide
+    return date_str
+
+@app.route("/stations")
+@login_required
+def stations():
+    """Comparaison des stations sur une journée (tableau et graphique)."""
+    try:
+        date_str = resolve_stations_date(request.args)
+    except ValueError:
+        flash("Date invalide.", "warning")
+        date_str = datetime.now().strftime('%Y-%m-%d')
+    overview = get_stations_overview(date_str)
+    series = {station["id"]: [(hour["hour"], hour["temp"], hour["pressure"], hour["rain"]) for hour in station["hours"]]
+              for station in overview["stations"]}
+    graph_html = render_pool.render("compare", date_str, series)
+    return render_template("stations.html", overview=overview, graph_html=graph_html)
+
+@app.route("/api/v1/stations")
+def api_stations():
+    """Résumé et agrégats horaires de chaque station (paramètre date=AAAA-MM-JJ, aujourd'hui par défaut)."""
+    try:
+        date_str = resolve_stations_date(request.args)
+    except ValueError:
+        return jsonify({"error": "Invalid date, expected YYYY-MM-DD"}), 400
+    return jsonify(get_stations_overview(date_str))
+
+@app.route("/api/v1/ingest", methods=["POST"])
+def api_ingest():
+    """
+    Réception des mesures d'une station distante (publisher : push_url).
+    Corps JSON : {"station": "id", "rows": [[champs CSV], ...]}, jeton
+    "ingest_token" dans l'en-tête Authorization: Bearer.
+    """
+    token = config.get("ingest_token")
+    if not token:
+        return jsonify({"error": "Ingest disabled"}), 403
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return jsonify({"error": "Unauthorized"}), 401
+    payload = request.get_json(silent=True) or {}
+    station_id = payload.get("station")
+    rows = payload.get("rows")
+    if not meteo_stations.valid_station_id(station_id) or not isinstance(rows, list):
+        return jsonify({"error": "Expected {\"station\": id, \"rows\": [...]}"}), 400
+    if station_id == config.get("station_id"):
+        return jsonify({"error": "Station id already used by this station"}), 409
+    if len(rows) > meteo_stations.MAX_INGEST_ROWS:
+        return jsonify({"error": f"Too many rows (max {meteo_stations.MAX_INGEST_ROWS})"}), 413
+    try:
+        accepted, rejected = meteo_stations.get_registry().ingest(station_id, rows)
+    except Exception as e:
+        print(f"❌ Erreur d'enregistrement des mesures de {station_id} : {e}")
+        return jsonify({"error": "Storage error"}), 503 # La station renverra le lot plus tard
+    return jsonify({"station": station_id, "accepted": accepted, "rejected": rejected})
 
 @app.route("/pressure_graph")
 @login_required
@@ -1689,11 +1725,7 @@ def pressure_graph():
     """Affiche le graphique de pression."""
     graph_html = None
     try:
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
-            df['pressure'] = pd.to_numeric(df['pressure'], errors='coerce')
-            graph_html = generate_pressure_graph_base64(df)
+        graph_html = render_pool.render("pressure")
     except (FileNotFoundError, pd.errors.EmptyDataError):
         pass
     return render_template("graph_page.html", title="Graphique de Pression", graph_html=graph_html)
@@ -1704,11 +1736,7 @@ def rain_graph():
     """Affiche le graphique du cumul de pluie."""
     graph_html = None
     try:
-        df = read_and_process_csv(CSV_FILE)
-        if not df.empty:
-            df['time'] = pd.to_datetime(df['time'], errors='coerce')
-            df['rain'] = pd.to_numeric(df['rain'], errors='coerce')
-            graph_html = generate_rain_accumulation_graph_base64(df)
+        graph_html = render_pool.render("rain_accumulation")
     except (FileNotFoundError, pd.errors.EmptyDataError):
         pass
     return render_template("graph_page.html", title="Cumul de Pluie Journalier", graph_html=graph_html)
@@ -1716,59 +1744,44 @@ def rain_graph():
 @app.route("/satellite")
 @login_required
 def satellite_page():
-    """Affiche l'image satellite."""
-    archive_dir = "static/satellite_archive"
-    image_files = []
-    if os.path.exists(archive_dir):
-        # On trie les images pour les avoir dans l'ordre chronologique
-        files = sorted(os.listdir(archive_dir))
-        image_files = [os.path.join(archive_dir, f) for f in files]
+    """Affiche l'animation satellite (un seul atlas d'images + manifeste)."""
+    manifest = None
+    try:
+        with open(os.path.join(app.root_path, 'static', 'satellite_archive', 'manifest.json'), 'r') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
 
     # Vérifie si un calque de carte existe
     overlay_path = os.path.join(app.root_path, 'static', 'img', 'map_overlay.png')
     overlay_exists = os.path.exists(overlay_path)
 
-    return render_template("satellite.html", image_files=image_files, overlay_exists=overlay_exists)
-
+    return render_template("satellite.html", manifest=manifest, overlay_exists=overlay_exists)
 
-def _save_graph_to_base64(fig):
-    img = io.BytesIO()
-    fig.savefig(img, format="png")
-    plt.close(fig)
-    img.seek(0)
-    graph_url = base64.b64encode(img.getvalue()).decode('utf8')
-    return f"data:image/png;base64,{graph_url}"
 
-def get_last_csv_line(filepath):
+@app.route("/metrics")
+def metrics():
     """
-    Lit efficacement la dernière ligne non vide d'un fichier.
-    C'est beaucoup plus performant que de lire tout le fichier avec Pandas.
+    Métriques de tous les processus de la station au format Prometheus.
+    Si "metrics_token" est défini, il est attendu dans l'en-tête Authorization: Bearer.
     """
-    try:
-        with open(filepath, 'rb') as f:
-            # On va à la fin du fichier, moins un peu pour trouver la dernière ligne
-            f.seek(-2, os.SEEK_END)
-            while f.read(1) != b'\n':
-                f.seek(-2, os.SEEK_CUR)
-            # La dernière ligne complète est après le '\n' que nous avons trouvé
-            last_line = f.readline().decode('utf-8')
-            return last_line.strip().split(',')
-    except (IOError, IndexError):
-        # Fichier trop petit, vide ou inexistant
-        return None
+    token = config.get("metrics_token")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(meteo_metrics.collect(), content_type=meteo_metrics.CONTENT_TYPE)
 
 @app.route("/api/v1/sensors")
 def api_sensors():
     """Fournit les dernières données des capteurs au format JSON pour Home Assistant (version optimisée)."""
     try:
-        last_reading_list = get_last_csv_line(CSV_FILE)
+        last_reading_list = csv_tail_reader.last_fields()
 
         if not last_reading_list or len(last_reading_list) < 7: # On vérifie qu'on a au moins 7 colonnes
             return jsonify({"error": "No data available or invalid format"}), 404
 
         # Gère l'ancien et le nouveau format
-        if len(last_reading_list) == 8:
-            headers = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_gust", "wind_dir_str"]
+        if len(last_reading_list) >= 8:
+            headers = data_cache.CSV_COLUMNS
         else: # len is 7
             headers = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_dir_str"]
         
@@ -1784,6 +1797,11 @@ def api_sensors():
         wind_gust = float(last_reading.get('wind_gust', 0.0)) 
         wind_dir = last_reading.get('wind_dir_str', 'N/A')
         
+        try:
+            wind_dir_deg = float(last_reading['wind_dir_deg'])
+        except (ValueError, KeyError):
+            wind_dir_deg = None
+
         # La pression peut être une chaîne vide si le BME280 n'est pas là
         try:
             pressure = float(last_reading['pressure'])
@@ -1797,10 +1815,15 @@ def api_sensors():
             "wind_speed": round(wind_speed, 1),
             "wind_gust": round(wind_gust, 1),
             "wind_direction": wind_dir,
+            "wind_direction_deg": round(wind_dir_deg, 1) if wind_dir_deg is not None else None,
             "rain": round(rain_since_last, 4),
             # On convertit la date string en objet datetime puis en format ISO
             "last_update": datetime.strptime(last_reading['time'], "%Y-%m-%d %H:%M:%S").isoformat()
         }
+        # Valeurs dérivées (pluie 24h, tendances 3h, vent moyen 10 min) si le processus capteurs tourne
+        live_stats = read_live_stats()
+        if live_stats:
+            data.update(live_stats["derived"])
         return jsonify(data)
 
     except (FileNotFoundError, pd.errors.EmptyDataError):
@@ -1818,7 +1841,7 @@ def api_live_wind():
         if not os.path.exists(WIND_CSV_FILE):
              return jsonify({"error": "No data"}), 404
              
-        last_line = get_last_csv_line(WIND_CSV_FILE)
+        last_line = wind_tail_reader.last_fields()
         
         # Validation (time, speed, dir)
         # On ignore si la ligne est trop courte ou si c'est l'en-tête
@@ -1827,7 +1850,8 @@ def api_live_wind():
 
         return jsonify({
             "wind_speed": float(last_line[1]),
-            "wind_dir": last_line[2]
+            "wind_dir": last_line[2],
+            "wind_angle": float(last_line[3]) if len(last_line) > 3 and last_line[3] else None
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
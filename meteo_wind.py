@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+#
+# Statistiques de direction du vent selon les recommandations de l'OMM.
+# La girouette est échantillonnée toutes les 3s (boucle temps réel de
+# meteo_capteur.py) dans un tampon préalloué ; à chaque mesure minute on
+# calcule la direction moyenne vectorielle (moyenne des sin/cos, qui gère
+# correctement le passage 359° -> 0°) et l'écart-type de Yamartino.
+#
+
+import json
+import math
+import os
+import threading
+from array import array
+from datetime import datetime, timedelta
+
+# Secteurs de la rose des vents (16 x 22.5°), libellés français comme le reste de la station
+SECTORS_16 = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+              "S", "SSO", "SO", "OSO", "O", "ONO", "NO", "NNO"]
+# Classes de vitesse de la rose des vents (km/h) : bornes inférieures incluses
+SPEED_BINS = [0, 2, 10, 20, 30, 50, float('inf')]
+SPEED_LABELS = ["< 2 km/h", "2-10 km/h", "10-20 km/h", "20-30 km/h", "30-50 km/h", "> 50 km/h"]
+N_SECTORS = len(SECTORS_16)
+N_CLASSES = len(SPEED_LABELS)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+WIND_ROSE_DIR = os.path.join(DATA_DIR, "wind_rose")
+
+# Angle central des libellés 8 directions enregistrés avant l'ajout de l'angle numérique
+LABEL_ANGLES = {"N": 0.0, "NE": 45.0, "E": 90.0, "SE": 135.0,
+                "S": 180.0, "SO": 225.0, "O": 270.0, "NO": 315.0}
+
+def vector_mean_direction(sin_sum, cos_sum, count):
+    """
+    Retourne (direction moyenne en degrés [0, 360), écart-type de Yamartino en degrés)
+    à partir des sommes des sinus et cosinus de `count` vecteurs unitaires.
+    """
+    if count <= 0:
+        return None, None
+    sa = sin_sum / count
+    ca = cos_sum / count
+    mean = math.degrees(math.atan2(sa, ca)) % 360.0
+    # Méthode de Yamartino (1984) : estimation en une passe de l'écart-type circulaire
+    eps = math.sqrt(max(0.0, 1.0 - (sa * sa + ca * ca)))
+    std = math.degrees(math.asin(min(1.0, eps)) * (1.0 + (2.0 / math.sqrt(3.0) - 1.0) * eps ** 3))
+    return mean, std
+
+class WindVaneBuffer:
+    """
+    Tampon préalloué des lectures de girouette d'une minute (20 lectures à 3s).
+    Les composantes sin/cos sont stockées directement : la moyenne vectorielle
+    ne demande ensuite qu'une somme.
+    """
+
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.sin_values = array('d', [0.0] * capacity)
+        self.cos_values = array('d', [0.0] * capacity)
+        self.moving = array('b', [0] * capacity)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, angle, wind_speed=None):
+        """Ajoute une lecture (ignorée si la girouette n'a pas répondu)."""
+        if angle is None:
+            return
+        rad = math.radians(angle)
+        with self.lock:
+            if self.count >= self.capacity:
+                return # Minute anormalement longue : les premières lectures suffisent
+            self.sin_values[self.count] = math.sin(rad)
+            self.cos_values[self.count] = math.cos(rad)
+            self.moving[self.count] = 1 if wind_speed is None or wind_speed > 0 else 0
+            self.count += 1
+
+    def compute_and_reset(self):
+        """
+        Calcule (direction moyenne, écart-type, nombre de lectures) puis vide le tampon.
+        Par temps calme la direction n'a pas de sens : seules les lectures avec du vent
+        sont moyennées, sauf si toute la minute était calme.
+        """
+        with self.lock:
+            n = self.count
+            self.count = 0
+            if n == 0:
+                return None, None, 0
+            indices = [i for i in range(n) if self.moving[i]] or range(n)
+            sin_sum = sum(self.sin_values[i] for i in indices)
+            cos_sum = sum(self.cos_values[i] for i in indices)
+            used = len(indices)
+        mean, std = vector_mean_direction(sin_sum, cos_sum, used)
+        return mean, std, used
+
+def sector_index(angle):
+    """Secteur (0-15) d'un angle en degrés, le secteur N étant centré sur 0°."""
+    return int(((angle % 360.0) + 11.25) // 22.5) % N_SECTORS
+
+def speed_class(speed):
+    """Classe de vitesse (0 à N_CLASSES - 1) d'une vitesse en km/h."""
+    for i in range(N_CLASSES):
+        if speed < SPEED_BINS[i + 1]:
+            return i
+    return N_CLASSES - 1
+
+def empty_histogram():
+    return [[0] * N_CLASSES for _ in range(N_SECTORS)]
+
+class WindRoseStore:
+    """
+    Histogrammes de rose des vents (16 secteurs x classes de vitesse) par jour.
+    Chaque mesure minute incrémente un compteur du jour courant ; une rose sur
+    une période quelconque n'est plus que la somme de quelques matrices 16x6.
+    Stockage : un petit fichier JSON par mois (data/wind_rose/AAAA-MM.json),
+    seul le mois courant est réécrit.
+    """
+
+    def __init__(self, directory=WIND_ROSE_DIR, cache=True):
+        self.directory = directory
+        # Le processus capteurs (seul écrivain) garde les mois en mémoire ; le serveur
+        # web relit les fichiers à chaque requête pour voir les derniers comptages.
+        self.cache = cache
+        self.lock = threading.Lock()
+        self._months = {} # "AAAA-MM" -> {"days": {...}, "last_timestamp": ts}
+
+    def _month_path(self, month):
+        return os.path.join(self.directory, f"{month}.json")
+
+    def _read_month(self, month):
+        try:
+            with open(self._month_path(month), 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {"days": {}, "last_timestamp": None}
+
+    def _load_month(self, month):
+        if not self.cache:
+            return self._read_month(month)
+        if month not in self._months:
+            self._months[month] = self._read_month(month)
+        return self._months[month]
+
+    def _save_month(self, month):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self._month_path(month) + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self._months[month], f, separators=(',', ':'))
+            os.replace(temp_path, self._month_path(month))
+        except OSError as e:
+            print(f"⚠️ Écriture de la rose des vents impossible ({month}) : {e}")
+
+    def months(self):
+        """Liste triée des mois disponibles sur disque."""
+        try:
+            return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+        except OSError:
+            return []
+
+    def last_timestamp(self):
+        """Horodatage de la dernière mesure comptée (None si le stockage est vide)."""
+        with self.lock:
+            for month in reversed(self.months()):
+                ts = self._load_month(month).get("last_timestamp")
+                if ts is not None:
+                    return ts
+        return None
+
+    def _add(self, timestamp, angle, speed):
+        day = datetime.fromtimestamp(timestamp)
+        month = day.strftime("%Y-%m")
+        data = self._load_month(month)
+        histogram = data["days"].setdefault(day.strftime("%Y-%m-%d"), empty_histogram())
+        histogram[sector_index(angle)][speed_class(speed)] += 1
+        if data.get("last_timestamp") is None or timestamp > data["last_timestamp"]:
+            data["last_timestamp"] = timestamp
+        return month
+
+    def add(self, timestamp, angle, speed, save=True):
+        """Compte une mesure (ignorée si la direction ou la vitesse manquent)."""
+        if angle is None or speed is None:
+            return
+        with self.lock:
+            month = self._add(timestamp, angle, speed)
+            if save:
+                self._save_month(month)
+
+    def catch_up_from_csv(self, csv_path, until=None):
+        """
+        Rattrape les mesures du CSV postérieures à la dernière comptée (premier
+        démarrage ou arrêt du processus capteurs). Les lignes plus anciennes sont
+        écartées par simple comparaison de chaînes sur l'horodatage.
+        """
+        last = self.last_timestamp()
+        last_str = datetime.fromtimestamp(last).strftime("%Y-%m-%d %H:%M:%S") if last else ""
+        until_str = datetime.fromtimestamp(until).strftime("%Y-%m-%d %H:%M:%S") if until else "9999"
+        count = 0
+        touched = set()
+        try:
+            with open(csv_path, 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    timestamp_str = line[:19]
+                    if timestamp_str <= last_str or timestamp_str >= until_str or not timestamp_str[:1].isdigit():
+                        continue
+                    fields = line.strip().split(',')
+                    if len(fields) < 7:
+                        continue
+                    try:
+                        ts = datetime.strptime(fields[0], "%Y-%m-%d %H:%M:%S").timestamp()
+                        speed = float(fields[5])
+                    except ValueError:
+                        continue
+                    angle = None
+                    if len(fields) >= 9 and fields[8]:
+                        try:
+                            angle = float(fields[8])
+                        except ValueError:
+                            pass
+                    if angle is None:
+                        # Anciennes lignes : libellé seul, placé au centre de son secteur
+                        angle = LABEL_ANGLES.get(fields[7] if len(fields) >= 8 else fields[6])
+                    if angle is None:
+                        continue
+                    with self.lock:
+                        touched.add(self._add(ts, angle, speed))
+                    count += 1
+        except OSError:
+            return 0
+        with self.lock:
+            for month in touched:
+                self._save_month(month)
+        return count
+
+    def histogram(self, start_date, end_date):
+        """
+        Somme des histogrammes journaliers entre deux dates incluses (objets date).
+        Retourne (matrice 16 x N_CLASSES de comptes, nombre de jours avec des données).
+        """
+        total = empty_histogram()
+        days_found = 0
+        available = set(self.months())
+        loaded = {}
+        with self.lock:
+            day = start_date
+            while day <= end_date:
+                month = day.strftime("%Y-%m")
+                if month in available or month in self._months:
+                    if month not in loaded:
+                        loaded[month] = self._load_month(month)
+                    counts = loaded[month]["days"].get(day.strftime("%Y-%m-%d"))
+                    if counts:
+                        days_found += 1
+                        for s in range(N_SECTORS):
+                            row, total_row = counts[s], total[s]
+                            for c in range(N_CLASSES):
+                                total_row[c] += row[c]
+                day += timedelta(days=1)
+        return total, days_found
+
+    def date_range(self):
+        """Premier et dernier jour disponibles (objets date), ou (None, None)."""
+        months = self.months()
+        if not months:
+            return None, None
+        first_days = sorted(self._load_month(months[0])["days"])
+        last_days = sorted(self._load_month(months[-1])["days"])
+        if not first_days or not last_days:
+            return None, None
+        return (datetime.strptime(first_days[0], "%Y-%m-%d").date(),
+                datetime.strptime(last_days[-1], "%Y-%m-%d").date())
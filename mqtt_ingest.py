@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+#
+# Service d'ingestion MQTT : abonné au topic des mesures (mqtt_topic,
+# "meteopi/sensors" par défaut), il écrit les messages JSON publiés par
+# meteo_capteur.py (voir meteo_publisher.py) dans le stockage de ce serveur.
+# Le tableau de bord peut ainsi tourner sur une machine plus puissante que le
+# Raspberry Pi, qui se contente de mesurer et de publier.
+#
+# - Station locale (champ "station" égal à station_id) : ajout au journal
+#   meteo_log.csv, à la base SQLite si storage_backend = "sqlite" et aux
+#   résumés climatologiques. Autres stations : bases de meteo_stations.py.
+# - Écritures groupées : un thread unique vide la file par lots.
+# - Contre-pression : la file est bornée. Quand elle est pleine (écriture
+#   lente ou impossible), le thread réseau de paho attend une place sans
+#   jamais abandonner la mesure : le message n'est acquitté (PUBACK) qu'une
+#   fois en file, et le broker conserve les suivants (session persistante,
+#   QoS 1). Si l'attente dépasse le keepalive, le broker coupe la connexion
+#   et renvoie à la reconnexion les messages non acquittés (ignorés s'ils
+#   ont déjà été écrits).
+# - Détection des trous : un écart de plus de GAP_THRESHOLD secondes entre
+#   deux mesures d'une même station est signalé (journal et état).
+#
+# Utilisation :
+#   python mqtt_ingest.py                    -> abonnement au broker de config.json
+#   python mqtt_ingest.py --replay f.jsonl   -> rejoue des messages enregistrés (une charge
+#                                               JSON par ligne, "-" pour l'entrée standard)
+#
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:
+    mqtt = None
+
+from csv_repair import locked_append
+from csv_tail import read_last_fields
+from meteo_climate import ClimateStore
+from meteo_config import load_config
+from meteo_stations import StationRegistry, valid_station_id
+from meteo_stats import parse_csv_row
+from meteo_store import MeteoStore, normalize_row
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
+STATUS_FILE = os.path.join(DATA_DIR, "mqtt_ingest_status.json") # Affiché sur la page d'administration
+
+QUEUE_MAX = 5000             # Messages en attente d'écriture au-delà desquels paho est mis en attente
+BATCH_SIZE = 500             # Lignes écrites par transaction
+BACKPRESSURE_TIMEOUT = 30.0  # File pleine depuis ce délai : attente signalée (elle continue)
+RETRY_DELAY = 5.0            # Attente avant de retenter un lot dont l'écriture a échoué
+STATUS_INTERVAL = 10.0       # Mise à jour du fichier d'état
+GAP_THRESHOLD = 150          # Secondes sans mesure (une mesure par minute attendue) signalant un trou
+MAX_GAPS = 50                # Trous récents conservés dans l'état
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _number(payload, key, fmt):
+    value = payload.get(key)
+    stale = payload.get("stale")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return ""
+    if isinstance(stale, list) and key in stale:
+        return "" # Dernière valeur valide republiée par le capteur, pas une mesure de cette minute
+    return fmt.format(value)
+
+def payload_to_row(payload):
+    """Message JSON de meteo_capteur.py -> ligne au format de meteo_log.csv, ou None s'il est invalide."""
+    row = [
+        payload.get("timestamp"),
+        _number(payload, "temperature", "{:.2f}"),
+        _number(payload, "humidity", "{:.2f}"),
+        _number(payload, "pressure", "{:.2f}"),
+        _number(payload, "rain_since_last", "{:.4f}"),
+        _number(payload, "wind_speed", "{:.2f}"),
+        _number(payload, "wind_gust", "{:.2f}"),
+        payload.get("wind_direction") or "N/A",
+        _number(payload, "wind_direction_deg", "{:.1f}"),
+        _number(payload, "wind_direction_std", "{:.1f}"),
+    ]
+    if not isinstance(row[0], str) or normalize_row(row) is None:
+        return None
+    return row
+
+class MqttIngest:
+    """
+    File bornée alimentée par handle_message() (thread réseau de paho, ou
+    rejeu d'un fichier) et vidée par lots par un thread d'écriture.
+    """
+
+    def __init__(self, config, csv_file=CSV_FILE, status_file=STATUS_FILE, registry=None):
+        self.local_id = config.get("station_id")
+        self.csv_file = csv_file
+        self.status_file = status_file
+        self.registry = registry or StationRegistry()
+        self.store = MeteoStore() if config.get("storage_backend") == "sqlite" else None
+        self.climate_store = ClimateStore()
+        self.queue = queue.Queue(maxsize=QUEUE_MAX)
+        self.last_seen = {} # Station -> dernier horodatage écrit
+        self.gaps = deque(maxlen=MAX_GAPS)
+        self.counters = {"received": 0, "written": 0, "invalid": 0, "late": 0, "stalls": 0, "dropped": 0, "gaps": 0, "write_errors": 0}
+        self.connected = False
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mqtt-ingest-writer", daemon=True)
+        self._thread.start()
+
+    # ---- Réception (thread réseau) ----
+
+    def handle_message(self, topic, payload):
+        """Valide un message et le met en file. Bloque tant que la file est pleine (contre-pression)."""
+        try:
+            data = json.loads(payload)
+        except (ValueError, UnicodeDecodeError):
+            data = None
+        row = payload_to_row(data) if isinstance(data, dict) else None
+        station_id = (data.get("station") or self.local_id) if row else None # Anciens capteurs : pas de champ station
+        if row is None or not valid_station_id(station_id):
+            self.counters["invalid"] += 1
+            return
+        self.counters["received"] += 1
+        waited = 0.0
+        while True:
+            try:
+                self.queue.put((station_id, row), timeout=BACKPRESSURE_TIMEOUT)
+                break
+            except queue.Full:
+                if self._stop_event.is_set():
+                    # Arrêt du service pendant l'attente : seul cas où une mesure est perdue
+                    self.counters["dropped"] += 1
+                    print(f"⚠️ Arrêt du service, mesure {row[0]} de {station_id} abandonnée (file pleine).")
+                    return
+                waited += BACKPRESSURE_TIMEOUT
+                if waited == BACKPRESSURE_TIMEOUT:
+                    self.counters["stalls"] += 1
+                print(f"⚠️ File d'ingestion pleine depuis {waited:.0f}s, mesure {row[0]} de {station_id} en attente (non acquittée au broker).")
+
+    # ---- Écriture (thread unique) ----
+
+    def _last_time(self, station_id):
+        if station_id not in self.last_seen:
+            if station_id == self.local_id:
+                fields = read_last_fields(self.csv_file)
+                last = fields[0] if fields and normalize_row(fields) else None
+            else:
+                store = self.registry.get(station_id)
+                last = store.last_time() if store else None
+            self.last_seen[station_id] = last
+        return self.last_seen[station_id]
+
+    def _prepare(self, batch):
+        """
+        Regroupe le lot par station, écarte les mesures déjà écrites et repère
+        les trous. Ne modifie rien : l'état n'est validé qu'après l'écriture.
+        """
+        by_station = defaultdict(list)
+        for station_id, row in batch:
+            by_station[station_id].append(row)
+        plan = []
+        for station_id, rows in by_station.items():
+            rows.sort(key=lambda row: row[0])
+            last = self._last_time(station_id)
+            fresh, gaps, late = [], [], 0
+            for row in rows:
+                if last is not None and row[0] <= last:
+                    late += 1 # Doublon (renvoi QoS 1) ou mesure déjà présente dans le journal
+                    continue
+                if last is not None:
+                    elapsed = (datetime.strptime(row[0], TIME_FORMAT) - datetime.strptime(last, TIME_FORMAT)).total_seconds()
+                    if elapsed > GAP_THRESHOLD:
+                        gaps.append({"station": station_id, "from": last, "to": row[0], "minutes": round(elapsed / 60)})
+                fresh.append(row)
+                last = row[0]
+            plan.append((station_id, fresh, last, gaps, late))
+        return plan
+
+    def _write_local(self, rows):
+        with locked_append(self.csv_file) as f: # Même verrou que le capteur et csv_repair
+            csv.writer(f).writerows(rows)
+            f.flush()
+        if self.store is not None:
+            self.store.bulk_write([normalize_row(row) for row in rows], "first")
+        for row in rows:
+            reading = parse_csv_row(row)
+            if reading is not None:
+                self.climate_store.update(reading)
+
+    def _write(self, batch):
+        """Écrit un lot. Retourne False en cas d'échec (le lot sera retenté)."""
+        try:
+            plan = self._prepare(batch)
+            for station_id, fresh, _, _, _ in plan:
+                if not fresh:
+                    continue
+                if station_id == self.local_id:
+                    self._write_local(fresh)
+                else:
+                    self.registry.ingest(station_id, fresh)
+        except Exception as e:
+            self.counters["write_errors"] += 1
+            print(f"⚠️ Écriture de {len(batch)} mesure(s) impossible, nouvel essai dans {RETRY_DELAY:.0f}s : {e}")
+            return False
+
+        for station_id, fresh, last, gaps, late in plan:
+            self.last_seen[station_id] = last
+            self.counters["written"] += len(fresh)
+            self.counters["late"] += late
+            for gap in gaps:
+                self.counters["gaps"] += 1
+                self.gaps.append(gap)
+                print(f"🕳️ Trou de {gap['minutes']} min dans les mesures de {station_id} ({gap['from']} -> {gap['to']}).")
+        return True
+
+    def _next_batch(self):
+        """Attend un message puis prend ceux déjà en file, jusqu'à BATCH_SIZE."""
+        try:
+            batch = [self.queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        while len(batch) < BATCH_SIZE:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        batch = []
+        last_status = 0.0
+        while not (self._stop_event.is_set() and not batch and self.queue.empty()):
+            if not batch:
+                batch = self._next_batch()
+            if batch:
+                if self._write(batch):
+                    batch = []
+                else:
+                    # Le lot est conservé : la file se remplit et ralentit paho pendant ce temps
+                    self._stop_event.wait(RETRY_DELAY)
+                    if self._stop_event.is_set():
+                        break
+            if time.time() - last_status >= STATUS_INTERVAL:
+                self._write_status()
+                last_status = time.time()
+        self._write_status()
+
+    def close(self):
+        """Écrit les messages encore en file puis arrête le thread d'écriture."""
+        self._stop_event.set()
+        self._thread.join()
+
+    # ---- Supervision ----
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "queue": self.queue.qsize(),
+            "last_seen": dict(self.last_seen),
+            "recent_gaps": list(self.gaps),
+            "updated": time.time(),
+            **self.counters,
+        }
+
+    def _write_status(self):
+        try:
+            temp_path = self.status_file + ".tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.stats(), f)
+            os.replace(temp_path, self.status_file)
+        except OSError:
+            pass
+
+def connect(config, ingest):
+    """Client MQTT à session persistante : le broker garde les messages QoS 1 pendant une coupure."""
+    client_id = config.get("mqtt_ingest_client_id", "meteopi-ingest")
+    try:
+        # Compatibilité paho-mqtt 2.0+ (CallbackAPIVersion requis)
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1, client_id=client_id, clean_session=False)
+    except AttributeError:
+        client = mqtt.Client(client_id=client_id, clean_session=False)
+
+    def on_connect(client, userdata, flags, rc):
+        if rc == 0:
+            ingest.connected = True
+            client.subscribe(config.get("mqtt_topic", "meteopi/sensors"), qos=1)
+            print(f"✅ MQTT connecté, abonnement à {config.get('mqtt_topic', 'meteopi/sensors')}.")
+        else:
+            print(f"❌ Échec de la connexion MQTT (code: {rc})")
+
+    def on_disconnect(client, userdata, rc):
+        ingest.connected = False
+        if rc != 0:
+            print("⚠️ Connexion MQTT perdue, reconnexion automatique...")
+
+    client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
+    client.on_message = lambda client, userdata, msg: ingest.handle_message(msg.topic, msg.payload)
+    client.reconnect_delay_set(min_delay=1, max_delay=120)
+    if config.get("mqtt_user"):
+        client.username_pw_set(config["mqtt_user"], config.get("mqtt_password"))
+    client.connect_async(config.get("mqtt_broker", "localhost"), int(config.get("mqtt_port", 1883)), 60)
+    return client
+
+def replay(ingest, path):
+    """Rejoue des messages enregistrés (une charge JSON par ligne), sans broker."""
+    source = sys.stdin if path == "-" else open(path, 'r', encoding='utf-8')
+    with source:
+        for line in source:
+            if line.strip():
+                ingest.handle_message(None, line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion des mesures publiées sur MQTT")
+    parser.add_argument("--replay", metavar="FICHIER", help="Rejoue des messages JSON (une charge par ligne, '-' pour l'entrée standard)")
+    args = parser.parse_args()
+
+    config = load_config()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    ingest = MqttIngest(config)
+    threading.Thread(target=ingest.climate_store.catch_up_from_csv, name="climate-catch-up", daemon=True).start()
+
+    if args.replay:
+        replay(ingest, args.replay)
+        ingest.close()
+        print(f"✅ Rejeu terminé : {ingest.counters['written']} mesure(s) écrite(s), {ingest.counters['late']} déjà présente(s), "
+              f"{ingest.counters['invalid']} invalide(s), {ingest.counters['gaps']} trou(s).")
+        sys.exit(0)
+
+    if mqtt is None:
+        print("❌ Bibliothèque paho-mqtt non trouvée : pip install paho-mqtt")
+        sys.exit(1)
+    client = connect(config, ingest)
+    print(f"🔄 Connexion à {config.get('mqtt_broker', 'localhost')}:{config.get('mqtt_port', 1883)}...")
+    try:
+        client.loop_forever(retry_first_connection=True)
+    except KeyboardInterrupt:
+        print("\nArrêt du service d'ingestion.")
+    finally:
+        client.disconnect()
+        ingest.close()
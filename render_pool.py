@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Pool de processus borné pour les rendus Matplotlib du serveur web.
+# Les workers Gunicorn utilisent des threads (voir gunicorn.conf.py) pour
+# servir les API légères ; Matplotlib n'étant pas thread-safe et un rendu
+# pouvant prendre plusieurs secondes sur un Raspberry Pi, les graphiques sont
+# calculés dans un processus séparé (démarré en "spawn" pour ne pas hériter
+# des threads du worker).
+#
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import meteo_metrics
+import meteo_profiler
+
+RENDER_WORKERS = int(os.environ.get("METEO_RENDER_WORKERS", "1")) # Processus de rendu par worker Gunicorn
+RENDER_TIMEOUT = 60   # Délai maximal d'un rendu (secondes)
+MAX_PENDING = 4       # Rendus en attente au-delà desquels les requêtes sont refusées
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+_inline_lock = threading.Lock()
+
+def _init_worker():
+    """Préchargement des bibliothèques lourdes au démarrage du processus de rendu."""
+    import meteo_graphs # noqa: F401
+    meteo_metrics.start("render")
+
+def _run(task, *args):
+    import meteo_graphs
+    return meteo_graphs.run_task(task, *args)
+
+def _run_profiled(task, *args):
+    """Rendu demandé par une requête profilée (voir meteo_profiler.py) : retourne (image, partie du profil)."""
+    return meteo_profiler.profile_call(f"render:{task}", _run, task, *args)
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker)
+        return _executor
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+def _render_inline(task, *args):
+    """Rendu de secours dans le worker lui-même (un seul à la fois : pyplot n'est pas thread-safe)."""
+    with _inline_lock:
+        return _run(task, *args)
+
+def render(task, *args, timeout=RENDER_TIMEOUT):
+    """
+    Exécute la tâche de rendu `task` (voir meteo_graphs.TASKS) dans le pool.
+    Retourne l'image en base64, ou None en cas d'échec ou de surcharge.
+    """
+    with meteo_metrics.timer("meteo_render_seconds", task=task):
+        return _render(task, args, timeout, meteo_profiler.is_active())
+
+def _render(task, args, timeout, profiled):
+    if not _pending.acquire(timeout=timeout):
+        print(f"⚠️ Rendu '{task}' abandonné : trop de graphiques en attente.")
+        meteo_metrics.inc("meteo_render_failures_total", task=task, reason="overload")
+        return None
+    try:
+        future = _get_executor().submit(_run_profiled if profiled else _run, task, *args)
+        result = future.result(timeout=timeout)
+        if profiled:
+            result, part = result
+            if part is not None:
+                meteo_profiler.add_part(part)
+        return result
+    except FutureTimeoutError:
+        print(f"⚠️ Rendu '{task}' trop long (> {timeout}s), abandonné.")
+        meteo_metrics.inc("meteo_render_failures_total", task=task, reason="timeout")
+        return None
+    except (BrokenProcessPool, OSError) as e:
+        # Processus de rendu tué (mémoire insuffisante...) : on le recrée au prochain appel
+        print(f"⚠️ Pool de rendu indisponible ({e}), rendu dans le worker.")
+        meteo_metrics.inc("meteo_render_failures_total", task=task, reason="pool")
+        _reset_executor()
+        try:
+            return _render_inline(task, *args)
+        except Exception as inline_error:
+            print(f"Erreur lors du rendu '{task}' : {inline_error}")
+            meteo_metrics.inc("meteo_render_failures_total", task=task, reason="error")
+            return None
+    except Exception as e:
+        print(f"Erreur lors du rendu '{task}' : {e}")
+        meteo_metrics.inc("meteo_render_failures_total", task=task, reason="error")
+        return None
+    finally:
+        _pending.release()
+
+def shutdown():
+    """Arrête les processus de rendu (appelé à la sortie d'un worker Gunicorn)."""
+    _reset_executor()
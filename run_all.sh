@@ -21,8 +21,6 @@ echo "Lancement de satellite_fetcher.py..." >> "$LOG_DIR/service.log"
 
 # Lancer le serveur web avec Gunicorn.
 # Il va créer un "socket" pour communiquer avec Nginx.
-# --workers 2 : nombre de processus pour gérer les requêtes.
-# --bind unix:.. : crée un socket dans un répertoire géré par systemd.
-# --umask 007 : supprime les permissions pour "les autres" mais garde celles du groupe.
+# La configuration (workers à threads, socket, umask) est dans gunicorn.conf.py.
 echo "Lancement de Gunicorn..." >> "$LOG_DIR/service.log"
-"$GUNICORN_EXEC" --workers 2 --bind unix:/run/station-meteo/station-meteo.sock --umask 007 meteo_web:app >> "$LOG_DIR/gunicorn.log" 2>&1
+"$GUNICORN_EXEC" -c "$BASE_DIR/gunicorn.conf.py" meteo_web:app >> "$LOG_DIR/gunicorn.log" 2>&1
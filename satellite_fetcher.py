@@ -2,88 +2,152 @@
 # -*- coding: utf-8 -*-
 
 import os
-import time
 import json
-import math
-import requests
+import threading
+from datetime import datetime, timedelta
 from PIL import Image
-from datetime import datetime
+from meteo_config import ConfigWatcher
+from tile_client import get_client, latlon_to_tile_coords
 
-CONFIG_FILE = "config.json"
 ARCHIVE_DIR = "static/satellite_archive"
-MAX_IMAGES = 12  # Nombre d'images à conserver pour l'animation (12 * 15min = 3h)
+# Les images brutes (quantifiées) restent hors de static/ : seul l'atlas est servi
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+FRAMES_DIR = os.path.join(DATA_DIR, "satellite_frames")
+MANIFEST_FILE = os.path.join(ARCHIVE_DIR, "manifest.json")
 FETCH_INTERVAL = 900  # 15 minutes en secondes
+# Clés de configuration qui déclenchent une nouvelle récupération immédiate
+SATELLITE_KEYS = ("owm_api_key", "latitude", "longitude", "satellite_loop_hours", "satellite_max_frames", "satellite_colors")
 
-def load_config():
-    """Charge la configuration depuis config.json."""
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Fichier de configuration introuvable ou corrompu. Utilisation des valeurs par défaut.")
-        return {
-            "owm_api_key": "METTRE_VOTRE_CLE_ICI",
-            "latitude": 48.85,
-            "longitude": 2.35
-        }
+def store_frame(image, timestamp):
+    """Quantifie la nouvelle image (palette réduite) et la range dans FRAMES_DIR."""
+    os.makedirs(FRAMES_DIR, exist_ok=True)
+    filepath = os.path.join(FRAMES_DIR, f"satellite_{timestamp}.png")
+    # La couverture nuageuse ne contient que quelques teintes : 64 couleurs suffisent
+    image.quantize(colors=64).save(filepath, format="PNG", optimize=True)
+    return filepath
 
-def latlon_to_tile_coords(lat, lon, zoom):
-    """Convertit des coordonnées GPS en coordonnées de tuile."""
-    lat_rad = math.radians(lat)
-    n = 2.0 ** zoom
-    xtile = int((lon + 180.0) / 360.0 * n)
-    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
-    return (xtile, ytile)
+def migrate_legacy_frames():
+    """Déplace les anciennes images PNG individuelles de static/ vers FRAMES_DIR."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return
+    for name in os.listdir(ARCHIVE_DIR):
+        if name.startswith("satellite_") and name.endswith(".png") and not name.startswith("satellite_sprite_"):
+            try:
+                with Image.open(os.path.join(ARCHIVE_DIR, name)) as legacy:
+                    store_frame(legacy.convert("RGB"), name[len("satellite_"):-len(".png")])
+                os.remove(os.path.join(ARCHIVE_DIR, name))
+            except OSError as e:
+                print(f"Ancienne image {name} ignorée : {e}")
+
+def select_frames(frame_names, loop_hours, max_frames):
+    """
+    Applique la politique de rétention : seules les images des `loop_hours`
+    dernières heures sont gardées, et au plus `max_frames` (réparties
+    régulièrement) entrent dans l'animation. Une boucle de 24h n'alourdit donc
+    pas l'atlas : elle est simplement échantillonnée plus largement.
+    Retourne (images de l'animation, images à supprimer).
+    """
+    limit = (datetime.now() - timedelta(hours=loop_hours)).strftime("%Y%m%d_%H%M%S")
+    kept = sorted(n for n in frame_names if n[len("satellite_"):-len(".png")] >= limit)
+    expired = [n for n in frame_names if n not in kept]
+    if len(kept) <= max_frames:
+        return kept, expired
+    # Échantillonnage régulier en conservant toujours l'image la plus récente
+    step = (len(kept) - 1) / (max_frames - 1) if max_frames > 1 else 0
+    indices = sorted({len(kept) - 1 - round(i * step) for i in range(max_frames)})
+    return [kept[i] for i in indices], expired
+
+def build_sprite(config):
+    """
+    Assemble les images retenues en un atlas vertical unique (une seule palette
+    partagée par toutes les images) et écrit le manifeste lu par la page satellite.
+    """
+    loop_hours = float(config.get("satellite_loop_hours", 3))
+    max_frames = max(1, int(config.get("satellite_max_frames", 12)))
+    colors = min(256, max(2, int(config.get("satellite_colors", 64))))
+
+    frame_names = [n for n in os.listdir(FRAMES_DIR) if n.endswith(".png")] if os.path.isdir(FRAMES_DIR) else []
+    selected, expired = select_frames(frame_names, loop_hours, max_frames)
+    for name in expired:
+        os.remove(os.path.join(FRAMES_DIR, name))
+        print(f"Ancienne image supprimée : {name}")
+    if not selected:
+        return
+
+    frames = []
+    for name in selected:
+        with Image.open(os.path.join(FRAMES_DIR, name)) as frame:
+            frames.append(frame.convert("RGB"))
+    width, height = frames[0].size
+    sheet = Image.new("RGB", (width, height * len(frames)))
+    for index, frame in enumerate(frames):
+        sheet.paste(frame.resize((width, height)) if frame.size != (width, height) else frame, (0, index * height))
+
+    # Nom versionné : le navigateur peut garder l'atlas en cache indéfiniment
+    version = selected[-1][len("satellite_"):-len(".png")]
+    sprite_name = f"satellite_sprite_{version}.png"
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    sheet.quantize(colors=colors).save(os.path.join(ARCHIVE_DIR, sprite_name), format="PNG", optimize=True)
+
+    manifest = {
+        "sprite": sprite_name,
+        "frame_width": width,
+        "frame_height": height,
+        "frames": [
+            {"time": datetime.strptime(name[len("satellite_"):-len(".png")], "%Y%m%d_%H%M%S").strftime("%d/%m/%Y %H:%M")}
+            for name in selected
+        ],
+        "generated": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(MANIFEST_FILE + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(MANIFEST_FILE + ".tmp", MANIFEST_FILE)
+
+    # Suppression des atlas précédents
+    for name in os.listdir(ARCHIVE_DIR):
+        if name.startswith("satellite_sprite_") and name != sprite_name:
+            os.remove(os.path.join(ARCHIVE_DIR, name))
+    print(f"Animation mise à jour : {len(selected)} image(s) dans {sprite_name}")
 
 def fetch_and_save_satellite_grid(config):
-    """Récupère une grille 3x3 et la sauvegarde en une seule image."""
+    """Récupère une grille 3x3, l'ajoute aux images archivées et régénère l'animation."""
     print(f"[{datetime.now()}] Début de la récupération de l'image satellite...")
     zoom = 5
     center_x, center_y = latlon_to_tile_coords(config['latitude'], config['longitude'], zoom)
     
-    grid_size = 3
-    full_image = Image.new('RGB', (256 * grid_size, 256 * grid_size))
-
-    for i in range(grid_size):
-        for j in range(grid_size):
-            tile_x, tile_y = center_x + i - 1, center_y + j - 1
-            url = f"https://tile.openweathermap.org/map/clouds_new/{zoom}/{tile_x}/{tile_y}.png?appid={config['owm_api_key']}"
-            
-            try:
-                response = requests.get(url, stream=True, timeout=10)
-                if response.status_code == 200:
-                    tile_image = Image.open(response.raw)
-                    full_image.paste(tile_image, (i * 256, j * 256))
-            except requests.RequestException as e:
-                print(f"Erreur lors du téléchargement de la tuile ({tile_x},{tile_y}): {e}")
+    # Les 9 tuiles sont téléchargées en parallèle puis assemblées en une fois.
+    # Pas de cache disque ici : la couverture nuageuse change à chaque passage.
+    url_template = "https://tile.openweathermap.org/map/clouds_new/{z}/{x}/{y}.png?appid=" + str(config['owm_api_key'])
+    full_image, tiles_ok = get_client().fetch_grid(url_template, center_x, center_y, zoom, grid_size=3, mode='RGB')
+    if tiles_ok == 0:
+        print("Aucune tuile satellite n'a pu être téléchargée, image ignorée.")
+        return
 
-    # Sauvegarde de l'image
-    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    # Seule la nouvelle image est quantifiée ; les précédentes sont réutilisées telles quelles
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filepath = os.path.join(ARCHIVE_DIR, f"satellite_{timestamp}.png")
-    full_image.save(filepath, format="PNG")
+    filepath = store_frame(full_image, timestamp)
     print(f"Image sauvegardée dans : {filepath}")
-
-    # Nettoyage des anciennes images
-    images = sorted(os.listdir(ARCHIVE_DIR), reverse=True)
-    if len(images) > MAX_IMAGES:
-        for old_image in images[MAX_IMAGES:]:
-            os.remove(os.path.join(ARCHIVE_DIR, old_image))
-            print(f"Ancienne image supprimée : {old_image}")
+    build_sprite(config)
 
 def main():
     """Boucle principale pour récupérer les images périodiquement."""
     print("Démarrage du service de récupération d'images satellite.")
-    config = load_config()
+    config_watcher = ConfigWatcher()
+    # Un changement de position ou de clé API relance une récupération sans attendre 15 min
+    refetch_event = threading.Event()
+    config_watcher.subscribe(SATELLITE_KEYS, lambda new_config, changed: refetch_event.set())
+    config_watcher.start()
+    migrate_legacy_frames()
     
     while True:
         try:
-            fetch_and_save_satellite_grid(config)
+            fetch_and_save_satellite_grid(config_watcher.config)
         except Exception as e:
             print(f"Une erreur inattendue est survenue dans la boucle principale : {e}")
         
         print(f"Prochaine récupération dans {FETCH_INTERVAL / 60} minutes.")
-        time.sleep(FETCH_INTERVAL)
+        refetch_event.wait(FETCH_INTERVAL)
+        refetch_event.clear()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
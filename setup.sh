@@ -143,7 +143,7 @@ pip install --upgrade pip
 
 echo -e "\e[32m[INFO]\e[0m Installation des dépendances Python restantes..."
 # Installation avec --no-cache-dir pour économiser la RAM sur Pi et éviter les timeouts
-pip install --no-cache-dir numpy pandas matplotlib gpiozero smbus2 adafruit-circuitpython-dht adafruit-circuitpython-bme280 adafruit-circuitpython-as5600 flask flask-login werkzeug requests Pillow gunicorn paho-mqtt influxdb-client
+pip install --no-cache-dir numpy pandas matplotlib gpiozero smbus2 adafruit-circuitpython-dht adafruit-circuitpython-busdevice adafruit-circuitpython-as5600 flask flask-login werkzeug requests Pillow gunicorn paho-mqtt influxdb-client
 if [ $? -ne 0 ]; then echo -e "\e[31m[ERROR]\e[0m Échec de l'installation des dépendances Python."; exit 1; fi
 
 echo -e "\e[32m[INFO]\e[0m Installation des dépendances Python terminée."
@@ -186,7 +186,7 @@ GUNICORN_EXEC="$PROJECT_DIR/venv/bin/gunicorn"
 
 # --- Nettoyage des anciens services ---
 log_info "Nettoyage des anciens services systemd..."
-systemctl disable --now station-meteo.service meteo-capteur.service meteo-web.service satellite-fetcher.service telegram-bot.service meteo-backup.timer meteo-backup.service meteo-persistence.service meteo-wifi-watchdog.service &> /dev/null
+systemctl disable --now station-meteo.service meteo-capteur.service meteo-web.service satellite-fetcher.service telegram-bot.service meteo-backup.timer meteo-backup.service meteo-persistence.service meteo-wifi-watchdog.service meteo-mqtt-ingest.service &> /dev/null
 rm -f /etc/systemd/system/station-meteo.service
 rm -f /etc/systemd/system/meteo-capteur.service
 rm -f /etc/systemd/system/meteo-web.service
@@ -196,6 +196,7 @@ rm -f /etc/systemd/system/meteo-backup.service
 rm -f /etc/systemd/system/meteo-backup.timer
 rm -f /etc/systemd/system/meteo-persistence.service
 rm -f /etc/systemd/system/meteo-wifi-watchdog.service
+rm -f /etc/systemd/system/meteo-mqtt-ingest.service
 log_info "Anciens services nettoyés."
 
 # --- Service 1: meteo_capteur.py ---
@@ -263,7 +264,7 @@ Description=Application web Gunicorn pour la station meteo
 After=network.target
 
 [Service]
-ExecStart=$GUNICORN_EXEC --workers 2 --bind unix:/run/station-meteo/station-meteo.sock --umask 007 meteo_web:app
+ExecStart=$GUNICORN_EXEC -c $PROJECT_DIR/gunicorn.conf.py meteo_web:app
 WorkingDirectory=$PROJECT_DIR
 RuntimeDirectory=station-meteo
 Restart=always
@@ -341,6 +342,27 @@ Group=root
 WantedBy=multi-user.target
 EOF
 
+# --- Service 8: Ingestion MQTT (optionnel, non activé) ---
+# Pour un tableau de bord installé sur une autre machine que le capteur :
+#   sudo systemctl enable --now meteo-mqtt-ingest.service
+cat <<EOF > /etc/systemd/system/meteo-mqtt-ingest.service
+[Unit]
+Description=Service d'ingestion des mesures MQTT MeteoPi
+After=network.target
+
+[Service]
+ExecStart=$PYTHON_EXEC $PROJECT_DIR/mqtt_ingest.py
+WorkingDirectory=$PROJECT_DIR
+Restart=always
+User=$REAL_USER
+Group=$REAL_USER
+StandardOutput=append:$PROJECT_DIR/logs/mqtt_ingest.log
+StandardError=append:$PROJECT_DIR/logs/mqtt_ingest.log
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
 systemctl daemon-reload || log_error "Échec du rechargement des démons systemd."
 systemctl enable --now meteo-persistence.service || log_error "Échec de l'activation de la persistance."
 systemctl enable --now meteo-capteur.service || log_error "Échec de l'activation du service meteo-capteur."
@@ -1,38 +1,110 @@
 # -*- coding: utf-8 -*-
-import json
 import os
 import time
 import requests
+from collections import deque
+from csv_tail import TailReader
 from datetime import datetime
+from meteo_config import ConfigWatcher
+from meteo_stats import RollingWindow, parse_csv_row, read_snapshot
 
-CONFIG_FILE = "config.json"
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 CSV_FILE = os.path.join(DATA_DIR, "meteo_log.csv")
 SEND_INTERVAL = 3600  # 1 heure en secondes
+POLL_INTERVAL = 5     # Vérification des nouvelles mesures toutes les 5s (simple stat() du fichier)
+WARMUP_LINES = 240      # 4h de mesures relues au démarrage pour amorcer les fenêtres glissantes
 
-def load_config():
-    """Charge la configuration depuis config.json."""
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        print("Fichier de configuration introuvable ou corrompu.")
-        return {}
-
-def get_last_csv_line(filepath):
-    """Lit efficacement la dernière ligne non vide d'un fichier."""
-    try:
-        with open(filepath, 'rb') as f:
-            f.seek(-2, os.SEEK_END)
-            while f.read(1) != b'\n':
-                f.seek(-2, os.SEEK_CUR)
-            last_line = f.readline().decode('utf-8')
-            return last_line.strip().split(',')
-    except (IOError, IndexError):
-        return None
-
-def send_telegram_message(token, chat_id, message):
-    """Envoie un message à un chat Telegram."""
+class AlertEngine:
+    """
+    Évalue les règles d'alerte configurées (`alert_rules`) à chaque nouvelle mesure.
+    - Les alertes sont dédupliquées : une règle active ne se redéclenche pas
+      tant que la valeur n'est pas repassée sous le seuil moins l'hystérésis.
+    - Chaque règle a un délai de répit (cooldown) et le nombre total d'alertes
+      est limité par heure (`alert_max_per_hour`).
+    """
+
+    def __init__(self, rules, max_per_hour):
+        self.rules = [dict(rule) for rule in rules]
+        self.max_per_hour = max_per_hour
+        self.windows = {}
+        self.state = {rule['name']: {'active': False, 'last_sent': 0.0} for rule in self.rules}
+        self.sent_times = deque()
+        for rule in self.rules:
+            key = (rule['metric'], int(rule.get('window', 0)))
+            if key not in self.windows:
+                self.windows[key] = RollingWindow(max(60, int(rule.get('window', 0)) * 60))
+
+    def _metric_value(self, rule, reading):
+        """Calcule la valeur observée par une règle (instantanée ou sur fenêtre)."""
+        metric = rule['metric']
+        window = self.windows[(metric, int(rule.get('window', 0)))]
+        if metric == 'rain_rate':
+            # Intensité en mm/h sur la fenêtre
+            return window.total * 3600.0 / window.seconds
+        if metric == 'rain_total':
+            return window.total
+        if metric == 'pressure_change':
+            if window.first is None or len(window.values) < 2:
+                return None
+            return window.last - window.first
+        if metric == 'gust_max':
+            return window.maximum
+        return reading.get(metric)
+
+    def process(self, reading, notify=True):
+        """Intègre une mesure et retourne la liste des messages d'alerte à envoyer."""
+        ts = reading['timestamp']
+        for (metric, _), window in self.windows.items():
+            source = {'rain_rate': 'rain', 'rain_total': 'rain', 'pressure_change': 'pressure', 'gust_max': 'wind_gust'}.get(metric, metric)
+            window.add(ts, reading.get(source))
+            window.expire(ts)
+
+        messages = []
+        for rule in self.rules:
+            value = self._metric_value(rule, reading)
+            if value is None:
+                continue
+            state = self.state[rule['name']]
+            threshold = float(rule['threshold'])
+            hysteresis = float(rule.get('hysteresis', 0))
+            above = rule.get('op', '>') == '>'
+            triggered = value > threshold if above else value < threshold
+            cleared = value <= threshold - hysteresis if above else value >= threshold + hysteresis
+
+            if state['active']:
+                if cleared:
+                    state['active'] = False
+                continue
+            if not triggered:
+                continue
+
+            state['active'] = True
+            if not notify:
+                continue # Amorçage : on mémorise l'état sans réveiller tout le monde
+            if ts - state['last_sent'] < float(rule.get('cooldown', 60)) * 60:
+                continue
+            if not self._rate_limit_ok(time.time()):
+                print(f"Alerte '{rule['name']}' ignorée (limite de {self.max_per_hour} alertes/heure atteinte).")
+                continue
+            state['last_sent'] = ts
+            messages.append(self._format(rule, value, reading))
+        return messages
+
+    def _rate_limit_ok(self, now):
+        while self.sent_times and now - self.sent_times[0] > 3600:
+            self.sent_times.popleft()
+        if len(self.sent_times) >= self.max_per_hour:
+            return False
+        self.sent_times.append(now)
+        return True
+
+    def _format(self, rule, value, reading):
+        update_time = datetime.fromtimestamp(reading['timestamp']).strftime('%d/%m à %Hh%M')
+        label = rule.get('message') or rule['name']
+        return f"⚠️ *Alerte météo : {label}*\n\nValeur mesurée : {value:.1f} (seuil {rule.get('op', '>')} {float(rule['threshold']):.1f})\nMesure du {update_time}"
+
+def send_telegram_message(session, token, chat_id, message):
+    """Envoie un message à un chat Telegram (via une session HTTP réutilisée)."""
     url = f"https://api.telegram.org/bot{token}/sendMessage"
     payload = {
         'chat_id': chat_id,
@@ -40,7 +112,7 @@ def send_telegram_message(token, chat_id, message):
         'parse_mode': 'Markdown'
     }
     try:
-        response = requests.post(url, data=payload, timeout=10)
+        response = session.post(url, data=payload, timeout=10)
         if response.status_code == 200:
             print("Message Telegram envoyé avec succès.")
         else:
@@ -48,41 +120,80 @@ def send_telegram_message(token, chat_id, message):
     except requests.RequestException as e:
         print(f"Erreur de connexion à l'API Telegram: {e}")
 
+def format_bulletin(last_reading, live_stats=None):
+    """Construit le bulletin horaire à partir de la dernière mesure (et des statistiques glissantes si disponibles)."""
+    update_time = datetime.fromtimestamp(last_reading['timestamp']).strftime('%d/%m à %Hh%M')
+    temp_str = f"{last_reading['temp']:.1f}°C" if last_reading['temp'] is not None else "N/A"
+    hum_str = f"{last_reading['hum']:.0f}%" if last_reading['hum'] is not None else "N/A"
+    pressure_str = f"{last_reading['pressure']:.1f} hPa" if last_reading['pressure'] is not None else "N/A"
+    wind_speed = last_reading['wind_speed'] or 0.0
+    wind_dir = last_reading.get('wind_dir_str', 'N/A')
+    gust_str = f", rafales {last_reading['wind_gust']:.1f} km/h" if last_reading.get('wind_gust') is not None else ""
+    message = f"☀️ *Bulletin Météo du {update_time}*\n\n🌡️ *Température*: {temp_str}\n💧 *Humidité*: {hum_str}\n📈 *Pression*: {pressure_str}\n💨 *Vent*: {wind_speed:.1f} km/h ({wind_dir}){gust_str}"
+    if live_stats:
+        derived = live_stats.get("derived", {})
+        if derived.get("rain_24h") is not None:
+            message += f"\n🌧️ *Pluie 24h*: {derived['rain_24h']:.1f} mm"
+        if derived.get("pressure_change_3h") is not None:
+            message += f"\n📉 *Tendance pression 3h*: {derived['pressure_change_3h']:+.1f} hPa"
+    return message
+
 def main():
-    """Boucle principale pour envoyer les bulletins météo."""
+    """Boucle principale : alertes en quasi temps réel et bulletin météo horaire."""
     print("Démarrage du bot de notification Telegram.")
-    
+    # La configuration est relue uniquement quand config.json change
+    config_watcher = ConfigWatcher().start()
+    session = requests.Session() # Connexion HTTPS réutilisée entre les envois
+
+    def build_engine(config):
+        return AlertEngine(config.get("alert_rules", []), config.get("alert_max_per_hour", 6))
+
+    engine = build_engine(config_watcher.config)
+    rules_version = (config_watcher.config.get("alert_rules"), config_watcher.config.get("alert_max_per_hour"))
+
+    follower = TailReader(CSV_FILE, WARMUP_LINES) # Suivi façon `tail -f` : seules les nouvelles lignes sont lues
+    last_reading = None
+    next_bulletin = time.time()
+    warming_up = True
+
     while True:
-        config = load_config()
+        config = config_watcher.config
         token = config.get("telegram_bot_token")
         chat_id = config.get("telegram_chat_id")
+        configured = bool(token) and "METTRE_VOTRE_TOKEN_ICI" not in token and bool(chat_id)
 
-        if not token or "METTRE_VOTRE_TOKEN_ICI" in token or not chat_id:
-            print("Token ou Chat ID Telegram non configuré. Mise en veille pour 1h.")
-            time.sleep(SEND_INTERVAL)
-            continue
-
-        last_reading_list = get_last_csv_line(CSV_FILE)
-        if not last_reading_list or len(last_reading_list) < 7:
-            print("Pas de données météo récentes à envoyer.")
-            time.sleep(SEND_INTERVAL)
-            continue
-
-        headers = ["time", "temp", "hum", "pressure", "rain", "wind_speed", "wind_dir_str"]
-        last_reading = dict(zip(headers, last_reading_list))
+        # Règles modifiées depuis l'interface : on reconstruit le moteur
+        current_version = (config.get("alert_rules"), config.get("alert_max_per_hour"))
+        if current_version != rules_version:
+            engine = build_engine(config)
+            rules_version = current_version
+            warming_up = True
+            follower = TailReader(CSV_FILE, WARMUP_LINES)
 
-        try:
-            update_time = datetime.strptime(last_reading['time'], "%Y-%m-%d %H:%M:%S").strftime('%d/%m à %Hh%M')
-            temp, hum, wind_speed, wind_dir = float(last_reading['temp']), float(last_reading['hum']), float(last_reading['wind_speed']), last_reading.get('wind_dir_str', 'N/A')
-            pressure_str = f"{float(last_reading['pressure']):.1f} hPa" if last_reading['pressure'] else "N/A"
+        # --- Nouvelles mesures : évaluation des alertes ---
+        for line in follower.poll():
+            reading = parse_csv_row(line.strip().split(','))
+            if reading is None:
+                continue
+            last_reading = reading
+            alerts = engine.process(reading, notify=not warming_up and config.get("alerts_enabled", True))
+            if configured:
+                for message in alerts:
+                    send_telegram_message(session, token, chat_id, message)
+        warming_up = False
 
-            message = f"☀️ *Bulletin Météo du {update_time}*\n\n🌡️ *Température*: {temp:.1f}°C\n💧 *Humidité*: {hum:.0f}%\n📈 *Pression*: {pressure_str}\n💨 *Vent*: {wind_speed:.1f} km/h ({wind_dir})"
-            send_telegram_message(token, chat_id, message)
-        except (ValueError, KeyError) as e:
-            print(f"Erreur lors du formatage des données: {e}")
+        # --- Bulletin horaire ---
+        if time.time() >= next_bulletin:
+            next_bulletin = time.time() + SEND_INTERVAL
+            if not configured:
+                print("Token ou Chat ID Telegram non configuré. Mise en veille pour 1h.")
+            elif last_reading is None:
+                print("Pas de données météo récentes à envoyer.")
+            else:
+                send_telegram_message(session, token, chat_id, format_bulletin(last_reading, read_snapshot()))
+                print(f"Prochain envoi dans {SEND_INTERVAL / 3600:.0f} heure(s).")
 
-        print(f"Prochain envoi dans {SEND_INTERVAL / 3600:.0f} heure(s).")
-        time.sleep(SEND_INTERVAL)
+        time.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
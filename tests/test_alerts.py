@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Moteur d'alertes du bot Telegram (telegram_bot.AlertEngine) et validation
+# des règles dans la configuration (meteo_config).
+#
+
+import pytest
+
+pytest.importorskip("requests")
+
+from meteo_config import validate_config
+from telegram_bot import AlertEngine
+
+T0 = 1_700_000_000.0
+
+def feed(engine, values, metric="temp", start=T0, step=60):
+    """Envoie une mesure par minute ; retourne le nombre de messages par mesure."""
+    return [len(engine.process({"timestamp": start + i * step, metric: value})) for i, value in enumerate(values)]
+
+def test_hysteresis_prevents_repeated_alerts():
+    engine = AlertEngine([{"name": "chaud", "metric": "temp", "op": ">", "threshold": 30, "hysteresis": 2, "cooldown": 0}], 100)
+    # 30.5 déclenche ; 29.5 reste dans la bande d'hystérésis : pas de nouvelle alerte à 31
+    assert feed(engine, [29, 30.5, 29.5, 31, 27.9, 31]) == [0, 1, 0, 0, 0, 1]
+
+def test_below_threshold_rule():
+    engine = AlertEngine([{"name": "gel", "metric": "temp", "op": "<", "threshold": 0, "hysteresis": 1, "cooldown": 0}], 100)
+    assert feed(engine, [2, -0.5, 0.5, -1, 1.5, -1]) == [0, 1, 0, 0, 0, 1]
+
+def test_cooldown_delays_new_alert():
+    engine = AlertEngine([{"name": "vent", "metric": "wind_speed", "op": ">", "threshold": 50, "cooldown": 10}], 100)
+    # Alerte à t=1 min, retour au calme puis nouveau dépassement à t=3 min : dans le délai de répit
+    counts = feed(engine, [40, 60, 40, 60, 40, 60], metric="wind_speed")
+    assert counts == [0, 1, 0, 0, 0, 0]
+    later = engine.process({"timestamp": T0 + 20 * 60, "wind_speed": 40}) + engine.process({"timestamp": T0 + 21 * 60, "wind_speed": 60})
+    assert len(later) == 1
+
+def test_rate_limit_per_hour():
+    rules = [{"name": f"r{i}", "metric": "temp", "op": ">", "threshold": i, "cooldown": 0} for i in range(3)]
+    engine = AlertEngine(rules, 2)
+    assert feed(engine, [10]) == [2]
+
+def test_warmup_does_not_notify():
+    engine = AlertEngine([{"name": "chaud", "metric": "temp", "op": ">", "threshold": 30, "cooldown": 0}], 100)
+    assert engine.process({"timestamp": T0, "temp": 35}, notify=False) == []
+    assert feed(engine, [35], start=T0 + 60) == [0] # Toujours active : pas d'alerte au démarrage
+
+def test_window_metric():
+    engine = AlertEngine([{"name": "pluie", "metric": "rain_total", "op": ">", "threshold": 1.0, "window": 60, "cooldown": 0}], 100)
+    assert feed(engine, [0.4, 0.4, 0.4], metric="rain") == [0, 0, 1]
+
+def test_invalid_rules_are_dropped():
+    rules = [
+        {"name": "ok", "metric": "temp", "op": ">", "threshold": "30"},
+        {"name": "ok", "metric": "temp", "threshold": 10},            # Nom en double
+        {"metric": "temp", "threshold": 10},                          # Sans nom
+        {"name": "m", "metric": "temperature", "threshold": 10},      # Mesure inconnue
+        {"name": "o", "metric": "temp", "op": ">=", "threshold": 10}, # Comparaison inconnue
+        {"name": "t", "metric": "temp", "threshold": True},           # Seuil non numérique
+        {"name": "c", "metric": "temp", "threshold": 1, "cooldown": -5},
+        "pas une règle",
+    ]
+    config = validate_config({"alert_rules": rules})
+    assert [rule["name"] for rule in config["alert_rules"]] == ["ok"]
+    AlertEngine(config["alert_rules"], 10) # Ne doit pas lever d'exception
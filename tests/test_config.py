@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Service de configuration (meteo_config) : rechargement à chaud et
+# conservation de la dernière configuration valide.
+#
+
+import os
+
+from meteo_config import ConfigWatcher, load_config, save_config
+
+def test_watcher_notifies_changed_keys(tmp_path):
+    path = str(tmp_path / "config.json")
+    save_config({"station_id": "jardin", "temp_offset": -1.5}, path)
+    watcher = ConfigWatcher(path)
+    calls = []
+    watcher.subscribe(["temp_offset"], lambda config, changed: calls.append((config["temp_offset"], changed)))
+    watcher.subscribe(["mqtt_broker"], lambda config, changed: calls.append("mqtt"))
+
+    save_config({"station_id": "jardin", "temp_offset": -2.0}, path)
+    assert watcher.check() == {"temp_offset"}
+    assert calls == [(-2.0, {"temp_offset"})]
+    assert watcher.check() == set() # Fichier inchangé
+
+def test_invalid_file_keeps_last_valid_config(tmp_path):
+    path = str(tmp_path / "config.json")
+    save_config({"station_id": "jardin", "mqtt_enabled": True}, path)
+    watcher = ConfigWatcher(path)
+    calls = []
+    watcher.subscribe(None, lambda config, changed: calls.append(changed))
+
+    for broken in ('{"station_id": "jardin", "mqtt_en', "[1, 2]"):
+        with open(path, 'w') as f:
+            f.write(broken)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + len(broken)))
+        assert watcher.check() == set()
+        assert watcher.get("mqtt_enabled") is True
+    os.remove(path)
+    assert watcher.check() == set()
+    assert calls == []
+
+    # Le fichier corrigé est relu normalement
+    save_config({"station_id": "jardin", "mqtt_enabled": False}, path)
+    assert watcher.check() == {"mqtt_enabled"}
+    assert calls == [{"mqtt_enabled"}]
+
+def test_initial_load_falls_back_to_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{pas du json")
+    assert load_config(str(path)) == load_config(str(tmp_path / "absent.json"))
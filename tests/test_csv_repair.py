@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Vérification incrémentale et réparation des caractères NUL
+# (csv_repair.verify_tail).
+#
+
+import os
+
+from csv_repair import CHECKPOINT_SUFFIX, load_checkpoint, verify_tail
+
+HEADER = b"time,temp,hum,pressure,rain,wind_speed,wind_gust,wind_dir_str,wind_dir_deg,wind_dir_std\n"
+
+def line(minute, temp="12.00"):
+    return f"2024-05-01 10:{minute:02d}:00,{temp},50.00,1013.00,0.0000,5.00,8.00,N,0.0,3.0\n".encode()
+
+def checkpoint(path):
+    with open(path, 'rb') as f:
+        return load_checkpoint(str(path), f.fileno())
+
+def test_clean_file_sets_checkpoint(tmp_path):
+    path = tmp_path / "meteo_log.csv"
+    path.write_bytes(HEADER + line(0) + line(1))
+    result = verify_tail(str(path))
+    assert result == {"scanned": path.stat().st_size, "repaired": 0, "dropped": 0}
+    assert checkpoint(path) == path.stat().st_size
+    # Rien de nouveau : aucun octet relu
+    assert verify_tail(str(path))["scanned"] == 0
+
+def test_only_appended_bytes_are_scanned(tmp_path):
+    path = tmp_path / "meteo_log.csv"
+    path.write_bytes(HEADER + line(0))
+    verify_tail(str(path))
+    size = path.stat().st_size
+    with open(path, 'ab') as f:
+        f.write(line(1) + b"2024-05-01 10:02") # Dernière ligne en cours d'écriture
+    result = verify_tail(str(path))
+    assert result["scanned"] == path.stat().st_size - size
+    assert checkpoint(path) == size + len(line(1)) # Seules les lignes complètes sont validées
+
+def test_nul_run_is_repaired(tmp_path):
+    path = tmp_path / "meteo_log.csv"
+    path.write_bytes(HEADER + line(0))
+    verify_tail(str(path))
+    # Coupure de courant : fin de ligne remplacée par des NUL, puis la mesure suivante
+    corrupted = line(1)[:20] + b"\x00" * 50 + line(2)
+    with open(path, 'ab') as f:
+        f.write(corrupted + line(3))
+    result = verify_tail(str(path))
+    assert result["repaired"] == 1
+    assert result["dropped"] == 1 # Le début de ligne tronqué n'est pas récupérable
+    data = path.read_bytes()
+    assert b"\x00" not in data
+    assert data == HEADER + line(0) + line(2) + line(3)
+    assert checkpoint(path) == len(data)
+
+def test_replaced_file_is_rescanned(tmp_path):
+    path = tmp_path / "meteo_log.csv"
+    path.write_bytes(HEADER + line(0) + line(1))
+    verify_tail(str(path))
+    assert os.path.exists(str(path) + CHECKPOINT_SUFFIX)
+    replacement = tmp_path / "new.csv"
+    replacement.write_bytes(HEADER + line(0) + b"\x00\x00" + line(1))
+    os.replace(replacement, path)
+    assert checkpoint(path) == 0 # Autre inode : le point de contrôle ne vaut plus
+    result = verify_tail(str(path))
+    assert result["scanned"] == len(HEADER + line(0) + b"\x00\x00" + line(1))
+    assert result["repaired"] == 1
+    assert path.read_bytes() == HEADER + line(0) + line(1)
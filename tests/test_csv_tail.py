@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Lecture de la fin des fichiers (csv_tail.read_last_lines, TailReader).
+#
+
+import os
+
+from csv_tail import TailReader, read_last_fields, read_last_lines
+
+def write(path, text, mode='w'):
+    with open(path, mode, newline='') as f:
+        f.write(text)
+
+def test_read_last_lines_across_blocks(tmp_path):
+    path = tmp_path / "log.csv"
+    write(path, "".join(f"ligne {i}\r\n" for i in range(2000)))
+    assert read_last_lines(str(path), 3) == ["ligne 1997", "ligne 1998", "ligne 1999"]
+    write(path, "2024-01-01 00:00:00,1,2\npartielle", 'a')
+    assert read_last_fields(str(path)) == ["2024-01-01 00:00:00", "1", "2"]
+
+def test_partial_last_line_is_deferred(tmp_path):
+    path = tmp_path / "log.csv"
+    write(path, "a\nb\n")
+    reader = TailReader(str(path), num_lines=2)
+    assert reader.poll() == ["a", "b"]
+    write(path, "c,en co", 'a')
+    assert reader.poll() == []
+    assert reader.lines() == ["a", "b"]
+    write(path, "urs\nd\n", 'a')
+    assert reader.poll() == ["c,en cours", "d"]
+    assert reader.last_fields() == ["d"]
+
+def test_replaced_file_is_reloaded(tmp_path):
+    path = tmp_path / "log.csv"
+    write(path, "a\nb\n")
+    reader = TailReader(str(path), num_lines=2)
+    reader.poll()
+    replacement = tmp_path / "new.csv"
+    write(replacement, "x\ny\nz\n")
+    os.replace(replacement, path)
+    assert reader.poll() == [] # Remplacement : on repart de la fin sans rejouer
+    assert reader.lines() == ["y", "z"]
+    write(path, "w\n", 'a')
+    assert reader.poll() == ["w"]
+
+def test_rewritten_in_place_is_detected(tmp_path):
+    path = tmp_path / "log.csv"
+    write(path, "2024-01-01,1\n2024-01-02,2\n")
+    reader = TailReader(str(path))
+    assert reader.last_fields() == ["2024-01-02", "2"]
+    # Même inode, même taille ou plus grande, contenu différent (édition d'une ligne)
+    with open(path, 'r+') as f:
+        f.write("2024-01-01,1\n2024-01-02,9\n3\n")
+    assert reader.last_fields() == ["3"]
+    with open(path, 'r+') as f:
+        f.truncate(13)
+    assert reader.lines() == ["2024-01-01,1"]
+
+def test_missing_file(tmp_path):
+    reader = TailReader(str(tmp_path / "absent.csv"))
+    assert reader.lines() == []
+    assert reader.last_fields() is None
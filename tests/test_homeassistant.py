@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# Découverte Home Assistant et filtrage des états publiés
+# (meteo_homeassistant.StateFilter).
+#
+
+import json
+
+from meteo_homeassistant import HA_REFRESH_INTERVAL, HA_SENSORS, StateFilter, availability_topic, discovery_messages
+
+def publish(state_filter, values, now):
+    """Publie comme le publisher : changes() puis commit() de chaque valeur envoyée."""
+    changes = state_filter.changes(values, now)
+    for key, value in changes:
+        state_filter.commit(key, value, now)
+    return dict(changes)
+
+def test_first_values_are_all_published():
+    state_filter = StateFilter()
+    assert publish(state_filter, {"temperature": 20.0, "humidity": 55.0, "wind_direction": "N", "pressure": None}, 0) == \
+        {"temperature": 20.0, "humidity": 55.0, "wind_direction": "N"}
+
+def test_deadbands():
+    state_filter = StateFilter()
+    publish(state_filter, {"temperature": 10.1, "pressure": 1013.0, "wind_direction": "N"}, 0)
+    assert publish(state_filter, {"temperature": 10.15, "pressure": 1013.1, "wind_direction": "N"}, 60) == {}
+    # 10.2 - 10.1 vaut 0.0999... en flottant : l'arrondi fait passer la variation
+    assert publish(state_filter, {"temperature": 10.2, "pressure": 1013.2, "wind_direction": "NE"}, 120) == \
+        {"temperature": 10.2, "pressure": 1013.2, "wind_direction": "NE"}
+
+def test_small_drifts_accumulate_against_last_published():
+    state_filter = StateFilter()
+    publish(state_filter, {"humidity": 50.0}, 0)
+    assert publish(state_filter, {"humidity": 50.6}, 60) == {}
+    assert publish(state_filter, {"humidity": 51.0}, 120) == {"humidity": 51.0}
+
+def test_unchanged_value_is_refreshed():
+    state_filter = StateFilter()
+    publish(state_filter, {"temperature": 15.0}, 0)
+    assert publish(state_filter, {"temperature": 15.0}, HA_REFRESH_INTERVAL - 1) == {}
+    assert publish(state_filter, {"temperature": 15.0}, HA_REFRESH_INTERVAL) == {"temperature": 15.0}
+
+def test_nothing_remembered_before_commit():
+    state_filter = StateFilter()
+    assert state_filter.changes({"temperature": 15.0}, 0) == [("temperature", 15.0)]
+    assert state_filter.changes({"temperature": 15.0}, 1) == [("temperature", 15.0)] # Envoi échoué : on retente
+    publish(state_filter, {"temperature": 15.0}, 2)
+    state_filter.reset()
+    assert state_filter.changes({"temperature": 15.0}, 3) == [("temperature", 15.0)]
+
+def test_discovery_messages():
+    config = {"station_id": "jardin", "ha_discovery_prefix": "ha", "ha_state_topic": "meteo"}
+    messages = discovery_messages(config)
+    assert len(messages) == len(HA_SENSORS)
+    topic, payload = messages[0]
+    assert topic == "ha/sensor/jardin/temperature/config"
+    payload = json.loads(payload)
+    assert payload["state_topic"] == "meteo/jardin/temperature"
+    assert payload["availability_topic"] == availability_topic(config) == "meteo/jardin/status"
+    assert payload["unique_id"] == "jardin_temperature"
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Import en masse (meteo_import) : fusion des runs triés, politiques de
+# doublons et conservation du journal existant.
+#
+
+import fcntl
+
+import pytest
+
+import meteo_import
+from meteo_import import _parse_chunk, merge_runs, run_import
+
+HEADER = "time,temp,hum,pressure,rain,wind_speed,wind_gust,wind_dir_str,wind_dir_deg,wind_dir_std\r\n"
+
+def runs_for(tmp_path, contents, existing=False):
+    """Un run par fichier (source = rang dans `contents`) ; la source 0 est le journal existant si `existing`."""
+    runs = []
+    for source, text in enumerate(contents):
+        path = tmp_path / f"source_{source}.csv"
+        path.write_bytes(text.encode())
+        runs.append(_parse_chunk(str(path), 0, len(text.encode()), source, str(tmp_path), existing=existing and source == 0))
+    return runs
+
+def merged(runs, policy):
+    stats = {"duplicates": 0}
+    return [(row[0] if row else None, row, raw) for row, raw in merge_runs(runs, policy, stats)], stats["duplicates"]
+
+FIRST = HEADER + "2024-01-01 00:00:00,1,50,,0,1,2,N,0,5\n2024-01-01 00:02:00,3,50,1013,0,1,2,N,0,5\n"
+SECOND = HEADER + "2024-01-01 00:01:00,2,50,1013,0,1,2,N,0,5\n2024-01-01 00:00:00,9,50,1013,0,1,2,N,0,5\n"
+
+@pytest.mark.parametrize("policy, expected_temp", [("first", 1.0), ("last", 9.0), ("most_complete", 9.0)])
+def test_duplicate_policies(tmp_path, policy, expected_temp):
+    rows, duplicates = merged(runs_for(tmp_path, [FIRST, SECOND]), policy)
+    assert [key for key, _, _ in rows] == ["2024-01-01 00:00:00", "2024-01-01 00:01:00", "2024-01-01 00:02:00"]
+    assert duplicates == 1
+    assert rows[0][1][1] == expected_temp
+
+def test_most_complete_keeps_first_on_tie(tmp_path):
+    other = HEADER + "2024-01-01 00:02:00,7,50,1013,0,1,2,N,0,5\n"
+    rows, _ = merged(runs_for(tmp_path, [FIRST, other]), "most_complete")
+    assert rows[-1][1][1] == 3.0
+
+def test_rejected_lines_are_counted(tmp_path):
+    text = HEADER + "2024-01-01 00:00:00,1,50,1013,0,1,2,N,0,5\nn'importe quoi\n\n"
+    run = runs_for(tmp_path, [text])[0]
+    assert (run["rows"], run["rejected"], run["kept_unparsed"]) == (1, 1, 0)
+    assert run["samples"] == ["source_0.csv : n'importe quoi"]
+
+def test_existing_rows_keep_their_text(tmp_path):
+    existing = HEADER + "illisible au début\r\n2024-01-01 00:00:00,1.00,50,1013,0,1,2,N,0,5\r\nLIGNE,CASSÉE\r\n2024-01-01 00:02:00,3.00,50,1013,0,1,2,N,0,5\r\n"
+    runs = runs_for(tmp_path, [existing, SECOND], existing=True)
+    assert runs[0]["kept_unparsed"] == 2 and runs[0]["rejected"] == 0
+    rows, duplicates = merged(runs, "first")
+    assert [raw for _, _, raw in rows] == [
+        "illisible au début",
+        "2024-01-01 00:00:00,1.00,50,1013,0,1,2,N,0,5",
+        "LIGNE,CASSÉE",
+        None, # Mesure importée, à formater
+        "2024-01-01 00:02:00,3.00,50,1013,0,1,2,N,0,5",
+    ]
+    assert duplicates == 1
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(meteo_import, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(meteo_import, "CSV_FILE", str(tmp_path / "meteo_log.csv"))
+    monkeypatch.setattr(meteo_import, "IMPORT_STATUS_FILE", str(tmp_path / "import_status.json"))
+    monkeypatch.setattr(meteo_import, "LOCK_FILE", str(tmp_path / ".import.lock"))
+    return tmp_path
+
+def test_run_import_merges_into_csv(data_dir):
+    log = data_dir / "meteo_log.csv"
+    log.write_bytes((HEADER + "2024-01-01 00:00:00,1.00,50,1013,0,1,2,N,0,5\r\n???\r\n").encode())
+    backup = data_dir / "backup.csv"
+    backup.write_text(SECOND)
+    stats = run_import([str(backup)], policy="first", backend="csv", workers=1, verbose=False)
+    assert (stats["state"], stats["duplicates"], stats["kept_unparsed"], stats["written"]) == ("done", 1, 1, 3)
+    assert log.read_bytes().decode() == (HEADER + "2024-01-01 00:00:00,1.00,50,1013,0,1,2,N,0,5\r\n???\r\n"
+                                         "2024-01-01 00:01:00,2.0,50.0,1013.0,0.0,1.0,2.0,N,0.0,5.0\r\n")
+    assert meteo_import.read_status()["state"] == "done"
+
+def test_unknown_policy_and_running_import(data_dir):
+    with pytest.raises(ValueError):
+        run_import([], policy="newest", backend="csv")
+    assert not meteo_import.import_running()
+    with open(meteo_import.LOCK_FILE, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # flock est lié au fichier ouvert : une autre ouverture du verrou est refusée
+        assert meteo_import.import_running()
+        with pytest.raises(meteo_import.ImportInProgress):
+            run_import([], backend="csv")
+
+def test_run_import_replace(data_dir):
+    log = data_dir / "meteo_log.csv"
+    log.write_text(HEADER + "2023-01-01 00:00:00,1,50,1013,0,1,2,N,0,5\r\n")
+    backup = data_dir / "backup.csv"
+    backup.write_text(SECOND)
+    stats = run_import([str(backup)], replace=True, backend="csv", workers=1, verbose=False)
+    assert stats["written"] == 2
+    content = log.read_text()
+    assert "2023-01-01" not in content # L'ancien journal n'est pas recopié comme « ajouté pendant l'import »
+    assert content.count("\n") == 3
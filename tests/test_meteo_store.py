@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# Stockage SQLite (meteo_store.MeteoStore) : écriture groupée, doublons et
+# remise à zéro.
+#
+
+import sqlite3
+
+from meteo_store import MeteoStore
+
+def fields(timestamp, temp="12.5"):
+    return [timestamp, temp, "50", "1013.2", "0", "5", "8", "N", "0.0", "3.0"]
+
+def test_flush_ignores_duplicates(tmp_path):
+    store = MeteoStore(str(tmp_path / "meteo.db"))
+    store.add_measurement(fields("2024-01-01 00:00:00"))
+    store.add_measurement(fields("2024-01-01 00:01:00"))
+    store.add_measurement(["pas une date"] + fields("")[1:])
+    assert store.flush() == 2
+    store.add_measurement(fields("2024-01-01 00:01:00", "99"))
+    store.flush()
+    assert store.count() == 2
+    assert store.get_measurement("2024-01-01 00:01:00")[1] == 12.5
+    assert store.last_time() == "2024-01-01 00:01:00"
+
+def test_clear_only_touches_measurements(tmp_path):
+    path = str(tmp_path / "meteo.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE climate_test (day TEXT PRIMARY KEY)")
+    conn.execute("INSERT INTO climate_test VALUES ('2024-01-01')")
+    # Ancienne table du vent 3 s, jamais relue : supprimée à l'ouverture
+    conn.execute("CREATE TABLE wind_detail (time TEXT PRIMARY KEY, wind_speed REAL)")
+    conn.commit()
+    conn.close()
+
+    store = MeteoStore(path)
+    store.bulk_write([("2024-01-01 00:00:00", 1.0, 50.0, 1013.0, 0.0, 1.0, 2.0, "N", 0.0, 5.0)])
+    store.clear()
+    assert store.count() == 0
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT count(*) FROM climate_test").fetchone() == (1,)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'wind_detail'").fetchone() is None
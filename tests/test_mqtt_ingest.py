@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Ingestion MQTT (mqtt_ingest) : conversion des messages du capteur en
+# lignes CSV et préparation des lots (doublons, trous).
+#
+
+import json
+import queue
+import threading
+import time
+
+import mqtt_ingest
+from mqtt_ingest import MqttIngest, payload_to_row
+
+PAYLOAD = {
+    "station": "jardin",
+    "timestamp": "2024-06-01 12:00:00",
+    "temperature": 21.456,
+    "humidity": 60,
+    "pressure": 1012.3,
+    "rain_since_last": 0.2794,
+    "wind_speed": 7.2,
+    "wind_gust": 12.0,
+    "wind_direction": "SO",
+    "wind_direction_deg": 224.6,
+    "wind_direction_std": 12.34,
+}
+
+def row(timestamp):
+    return payload_to_row(dict(PAYLOAD, timestamp=timestamp))
+
+def test_payload_to_row():
+    assert payload_to_row(PAYLOAD) == ["2024-06-01 12:00:00", "21.46", "60.00", "1012.30", "0.2794",
+                                       "7.20", "12.00", "SO", "224.6", "12.3"]
+
+def test_payload_missing_and_stale_values():
+    data = dict(PAYLOAD, humidity=None, pressure=True, wind_direction=None, stale=["temperature"])
+    del data["wind_gust"]
+    assert payload_to_row(data) == ["2024-06-01 12:00:00", "", "", "", "0.2794", "7.20", "", "N/A", "224.6", "12.3"]
+
+def test_invalid_payloads():
+    assert payload_to_row(dict(PAYLOAD, timestamp="hier")) is None
+    assert payload_to_row(dict(PAYLOAD, timestamp=1717243200)) is None
+    assert payload_to_row({}) is None
+
+class FakeStationStore:
+    def __init__(self, last):
+        self.last = last
+
+    def last_time(self):
+        return self.last
+
+class FakeRegistry:
+    def __init__(self, stores):
+        self.stores = stores
+
+    def get(self, station_id):
+        return self.stores.get(station_id)
+
+def make_ingest(tmp_path, csv_text="", stores=None):
+    """MqttIngest sans thread d'écriture ni stockage : seul l'état utilisé par _prepare()."""
+    csv_file = tmp_path / "meteo_log.csv"
+    csv_file.write_text(csv_text)
+    ingest = MqttIngest.__new__(MqttIngest)
+    ingest.local_id = "local"
+    ingest.csv_file = str(csv_file)
+    ingest.registry = FakeRegistry(stores or {})
+    ingest.last_seen = {}
+    ingest.counters = {"received": 0, "invalid": 0, "stalls": 0, "dropped": 0}
+    ingest.queue = queue.Queue()
+    ingest._stop_event = threading.Event()
+    return ingest
+
+def test_prepare_skips_duplicates_and_reports_gaps(tmp_path):
+    ingest = make_ingest(tmp_path, "time,temp\n" + ",".join(row("2024-06-01 12:00:00")) + "\n")
+    batch = [("local", row(t)) for t in ("2024-06-01 12:05:00", "2024-06-01 12:01:00", "2024-06-01 12:00:00",
+                                         "2024-06-01 12:01:00", "2024-06-01 12:02:00")]
+    [(station, fresh, last, gaps, late)] = ingest._prepare(batch)
+    assert station == "local"
+    assert [r[0] for r in fresh] == ["2024-06-01 12:01:00", "2024-06-01 12:02:00", "2024-06-01 12:05:00"]
+    assert last == "2024-06-01 12:05:00"
+    assert late == 2 # Déjà dans le journal, et renvoi QoS 1
+    assert gaps == [{"station": "local", "from": "2024-06-01 12:02:00", "to": "2024-06-01 12:05:00", "minutes": 3}]
+    assert ingest.last_seen == {"local": "2024-06-01 12:00:00"} # Validé seulement après l'écriture
+
+def test_prepare_per_station(tmp_path):
+    ingest = make_ingest(tmp_path, stores={"jardin": FakeStationStore("2024-06-01 12:00:00")})
+    batch = [("jardin", row("2024-06-01 12:00:00")), ("jardin", row("2024-06-01 12:01:00")),
+             ("nouvelle", row("2024-06-01 11:00:00"))]
+    plan = {station: (len(fresh), late, gaps) for station, fresh, _, gaps, late in ingest._prepare(batch)}
+    assert plan == {"jardin": (1, 1, []), "nouvelle": (1, 0, [])}
+
+def test_handle_message_validation(tmp_path):
+    ingest = make_ingest(tmp_path)
+    ingest.handle_message("meteo/data", json.dumps(PAYLOAD).encode())
+    ingest.handle_message("meteo/data", b"{pas du json")
+    ingest.handle_message("meteo/data", json.dumps(dict(PAYLOAD, station="../etc")).encode())
+    assert ingest.counters == {"received": 1, "invalid": 2, "stalls": 0, "dropped": 0}
+    assert ingest.queue.get_nowait() == ("jardin", payload_to_row(PAYLOAD))
+
+def test_full_queue_blocks_instead_of_dropping(tmp_path, monkeypatch):
+    monkeypatch.setattr(mqtt_ingest, "BACKPRESSURE_TIMEOUT", 0.05)
+    ingest = make_ingest(tmp_path)
+    ingest.queue = queue.Queue(maxsize=1)
+    ingest.queue.put(("jardin", row("2024-06-01 11:59:00")))
+
+    # Le thread réseau de paho reste dans on_message : pas de PUBACK tant que la mesure n'est pas en file
+    thread = threading.Thread(target=ingest.handle_message, args=("meteo/data", json.dumps(PAYLOAD)))
+    thread.start()
+    time.sleep(0.3)
+    assert thread.is_alive()
+    assert ingest.counters["stalls"] == 1 and ingest.counters["dropped"] == 0
+
+    ingest.queue.get_nowait() # Le thread d'écriture libère une place
+    thread.join(1)
+    assert not thread.is_alive()
+    assert ingest.queue.get_nowait() == ("jardin", payload_to_row(PAYLOAD))
+    assert ingest.counters["dropped"] == 0
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# File d'attente persistante du publisher (meteo_publisher.Outbox) et
+# attente des accusés de réception MQTT (acked_prefix).
+#
+
+import json
+import os
+
+import meteo_publisher
+from meteo_publisher import Outbox, acked_prefix
+
+def test_put_peek_commit(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.jsonl"))
+    for i in range(5):
+        outbox.put({"n": i})
+    assert len(outbox) == 5
+    assert outbox.peek(2) == [{"n": 0}, {"n": 1}]
+    assert len(outbox) == 5 # peek() ne retire rien
+    outbox.commit(2)
+    assert outbox.peek(10) == [{"n": 2}, {"n": 3}, {"n": 4}]
+    outbox.commit(0)
+    assert len(outbox) == 3
+
+def test_reload_after_restart(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    for i in range(4):
+        outbox.put({"n": i})
+    outbox.commit(1)
+    outbox.put({"n": 4})
+
+    reloaded = Outbox(path)
+    assert reloaded.peek(10) == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+
+def test_reload_skips_truncated_line(tmp_path):
+    path = tmp_path / "outbox.jsonl"
+    path.write_text(json.dumps({"n": 1}) + "\n" + '{"n": 2' + "\n")
+    outbox = Outbox(str(path))
+    assert outbox.peek(10) == [{"n": 1}]
+    assert outbox.dropped == 1
+
+def test_overflow_drops_oldest(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path, max_items=10)
+    for i in range(11):
+        outbox.put({"n": i})
+    assert outbox.dropped == 1
+    assert outbox.peek(1) == [{"n": 1}]
+    assert Outbox(path).peek(100) == outbox.peek(100)
+
+def test_commit_appends_an_ack_instead_of_rewriting(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    for i in range(10):
+        outbox.put({"n": i})
+    inode, size = os.stat(path).st_ino, os.stat(path).st_size
+    outbox.commit(3)
+    outbox.commit(4)
+    assert (os.stat(path).st_ino, os.stat(path).st_size) == (inode, size) # Fichier de données intact
+    with open(outbox.ack_path) as f:
+        assert f.read() == f"{inode} 3\n{inode} 4\n"
+    assert Outbox(path).peek(10) == [{"n": 7}, {"n": 8}, {"n": 9}]
+
+def test_compaction_after_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(meteo_publisher, "OUTBOX_COMPACT_ITEMS", 5)
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    for i in range(12):
+        outbox.put({"n": i})
+    inode = os.stat(path).st_ino
+    outbox.commit(4)
+    assert os.stat(path).st_ino == inode
+    outbox.commit(2) # 6 acquittés, 6 vivants : réécriture
+    assert os.stat(path).st_ino != inode
+    assert outbox.dead == 0 and os.path.getsize(outbox.ack_path) == 0
+    with open(path) as f:
+        assert [json.loads(line)["n"] for line in f] == list(range(6, 12))
+    assert Outbox(path).peek(20) == outbox.peek(20)
+
+def test_acks_of_a_previous_file_are_ignored(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+    outbox = Outbox(path)
+    for i in range(3):
+        outbox.put({"n": i})
+    outbox.commit(2)
+    # Fichier remplacé (compactage interrompu avant la remise à zéro des acquittements)
+    with open(path + ".new", "w") as f:
+        f.write(json.dumps({"n": 2}) + "\n")
+    os.replace(path + ".new", path)
+    assert Outbox(path).peek(10) == [{"n": 2}]
+
+class FakeInfo:
+    """MQTTMessageInfo : accusé reçu ou non."""
+
+    def __init__(self, published):
+        self.published = published
+
+    def is_published(self):
+        return self.published
+
+def test_acked_prefix_counts_leading_acks():
+    assert acked_prefix([FakeInfo(True), FakeInfo(True), FakeInfo(True)], timeout=0.1) == 3
+    # Un message sans PUBACK bloque le retrait de tous ceux qui le suivent
+    assert acked_prefix([FakeInfo(True), FakeInfo(False), FakeInfo(True)], timeout=0.1) == 1
+    assert acked_prefix([], timeout=0.1) == 0
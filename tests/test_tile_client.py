@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# Cache disque et revalidation ETag de tile_client.TileClient, face à un
+# serveur de tuiles local (http.server).
+#
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("PIL")
+
+from tile_client import TileClient
+
+TILE = b"\x89PNG-tuile"
+ETAG = '"v1"'
+
+class TileHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/missing.png":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(TILE)))
+        self.end_headers()
+        self.wfile.write(TILE)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    TileHandler.requests_seen = []
+    httpd = HTTPServer(("127.0.0.1", 0), TileHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_fresh_cache_is_served_without_request(server, tmp_path):
+    client = TileClient(cache_dir=str(tmp_path), max_workers=1)
+    assert client.fetch_tile(f"{server}/1/2/3.png", "osm/1/2/3.png") == TILE
+    assert client.fetch_tile(f"{server}/1/2/3.png", "osm/1/2/3.png") == TILE
+    assert len(TileHandler.requests_seen) == 1
+    meta = json.loads((tmp_path / "osm/1/2/3.png.meta.json").read_text())
+    assert meta["etag"] == ETAG
+
+def test_stale_cache_is_revalidated_with_etag(server, tmp_path):
+    client = TileClient(cache_dir=str(tmp_path), max_workers=1, cache_max_age=0)
+    assert client.fetch_tile(f"{server}/t.png", "t.png") == TILE
+    assert client.fetch_tile(f"{server}/t.png", "t.png") == TILE # Réponse 304 : contenu repris du cache
+    assert TileHandler.requests_seen == [("/t.png", None), ("/t.png", ETAG)]
+
+def test_error_returns_cached_tile(server, tmp_path):
+    client = TileClient(cache_dir=str(tmp_path), max_workers=1)
+    assert client.fetch_tile(f"{server}/missing.png") is None
+    (tmp_path / "m.png").write_bytes(TILE)
+    (tmp_path / "m.png.meta.json").write_text(json.dumps({"etag": ETAG, "fetched_at": 0}))
+    assert client.fetch_tile(f"{server}/missing.png", "m.png") == TILE
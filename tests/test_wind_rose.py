@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# Histogrammes journaliers de rose des vents (meteo_wind.WindRoseStore).
+#
+
+from datetime import date, datetime
+
+from meteo_wind import N_CLASSES, N_SECTORS, WindRoseStore, sector_index, speed_class
+
+def ts(text):
+    return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp()
+
+def test_sector_and_speed_class():
+    assert sector_index(0) == 0
+    assert sector_index(359) == 0          # N centré sur 0°
+    assert sector_index(11.25) == 1
+    assert sector_index(180) == 8
+    assert speed_class(0) == 0
+    assert speed_class(2) == 1              # Bornes inférieures incluses
+    assert speed_class(500) == N_CLASSES - 1
+
+def test_add_and_histogram_across_months(tmp_path):
+    store = WindRoseStore(str(tmp_path))
+    store.add(ts("2024-01-31 23:59:00"), 90, 12)
+    store.add(ts("2024-02-01 00:00:00"), 90, 12)
+    store.add(ts("2024-02-01 00:01:00"), 270, 1)
+    store.add(ts("2024-02-02 00:00:00"), None, 5) # Ignorée : pas de direction
+
+    assert store.months() == ["2024-01", "2024-02"]
+    total, days = store.histogram(date(2024, 1, 1), date(2024, 2, 29))
+    assert days == 2
+    assert len(total) == N_SECTORS and all(len(row) == N_CLASSES for row in total)
+    assert total[sector_index(90)][speed_class(12)] == 2
+    assert total[sector_index(270)][speed_class(1)] == 1
+    assert sum(map(sum, total)) == 3
+
+    total, days = store.histogram(date(2024, 2, 1), date(2024, 2, 1))
+    assert (days, sum(map(sum, total))) == (1, 2)
+    assert store.date_range() == (date(2024, 1, 31), date(2024, 2, 1))
+    assert store.last_timestamp() == ts("2024-02-01 00:01:00")
+
+def test_reader_without_cache_sees_new_counts(tmp_path):
+    writer = WindRoseStore(str(tmp_path))
+    reader = WindRoseStore(str(tmp_path), cache=False)
+    writer.add(ts("2024-03-10 12:00:00"), 45, 25)
+    assert reader.histogram(date(2024, 3, 10), date(2024, 3, 10))[1] == 1
+    writer.add(ts("2024-03-10 12:01:00"), 45, 25)
+    assert sum(map(sum, reader.histogram(date(2024, 3, 10), date(2024, 3, 10))[0])) == 2
+
+def test_catch_up_from_csv(tmp_path):
+    csv_path = tmp_path / "meteo_log.csv"
+    csv_path.write_text(
+        "time,temp,hum,pressure,rain,wind_speed,wind_gust,wind_dir_str,wind_dir_deg,wind_dir_std\n"
+        "2024-04-01 10:00:00,12,50,1013,0,15,20,E,92.0,5.0\n"
+        "2024-04-01 10:01:00,12,50,1013,0,3,,SO\n"   # Ancienne ligne : libellé seul
+        "2024-04-01 10:02:00,12,50,1013,0,3,,N/A,,\n" # Sans direction : ignorée
+    )
+    store = WindRoseStore(str(tmp_path / "rose"))
+    assert store.catch_up_from_csv(str(csv_path)) == 2
+    total, _ = store.histogram(date(2024, 4, 1), date(2024, 4, 1))
+    assert total[sector_index(92)][speed_class(15)] == 1
+    assert total[sector_index(225)][speed_class(3)] == 1
+    # Un second rattrapage ne recompte pas les mêmes lignes
+    assert store.catch_up_from_csv(str(csv_path)) == 0
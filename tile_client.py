@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# Client de tuiles cartographiques partagé par satellite_fetcher.py et la page
+# d'administration (génération du fond de carte OpenStreetMap).
+# - Une session requests avec pool de connexions (keep-alive entre les tuiles)
+# - Téléchargement des 9 tuiles en parallèle sur un pool de threads
+# - Cache disque optionnel avec revalidation ETag / Last-Modified
+# - Assemblage de la grille en une seule passe une fois toutes les tuiles reçues
+#
+
+import io
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+TILE_SIZE = 256
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CACHE_DIR = os.path.join(DATA_DIR, "tile_cache")
+CACHE_MAX_AGE = 30 * 24 * 3600 # Au-delà de 30 jours, une tuile en cache est revalidée auprès du serveur
+USER_AGENT = 'MeteoPi/1.0 (Raspberry Pi Weather Station)' # Requis par la politique d'utilisation des tuiles OSM
+
+def latlon_to_tile_coords(lat, lon, zoom):
+    """Convertit des coordonnées GPS en coordonnées de tuile OpenStreetMap."""
+    lat_rad = math.radians(lat)
+    n = 2.0 ** zoom
+    xtile = int((lon + 180.0) / 360.0 * n)
+    ytile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return (xtile, ytile)
+
+class TileClient:
+    """Téléchargement concurrent et mis en cache de tuiles de carte."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_workers=9, timeout=10, cache_max_age=CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.cache_max_age = cache_max_age
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tile")
+
+    # ---- Cache disque ----
+
+    def _cache_paths(self, cache_key):
+        path = os.path.join(self.cache_dir, cache_key)
+        return path, path + ".meta.json"
+
+    def _read_cache(self, cache_key):
+        data_path, meta_path = self._cache_paths(cache_key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(data_path, 'rb') as f:
+                return f.read(), meta
+        except (OSError, json.JSONDecodeError):
+            return None, {}
+
+    def _write_cache(self, cache_key, content, meta):
+        data_path, meta_path = self._cache_paths(cache_key)
+        try:
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            if content is not None:
+                with open(data_path + ".tmp", 'wb') as f:
+                    f.write(content)
+                os.replace(data_path + ".tmp", data_path)
+            with open(meta_path + ".tmp", 'w') as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            print(f"⚠️ Écriture du cache de tuiles impossible ({cache_key}) : {e}")
+
+    # ---- Téléchargement ----
+
+    def fetch_tile(self, url, cache_key=None):
+        """
+        Retourne le contenu brut (bytes) d'une tuile, ou None en cas d'échec.
+        Avec `cache_key`, la tuile est servie depuis le disque tant qu'elle est
+        récente, puis revalidée (requête conditionnelle, réponse 304 sans contenu).
+        """
+        cached, meta = (None, {})
+        headers = {}
+        if cache_key:
+            cached, meta = self._read_cache(cache_key)
+            if cached is not None:
+                if time.time() - meta.get('fetched_at', 0) < self.cache_max_age:
+                    return cached
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Erreur lors du téléchargement de la tuile {url.split('?')[0]} : {e}")
+            return cached # Une tuile ancienne vaut mieux qu'un trou dans la carte
+
+        if response.status_code == 304 and cached is not None:
+            meta['fetched_at'] = time.time()
+            self._write_cache(cache_key, None, meta)
+            return cached
+        if response.status_code == 200:
+            if cache_key:
+                self._write_cache(cache_key, response.content, {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'fetched_at': time.time(),
+                })
+            return response.content
+
+        print(f"Tuile {url.split('?')[0]} indisponible (HTTP {response.status_code}).")
+        return cached
+
+    def fetch_grid(self, url_template, center_x, center_y, zoom, grid_size=3, mode='RGB', cache_name=None):
+        """
+        Télécharge en parallèle une grille `grid_size` x `grid_size` centrée sur
+        (center_x, center_y) et l'assemble en une seule image PIL.
+        `url_template` contient les champs {z}, {x} et {y}.
+        Retourne (image, nombre de tuiles obtenues).
+        """
+        offset = grid_size // 2
+        futures = {}
+        for i in range(grid_size):
+            for j in range(grid_size):
+                tile_x, tile_y = center_x + i - offset, center_y + j - offset
+                url = url_template.format(z=zoom, x=tile_x, y=tile_y)
+                cache_key = f"{cache_name}/{zoom}/{tile_x}/{tile_y}.png" if cache_name else None
+                futures[self.executor.submit(self.fetch_tile, url, cache_key)] = (i, j)
+
+        # Délai global : les tuiles sont téléchargées en même temps, pas à la suite
+        done, not_done = wait(futures, timeout=self.timeout * 2)
+        for future in not_done:
+            future.cancel()
+
+        full_image = Image.new(mode, (TILE_SIZE * grid_size, TILE_SIZE * grid_size), (0, 0, 0, 0) if mode == 'RGBA' else 0)
+        tiles_ok = 0
+        for future in done:
+            content = future.result()
+            if not content:
+                continue
+            i, j = futures[future]
+            try:
+                tile_image = Image.open(io.BytesIO(content)).convert(mode)
+                full_image.paste(tile_image, (i * TILE_SIZE, j * TILE_SIZE))
+                tiles_ok += 1
+            except (OSError, ValueError) as e:
+                print(f"Tuile ({i},{j}) illisible : {e}")
+        return full_image, tiles_ok
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Retourne le client de tuiles partagé du processus (créé au premier appel)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TileClient()
+        return _client